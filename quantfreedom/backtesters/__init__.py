@@ -1,9 +1,20 @@
 from quantfreedom.backtesters.bt_live_bt import live_backtest
 from quantfreedom.backtesters.bt_or_bt import or_backtest
 from quantfreedom.backtesters.bt_multi_bt import run_df_backtest
+from quantfreedom.backtesters.bt_halving import run_halving_backtest
+from quantfreedom.backtesters.bt_adaptive import run_adaptive_backtest
+from quantfreedom.backtesters.bt_refine import run_refine_backtest
+from quantfreedom.backtesters.bt_distributed import run_coordinator_backtest, run_worker_backtest
+from quantfreedom.backtesters.bt_session import BacktestSession
 
 __all__ = [
     "run_df_backtest",
+    "run_halving_backtest",
+    "run_adaptive_backtest",
+    "run_refine_backtest",
+    "run_coordinator_backtest",
+    "run_worker_backtest",
+    "BacktestSession",
     "live_backtest",
     "or_backtest",
 ]
@@ -0,0 +1,285 @@
+import numpy as np
+import pandas as pd
+from copy import copy
+from logging import getLogger
+from typing import Optional
+from quantfreedom.backtesters.bt_multi_bt import run_df_backtest
+from quantfreedom.core.search_space import SearchSpace
+from quantfreedom.core.strategy import Strategy
+from quantfreedom.core.enums import BacktestSettings, FootprintCandlesTuple
+from quantfreedom.helpers.helper_funcs import filter_bt_df
+from quantfreedom.helpers.result_sink import ResultMetricColumns
+
+logger = getLogger()
+
+
+def run_adaptive_backtest(
+    candles: FootprintCandlesTuple,
+    strategy: Strategy,
+    threads: int,
+    total_evals: int = 1000,
+    evals_per_round: Optional[int] = None,
+    startup_evals: Optional[int] = None,
+    gamma: float = 0.25,
+    candidates_per_eval: int = 24,
+    rank_metric: str = "qf_score",
+    seed: Optional[int] = None,
+    engine: str = "loop",
+    batch_size: int = 1000,
+    shared_memory: bool = False,
+    tasks_per_thread: int = 4,
+    progress_interval: float = 5.0,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Summary
+    -------
+    Tree structured parzen estimator search over the settings of the strategy instead of backtesting every one of them
+
+    The first round backtests startup_evals random settings. After that the settings backtested so far get split into the gamma share with the highest rank_metric and the rest, and every axis of the SearchSpace gets a smoothed histogram for both. Candidates get drawn from the histograms of the good settings and the evals_per_round with the highest good to bad density ratio that aren't backtested yet go into the next round
+
+    Candidates that aren't settings of the strategy get thrown out so the search stays inside get_filter_cart_prod_array or the param space constraints. Every round goes through run_df_backtest without the backtest settings filters so settings that don't pass them still teach the search something, the filters are used on the results at the end
+
+    Parameters
+    ----------
+    candles : FootprintCandlesTuple
+        candles
+    strategy : Strategy
+        strategy
+    threads : int
+        number of processes
+    total_evals : int, 1000
+        settings to backtest, less if the strategy doesn't have that many
+    evals_per_round : Optional[int], None
+        settings backtested together in one run_df_backtest. None = threads * tasks_per_thread * 8
+    startup_evals : Optional[int], None
+        random settings in the first round. None = evals_per_round
+    gamma : float, 0.25
+        share of the settings backtested so far that count as good
+    candidates_per_eval : int, 24
+        candidates drawn from the good histograms for every setting a round needs
+    rank_metric : str, "qf_score"
+        gains_pct, win_rate, qf_score or profit_factor
+    seed : Optional[int], None
+        seed of the random generator
+    engine : str, "loop"
+        loop or batch, see run_df_backtest
+    batch_size : int, 1000
+        see run_df_backtest
+    shared_memory : bool, False
+        see run_df_backtest
+    tasks_per_thread : int, 4
+        see run_df_backtest
+    progress_interval : float, 5.0
+        see run_df_backtest
+
+    Returns
+    -------
+    tuple[pd.DataFrame, pd.DataFrame]
+        backtest results of the settings that made it through the backtest settings filters and the eval log with the round, settings index, rank_metric and best rank_metric so far of every setting that got backtested, rank_metric is nan if the setting had no closed trades
+    """
+    if rank_metric not in ResultMetricColumns:
+        raise Exception(f"{', '.join(ResultMetricColumns)} are the only options for rank_metric")
+    if not 0 < gamma < 1:
+        raise Exception("gamma has to be between 0 and 1")
+
+    rng = np.random.default_rng(seed)
+    search_space = SearchSpace(strategy=strategy)
+    total_evals = min(total_evals, strategy.total_filtered_settings)
+    if evals_per_round is None:
+        evals_per_round = threads * tasks_per_thread * 8
+    if startup_evals is None:
+        startup_evals = evals_per_round
+
+    print(f"Search space axis sizes: {search_space.axis_sizes}")
+    print(f"Total settings: {strategy.total_filtered_settings:,} Total evals: {total_evals:,}")
+
+    evaluated = np.empty(0, dtype=np.int_)
+    scores = np.empty(0)
+    backtest_dfs = []
+    eval_logs = []
+    round_idx = 0
+    while evaluated.size < total_evals:
+        round_evals = min(startup_evals if round_idx == 0 else evals_per_round, total_evals - evaluated.size)
+        if round_idx == 0 or np.isnan(scores).all():
+            settings_indexes = get_random_new_settings(
+                evaluated=evaluated,
+                rng=rng,
+                search_space=search_space,
+                size=round_evals,
+            )
+        else:
+            settings_indexes = get_tpe_settings(
+                candidates_per_eval=candidates_per_eval,
+                evaluated=evaluated,
+                gamma=gamma,
+                rng=rng,
+                scores=scores,
+                search_space=search_space,
+                size=round_evals,
+            )
+        if settings_indexes.size == 0:
+            break
+
+        round_strategy = copy(strategy)
+        round_strategy.set_og_settings_subset(settings_indexes=settings_indexes)
+        round_strategy.backtest_settings_tuple = BacktestSettings()
+        print("\n" + f"Round {round_idx + 1}: {settings_indexes.size:,} settings")
+        backtest_df = run_df_backtest(
+            candles=candles,
+            strategy=round_strategy,
+            threads=threads,
+            engine=engine,
+            batch_size=batch_size,
+            shared_memory=shared_memory,
+            tasks_per_thread=tasks_per_thread,
+            progress_interval=progress_interval,
+        )
+        backtest_dfs.append(backtest_df)
+
+        round_scores = backtest_df[rank_metric].reindex(settings_indexes).to_numpy(dtype=np.float_)
+        evaluated = np.concatenate((evaluated, settings_indexes))
+        scores = np.concatenate((scores, round_scores))
+        eval_logs.append(
+            pd.DataFrame(
+                {
+                    "round": round_idx,
+                    "settings_index": settings_indexes,
+                    rank_metric: round_scores,
+                }
+            )
+        )
+        print(f"Best {rank_metric} so far: {np.nanmax(scores) if not np.isnan(scores).all() else np.nan}")
+        round_idx += 1
+
+    eval_log = pd.concat(eval_logs, ignore_index=True) if eval_logs else pd.DataFrame()
+    if not eval_log.empty:
+        eval_log[f"best_{rank_metric}"] = eval_log[rank_metric].cummax().ffill()
+
+    backtest_df = pd.concat(backtest_dfs) if backtest_dfs else pd.DataFrame()
+    if not backtest_df.empty:
+        backtest_df = filter_bt_df(
+            backtest_df=backtest_df,
+            backtest_settings_tuple=strategy.backtest_settings_tuple,
+        ).sort_values("gains_pct", ascending=False)
+    return backtest_df, eval_log
+
+
+def get_random_new_settings(
+    evaluated: np.ndarray,
+    rng: np.random.Generator,
+    search_space: SearchSpace,
+    size: int,
+) -> np.ndarray:
+    """
+    Summary
+    -------
+    Up to size settings indexes picked uniformly from the settings that weren't backtested yet
+
+    Returns
+    -------
+    np.ndarray
+        settings indexes, less than size if there aren't that many settings left
+    """
+    new_settings = np.empty(0, dtype=np.int_)
+    for _ in range(10):
+        picks = search_space.get_random_settings_indexes(rng=rng, size=size * 2)
+        picks = picks[~np.isin(picks, evaluated) & ~np.isin(picks, new_settings)]
+        new_settings = np.concatenate((new_settings, pd.unique(picks)))[:size]
+        if new_settings.size == size:
+            return new_settings
+
+    # most of the settings are backtested already so pick from the ones that are left
+    if search_space.total_settings <= 1_000_000:
+        if search_space.param_space is None:
+            all_settings = search_space.settings_indexes
+        else:
+            all_settings = search_space.param_space.get_settings_indexes(positions=np.arange(search_space.total_settings))
+        settings_left = np.setdiff1d(all_settings, np.concatenate((evaluated, new_settings)))
+        new_settings = np.concatenate(
+            (new_settings, rng.permutation(settings_left)[: size - new_settings.size])
+        )
+    return new_settings
+
+
+def get_axis_densities(
+    axis_size: int,
+    value_indexes: np.ndarray,
+) -> np.ndarray:
+    """
+    Summary
+    -------
+    Histogram of value_indexes on one axis smoothed into the neighbouring values with a 0.25 0.5 0.25 kernel plus a uniform prior worth one observation
+
+    Returns
+    -------
+    np.ndarray
+        density of every value of the axis, sums to 1
+    """
+    counts = np.bincount(value_indexes, minlength=axis_size).astype(np.float_)
+    smoothed = counts * 0.5
+    smoothed[1:] += counts[:-1] * 0.25
+    smoothed[:-1] += counts[1:] * 0.25
+    # the first and last values have no neighbour on one side so they keep that quarter
+    smoothed[0] += counts[0] * 0.25
+    smoothed[-1] += counts[-1] * 0.25
+    densities = smoothed + 1 / axis_size
+    return densities / densities.sum()
+
+
+def get_tpe_settings(
+    candidates_per_eval: int,
+    evaluated: np.ndarray,
+    gamma: float,
+    rng: np.random.Generator,
+    scores: np.ndarray,
+    search_space: SearchSpace,
+    size: int,
+) -> np.ndarray:
+    """
+    Summary
+    -------
+    Draws candidates from the good densities of every axis and picks the size new settings with the highest sum of log good density minus log bad density, filled up with random new settings if there aren't enough
+
+    Returns
+    -------
+    np.ndarray
+        settings indexes
+    """
+    ranks = np.argsort(-np.nan_to_num(scores, nan=-np.inf), kind="stable")
+    total_good = max(int(np.ceil(gamma * evaluated.size)), 1)
+    value_indexes = search_space.get_value_indexes(settings_indexes=evaluated)
+    good_value_indexes = value_indexes[ranks[:total_good]]
+    bad_value_indexes = value_indexes[ranks[total_good:]]
+
+    total_candidates = size * candidates_per_eval
+    candidates = np.empty((total_candidates, len(search_space.axis_sizes)), dtype=np.int_)
+    log_ratios = np.zeros(total_candidates)
+    for axis, axis_size in enumerate(search_space.axis_sizes):
+        good_densities = get_axis_densities(axis_size=axis_size, value_indexes=good_value_indexes[:, axis])
+        bad_densities = get_axis_densities(axis_size=axis_size, value_indexes=bad_value_indexes[:, axis])
+        candidates[:, axis] = rng.choice(axis_size, size=total_candidates, p=good_densities)
+        log_ratios += np.log(good_densities[candidates[:, axis]]) - np.log(bad_densities[candidates[:, axis]])
+
+    candidate_settings = search_space.get_settings_indexes(value_indexes=candidates)
+    keep = (candidate_settings != -1) & ~np.isin(candidate_settings, evaluated)
+    candidate_settings = candidate_settings[keep]
+    log_ratios = log_ratios[keep]
+
+    # best ratio first and every setting only once
+    candidate_settings = candidate_settings[np.argsort(-log_ratios, kind="stable")]
+    new_settings = pd.unique(candidate_settings)[:size]
+    logger.debug(f"tpe kept {new_settings.size} of {total_candidates} candidates")
+
+    if new_settings.size < size:
+        new_settings = np.concatenate(
+            (
+                new_settings,
+                get_random_new_settings(
+                    evaluated=np.concatenate((evaluated, new_settings)),
+                    rng=rng,
+                    search_space=search_space,
+                    size=size - new_settings.size,
+                ),
+            )
+        )
+    return new_settings.astype(np.int_)
@@ -0,0 +1,481 @@
+import numpy as np
+import pandas as pd
+from collections import deque
+from copy import copy
+from logging import getLogger
+from multiprocessing import Pool, TimeoutError
+from multiprocessing.connection import AuthenticationError, Client, Listener, wait
+from os import getpid
+from queue import Empty, Queue
+from ipaddress import ip_address
+from socket import gethostbyname, gethostname
+from threading import Event, Thread
+from time import perf_counter, sleep
+from typing import Optional
+from quantfreedom.backtesters.bt_multi_bt import (
+    get_engine_bt_func_and_order,
+    print_backtest_progress,
+    set_worker_backtest_data,
+    worker_backtest_task,
+)
+from quantfreedom.core.strategy import Strategy
+from quantfreedom.core.enums import FootprintCandlesTuple, PruneRule
+from quantfreedom.helpers.checkpoint import BacktestCheckpoint, get_backtest_key, get_ranges_left
+from quantfreedom.helpers.helper_funcs import make_bt_df
+from quantfreedom.helpers.result_sink import ResultMetricColumns, ResultMetricNames, get_result_sink
+
+logger = getLogger()
+
+# the messages are pickles so anyone with the authkey can run code on the other side, the default only works on loopback
+default_authkey = "quantfreedom"
+
+
+def run_coordinator_backtest(
+    candles: FootprintCandlesTuple,
+    strategy: Strategy,
+    host: str = "127.0.0.1",
+    port: int = 6000,
+    authkey: str = default_authkey,
+    step_by: int = 1,
+    chunk_size: int = 10000,
+    task_timeout: float = 120.0,
+    max_retries: int = 3,
+    progress_interval: float = 5.0,
+    result_sink: str = "memory",
+    result_path: Optional[str] = None,
+    top_k: Optional[int] = None,
+    top_k_metric: str = "qf_score",
+    checkpoint_path: Optional[str] = None,
+    resume: bool = False,
+    checkpoint_interval: float = 60.0,
+) -> pd.DataFrame:
+    """
+    Summary
+    -------
+    Coordinator of a backtest over multiple machines. It listens on host and port and hands out ranges of chunk_size settings to every run_worker_backtest that connects, the workers stream the result rows of every piece of a range back as soon as it is done
+
+    Workers have to load the same candles and the same strategy. Every worker sends a hash of its candles and strategy settings and gets turned away if it doesn't match the coordinator, so a shuffled strategy needs the same shuffle on every machine
+
+    A range is lost when the connection to its worker drops or the worker doesn't send anything for task_timeout seconds. The pieces of a lost range that didn't come back yet go to the front of the queue for the next worker that asks, a range that gets lost more than max_retries times stops the backtest
+
+    Settings get handed out in og order like the range partition of run_df_backtest so the checkpoints of the two work with each other
+
+    Parameters
+    ----------
+    candles : FootprintCandlesTuple
+        candles
+    strategy : Strategy
+        strategy
+    host : str, "127.0.0.1"
+        address to listen on, use "0.0.0.0" with your own authkey for workers on other machines
+    port : int, 6000
+        port to listen on
+    authkey : str, "quantfreedom"
+        key the workers need to connect. The default only works when host is a loopback address, anywhere else you need your own secret key since the messages are unpickled
+    step_by : int, 1
+        only backtest every step_by settings
+    chunk_size : int, 10000
+        number of settings in a range, a worker splits its range over its processes
+    task_timeout : float, 120.0
+        seconds without a message from a worker with a range before the range counts as lost
+    max_retries : int, 3
+        times a range can get lost
+    progress_interval : float, 5.0
+        seconds between progress prints
+    result_sink : str, "memory"
+        see run_df_backtest
+    result_path : Optional[str], None
+        see run_df_backtest
+    top_k : Optional[int], None
+        see run_df_backtest
+    top_k_metric : str, "qf_score"
+        see run_df_backtest
+    checkpoint_path : Optional[str], None
+        see run_df_backtest
+    resume : bool, False
+        see run_df_backtest
+    checkpoint_interval : float, 60.0
+        see run_df_backtest
+
+    Returns
+    -------
+    pd.DataFrame
+        backtest results
+    """
+    check_authkey(host=host, authkey=authkey)
+    logger.disabled = True
+
+    total_bars = candles.candle_open_timestamps.size
+    num_array_columns = (
+        len(ResultMetricNames) + len(strategy.og_dos_tuple._fields) + len(strategy.og_ind_set_tuple._fields)
+    )
+    run_settings = (step_by, "range", top_k, top_k_metric if top_k is not None else None)
+    backtest_key = get_backtest_key(
+        candles=candles,
+        strategy=strategy,
+        run_settings=run_settings,
+    )
+
+    # a multiple of step_by so every range steps through the same settings one big range would
+    chunk_size = max(step_by, -(-chunk_size // step_by) * step_by)
+    task_ranges = [
+        (range_start, min(range_start + chunk_size, strategy.total_filtered_settings))
+        for range_start in range(0, strategy.total_filtered_settings, chunk_size)
+    ]
+
+    print("\n" + f"Total settings combinations after filtering: {strategy.total_filtered_settings:,}")
+    print(f"Total candles: {total_bars:,}")
+    print(f"Total ranges: {len(task_ranges):,}")
+
+    sink = get_result_sink(
+        num_array_columns=num_array_columns,
+        result_sink=result_sink,
+        result_path=result_path,
+        top_k=top_k,
+        top_k_metric=top_k_metric,
+    )
+    top_k_column = ResultMetricColumns[top_k_metric] if top_k is not None else None
+
+    prune_counts = np.zeros(len(PruneRule), dtype=np.int_)
+    checkpoint = None
+    if checkpoint_path is not None:
+        checkpoint = BacktestCheckpoint(
+            backtest_key=backtest_key,
+            checkpoint_path=checkpoint_path,
+            num_array_columns=num_array_columns,
+            resume=resume,
+            checkpoint_interval=checkpoint_interval,
+            top_k=top_k,
+            top_k_column=top_k_column,
+        )
+        if checkpoint.done_ranges:
+            sink.append(rows=checkpoint.get_done_rows())
+            prune_counts += checkpoint.get_done_prune_counts(total_rules=len(PruneRule))
+            task_ranges = get_ranges_left(
+                task_ranges=task_ranges,
+                done_ranges=checkpoint.done_ranges,
+                step_by=step_by,
+            )
+            print(f"Resuming from {checkpoint.folder_path} with {sink.total_rows:,} results kept")
+            print(f"Total ranges left: {len(task_ranges):,}")
+
+    listener = Listener((host, port), authkey=authkey.encode())
+    new_conns = Queue()
+    stop_accepting = Event()
+    Thread(
+        target=accept_workers,
+        args=(listener, new_conns, stop_accepting),
+        daemon=True,
+    ).start()
+    print("\n" + f"Waiting for workers on {host}:{port}")
+
+    task_queue = deque((range_start, range_end, 0) for range_start, range_end in task_ranges)
+    total_task_settings = sum(len(range(range_start, range_end, step_by)) for range_start, range_end in task_ranges)
+    workers = {}
+    done_ranges = []
+    settings_done = 0
+    tasks_done = 0
+    worker_busy_times = {}
+    start_time = perf_counter()
+    last_print_time = start_time
+
+    def lose_worker(conn, reason: str):
+        worker = workers.pop(conn)
+        conn.close()
+        if worker["task"] is None:
+            return
+        range_start, range_end, attempts = worker["task"]
+        if attempts >= max_retries:
+            raise Exception(f"range {range_start:,} to {range_end:,} got lost {attempts + 1} times")
+        pieces_left = get_ranges_left(
+            task_ranges=[(range_start, range_end)],
+            done_ranges=done_ranges,
+            step_by=step_by,
+        )
+        task_queue.extendleft((piece_start, piece_end, attempts + 1) for piece_start, piece_end in pieces_left[::-1])
+        print(f"Lost worker {worker['name']} because {reason}, {len(pieces_left):,} ranges back in the queue", flush=True)
+
+    try:
+        while task_queue or any(worker["task"] is not None for worker in workers.values()):
+            while True:
+                try:
+                    conn = new_conns.get_nowait()
+                except Empty:
+                    break
+                conn.send(("settings", run_settings))
+                workers[conn] = {"name": None, "task": None, "last_time": perf_counter()}
+
+            if not workers:
+                sleep(0.5)
+                continue
+
+            for conn in wait(list(workers), timeout=1.0):
+                try:
+                    message = conn.recv()
+                except (EOFError, OSError):
+                    lose_worker(conn=conn, reason="the connection dropped")
+                    continue
+                worker = workers[conn]
+                worker["last_time"] = perf_counter()
+
+                if message[0] == "ready":
+                    worker_key, worker["name"] = message[1], message[2]
+                    if worker_key != backtest_key:
+                        conn.send(("error", "the candles or the strategy settings of the worker aren't the same as the coordinator"))
+                        print(f"Turned away worker {worker['name']} with different candles or strategy settings", flush=True)
+                        workers.pop(conn)
+                        conn.close()
+                    else:
+                        print(f"Worker {worker['name']} joined", flush=True)
+
+                elif message[0] == "next":
+                    if worker["task"] is not None:
+                        tasks_done += 1
+                        worker["task"] = None
+                    if task_queue:
+                        worker["task"] = task_queue.popleft()
+                        conn.send(("range",) + worker["task"][:2])
+                    elif any(other["task"] is not None for other in workers.values()):
+                        # a range can still get lost so hold on to the worker
+                        conn.send(("wait", 1.0))
+                    else:
+                        conn.send(("done",))
+
+                elif message[0] == "result":
+                    _, range_start, range_end, record_results, task_prune_counts, worker_pid, busy_time, _ = message
+                    sink.append(rows=record_results)
+                    prune_counts += task_prune_counts
+                    settings_done += len(range(range_start, range_end, step_by))
+                    done_ranges.append((range_start, range_end))
+                    busy_key = f"{worker['name']}:{worker_pid}"
+                    worker_busy_times[busy_key] = worker_busy_times.get(busy_key, 0.0) + busy_time
+                    if checkpoint is not None:
+                        checkpoint.add_done_range(
+                            range_start=range_start,
+                            range_end=range_end,
+                            record_results=record_results,
+                            task_prune_counts=task_prune_counts,
+                        )
+
+            for conn, worker in list(workers.items()):
+                if worker["task"] is not None and perf_counter() - worker["last_time"] > task_timeout:
+                    lose_worker(conn=conn, reason=f"it didn't send anything for {task_timeout:,.0f} seconds")
+
+            cur_time = perf_counter()
+            if cur_time - last_print_time >= progress_interval:
+                print_backtest_progress(
+                    elapsed_time=cur_time - start_time,
+                    settings_done=settings_done,
+                    tasks_done=tasks_done,
+                    total_bars=total_bars,
+                    total_settings=total_task_settings,
+                    total_tasks=tasks_done + len(task_queue) + sum(worker["task"] is not None for worker in workers.values()),
+                    worker_busy_times=worker_busy_times,
+                )
+                last_print_time = cur_time
+    except BaseException:
+        if checkpoint is not None:
+            checkpoint.save()
+            print("\n" + f"Checkpoint saved to {checkpoint.folder_path}")
+        raise
+    finally:
+        stop_accepting.set()
+        for conn in workers:
+            try:
+                conn.send(("done",))
+            except OSError:
+                pass
+            conn.close()
+        listener.close()
+
+    if checkpoint is not None:
+        checkpoint.save()
+
+    print("\n" + f"Settings skipped with too few entries: {prune_counts[PruneRule.TooFewEntries]:,}")
+    print(f"Settings stopped early because equity can't afford min asset size: {prune_counts[PruneRule.CantAffordMinAsset]:,}")
+    print(f"Settings stopped early because they can't pass the filters: {prune_counts[PruneRule.CantPassFilters]:,}")
+    print(f"Total results kept: {sink.total_rows:,}")
+
+    backtest_df = make_bt_df(
+        strategy=strategy,
+        strategy_result_records=sink.get_results(),
+    )
+    sink.close()
+
+    return backtest_df
+
+
+def check_authkey(
+    host: str,
+    authkey: str,
+):
+    """
+    Summary
+    -------
+    The coordinator and the workers unpickle every message they get, so the default authkey that everyone knows is only allowed on a loopback host
+
+    Parameters
+    ----------
+    host : str
+        address of the coordinator
+    authkey : str
+        authkey
+    """
+    if authkey != default_authkey:
+        return
+    try:
+        is_loopback = ip_address(gethostbyname(host)).is_loopback
+    except (OSError, ValueError):
+        is_loopback = False
+    if not is_loopback:
+        raise Exception(f"the default authkey only works on a loopback host, use your own authkey for {host}")
+
+
+def accept_workers(
+    listener: Listener,
+    new_conns: Queue,
+    stop_accepting: Event,
+):
+    """
+    Summary
+    -------
+    Accepts the connections of the workers in its own thread and puts them in new_conns for the coordinator
+    """
+    while not stop_accepting.is_set():
+        try:
+            new_conns.put(listener.accept())
+        except AuthenticationError:
+            logger.warning("a worker with the wrong authkey tried to connect")
+        except OSError:
+            if stop_accepting.is_set():
+                return
+
+
+def run_worker_backtest(
+    candles: FootprintCandlesTuple,
+    strategy: Strategy,
+    threads: int,
+    host: str = "127.0.0.1",
+    port: int = 6000,
+    authkey: str = default_authkey,
+    engine: str = "loop",
+    batch_size: int = 1000,
+    tasks_per_thread: int = 4,
+    heartbeat_interval: float = 10.0,
+    connect_timeout: float = 60.0,
+    worker_name: Optional[str] = None,
+):
+    """
+    Summary
+    -------
+    Worker of a backtest over multiple machines. It connects to run_coordinator_backtest at host and port, asks for a range of settings, splits the range into tasks_per_thread pieces for each of its processes and sends the result rows of every piece back as soon as it is done, till the coordinator says everything is done
+
+    Parameters
+    ----------
+    candles : FootprintCandlesTuple
+        the same candles the coordinator has
+    strategy : Strategy
+        the same strategy the coordinator has
+    threads : int
+        number of processes on this machine
+    host : str, "127.0.0.1"
+        address of the coordinator
+    port : int, 6000
+        port of the coordinator
+    authkey : str, "quantfreedom"
+        authkey of the coordinator. The default only works when host is a loopback address
+    engine : str, "loop"
+        loop batch or kernel, see run_df_backtest
+    batch_size : int, 1000
+        see run_df_backtest
+    tasks_per_thread : int, 4
+        pieces per process a range gets split into
+    heartbeat_interval : float, 10.0
+        seconds between messages to the coordinator while a piece is still running, needs to be less than the task_timeout of the coordinator
+    connect_timeout : float, 60.0
+        seconds to keep trying to connect so the workers can be started before the coordinator
+    worker_name : Optional[str], None
+        name the coordinator prints. None = host name and process id
+    """
+    check_authkey(host=host, authkey=authkey)
+    logger.disabled = True
+
+    if worker_name is None:
+        worker_name = f"{gethostname()}:{getpid()}"
+
+    start_time = perf_counter()
+    while True:
+        try:
+            conn = Client((host, port), authkey=authkey.encode())
+            break
+        except ConnectionRefusedError:
+            if perf_counter() - start_time > connect_timeout:
+                raise
+            sleep(1.0)
+    _, run_settings = conn.recv()
+    step_by, _, top_k, top_k_metric = run_settings
+    conn.send(
+        (
+            "ready",
+            get_backtest_key(candles=candles, strategy=strategy, run_settings=run_settings),
+            worker_name,
+        )
+    )
+
+    bt_func, order = get_engine_bt_func_and_order(
+        batch_size=batch_size,
+        engine=engine,
+        strategy=strategy,
+    )
+    # copy so the indicator bank doesn't stick to your strategy after the backtest
+    strategy = copy(strategy)
+    strategy.set_indicator_bank(candles=candles)
+
+    p = Pool(
+        processes=threads,
+        initializer=set_worker_backtest_data,
+        initargs=(
+            candles,
+            len(ResultMetricNames) + len(strategy.og_dos_tuple._fields) + len(strategy.og_ind_set_tuple._fields),
+            strategy,
+            bt_func,
+            order,
+            strategy.static_os_tuple.starting_equity,
+            step_by,
+            top_k,
+            ResultMetricColumns[top_k_metric] if top_k is not None else None,
+            candles.candle_open_timestamps.size,
+        ),
+    )
+    try:
+        while True:
+            conn.send(("next",))
+            message = conn.recv()
+            if message[0] == "done":
+                break
+            if message[0] == "error":
+                raise Exception(message[1])
+            if message[0] == "wait":
+                sleep(message[1])
+                continue
+
+            _, range_start, range_end = message
+            piece_size = -(-(range_end - range_start) // (threads * tasks_per_thread))
+            # a multiple of step_by so the pieces step through the same settings the range does
+            piece_size = max(step_by, -(-piece_size // step_by) * step_by)
+            pieces = [
+                (piece_start, min(piece_start + piece_size, range_end))
+                for piece_start in range(range_start, range_end, piece_size)
+            ]
+            results = p.imap_unordered(worker_backtest_task, pieces)
+            for _ in pieces:
+                while True:
+                    try:
+                        result = results.next(timeout=heartbeat_interval)
+                        break
+                    except TimeoutError:
+                        conn.send(("alive",))
+                conn.send(("result",) + result)
+    finally:
+        p.terminate()
+        conn.close()
@@ -0,0 +1,126 @@
+import numpy as np
+import pandas as pd
+from copy import copy
+from logging import getLogger
+from quantfreedom.backtesters.bt_multi_bt import run_df_backtest
+from quantfreedom.core.strategy import Strategy
+from quantfreedom.core.enums import BacktestSettings, FootprintCandlesTuple
+
+logger = getLogger()
+
+
+def run_halving_backtest(
+    candles: FootprintCandlesTuple,
+    strategy: Strategy,
+    threads: int,
+    num_rungs: int = 4,
+    keep_pct: float = 0.5,
+    rank_metric: str = "qf_score",
+    engine: str = "loop",
+    batch_size: int = 1000,
+    shared_memory: bool = False,
+    partition: str = "range",
+    tasks_per_thread: int = 4,
+    progress_interval: float = 5.0,
+) -> pd.DataFrame:
+    """
+    Summary
+    -------
+    Successive halving over longer and longer candle chunks. Every setting gets backtested on the first chunk of the candles, only the keep_pct with the highest rank_metric get backtested again on a chunk that is 1 / keep_pct times longer and so on till the last rung which is the full candles
+
+    Every rung costs about the same number of bar evaluations so the whole thing costs about num_rungs * keep_pct ** (num_rungs - 1) of a full sweep
+
+    The rungs before the last one ignore the backtest settings filters so a setting isn't thrown out for not having enough trades on a short chunk, the last rung uses them like run_df_backtest does
+
+    Parameters
+    ----------
+    candles : FootprintCandlesTuple
+        candles
+    strategy : Strategy
+        strategy
+    threads : int
+        number of processes
+    num_rungs : int, 4
+        number of candle chunks, the last one is the full candles
+    keep_pct : float, 0.5
+        share of the settings that go on to the next rung
+    rank_metric : str, "qf_score"
+        gains_pct, win_rate, qf_score or profit_factor
+    engine : str, "loop"
+        loop or batch, see run_df_backtest
+    batch_size : int, 1000
+        see run_df_backtest
+    shared_memory : bool, False
+        see run_df_backtest
+    partition : str, "range"
+        range or indicator, see run_df_backtest
+    tasks_per_thread : int, 4
+        see run_df_backtest
+    progress_interval : float, 5.0
+        see run_df_backtest
+
+    Returns
+    -------
+    pd.DataFrame
+        backtest results of the settings that made it to the last rung
+    """
+    if num_rungs < 1:
+        raise Exception("num_rungs has to be at least 1")
+    if not 0 < keep_pct < 1:
+        raise Exception("keep_pct has to be between 0 and 1")
+
+    total_bars = candles.candle_open_timestamps.size
+    rung_bars = [int(total_bars * keep_pct ** (num_rungs - 1 - rung)) for rung in range(num_rungs)]
+    if rung_bars[0] <= strategy.static_os_tuple.starting_bar:
+        raise Exception(
+            f"the first rung only has {rung_bars[0]:,} candles which isn't more than the starting bar, use less rungs or a bigger keep_pct"
+        )
+
+    settings_indexes = None
+    total_bar_evals = 0
+    for rung, bars in enumerate(rung_bars):
+        rung_strategy = copy(strategy)
+        if settings_indexes is not None:
+            rung_strategy.set_og_settings_subset(settings_indexes=settings_indexes)
+
+        last_rung = rung == num_rungs - 1
+        top_k = None
+        if not last_rung:
+            rung_strategy.backtest_settings_tuple = BacktestSettings()
+            top_k = max(int(rung_strategy.total_filtered_settings * keep_pct), 1)
+
+        print(
+            "\n" + f"Rung {rung + 1}/{num_rungs}: {rung_strategy.total_filtered_settings:,} settings on {bars:,} candles"
+        )
+        total_bar_evals += rung_strategy.total_filtered_settings * bars
+
+        backtest_df = run_df_backtest(
+            candles=strategy.candle_chunk(candles=candles, beg=0, end=bars),
+            strategy=rung_strategy,
+            threads=threads,
+            engine=engine,
+            batch_size=batch_size,
+            shared_memory=shared_memory,
+            partition=partition,
+            tasks_per_thread=tasks_per_thread,
+            progress_interval=progress_interval,
+            top_k=top_k,
+            top_k_metric=rank_metric,
+        )
+        if last_rung or backtest_df.empty:
+            break
+
+        # keep the order the settings had so a shuffled strategy stays shuffled
+        settings_indexes = backtest_df["settings_index"].to_numpy(dtype=np.int_)
+        if rung_strategy.param_space is None:
+            positions = [rung_strategy.get_settings_index(set_idx=idx) for idx in settings_indexes.tolist()]
+        else:
+            positions = rung_strategy.param_space.get_positions(settings_indexes=settings_indexes)
+        settings_indexes = settings_indexes[np.argsort(positions)]
+
+    full_sweep_bar_evals = max(strategy.total_filtered_settings * total_bars, 1)
+    print(
+        "\n"
+        + f"Total candle evaluations: {total_bar_evals:,} which is {total_bar_evals / full_sweep_bar_evals * 100:.1f}% of a full sweep"
+    )
+    return backtest_df
@@ -1,21 +1,47 @@
-from typing import Optional
+from copy import copy
+from glob import glob
+from os import getpid, makedirs, remove
+from os.path import join
+from time import perf_counter
+from typing import Callable, Optional
 import numpy as np
 import pandas as pd
 from logging import getLogger
 from multiprocessing import Pool
-from multiprocessing.pool import ApplyResult
+from multiprocessing.shared_memory import SharedMemory
+from quantfreedom.helpers.checkpoint import BacktestCheckpoint, get_backtest_key, get_ranges_left
 from quantfreedom.helpers.custom_logger import set_loggers
-from quantfreedom.helpers.helper_funcs import get_qf_score, order_records_to_df, make_bt_df
+from quantfreedom.helpers.helper_funcs import order_records_to_df, make_bt_df
+from quantfreedom.helpers.result_sink import ResultMetricColumns, ResultMetricNames, get_result_sink, get_top_k_rows
+from quantfreedom.helpers.trade_metrics import (
+    add_closed_trade,
+    get_profit_factor,
+    get_qf_score_from_metrics,
+    get_trade_metrics,
+    reset_trade_metrics,
+)
+from quantfreedom.helpers import phase_profiler, trace
+from quantfreedom.helpers.phase_profiler import add_phase_stats, print_phase_table
+from quantfreedom.helpers.shared_memory import (
+    attach_named_tuple,
+    close_shared_memory,
+    share_named_tuple,
+)
+from quantfreedom.order_handler.batch_order import BatchOrderHandler
+from quantfreedom.order_handler.kernel_order import JIT_AVAILABLE, NOT_PRUNED, KernelOrderHandler, kernel_backtest
 from quantfreedom.order_handler.order import OrderHandler
 from quantfreedom.core.plotting_base import plot_or_results
 from quantfreedom.core.strategy import Strategy
 from quantfreedom.core.enums import (
     CurrentFootprintCandleTuple,
-    DecreasePosition,
     FootprintCandlesTuple,
+    LeverageStrategyType,
     OrderStatus,
-    RejectedOrder,
     or_dt,
+    ProfilePhase,
+    PruneRule,
+    TraceEvent,
+    TradeMetric,
     TrailingSLStrategyType,
 )
 from quantfreedom.helpers.utils import pretty_qf
@@ -28,21 +54,128 @@ def run_df_backtest(
     strategy: Strategy,
     threads: int,
     step_by: int = 1,
+    engine: str = "loop",
+    batch_size: int = 1000,
+    shared_memory: bool = False,
+    partition: str = "range",
+    chunk_size: Optional[int] = None,
+    tasks_per_thread: int = 4,
+    progress_interval: float = 5.0,
+    result_sink: str = "memory",
+    result_path: Optional[str] = None,
+    top_k: Optional[int] = None,
+    top_k_metric: str = "qf_score",
+    checkpoint_path: Optional[str] = None,
+    resume: bool = False,
+    checkpoint_interval: float = 60.0,
+    session: Optional["BacktestSession"] = None,
+    trace_path: Optional[str] = None,
+    trace_size: int = 100_000,
+    profile: bool = False,
 ) -> pd.DataFrame:
-    global strategy_result_records
+    """
+    Summary
+    -------
+    Backtests every settings combination of the strategy over multiple processes and returns the ones that made it through the backtest settings filters
+
+    Parameters
+    ----------
+    candles : FootprintCandlesTuple
+        candles
+    strategy : Strategy
+        strategy
+    threads : int
+        number of processes
+    step_by : int, 1
+        only backtest every step_by settings
+    engine : str, "loop"
+        loop = one setting at a time bar by bar with the OrderHandler
+
+        batch = batch_size settings at a time bar by bar with the BatchOrderHandler, much faster for big sweeps
+
+        kernel = one setting at a time with the bar loop and order math compiled by numba, same results as loop. Runs the kernel as plain python if numba isn't installed, slower but still a bit faster than loop
+    batch_size : int, 1000
+        number of settings that move forward together when the engine is batch
+    shared_memory : bool, False
+        publish the candles, the og dos and indicator settings and the indicator bank once through shared memory so the processes attach to them instead of getting a pickled copy with every task
+    partition : str, "range"
+        range = every process gets one range of settings of the same size
+
+        indicator = settings with the same indicator settings get put next to each other and split into more ranges than processes with about the same estimated cost, so a process computes the entries once for all the dos that go with them
+    chunk_size : Optional[int], None
+        number of settings in a task, the processes take the next task as soon as they are done so small tasks keep every process busy till the end. None = about tasks_per_thread tasks per process
+    tasks_per_thread : int, 4
+        tasks per process when chunk_size is None
+    progress_interval : float, 5.0
+        seconds between progress prints with settings per second, bars per second, eta and how busy every process was
+    result_sink : str, "memory"
+        where the rows that make it through the backtest settings filters go as the tasks finish
+
+        memory = an array that grows when it needs to
+
+        hdf5 = an hdf5 file at result_path with tables
+
+        npy = one .npy shard per task in the result_path folder
+    result_path : Optional[str], None
+        hdf5 file or npy shard folder
+    top_k : Optional[int], None
+        only keep the top_k settings with the highest top_k_metric. Every task only sends back its own top_k and the parent merges them, so memory and the final sort don't grow with the number of settings that make it through the filters. Only works with the memory result_sink
+    top_k_metric : str, "qf_score"
+        gains_pct, win_rate, qf_score or profit_factor
+    checkpoint_path : Optional[str], None
+        folder where the settings ranges that are done and their result rows get saved every checkpoint_interval seconds and when the backtest gets stopped by an error or ctrl c. Every backtest gets its own folder in there named after a hash of the candles, the strategy settings, step_by, partition and top_k. None = no checkpoints
+    resume : bool, False
+        skip the settings ranges the checkpoint of this backtest has as done and put their saved rows in the results. False = start the checkpoint over
+    checkpoint_interval : float, 60.0
+        seconds between checkpoint saves
+    session : Optional[BacktestSession], None
+        run on the warm processes of a BacktestSession instead of a new pool, the candles have to be the candles of the session and shared_memory is up to the session. Easier with BacktestSession.run_df_backtest
+    trace_path : Optional[str], None
+        folder where every process adds the events of every task to the end of trace_<pid>.bin, read them with load_trace_events and decode_trace_events from quantfreedom.helpers.trace. The batch and kernel engines only trace when a batch starts and the result of every setting. None = tracing is off and the backtest doesn't do any of the work for it
+    trace_size : int, 100_000
+        number of events the trace ring buffer of every process keeps, a task that records more than this only saves its last trace_size events
+    profile : bool, False
+        time the indicators, entries, position management, order sizing, scoring and result transfer phases of every process and print them as a table at the end, main is the time this process spent on the indicator bank and taking in the results
 
+    Returns
+    -------
+    pd.DataFrame
+        backtest results
+    """
     logger.disabled = True
     # logger.disabled = False
     # set_loggers(log_folder=strategy.log_folder)
 
     starting_equity = strategy.static_os_tuple.starting_equity
 
-    order = OrderHandler(
-        long_short=strategy.get_long_or_short(),
-        static_os_tuple=strategy.static_os_tuple,
-        exchange_settings_tuple=strategy.exchange_settings_tuple,
+    bt_func, order = get_engine_bt_func_and_order(
+        batch_size=batch_size,
+        engine=engine,
+        strategy=strategy,
     )
 
+    og_profiler = phase_profiler.profiler
+    phase_profiler.profiler = main_profiler = phase_profiler.PhaseProfiler() if profile else None
+
+    # copy so the indicator bank doesn't stick to your strategy after the backtest
+    strategy = copy(strategy)
+    if session is None:
+        strategy.set_indicator_bank(candles=candles)
+    else:
+        if candles is not session.candles:
+            raise Exception("the candles have to be the candles of the session")
+        session.set_indicator_bank(strategy=strategy)
+        shared_memory = False
+
+    checkpoint_key = None
+    if checkpoint_path is not None:
+        # before the indicator partition reorders the settings, the reorder is the same every time
+        checkpoint_key = get_backtest_key(
+            candles=candles,
+            strategy=strategy,
+            run_settings=(step_by, partition.lower(), top_k, top_k_metric if top_k is not None else None),
+        )
+
     # Creating Settings Vars
     total_bars = candles.candle_open_timestamps.size
     step_by_settings = strategy.total_filtered_settings // step_by
@@ -52,13 +185,16 @@ def run_df_backtest(
 
     # TODO total settings combinations to test is wrong because we need to take into account the filtering in creating dos tuple
 
-    print("\n" + f"Total threads to use: {threads:,}")
+    print("\n" + f"Engine: {engine}")
+    print(f"Total threads to use: {threads:,}")
     print(f"Total Dynamic Order settings: {strategy.total_dos:,}")
     print(f"Total indicator settings: {strategy.total_indicator_settings:,}")
     print(f"Total settings combinations: {strategy.total_dos * strategy.total_indicator_settings:,}")
     print(f"Total settings combinations after filtering: {strategy.total_filtered_settings:,}")
     print(f"Total settings combinations with step by: {step_by_settings:,}")
     print(f"Total settings combinations to process per chunk: {chunk_process:,}")
+    if strategy.indicator_bank is not None:
+        print(f"Total unique indicators in the indicator bank: {strategy.indicator_bank.bank_params.shape[0]:,}")
 
     total_candles = strategy.total_filtered_settings * total_bars
     chunks = total_candles // threads
@@ -68,61 +204,287 @@ def run_df_backtest(
     print(f"Total candle chunks to be processed at the same time: {chunks:,}")
     print(f"Total candle chunks with step by: {candle_chunks:,}")
 
-    num_array_columns = 9 + len(strategy.og_dos_tuple._fields) + len(strategy.og_ind_set_tuple._fields)
-    arr_shape = (1000000, num_array_columns)
-    # arr_shape = (strategy.total_filtered_settings, num_array_columns)
-    strategy_result_records = np.full(arr_shape, np.nan)
-
-    range_multiplier = strategy.total_filtered_settings / threads
-    p = Pool()
-    results = []
-    for thread in range(threads):
-        range_start = int(thread * range_multiplier)
-        range_end = int((thread + 1) * range_multiplier)
-        rec_arr_shape = (range_end - range_start, num_array_columns)
-        record_results = np.full(rec_arr_shape, np.nan)
-
-        r: ApplyResult = p.apply_async(
-            func=multiprocess_backtest,
-            args=[
-                candles,
+    num_array_columns = (
+        len(ResultMetricNames) + len(strategy.og_dos_tuple._fields) + len(strategy.og_ind_set_tuple._fields)
+    )
+
+    if partition.lower() == "range":
+        if chunk_size is None:
+            chunk_size = -(-strategy.total_filtered_settings // (threads * tasks_per_thread))
+        # a multiple of step_by so every chunk steps through the same settings one big range would
+        chunk_size = max(step_by, -(-chunk_size // step_by) * step_by)
+        task_ranges = [
+            (range_start, min(range_start + chunk_size, strategy.total_filtered_settings))
+            for range_start in range(0, strategy.total_filtered_settings, chunk_size)
+        ]
+    elif partition.lower() == "indicator":
+        if step_by > 1:
+            # the same settings the range partition steps through, picked in og order before they get regrouped
+            strategy.set_og_order(og_order=np.arange(0, strategy.total_filtered_settings, step_by))
+            strategy.total_filtered_settings = -(-strategy.total_filtered_settings // step_by)
+            step_by = 1
+        task_ranges = get_indicator_task_ranges(
+            bt_func=bt_func,
+            candles=candles,
+            chunk_size=chunk_size,
+            num_array_columns=num_array_columns,
+            order=order,
+            starting_equity=starting_equity,
+            strategy=strategy,
+            tasks_per_thread=tasks_per_thread,
+            threads=threads,
+            total_bars=total_bars,
+        )
+    else:
+        raise Exception("range or indicator are the only options for partition")
+    print(f"Total tasks: {len(task_ranges):,}")
+
+    if trace_path is not None:
+        makedirs(trace_path, exist_ok=True)
+        # every process adds its events to the end of its file so the files of the last backtest have to go
+        for trace_file in glob(join(trace_path, "trace_*.bin")):
+            remove(trace_file)
+
+    sink = get_result_sink(
+        num_array_columns=num_array_columns,
+        result_sink=result_sink,
+        result_path=result_path,
+        top_k=top_k,
+        top_k_metric=top_k_metric,
+    )
+    top_k_column = ResultMetricColumns[top_k_metric] if top_k is not None else None
+
+    prune_counts = np.zeros(len(PruneRule), dtype=np.int_)
+    checkpoint = None
+    if checkpoint_key is not None:
+        checkpoint = BacktestCheckpoint(
+            backtest_key=checkpoint_key,
+            checkpoint_path=checkpoint_path,
+            num_array_columns=num_array_columns,
+            resume=resume,
+            checkpoint_interval=checkpoint_interval,
+            top_k=top_k,
+            top_k_column=top_k_column,
+        )
+        if checkpoint.done_ranges:
+            sink.append(rows=checkpoint.get_done_rows())
+            prune_counts += checkpoint.get_done_prune_counts(total_rules=len(PruneRule))
+            task_ranges = get_ranges_left(
+                task_ranges=task_ranges,
+                done_ranges=checkpoint.done_ranges,
+                step_by=step_by,
+            )
+            print(f"Resuming from {checkpoint.folder_path} with {sink.total_rows:,} results kept")
+            print(f"Total tasks left: {len(task_ranges):,}")
+
+    if session is not None:
+        task_results = session.imap_backtest_tasks(
+            bt_func=bt_func,
+            num_array_columns=num_array_columns,
+            order=order,
+            step_by=step_by,
+            strategy=strategy,
+            task_ranges=task_ranges,
+            top_k=top_k,
+            top_k_column=top_k_column,
+            trace_path=trace_path,
+            trace_size=trace_size,
+            profile=profile,
+        )
+    elif shared_memory:
+        print("\n" + "Publishing candles and settings to shared memory")
+        shms, shared_strategy, shared_candles = share_backtest_data(
+            candles=candles,
+            strategy=strategy,
+        )
+        p = Pool(
+            processes=threads,
+            initializer=attach_backtest_data,
+            initargs=(
+                shared_candles,
+                num_array_columns,
+                shared_strategy,
+                bt_func,
                 order,
-                range_end,
-                range_start,
-                record_results,
                 starting_equity,
-                strategy,
+                step_by,
+                top_k,
+                top_k_column,
                 total_bars,
+                trace_path,
+                trace_size,
+                profile,
+            ),
+        )
+    else:
+        p = Pool(
+            processes=threads,
+            initializer=set_worker_backtest_data,
+            initargs=(
+                candles,
+                num_array_columns,
+                strategy,
+                bt_func,
+                order,
+                starting_equity,
                 step_by,
-            ],
-            callback=proc_results,
-            error_callback=handler,
+                top_k,
+                top_k_column,
+                total_bars,
+                trace_path,
+                trace_size,
+                profile,
+            ),
         )
-        results.append(r)
+    if session is None:
+        task_results = p.imap_unordered(worker_backtest_task, task_ranges)
 
     print("\n" + "looping through results")
-    for idx, r in enumerate(results):
-        print(idx, end=", ")
-        r.wait()
-
-    print("\n" + "closing")
-    p.close()
-    print("joining")
-    p.join()
+    total_task_settings = sum(len(range(range_start, range_end, step_by)) for range_start, range_end in task_ranges)
+    settings_done = 0
+    worker_busy_times = {}
+    all_phase_stats = {}
+    start_time = perf_counter()
+    last_print_time = start_time
+    try:
+        for tasks_done, (
+            range_start,
+            range_end,
+            record_results,
+            task_prune_counts,
+            worker_pid,
+            busy_time,
+            phase_stats,
+        ) in enumerate(task_results, 1):
+            if main_profiler is not None:
+                main_profiler.start(ProfilePhase.ResultTransfer)
+            sink.append(rows=record_results)
+            prune_counts += task_prune_counts
+            settings_done += len(range(range_start, range_end, step_by))
+            worker_busy_times[worker_pid] = worker_busy_times.get(worker_pid, 0.0) + busy_time
+            if checkpoint is not None:
+                checkpoint.add_done_range(
+                    range_start=range_start,
+                    range_end=range_end,
+                    record_results=record_results,
+                    task_prune_counts=task_prune_counts,
+                )
+            if main_profiler is not None:
+                main_profiler.stop()
+            add_phase_stats(
+                all_phase_stats=all_phase_stats,
+                name=str(worker_pid),
+                phase_stats=phase_stats,
+            )
+
+            cur_time = perf_counter()
+            if cur_time - last_print_time >= progress_interval or tasks_done == len(task_ranges):
+                print_backtest_progress(
+                    elapsed_time=cur_time - start_time,
+                    settings_done=settings_done,
+                    tasks_done=tasks_done,
+                    total_bars=total_bars,
+                    total_settings=total_task_settings,
+                    total_tasks=len(task_ranges),
+                    worker_busy_times=worker_busy_times,
+                )
+                last_print_time = cur_time
+    except BaseException:
+        # ctrl c or a worker error, save what is done so resume can pick it up
+        if checkpoint is not None:
+            checkpoint.save()
+            print("\n" + f"Checkpoint saved to {checkpoint.folder_path}")
+        if session is not None:
+            # the pool still has tasks of this backtest queued up
+            session.restart_pool()
+        else:
+            p.terminate()
+        if shared_memory:
+            close_shared_memory(shms=shms, unlink=True)
+        phase_profiler.profiler = og_profiler
+        raise
+
+    if checkpoint is not None:
+        checkpoint.save()
+
+    if session is None:
+        print("\n" + "closing")
+        p.close()
+        print("joining")
+        p.join()
+
+    if shared_memory:
+        close_shared_memory(shms=shms, unlink=True)
+
+    print(f"Settings skipped with too few entries: {prune_counts[PruneRule.TooFewEntries]:,}")
+    print(f"Settings stopped early because equity can't afford min asset size: {prune_counts[PruneRule.CantAffordMinAsset]:,}")
+    print(f"Settings stopped early because they can't pass the filters: {prune_counts[PruneRule.CantPassFilters]:,}")
+    print(f"Total results kept: {sink.total_rows:,}")
+    if trace_path is not None:
+        print(f"Trace events saved to {trace_path}")
+    if main_profiler is not None:
+        add_phase_stats(
+            all_phase_stats=all_phase_stats,
+            name="main",
+            phase_stats=main_profiler.get_phase_stats(),
+        )
+        print_phase_table(all_phase_stats=all_phase_stats)
+    phase_profiler.profiler = og_profiler
     print("creating datafram")
 
     backtest_df = make_bt_df(
         strategy=strategy,
-        strategy_result_records=strategy_result_records,
+        strategy_result_records=sink.get_results(),
     )
+    sink.close()
 
     return backtest_df
 
 
+def get_engine_bt_func_and_order(
+    batch_size: int,
+    engine: str,
+    strategy: Strategy,
+) -> tuple[Callable, OrderHandler]:
+    """
+    Summary
+    -------
+    Backtest function and order handler of the engine
+
+    Returns
+    -------
+    tuple[Callable, OrderHandler]
+        multiprocess_backtest with an OrderHandler, multiprocess_batch_backtest with a BatchOrderHandler or multiprocess_kernel_backtest with a KernelOrderHandler
+    """
+    if engine.lower() == "loop":
+        return multiprocess_backtest, OrderHandler(
+            long_short=strategy.get_long_or_short(),
+            static_os_tuple=strategy.static_os_tuple,
+            exchange_settings_tuple=strategy.exchange_settings_tuple,
+        )
+    if engine.lower() == "batch":
+        return multiprocess_batch_backtest, BatchOrderHandler(
+            batch_size=batch_size,
+            long_short=strategy.get_long_or_short(),
+            static_os_tuple=strategy.static_os_tuple,
+            exchange_settings_tuple=strategy.exchange_settings_tuple,
+        )
+    if engine.lower() == "kernel":
+        if not JIT_AVAILABLE:
+            logger.warning("numba isn't installed so the kernel engine runs the kernel as plain python")
+        return multiprocess_kernel_backtest, KernelOrderHandler(
+            long_short=strategy.get_long_or_short(),
+            static_os_tuple=strategy.static_os_tuple,
+            exchange_settings_tuple=strategy.exchange_settings_tuple,
+        )
+    raise Exception("loop batch or kernel are the only options for engine")
+
+
 def multiprocess_backtest(
     candles: FootprintCandlesTuple,
     order: OrderHandler,
     range_end: int,
+    prune_counts: np.ndarray,
     range_start: int,
     record_results: np.ndarray,
     starting_equity: float,
@@ -132,9 +494,30 @@ def multiprocess_backtest(
 ):
     logger.disabled = True
     rec_idx = 0
-    for set_idx in range(range_start, range_end, step_by):
-        logger.debug(set_idx)
+    loop_start = range_start
+    loop_end = range_end
 
+    if strategy.param_space is not None:
+        strategy.set_og_tuples_from_param_space(
+            range_start=range_start,
+            range_end=range_end,
+        )
+        loop_start = 0
+        loop_end = range_end - range_start
+
+    starting_bar = strategy.static_os_tuple.starting_bar - 1
+    max_trades_to_prune = max(strategy.backtest_settings_tuple.total_trade_filter, 0)
+    min_asset_size = strategy.exchange_settings_tuple.min_asset_size
+    max_entry_leverage = get_max_entry_leverage(strategy=strategy)
+    # every setting starts it over so it only gets allocated once
+    trade_metrics = get_trade_metrics(starting_equity=starting_equity)
+    # None when tracing is off so every trace point is one check that doesn't format anything
+    tracer = trace.tracer
+    # None when profiling is off, same as the tracer
+    profiler = phase_profiler.profiler
+
+    prev_ind_set_view = None
+    for set_idx in range(loop_start, loop_end, step_by):
         strategy.set_cur_ind_set_tuple(
             set_idx=set_idx,
         )
@@ -142,14 +525,40 @@ def multiprocess_backtest(
         strategy.set_cur_dos_tuple(
             set_idx=set_idx,
         )
+        if tracer is not None:
+            tracer.set_idx = strategy.cur_dos_tuple.settings_index
+            tracer.bar_idx = starting_bar
+            tracer.record(TraceEvent.SettingStart)
 
-        strategy.set_entries_exits_array(
-            candles=candles,
-        )
+        # the entries only depend on the indicator settings so they only get computed again when those change
+        cur_ind_set_view = strategy.get_cur_settings_views(set_idx=set_idx)[1]
+        if prev_ind_set_view is None or not np.array_equal(cur_ind_set_view, prev_ind_set_view):
+            if profiler is not None:
+                profiler.start(ProfilePhase.Entries)
+            strategy.set_entries_exits_array(
+                candles=candles,
+            )
+            prev_ind_set_view = cur_ind_set_view
+            entry_bars, min_entry_prices_left = get_entry_prune_arrays(
+                candles=candles,
+                entries=strategy.entries,
+                starting_bar=starting_bar,
+            )
+            if profiler is not None:
+                profiler.stop()
 
-        pnl_array = np.full(shape=round(total_bars / 3), fill_value=np.nan)
-        filled_pnl_counter = 0
-        total_fees_paid = 0
+        # every closed trade needs its own entry so there is no way to get more trades than entries
+        if entry_bars.size <= max_trades_to_prune:
+            prune_counts[PruneRule.TooFewEntries] += 1
+            if tracer is not None:
+                tracer.record(TraceEvent.SettingPruned, PruneRule.TooFewEntries)
+            continue
+
+        total_trades_closed = 0
+        reset_trade_metrics(
+            trade_metrics=trade_metrics,
+            starting_equity=starting_equity,
+        )
 
         order.update_class_dos(
             dynamic_order_settings=strategy.cur_dos_tuple,
@@ -158,40 +567,82 @@ def multiprocess_backtest(
             equity=starting_equity,
         )
 
-        logger.debug("Set order variables, class dos and pnl array")
+        bar_index = starting_bar
+        setting_pruned = False
 
-        starting_bar = strategy.static_os_tuple.starting_bar - 1
+        if profiler is not None:
+            profiler.start(ProfilePhase.PositionManagement)
+        while bar_index < total_bars:
+            if order.position_size_usd == 0:
+                # nothing can happen while we are flat so jump to the next entry
+                next_entry = np.searchsorted(entry_bars, bar_index)
+                if next_entry == entry_bars.size:
+                    break
+                if total_trades_closed + entry_bars.size - next_entry <= max_trades_to_prune:
+                    prune_counts[PruneRule.CantPassFilters] += 1
+                    if tracer is not None:
+                        tracer.record(TraceEvent.SettingPruned, PruneRule.CantPassFilters)
+                    setting_pruned = True
+                    break
+                if order.equity * max_entry_leverage < min_asset_size * min_entry_prices_left[next_entry]:
+                    # every entry left gets rejected so the result is already final
+                    prune_counts[PruneRule.CantAffordMinAsset] += 1
+                    if tracer is not None:
+                        tracer.record(TraceEvent.SettingPruned, PruneRule.CantAffordMinAsset)
+                    break
+                bar_index = entry_bars[next_entry]
+            elif order.can_search_exit_bar:
+                # the sl tp and liq prices can't change until the next entry so jump to the first bar that hits one of them
+                next_entry = np.searchsorted(entry_bars, bar_index)
+                bar_index = order.get_next_exit_bar(
+                    candles=candles,
+                    exit_prices=strategy.exit_prices,
+                    start_bar=bar_index,
+                    end_bar=entry_bars[next_entry] if next_entry < entry_bars.size else total_bars,
+                )
+                if bar_index == total_bars:
+                    break
 
-        for bar_index in range(starting_bar, total_bars):
-            logger.debug("\n\n")
-            logger.debug(
-                f"set_idx= {strategy.cur_dos_tuple.settings_index} loop_idx = {set_idx} bar_idx= {bar_index} datetime= {candles.candle_open_datetimes[bar_index]}"
-            )
+            if tracer is not None:
+                tracer.bar_idx = bar_index
 
             if order.position_size_usd > 0:
-                try:
-                    current_candle = CurrentFootprintCandleTuple(
-                        open_timestamp=candles.candle_open_timestamps[bar_index],
-                        open_price=candles.candle_open_prices[bar_index],
-                        high_price=candles.candle_high_prices[bar_index],
-                        low_price=candles.candle_low_prices[bar_index],
-                        close_price=candles.candle_close_prices[bar_index],
-                    )
-                    logger.debug("Checking stop loss hit")
-                    order.check_stop_loss_hit(
-                        current_candle=current_candle,
-                    )
-                    logger.debug("Checking liq hit")
-                    order.check_liq_hit(
-                        current_candle=current_candle,
+                current_candle = CurrentFootprintCandleTuple(
+                    open_timestamp=candles.candle_open_timestamps[bar_index],
+                    open_price=candles.candle_open_prices[bar_index],
+                    high_price=candles.candle_high_prices[bar_index],
+                    low_price=candles.candle_low_prices[bar_index],
+                    close_price=candles.candle_close_prices[bar_index],
+                )
+                order_status, exit_price, exit_fee_pct = order.get_exit_status(
+                    current_candle=current_candle,
+                    exit_price=strategy.exit_prices[bar_index],
+                )
+
+                if order_status != OrderStatus.Nothing:
+                    (
+                        equity,
+                        fees_paid,
+                        realized_pnl,
+                    ) = order.calculate_decrease_position(
+                        cur_datetime=candles.candle_open_datetimes[bar_index],
+                        exit_fee_pct=exit_fee_pct,
+                        exit_price=exit_price,
+                        order_status=order_status,
+                        market_fee_pct=strategy.exchange_settings_tuple.market_fee_pct,
+                        equity=order.equity,
                     )
-                    logger.debug("Checking take profit hit")
-                    order.check_take_profit_hit(
-                        current_candle=current_candle,
-                        exit_price=strategy.exit_prices[bar_index],
+
+                    add_closed_trade(
+                        trade_metrics=trade_metrics,
+                        equity=equity,
+                        fees_paid=fees_paid,
+                        realized_pnl=realized_pnl,
                     )
+                    total_trades_closed += 1
 
-                    logger.debug("Checking to move stop to break even")
+                    order.set_order_variables(equity=equity)
+                else:
                     sl_to_be_price, sl_to_be_pct = order.check_move_sl_to_be(
                         current_candle=current_candle,
                     )
@@ -199,7 +650,6 @@ def multiprocess_backtest(
                         order.sl_pct = sl_to_be_pct
                         order.sl_price = sl_to_be_price
 
-                    logger.debug("Checking to move trailing stop loss")
                     tsl_price, tsl_pct = order.check_move_tsl(
                         current_candle=current_candle,
                     )
@@ -207,190 +657,888 @@ def multiprocess_backtest(
                         order.sl_pct = tsl_pct
                         order.sl_price = tsl_price
 
-                except DecreasePosition as e:
-                    (
-                        equity,
-                        fees_paid,
-                        realized_pnl,
-                    ) = order.calculate_decrease_position(
-                        cur_datetime=candles.candle_open_datetimes[bar_index],
-                        exit_fee_pct=e.exit_fee_pct,
-                        exit_price=e.exit_price,
-                        order_status=e.order_status,
-                        market_fee_pct=strategy.exchange_settings_tuple.market_fee_pct,
-                        equity=order.equity,
-                    )
+            if strategy.entries[bar_index]:
+                strategy.entry_message(bar_index=bar_index)
+                if profiler is not None:
+                    profiler.start(ProfilePhase.OrderSizing)
+                order_status = order.calculate_entry_status(
+                    bar_index=bar_index,
+                    candles=candles,
+                    entry_price=candles.candle_close_prices[bar_index],
+                )
+                if profiler is not None:
+                    profiler.stop()
+                if tracer is not None:
+                    tracer.record(TraceEvent.EntryStatus, order_status, candles.candle_close_prices[bar_index])
 
-                    pnl_array[filled_pnl_counter] = realized_pnl
-                    filled_pnl_counter += 1
-                    total_fees_paid += fees_paid
-                    logger.debug("Filled pnl array and updated total fees paid")
+            bar_index += 1
 
-                    order.set_order_variables(equity=equity)
-                    logger.debug("reset order variables")
+        if profiler is not None:
+            profiler.stop()
 
-                except Exception as e:
-                    logger.error(f"Exception checking sl liq tp and move -> {e}")
-                    raise Exception(f"Exception checking sl liq tp  and move -> {e}")
-            else:
-                logger.debug("Not in a pos so not checking SL Liq or TP")
+        if setting_pruned:
+            continue
 
-            logger.debug("strategy evaluate")
-            if strategy.entries[bar_index]:
-                strategy.entry_message(bar_index=bar_index)
-                try:
-                    logger.debug("calculate_stop_loss")
-                    sl_price = order.calculate_stop_loss(
-                        bar_index=bar_index,
-                        candles=candles,
-                    )
+        rec_idx = record_strategy_result(
+            ending_equity=order.equity,
+            rec_idx=rec_idx,
+            record_results=record_results,
+            set_idx=set_idx,
+            starting_equity=starting_equity,
+            strategy=strategy,
+            trade_metrics=trade_metrics,
+        )
 
-                    logger.debug("calculate_increase_position")
-                    (
-                        average_entry,
-                        entry_price,
-                        entry_size_asset,
-                        entry_size_usd,
-                        position_size_asset,
-                        position_size_usd,
-                        total_possible_loss,
-                        total_trades,
-                        sl_pct,
-                    ) = order.calculate_increase_position(
-                        average_entry=order.average_entry,
-                        entry_price=candles.candle_close_prices[bar_index],
-                        equity=order.equity,
-                        position_size_asset=order.position_size_asset,
-                        position_size_usd=order.position_size_usd,
-                        sl_price=sl_price,
-                        total_trades=order.total_trades,
-                    )
+    return range_start, range_end, record_results
 
-                    logger.debug("calculate_leverage")
-                    (
-                        available_balance,
-                        cash_borrowed,
-                        cash_used,
-                        leverage,
-                        liq_price,
-                    ) = order.calculate_leverage(
-                        available_balance=order.available_balance,
-                        average_entry=average_entry,
-                        cash_borrowed=order.cash_borrowed,
-                        cash_used=order.cash_used,
-                        position_size_asset=position_size_asset,
-                        position_size_usd=position_size_usd,
-                        sl_price=sl_price,
-                    )
 
-                    logger.debug("calculate_take_profit")
-                    (
-                        can_move_sl_to_be,
-                        tp_price,
-                        tp_pct,
-                    ) = order.calculate_take_profit(
-                        average_entry=average_entry,
-                        position_size_usd=position_size_usd,
-                        total_possible_loss=total_possible_loss,
+def record_strategy_result(
+    ending_equity: float,
+    rec_idx: int,
+    record_results: np.ndarray,
+    set_idx: int,
+    starting_equity: float,
+    strategy: Strategy,
+    trade_metrics: np.ndarray,
+) -> int:
+    """
+    Summary
+    -------
+    Scores the setting that was just backtested and if it makes it through the backtest settings filters it gets put in the record results
+
+    Parameters
+    ----------
+    ending_equity : float
+        equity at the end of the backtest
+    rec_idx : int
+        next free row of record_results
+    record_results : np.ndarray
+        record_results
+    set_idx : int
+        position of the setting that was backtested in the og tuples
+    starting_equity : float
+        starting_equity
+    strategy : Strategy
+        strategy
+    trade_metrics : np.ndarray
+        trade metrics of every closed trade of the setting from add_closed_trade
+
+    Returns
+    -------
+    int
+        next free row of record_results
+    """
+    profiler = phase_profiler.profiler
+    if profiler is not None:
+        profiler.start(ProfilePhase.Scoring)
+    # Checking if gains
+    gains_pct = round(((ending_equity - starting_equity) / starting_equity) * 100, 2)
+    total_trades_closed = int(trade_metrics[TradeMetric.TotalTrades])
+    if trace.tracer is not None:
+        trace.tracer.set_idx = strategy.og_dos_tuple.settings_index[set_idx]
+        trace.tracer.record(TraceEvent.SettingResult, ending_equity, gains_pct, total_trades_closed)
+    if total_trades_closed > 0 and gains_pct > strategy.backtest_settings_tuple.gains_pct_filter:
+        if total_trades_closed > strategy.backtest_settings_tuple.total_trade_filter:
+            qf_score = get_qf_score_from_metrics(
+                gains_pct=gains_pct,
+                trade_metrics=trade_metrics,
+            )
+
+            # Checking to the upside filter
+            if qf_score > strategy.backtest_settings_tuple.qf_filter:
+                wins = int(trade_metrics[TradeMetric.Wins])
+                losses = int(trade_metrics[TradeMetric.Losses])
+                win_rate = round(wins / (wins + losses) * 100, 2)
+
+                cur_dos_view, cur_ind_set_view = strategy.get_cur_settings_views(set_idx=set_idx)
+                record_results[rec_idx, : len(ResultMetricNames)] = (
+                    total_trades_closed,
+                    wins,
+                    losses,
+                    gains_pct,
+                    win_rate,
+                    qf_score,
+                    round(trade_metrics[TradeMetric.FeesPaid], 2),
+                    trade_metrics[TradeMetric.TotalPnl],
+                    ending_equity,
+                    round(trade_metrics[TradeMetric.MaxDrawdownPct], 2),
+                    round(get_profit_factor(trade_metrics=trade_metrics), 3),
+                )
+                dos_start = len(ResultMetricNames)
+                record_results[rec_idx, dos_start : dos_start + cur_dos_view.size] = cur_dos_view
+                record_results[rec_idx, dos_start + cur_dos_view.size :] = cur_ind_set_view
+                rec_idx += 1
+    if profiler is not None:
+        profiler.stop()
+    return rec_idx
+
+
+def multiprocess_batch_backtest(
+    candles: FootprintCandlesTuple,
+    order: BatchOrderHandler,
+    range_end: int,
+    prune_counts: np.ndarray,
+    range_start: int,
+    record_results: np.ndarray,
+    starting_equity: float,
+    strategy: Strategy,
+    total_bars: int,
+    step_by: int,
+):
+    """
+    Summary
+    -------
+    Same as multiprocess_backtest but instead of walking every bar for one setting at a time it keeps the order variables of order.batch_size settings in arrays and moves all of them forward one bar at a time
+    """
+    logger.disabled = True
+    rec_idx = 0
+    loop_start = range_start
+    loop_end = range_end
+
+    if strategy.param_space is not None:
+        strategy.set_og_tuples_from_param_space(
+            range_start=range_start,
+            range_end=range_end,
+        )
+        loop_start = 0
+        loop_end = range_end - range_start
+
+    starting_bar = strategy.static_os_tuple.starting_bar - 1
+    max_trades_to_prune = max(strategy.backtest_settings_tuple.total_trade_filter, 0)
+    min_asset_size = strategy.exchange_settings_tuple.min_asset_size
+    max_entry_leverage = get_max_entry_leverage(strategy=strategy)
+    set_idxs = np.arange(loop_start, loop_end, step_by)
+    prev_ind_set_view = None
+    profiler = phase_profiler.profiler
+
+    for batch_start in range(0, set_idxs.size, order.batch_size):
+        batch_set_idxs = set_idxs[batch_start : batch_start + order.batch_size]
+        batch_size = batch_set_idxs.size
+        if trace.tracer is not None:
+            trace.tracer.set_idx = strategy.og_dos_tuple.settings_index[batch_set_idxs[0]]
+            trace.tracer.bar_idx = starting_bar
+            trace.tracer.record(TraceEvent.BatchStart, batch_size)
+
+        if profiler is not None:
+            profiler.start(ProfilePhase.Entries)
+        entries, exit_prices = order.get_signal_buffers(
+            batch_size=batch_size,
+            total_bars=total_bars,
+        )
+        keep_rows = np.full(batch_size, False)
+        row = 0
+        for batch_row, set_idx in enumerate(batch_set_idxs):
+            strategy.set_cur_ind_set_tuple(
+                set_idx=set_idx,
+            )
+            cur_ind_set_view = strategy.get_cur_settings_views(set_idx=set_idx)[1]
+            if prev_ind_set_view is None or not np.array_equal(cur_ind_set_view, prev_ind_set_view):
+                strategy.set_entries_exits_array(
+                    candles=candles,
+                )
+                prev_ind_set_view = cur_ind_set_view
+                # every closed trade needs its own entry so there is no way to get more trades than entries
+                enough_entries = np.count_nonzero(strategy.entries[starting_bar:]) > max_trades_to_prune
+            if not enough_entries:
+                continue
+            # the settings that get pruned never get a column so the buffers don't have to be copied to drop them
+            keep_rows[batch_row] = True
+            entries[:, row] = strategy.entries
+            if exit_prices is not None:
+                exit_prices[:, row] = strategy.exit_prices
+            row += 1
+        if profiler is not None:
+            profiler.stop()
+
+        if row < batch_size:
+            prune_counts[PruneRule.TooFewEntries] += batch_size - row
+            batch_set_idxs = batch_set_idxs[keep_rows]
+            batch_size = row
+            if batch_size == 0:
+                continue
+            entries = entries[:, :batch_size]
+            if exit_prices is not None:
+                exit_prices = exit_prices[:, :batch_size]
+
+        if profiler is not None:
+            profiler.start(ProfilePhase.PositionManagement)
+        order.update_class_dos(
+            candles=candles,
+            og_dos_tuple=strategy.og_dos_tuple,
+            set_idxs=batch_set_idxs,
+        )
+        order.set_order_variables(
+            batch_size=batch_size,
+            equity=starting_equity,
+        )
+
+        entry_bars = np.flatnonzero(entries[starting_bar:].any(axis=1)) + starting_bar
+        entry_keys, row_ends, min_entry_prices_left = get_batch_entry_prune_arrays(
+            candles=candles,
+            entries=entries,
+            starting_bar=starting_bar,
+            total_bars=total_bars,
+        )
+        pruned_rows = np.full(batch_size, False)
+        prune_batch_rows(
+            bar_index=starting_bar,
+            entries=entries,
+            entry_keys=entry_keys,
+            max_entry_leverage=max_entry_leverage,
+            max_trades_to_prune=max_trades_to_prune,
+            min_asset_size=min_asset_size,
+            min_entry_prices_left=min_entry_prices_left,
+            order=order,
+            prune_counts=prune_counts,
+            pruned_rows=pruned_rows,
+            row_ends=row_ends,
+            rows=np.arange(batch_size),
+            total_bars=total_bars,
+        )
+        bar_index = starting_bar
+
+        while bar_index < total_bars:
+            in_pos_rows = np.flatnonzero(order.position_size_usd > 0)
+            if in_pos_rows.size == 0:
+                # every setting in the batch is flat so jump to the next bar where one of them has an entry
+                next_entry = np.searchsorted(entry_bars, bar_index)
+                if next_entry == entry_bars.size:
+                    break
+                bar_index = entry_bars[next_entry]
+            else:
+                (
+                    exit_mask,
+                    exit_price,
+                    exit_fee_pct,
+                    order_status,
+                ) = order.check_exits(
+                    bar_index=bar_index,
+                    exit_prices=exit_prices,
+                    rows=in_pos_rows,
+                )
+                if exit_price.size:
+                    order.calculate_decrease_position(
+                        exit_fee_pct=exit_fee_pct,
+                        exit_price=exit_price,
+                        rows=in_pos_rows[exit_mask],
                     )
-                    logger.debug("filling order result")
-                    order.fill_order_result(
-                        available_balance=available_balance,
-                        average_entry=average_entry,
-                        can_move_sl_to_be=can_move_sl_to_be,
-                        cash_borrowed=cash_borrowed,
-                        cash_used=cash_used,
-                        entry_price=entry_price,
-                        entry_size_asset=entry_size_asset,
-                        entry_size_usd=entry_size_usd,
-                        equity=order.equity,
-                        exit_price=np.nan,
-                        fees_paid=np.nan,
-                        leverage=leverage,
-                        liq_price=liq_price,
-                        order_status=OrderStatus.EntryFilled,
-                        position_size_asset=position_size_asset,
-                        position_size_usd=position_size_usd,
-                        total_possible_loss=total_possible_loss,
-                        realized_pnl=np.nan,
-                        sl_pct=sl_pct,
-                        sl_price=sl_price,
-                        total_trades=total_trades,
-                        tp_pct=tp_pct,
-                        tp_price=tp_price,
+                    prune_batch_rows(
+                        bar_index=bar_index,
+                        entries=entries,
+                        entry_keys=entry_keys,
+                        max_entry_leverage=max_entry_leverage,
+                        max_trades_to_prune=max_trades_to_prune,
+                        min_asset_size=min_asset_size,
+                        min_entry_prices_left=min_entry_prices_left,
+                        order=order,
+                        prune_counts=prune_counts,
+                        pruned_rows=pruned_rows,
+                        row_ends=row_ends,
+                        rows=in_pos_rows[exit_mask],
+                        total_bars=total_bars,
                     )
-                    logger.debug("We are in a position and filled the result")
-                except RejectedOrder:
-                    pass
-                except Exception as e:
-                    logger.error(f"Exception hit in eval strat -> {e}")
-                    raise Exception(f"Exception hit in eval strat -> {e}")
-
-        # Checking if gains
-        gains_pct = round(((order.equity - starting_equity) / starting_equity) * 100, 2)
-        wins_and_losses_array = pnl_array[~np.isnan(pnl_array)]
-        total_trades_closed = wins_and_losses_array.size
-        logger.debug(
-            f"""
-Results from backtest
-set_idx={strategy.cur_dos_tuple.settings_index}
-loop_idx = {set_idx}
-Starting eq={starting_equity}
-Ending eq={order.equity}
-Gains pct={gains_pct}
-total_trades={total_trades_closed}"""
-        )
-        if total_trades_closed > 0 and gains_pct > strategy.backtest_settings_tuple.gains_pct_filter:
-            if wins_and_losses_array.size > strategy.backtest_settings_tuple.total_trade_filter:
-                wins_and_losses_array_no_be = wins_and_losses_array[
-                    (wins_and_losses_array < -0.009) | (wins_and_losses_array > 0.009)
-                ]
-                qf_score = get_qf_score(
-                    gains_pct=gains_pct,
-                    wins_and_losses_array_no_be=wins_and_losses_array_no_be,
+                    in_pos_rows = in_pos_rows[~exit_mask]
+
+                order.check_move_sl_to_be(
+                    bar_index=bar_index,
+                    rows=in_pos_rows,
+                )
+                order.check_move_tsl(
+                    bar_index=bar_index,
+                    rows=in_pos_rows,
                 )
 
-                # Checking to the upside filter
-                if qf_score > strategy.backtest_settings_tuple.qf_filter:
-                    win_loss = np.where(wins_and_losses_array_no_be < 0, 0, 1)
-                    wins = np.count_nonzero(win_loss)
-                    losses = win_loss.size - wins
-                    win_rate = round(wins / win_loss.size * 100, 2)
-
-                    total_pnl = wins_and_losses_array.sum()
-                    tuple_results = (
-                        (
-                            wins_and_losses_array.size,
-                            wins,
-                            losses,
-                            gains_pct,
-                            win_rate,
-                            qf_score,
-                            round(total_fees_paid, 2),
-                            total_pnl,
-                            order.equity,
-                        )
-                        + strategy.cur_dos_tuple
-                        + strategy.cur_ind_set_tuple
+            entry_rows = np.flatnonzero(entries[bar_index])
+            if entry_rows.size:
+                if profiler is not None:
+                    profiler.start(ProfilePhase.OrderSizing)
+                order.calculate_entries(
+                    bar_index=bar_index,
+                    entry_price=candles.candle_close_prices[bar_index],
+                    rows=entry_rows,
+                )
+                if profiler is not None:
+                    profiler.stop()
+                # a rejected entry is one less entry left for the rows that are still flat
+                rejected_rows = entry_rows[order.position_size_usd[entry_rows] == 0]
+                if rejected_rows.size:
+                    prune_batch_rows(
+                        bar_index=bar_index + 1,
+                        entries=entries,
+                        entry_keys=entry_keys,
+                        max_entry_leverage=max_entry_leverage,
+                        max_trades_to_prune=max_trades_to_prune,
+                        min_asset_size=min_asset_size,
+                        min_entry_prices_left=min_entry_prices_left,
+                        order=order,
+                        prune_counts=prune_counts,
+                        pruned_rows=pruned_rows,
+                        row_ends=row_ends,
+                        rows=rejected_rows,
+                        total_bars=total_bars,
                     )
-                    record_results[rec_idx] = tuple_results
-                    rec_idx += 1
-        logger.debug(
-            f"Starting New Loop\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n"
+
+            bar_index += 1
+
+        if profiler is not None:
+            profiler.stop()
+
+        for row in range(batch_set_idxs.size):
+            if pruned_rows[row]:
+                continue
+            rec_idx = record_strategy_result(
+                ending_equity=order.equity[row],
+                rec_idx=rec_idx,
+                record_results=record_results,
+                set_idx=batch_set_idxs[row],
+                starting_equity=starting_equity,
+                strategy=strategy,
+                trade_metrics=order.trade_metrics[:, row],
+            )
+
+    return range_start, range_end, record_results
+
+
+def multiprocess_kernel_backtest(
+    candles: FootprintCandlesTuple,
+    order: KernelOrderHandler,
+    range_end: int,
+    prune_counts: np.ndarray,
+    range_start: int,
+    record_results: np.ndarray,
+    starting_equity: float,
+    strategy: Strategy,
+    total_bars: int,
+    step_by: int,
+):
+    """
+    Summary
+    -------
+    Same as multiprocess_backtest but every setting goes through kernel_backtest, which has the bar loop and the order math in one function that numba compiles
+    """
+    logger.disabled = True
+    rec_idx = 0
+    loop_start = range_start
+    loop_end = range_end
+
+    if strategy.param_space is not None:
+        strategy.set_og_tuples_from_param_space(
+            range_start=range_start,
+            range_end=range_end,
+        )
+        loop_start = 0
+        loop_end = range_end - range_start
+
+    order.check_candle_body_types(dynamic_order_settings=strategy.og_dos_tuple)
+    candle_prices = order.get_candle_prices(candles=candles)
+    starting_bar = strategy.static_os_tuple.starting_bar - 1
+    max_trades_to_prune = max(strategy.backtest_settings_tuple.total_trade_filter, 0)
+    max_entry_leverage = get_max_entry_leverage(strategy=strategy)
+    no_order_records = np.empty((0, 0))
+    trade_metrics = get_trade_metrics(starting_equity=starting_equity)
+    profiler = phase_profiler.profiler
+
+    prev_ind_set_view = None
+    for set_idx in range(loop_start, loop_end, step_by):
+        strategy.set_cur_ind_set_tuple(
+            set_idx=set_idx,
+        )
+        strategy.set_cur_dos_tuple(
+            set_idx=set_idx,
+        )
+
+        # the entries only depend on the indicator settings so they only get computed again when those change
+        cur_ind_set_view = strategy.get_cur_settings_views(set_idx=set_idx)[1]
+        if prev_ind_set_view is None or not np.array_equal(cur_ind_set_view, prev_ind_set_view):
+            if profiler is not None:
+                profiler.start(ProfilePhase.Entries)
+            strategy.set_entries_exits_array(
+                candles=candles,
+            )
+            prev_ind_set_view = cur_ind_set_view
+            entry_bars, min_entry_prices_left = get_entry_prune_arrays(
+                candles=candles,
+                entries=strategy.entries,
+                starting_bar=starting_bar,
+            )
+            if profiler is not None:
+                profiler.stop()
+
+        # every closed trade needs its own entry so there is no way to get more trades than entries
+        if entry_bars.size <= max_trades_to_prune:
+            prune_counts[PruneRule.TooFewEntries] += 1
+            continue
+
+        # the kernel has the whole bar loop so all of its time goes to position management
+        if profiler is not None:
+            profiler.start(ProfilePhase.PositionManagement)
+        prune_rule, equity, _, _ = kernel_backtest(
+            candle_prices=candle_prices,
+            dos=strategy.cur_dos_tuple,
+            entries=strategy.entries,
+            entry_bars=entry_bars,
+            exit_prices=strategy.exit_prices,
+            kos=order.kos,
+            max_entry_leverage=max_entry_leverage,
+            max_trades_to_prune=max_trades_to_prune,
+            min_entry_prices_left=min_entry_prices_left,
+            order_records=no_order_records,
+            record_orders=False,
+            set_idx=set_idx,
+            starting_bar=starting_bar,
+            starting_equity=starting_equity,
+            trade_metrics=trade_metrics,
+        )
+        if profiler is not None:
+            profiler.stop()
+        if prune_rule != NOT_PRUNED:
+            prune_counts[prune_rule] += 1
+            if prune_rule == PruneRule.CantPassFilters:
+                continue
+
+        # numba gives back python floats and round works a bit different on them than on the numpy floats the loop engine has
+        rec_idx = record_strategy_result(
+            ending_equity=np.float64(equity),
+            rec_idx=rec_idx,
+            record_results=record_results,
+            set_idx=set_idx,
+            starting_equity=starting_equity,
+            strategy=strategy,
+            trade_metrics=trade_metrics,
         )
 
     return range_start, range_end, record_results
 
 
-def proc_results(
-    results: tuple,
+def get_max_entry_leverage(
+    strategy: Strategy,
+) -> float:
+    """
+    Highest leverage an entry can get with the leverage strategy type of the strategy
+    """
+    if strategy.static_os_tuple.leverage_strategy_type == LeverageStrategyType.Static:
+        return strategy.static_os_tuple.static_leverage
+    # dynamic leverage gets capped at max leverage and set to 1 when it is below min leverage
+    return max(strategy.exchange_settings_tuple.max_leverage, 1)
+
+
+def get_entry_prune_arrays(
+    candles: FootprintCandlesTuple,
+    entries: np.ndarray,
+    starting_bar: int,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Summary
+    -------
+    Entry bars after the starting bar and the lowest entry price from each entry bar on
+
+    An entry needs at least min_asset_size * entry_price / leverage of available balance for its initial margin so once the equity is below that for the lowest entry price left no entry can be filled anymore
+
+    Returns
+    -------
+    tuple[np.ndarray, np.ndarray]
+        entry_bars, min_entry_prices_left
+    """
+    entry_bars = np.flatnonzero(entries[starting_bar:]) + starting_bar
+    min_entry_prices_left = np.minimum.accumulate(candles.candle_close_prices[entry_bars][::-1])[::-1]
+    return entry_bars, min_entry_prices_left
+
+
+def get_batch_entry_prune_arrays(
+    candles: FootprintCandlesTuple,
+    entries: np.ndarray,
+    starting_bar: int,
+    total_bars: int,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Summary
+    -------
+    Same as get_entry_prune_arrays for every row of the batch entries
+
+    The entry bars of every row are stored one row after the other as row * total_bars + bar, so the keys are sorted and one searchsorted finds the next entry of any row
+
+    Returns
+    -------
+    tuple[np.ndarray, np.ndarray, np.ndarray]
+        entry_keys, row_ends, min_entry_prices_left
+    """
+    entry_rows, entry_bars = np.nonzero(entries[starting_bar:].T)
+    entry_bars += starting_bar
+    entry_keys = entry_rows * total_bars + entry_bars
+    row_ends = np.searchsorted(entry_rows, np.arange(1, entries.shape[1] + 1))
+
+    min_entry_prices_left = candles.candle_close_prices[entry_bars]
+    row_start = 0
+    for row_end in row_ends:
+        min_entry_prices_left[row_start:row_end] = np.minimum.accumulate(
+            min_entry_prices_left[row_start:row_end][::-1]
+        )[::-1]
+        row_start = row_end
+    return entry_keys, row_ends, min_entry_prices_left
+
+
+def prune_batch_rows(
+    bar_index: int,
+    entries: np.ndarray,
+    entry_keys: np.ndarray,
+    max_entry_leverage: float,
+    max_trades_to_prune: int,
+    min_asset_size: float,
+    min_entry_prices_left: np.ndarray,
+    order: BatchOrderHandler,
+    prune_counts: np.ndarray,
+    pruned_rows: np.ndarray,
+    row_ends: np.ndarray,
+    rows: np.ndarray,
+    total_bars: int,
 ):
-    start = results[0]
-    end = results[1]
-    arr = results[2]
-    strategy_result_records[start:end] = arr
+    """
+    Summary
+    -------
+    Checks the rows that just became flat or just had an entry rejected against the CantPassFilters and CantAffordMinAsset prune rules and clears the entries they have left so they stay flat
 
+    Rows that can't pass the filters get set in pruned_rows so they don't get recorded, rows that can't afford an entry anymore already have their final result so they still get recorded
+    """
+    next_entries = np.searchsorted(entry_keys, rows * total_bars + bar_index)
+    entries_left = row_ends[rows] - next_entries
+    has_entries_left = entries_left > 0
+    cant_pass = has_entries_left & (order.total_trades_closed[rows] + entries_left <= max_trades_to_prune)
+    cant_afford = (
+        has_entries_left
+        & ~cant_pass
+        & (
+            order.equity[rows] * max_entry_leverage
+            < min_asset_size * min_entry_prices_left[np.minimum(next_entries, min_entry_prices_left.size - 1)]
+        )
+    )
+    prune_counts[PruneRule.CantPassFilters] += np.count_nonzero(cant_pass)
+    prune_counts[PruneRule.CantAffordMinAsset] += np.count_nonzero(cant_afford)
+    pruned_rows[rows[cant_pass]] = True
+    for row in rows[cant_pass | cant_afford]:
+        entries[bar_index:, row] = False
+
+
+def get_indicator_task_ranges(
+    bt_func: Callable,
+    candles: FootprintCandlesTuple,
+    num_array_columns: int,
+    order: OrderHandler,
+    starting_equity: float,
+    strategy: Strategy,
+    threads: int,
+    total_bars: int,
+    chunk_size: Optional[int] = None,
+    tasks_per_thread: int = 4,
+) -> list[tuple[int, int]]:
+    """
+    Summary
+    -------
+    Reorders the settings of the strategy so settings with the same indicator settings are next to each other and splits them into ranges with about the same estimated cost
+
+    The cost of a range is the number of settings in it plus indicator_cost for every indicator group in it. indicator_cost is how many settings can be backtested in the time it takes to compute the entries once, measured on the first setting
+
+    Every range costs about chunk_size settings or if chunk_size is None there are about tasks_per_thread ranges per thread
+
+    Returns
+    -------
+    list[tuple[int, int]]
+        range start and range end of every task, most expensive first so the pool hands out the big ones before the small ones
+    """
+    group_ids = strategy.get_indicator_group_ids()
+    og_order = np.argsort(group_ids, kind="stable")
+    strategy.set_og_order(og_order=og_order)
+    group_sizes = np.bincount(group_ids)
+    group_sizes = group_sizes[group_sizes > 0]
+
+    # time one setting with and without the entries
+    bt_time = np.inf
+    entries_time = np.inf
+    for _ in range(3):
+        start_time = perf_counter()
+        bt_func(
+            candles=candles,
+            order=order,
+            prune_counts=np.zeros(len(PruneRule), dtype=np.int_),
+            range_end=1,
+            range_start=0,
+            record_results=np.full((1, num_array_columns), np.nan),
+            starting_equity=starting_equity,
+            strategy=strategy,
+            total_bars=total_bars,
+            step_by=1,
+        )
+        bt_time = min(bt_time, perf_counter() - start_time)
+
+        start_time = perf_counter()
+        strategy.set_entries_exits_array(candles=candles)
+        entries_time = min(entries_time, perf_counter() - start_time)
+    indicator_cost = entries_time / max(bt_time - entries_time, 1e-9)
+
+    total_cost = group_sizes.sum() + indicator_cost * group_sizes.size
+    if chunk_size is None:
+        target_cost = max(total_cost / (threads * tasks_per_thread), 1 + indicator_cost)
+    else:
+        target_cost = max(chunk_size, 1) + indicator_cost
+    max_piece_size = max(1, int(target_cost - indicator_cost))
+
+    task_ranges = []
+    task_costs = []
+    range_start = 0
+    range_end = 0
+    cur_cost = 0.0
+    for group_size in group_sizes:
+        total_pieces = -(-group_size // max_piece_size)
+        for piece_size in np.diff(np.linspace(0, group_size, total_pieces + 1).astype(np.int_)):
+            piece_cost = piece_size + indicator_cost
+            if range_end > range_start and cur_cost + piece_cost > target_cost:
+                task_ranges.append((range_start, range_end))
+                task_costs.append(cur_cost)
+                range_start = range_end
+                cur_cost = 0.0
+            range_end += int(piece_size)
+            cur_cost += piece_cost
+    if range_end > range_start:
+        task_ranges.append((range_start, range_end))
+        task_costs.append(cur_cost)
+
+    print(f"Total indicator groups: {group_sizes.size:,}")
+    print(f"Estimated indicator cost in settings: {indicator_cost:,.2f}")
+
+    return [task_ranges[idx] for idx in np.argsort(task_costs, kind="stable")[::-1]]
+
+
+def share_backtest_data(
+    candles: FootprintCandlesTuple,
+    strategy: Strategy,
+) -> tuple[list[SharedMemory], Strategy, FootprintCandlesTuple]:
+    """
+    Summary
+    -------
+    Puts the candles, the og dos tuple, the og indicator settings tuple and the indicator bank if there is one in shared memory
+
+    Returns
+    -------
+    tuple[list[SharedMemory], Strategy, FootprintCandlesTuple]
+        shared memory blocks to unlink when the backtest is done, a shallow copy of the strategy with specs in place of the og tuples and candles with specs in place of the arrays
+    """
+    candle_shms, shared_candles = share_named_tuple(named_tuple=candles)
+    dos_shms, shared_dos_tuple = share_named_tuple(named_tuple=strategy.og_dos_tuple)
+    ind_shms, shared_ind_set_tuple = share_named_tuple(named_tuple=strategy.og_ind_set_tuple)
+
+    shared_strategy = copy(strategy)
+    shared_strategy.og_dos_tuple = shared_dos_tuple
+    shared_strategy.og_ind_set_tuple = shared_ind_set_tuple
+    shared_strategy.og_settings_array = shared_strategy.og_settings_array_key = None
+    shared_strategy.settings_index_lookup = shared_strategy.settings_index_lookup_key = None
+    shared_strategy.indicator_bank_lookup = None
+
+    bank_shms = []
+    if strategy.indicator_bank is not None:
+        bank_shms, shared_strategy.indicator_bank = share_named_tuple(named_tuple=strategy.indicator_bank)
+
+    shms = candle_shms + dos_shms + ind_shms + bank_shms
+    return shms, shared_strategy, shared_candles
+
+
+def set_worker_backtest_settings(
+    bt_func: Callable,
+    num_array_columns: int,
+    order: OrderHandler,
+    starting_equity: float,
+    step_by: int,
+    top_k: Optional[int],
+    top_k_column: Optional[int],
+    total_bars: int,
+    trace_path: Optional[str] = None,
+    trace_size: int = 100_000,
+    profile: bool = False,
+):
+    global worker_bt_func, worker_num_array_columns, worker_order, worker_starting_equity
+    global worker_step_by, worker_top_k, worker_top_k_column, worker_total_bars, worker_trace_path
+
+    worker_bt_func = bt_func
+    worker_num_array_columns = num_array_columns
+    worker_order = order
+    worker_starting_equity = starting_equity
+    worker_step_by = step_by
+    worker_top_k = top_k
+    worker_top_k_column = top_k_column
+    worker_total_bars = total_bars
+    worker_trace_path = trace_path
 
-def handler(error):
-    print(f"Error: {error}", flush=True)
+    # a forked process gets the tracer of the parent so it always gets set here
+    if trace_path is None:
+        trace.stop_trace()
+    else:
+        trace.start_trace(size=trace_size)
+    if profile:
+        phase_profiler.start_profiler()
+    else:
+        phase_profiler.stop_profiler()
 
+
+def set_worker_backtest_data(
+    candles: FootprintCandlesTuple,
+    num_array_columns: int,
+    strategy: Strategy,
+    bt_func: Callable,
+    order: OrderHandler,
+    starting_equity: float,
+    step_by: int,
+    top_k: Optional[int],
+    top_k_column: Optional[int],
+    total_bars: int,
+    trace_path: Optional[str] = None,
+    trace_size: int = 100_000,
+    profile: bool = False,
+):
+    """
+    Summary
+    -------
+    Pool initializer that gives every process its own copy of the candles and the strategy once instead of with every task
+    """
+    global worker_candles, worker_strategy
+
+    worker_candles = candles
+    worker_strategy = strategy
+    set_worker_backtest_settings(
+        bt_func=bt_func,
+        num_array_columns=num_array_columns,
+        order=order,
+        starting_equity=starting_equity,
+        step_by=step_by,
+        top_k=top_k,
+        top_k_column=top_k_column,
+        total_bars=total_bars,
+        trace_path=trace_path,
+        trace_size=trace_size,
+        profile=profile,
+    )
+
+
+def attach_backtest_data(
+    shared_candles: FootprintCandlesTuple,
+    num_array_columns: int,
+    shared_strategy: Strategy,
+    bt_func: Callable,
+    order: OrderHandler,
+    starting_equity: float,
+    step_by: int,
+    top_k: Optional[int],
+    top_k_column: Optional[int],
+    total_bars: int,
+    trace_path: Optional[str] = None,
+    trace_size: int = 100_000,
+    profile: bool = False,
+):
+    """
+    Summary
+    -------
+    Pool initializer that attaches every process to the data published by share_backtest_data once
+    """
+    global worker_candles, worker_shms, worker_strategy
+
+    candle_shms, worker_candles = attach_named_tuple(spec_tuple=shared_candles)
+    dos_shms, shared_strategy.og_dos_tuple = attach_named_tuple(spec_tuple=shared_strategy.og_dos_tuple)
+    ind_shms, shared_strategy.og_ind_set_tuple = attach_named_tuple(spec_tuple=shared_strategy.og_ind_set_tuple)
+
+    bank_shms = []
+    if shared_strategy.indicator_bank is not None:
+        bank_shms, shared_strategy.indicator_bank = attach_named_tuple(spec_tuple=shared_strategy.indicator_bank)
+
+    worker_strategy = shared_strategy
+    worker_shms = candle_shms + dos_shms + ind_shms + bank_shms
+    set_worker_backtest_settings(
+        bt_func=bt_func,
+        num_array_columns=num_array_columns,
+        order=order,
+        starting_equity=starting_equity,
+        step_by=step_by,
+        top_k=top_k,
+        top_k_column=top_k_column,
+        total_bars=total_bars,
+        trace_path=trace_path,
+        trace_size=trace_size,
+        profile=profile,
+    )
+
+
+def worker_backtest_task(
+    task_range: tuple[int, int],
+) -> tuple[int, int, np.ndarray, np.ndarray, int, float, Optional[np.ndarray]]:
+    """
+    Summary
+    -------
+    Backtests one range of settings with the data the pool initializer gave the process
+
+    Returns
+    -------
+    tuple[int, int, np.ndarray, np.ndarray, int, float, Optional[np.ndarray]]
+        range start, range end, only the record results rows that made it through the backtest settings filters or only the top_k of them, how many settings every PruneRule pruned, the process id, how many seconds the task took and the phase stats of the task if profiling is on
+    """
+    start_time = perf_counter()
+    range_start, range_end = task_range
+
+    record_results = np.full((range_end - range_start, worker_num_array_columns), np.nan)
+    prune_counts = np.zeros(len(PruneRule), dtype=np.int_)
+    worker_bt_func(
+        candles=worker_candles,
+        order=worker_order,
+        prune_counts=prune_counts,
+        range_end=range_end,
+        range_start=range_start,
+        record_results=record_results,
+        starting_equity=worker_starting_equity,
+        strategy=worker_strategy,
+        total_bars=worker_total_bars,
+        step_by=worker_step_by,
+    )
+
+    profiler = phase_profiler.profiler
+    if profiler is not None:
+        profiler.start(ProfilePhase.ResultTransfer)
+    # record_strategy_result fills the rows from the top so the kept rows are the ones before the first nan
+    total_kept = np.count_nonzero(~np.isnan(record_results[:, 0]))
+    record_results = record_results[:total_kept]
+    if worker_top_k is not None:
+        record_results = get_top_k_rows(
+            rows=record_results,
+            top_k=worker_top_k,
+            metric_column=worker_top_k_column,
+        )
+    if worker_trace_path is not None:
+        # only the events of this task get written, not the whole ring buffer
+        trace.tracer.save(path=join(worker_trace_path, f"trace_{getpid()}.bin"))
+
+    phase_stats = None
+    if profiler is not None:
+        profiler.stop()
+        phase_stats = profiler.get_phase_stats()
+    return range_start, range_end, record_results, prune_counts, getpid(), perf_counter() - start_time, phase_stats
+
+
+def print_backtest_progress(
+    elapsed_time: float,
+    settings_done: int,
+    tasks_done: int,
+    total_bars: int,
+    total_settings: int,
+    total_tasks: int,
+    worker_busy_times: dict,
+):
+    """
+    Summary
+    -------
+    Prints how far the backtest is with settings per second, bars per second, eta and the share of the elapsed time every process spent backtesting
+    """
+    settings_per_sec = settings_done / max(elapsed_time, 1e-9)
+    eta = (total_settings - settings_done) / max(settings_per_sec, 1e-9)
+    worker_utilization = " ".join(
+        f"{min(busy_time / max(elapsed_time, 1e-9), 1) * 100:.0f}%" for busy_time in worker_busy_times.values()
+    )
+    print(
+        f"tasks {tasks_done:,}/{total_tasks:,} settings {settings_done:,}/{total_settings:,} "
+        f"settings/s {settings_per_sec:,.1f} bars/s {settings_per_sec * total_bars:,.0f} "
+        f"eta {eta:,.0f}s worker utilization {worker_utilization}",
+        flush=True,
+    )
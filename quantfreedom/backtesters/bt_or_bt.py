@@ -1,7 +1,9 @@
 import numpy as np
 from logging import getLogger
+from quantfreedom.helpers import phase_profiler, trace
 from quantfreedom.helpers.custom_logger import set_loggers
 from quantfreedom.helpers.helper_funcs import order_records_to_df
+from quantfreedom.helpers.phase_profiler import print_phase_table
 from quantfreedom.order_handler.order import OrderHandler
 from quantfreedom.core.plotting_base import plot_or_results
 from quantfreedom.core.strategy import Strategy
@@ -10,6 +12,7 @@ from quantfreedom.core.enums import (
     DecreasePosition,
     FootprintCandlesTuple,
     OrderStatus,
+    ProfilePhase,
     RejectedOrder,
     or_dt,
     TrailingSLStrategyType,
@@ -26,6 +29,7 @@ def or_backtest(
     strategy: Strategy,
     set_idx: int,
     logger_level: str = "INFO",
+    profile: bool = False,
 ):
     if disable_logger:
         set_loggers(
@@ -38,252 +42,314 @@ def or_backtest(
             logger_level=logger_level,
         )
 
-    starting_equity = strategy.static_os_tuple.starting_equity
-
-    
-    
-    order = OrderHandler(
-        exchange_settings_tuple=strategy.exchange_settings_tuple,
-        long_short=strategy.get_long_or_short(),
-        static_os_tuple=strategy.static_os_tuple,
-    )
-
-    set_idx = strategy.get_settings_index(set_idx=set_idx)
-
-    strategy.set_cur_ind_set_tuple(
-        set_idx=set_idx,
-    )
-
-    strategy.set_entries_exits_array(
-        candles=candles,
-    )
-
-    strategy.set_cur_dos_tuple(
-        set_idx=set_idx,
-    )
-
-    order.update_class_dos(
-        dynamic_order_settings=strategy.cur_dos_tuple,
-    )
-    order.set_order_variables(
-        equity=starting_equity,
-    )
-
-    total_bars = candles.candle_open_timestamps.size
-
-    or_filled = 0
-    order_records = np.empty(shape=int(total_bars / 3), dtype=or_dt)
-
-    for bar_index in range(strategy.static_os_tuple.starting_bar - 1, total_bars):
-        logger.debug("\n\n")
-        datetime = candles.candle_open_datetimes[bar_index]
-        logger.debug(f"set_idx= {set_idx} bar_idx= {bar_index} datetime= {datetime}")
-
-        if order.position_size_usd > 0:
-            try:
-                current_candle = CurrentFootprintCandleTuple(
-                    open_timestamp=candles.candle_open_timestamps[bar_index],
-                    open_price=candles.candle_open_prices[bar_index],
-                    high_price=candles.candle_high_prices[bar_index],
-                    low_price=candles.candle_low_prices[bar_index],
-                    close_price=candles.candle_close_prices[bar_index],
-                )
-                logger.debug("Checking stop loss hit")
-                order.check_stop_loss_hit(
-                    current_candle=current_candle,
-                )
-                logger.debug("Checking liq hit")
-                order.check_liq_hit(
-                    current_candle=current_candle,
-                )
-                logger.debug("Checking take profit hit")
-                order.check_take_profit_hit(
-                    current_candle=current_candle,
-                    exit_price=strategy.exit_prices[bar_index],
-                )
+    # the order handler traces what it does instead of logging it so the trace logger turns every event into a log line
+    og_tracer = trace.tracer
+    if not disable_logger:
+        trace.tracer = trace.TraceLogger()
+
+    og_profiler = phase_profiler.profiler
+    phase_profiler.profiler = profiler = phase_profiler.PhaseProfiler() if profile else None
+
+    try:
+        starting_equity = strategy.static_os_tuple.starting_equity
+
+
+
+        order = OrderHandler(
+            exchange_settings_tuple=strategy.exchange_settings_tuple,
+            long_short=strategy.get_long_or_short(),
+            static_os_tuple=strategy.static_os_tuple,
+        )
+
+        if strategy.param_space is not None:
+            position = strategy.param_space.get_position(settings_index=set_idx)
+            strategy.set_og_tuples_from_param_space(range_start=position, range_end=position + 1)
+
+        set_idx = strategy.get_settings_index(set_idx=set_idx)
+        if trace.tracer is not None:
+            trace.tracer.set_idx = set_idx
+
+        strategy.set_cur_ind_set_tuple(
+            set_idx=set_idx,
+        )
+
+        if profiler is not None:
+            profiler.start(ProfilePhase.Entries)
+        strategy.set_entries_exits_array(
+            candles=candles,
+        )
+        if profiler is not None:
+            profiler.stop()
+
+        strategy.set_cur_dos_tuple(
+            set_idx=set_idx,
+        )
+
+        order.update_class_dos(
+            dynamic_order_settings=strategy.cur_dos_tuple,
+        )
+        order.set_order_variables(
+            equity=starting_equity,
+        )
+
+        total_bars = candles.candle_open_timestamps.size
+
+        or_filled = 0
+        order_records = np.empty(shape=int(total_bars / 3), dtype=or_dt)
 
-                logger.debug("Checking to move stop to break even")
-                sl_to_be_price, sl_to_be_pct = order.check_move_sl_to_be(
-                    current_candle=current_candle,
+        starting_bar = strategy.static_os_tuple.starting_bar - 1
+        entry_bars = np.flatnonzero(strategy.entries[starting_bar:]) + starting_bar
+        bar_index = starting_bar
+
+        if profiler is not None:
+            profiler.start(ProfilePhase.PositionManagement)
+        while bar_index < total_bars:
+            if order.position_size_usd == 0:
+                # nothing can happen while we are flat so jump to the next entry
+                next_entry = np.searchsorted(entry_bars, bar_index)
+                if next_entry == entry_bars.size:
+                    break
+                bar_index = entry_bars[next_entry]
+            elif order.can_search_exit_bar:
+                # the sl tp and liq prices can't change until the next entry so jump to the first bar that hits one of them
+                next_entry = np.searchsorted(entry_bars, bar_index)
+                bar_index = order.get_next_exit_bar(
+                    candles=candles,
+                    exit_prices=strategy.exit_prices,
+                    start_bar=bar_index,
+                    end_bar=entry_bars[next_entry] if next_entry < entry_bars.size else total_bars,
                 )
-                if sl_to_be_price:
-                    order.sl_pct = sl_to_be_pct
-                    order.sl_price = sl_to_be_price
-                    logger.debug(f"Filling order for move sl to be")
+                if bar_index == total_bars:
+                    break
+
+            logger.debug("\n\n")
+            datetime = candles.candle_open_datetimes[bar_index]
+            logger.debug(f"set_idx= {set_idx} bar_idx= {bar_index} datetime= {datetime}")
+            if trace.tracer is not None:
+                trace.tracer.bar_idx = bar_index
+
+            if order.position_size_usd > 0:
+                try:
+                    current_candle = CurrentFootprintCandleTuple(
+                        open_timestamp=candles.candle_open_timestamps[bar_index],
+                        open_price=candles.candle_open_prices[bar_index],
+                        high_price=candles.candle_high_prices[bar_index],
+                        low_price=candles.candle_low_prices[bar_index],
+                        close_price=candles.candle_close_prices[bar_index],
+                    )
+                    logger.debug("Checking stop loss hit")
+                    order.check_stop_loss_hit(
+                        current_candle=current_candle,
+                    )
+                    logger.debug("Checking liq hit")
+                    order.check_liq_hit(
+                        current_candle=current_candle,
+                    )
+                    logger.debug("Checking take profit hit")
+                    order.check_take_profit_hit(
+                        current_candle=current_candle,
+                        exit_price=strategy.exit_prices[bar_index],
+                    )
+
+                    logger.debug("Checking to move stop to break even")
+                    sl_to_be_price, sl_to_be_pct = order.check_move_sl_to_be(
+                        current_candle=current_candle,
+                    )
+                    if sl_to_be_price:
+                        order.sl_pct = sl_to_be_pct
+                        order.sl_price = sl_to_be_price
+                        logger.debug(f"Filling order for move sl to be")
+                        order.fill_or_exit_move(
+                            bar_index=bar_index,
+                            set_idx=set_idx,
+                            order_records=order_records[or_filled],
+                            order_status=OrderStatus.MovedSLToBE,
+                            timestamp=current_candle.open_timestamp,
+                            sl_price=sl_to_be_price,
+                            sl_pct=sl_to_be_pct,
+                        )
+                        or_filled += 1
+                        logger.debug(f"Filled sl to be order records")
+
+                    logger.debug("Checking to move trailing stop loss")
+                    tsl_price, tsl_pct = order.check_move_tsl(
+                        current_candle=current_candle,
+                    )
+                    if tsl_price:
+                        order.sl_pct = tsl_pct
+                        order.sl_price = tsl_price
+                        logger.debug(f"Filling order for tsl")
+
+                        order.fill_or_exit_move(
+                            bar_index=bar_index,
+                            set_idx=set_idx,
+                            order_records=order_records[or_filled],
+                            order_status=OrderStatus.MovedTSL,
+                            timestamp=current_candle.open_timestamp,
+                            sl_pct=tsl_pct,
+                            sl_price=tsl_price,
+                        )
+                        or_filled += 1
+                        logger.debug(f"Filled move tsl order records")
+
+                except DecreasePosition as e:
+                    (
+                        equity,
+                        fees_paid,
+                        realized_pnl,
+                    ) = order.calculate_decrease_position(
+                        cur_datetime=candles.candle_open_datetimes[bar_index],
+                        exit_fee_pct=e.exit_fee_pct,
+                        exit_price=e.exit_price,
+                        order_status=e.order_status,
+                        market_fee_pct=strategy.exchange_settings_tuple.market_fee_pct,
+                        equity=order.equity,
+                    )
+                    logger.debug(f"Filling or for decrease postiion {OrderStatus._fields[e.order_status]}")
                     order.fill_or_exit_move(
                         bar_index=bar_index,
                         set_idx=set_idx,
                         order_records=order_records[or_filled],
-                        order_status=OrderStatus.MovedSLToBE,
+                        order_status=e.order_status,
                         timestamp=current_candle.open_timestamp,
-                        sl_price=sl_to_be_price,
-                        sl_pct=sl_to_be_pct,
+                        equity=equity,
+                        exit_price=e.exit_price,
+                        fees_paid=fees_paid,
+                        realized_pnl=realized_pnl,
                     )
                     or_filled += 1
-                    logger.debug(f"Filled sl to be order records")
+                    logger.debug(f"Filled decrease postiion order records for {OrderStatus._fields[e.order_status]}")
 
-                logger.debug("Checking to move trailing stop loss")
-                tsl_price, tsl_pct = order.check_move_tsl(
-                    current_candle=current_candle,
-                )
-                if tsl_price:
-                    order.sl_pct = tsl_pct
-                    order.sl_price = tsl_price
-                    logger.debug(f"Filling order for tsl")
+                    order.set_order_variables(equity=equity)
+                    logger.debug("reset order variables")
 
-                    order.fill_or_exit_move(
+                except Exception as e:
+                    logger.error(f"Exception checking sl liq tp and move -> {e}")
+                    raise Exception(f"Exception checking sl liq tp and move -> {e}")
+            else:
+                logger.debug("Not in a pos so not checking SL Liq or TP")
+
+            logger.debug("strategy evaluate")
+            if strategy.entries[bar_index]:
+                strategy.entry_message(bar_index=bar_index)
+                if profiler is not None:
+                    profiler.start(ProfilePhase.OrderSizing)
+                try:
+                    logger.debug("calculate_stop_loss")
+                    sl_price = order.calculate_stop_loss(
                         bar_index=bar_index,
+                        candles=candles,
+                    )
+
+                    logger.debug("calculate_increase_position")
+                    (
+                        average_entry,
+                        entry_price,
+                        entry_size_asset,
+                        entry_size_usd,
+                        position_size_asset,
+                        position_size_usd,
+                        total_possible_loss,
+                        total_trades,
+                        sl_pct,
+                    ) = order.calculate_increase_position(
+                        average_entry=order.average_entry,
+                        entry_price=candles.candle_close_prices[bar_index],
+                        equity=order.equity,
+                        position_size_asset=order.position_size_asset,
+                        position_size_usd=order.position_size_usd,
+                        sl_price=sl_price,
+                        total_trades=order.total_trades,
+                    )
+
+                    logger.debug("calculate_leverage")
+                    (
+                        available_balance,
+                        cash_borrowed,
+                        cash_used,
+                        leverage,
+                        liq_price,
+                    ) = order.calculate_leverage(
+                        available_balance=order.available_balance,
+                        average_entry=average_entry,
+                        cash_borrowed=order.cash_borrowed,
+                        cash_used=order.cash_used,
+                        position_size_usd=position_size_usd,
+                        position_size_asset=position_size_asset,
+                        sl_price=sl_price,
+                    )
+
+                    logger.debug("calculate_take_profit")
+                    (
+                        can_move_sl_to_be,
+                        tp_price,
+                        tp_pct,
+                    ) = order.calculate_take_profit(
+                        average_entry=average_entry,
+                        position_size_usd=position_size_usd,
+                        total_possible_loss=total_possible_loss,
+                    )
+
+                    logger.debug("calculate_take_profit")
+                    order.fill_order_result(
+                        available_balance=available_balance,
+                        average_entry=average_entry,
+                        can_move_sl_to_be=can_move_sl_to_be,
+                        cash_borrowed=cash_borrowed,
+                        cash_used=cash_used,
+                        entry_price=entry_price,
+                        entry_size_asset=entry_size_asset,
+                        entry_size_usd=entry_size_usd,
+                        equity=order.equity,
+                        exit_price=np.nan,
+                        fees_paid=np.nan,
+                        leverage=leverage,
+                        liq_price=liq_price,
+                        order_status=OrderStatus.EntryFilled,
+                        position_size_asset=position_size_asset,
+                        position_size_usd=position_size_usd,
+                        total_possible_loss=total_possible_loss,
+                        realized_pnl=np.nan,
+                        sl_pct=sl_pct,
+                        sl_price=sl_price,
+                        total_trades=total_trades,
+                        tp_pct=tp_pct,
+                        tp_price=tp_price,
+                    )
+                    logger.debug("filling entry order records")
+                    order.fill_or_entry(
+                        bar_index=bar_index + 1,
                         set_idx=set_idx,
                         order_records=order_records[or_filled],
-                        order_status=OrderStatus.MovedTSL,
-                        timestamp=current_candle.open_timestamp,
-                        sl_pct=tsl_pct,
-                        sl_price=tsl_price,
+                        timestamp=candles.candle_open_timestamps[bar_index + 1],
                     )
                     or_filled += 1
-                    logger.debug(f"Filled move tsl order records")
-
-            except DecreasePosition as e:
-                (
-                    equity,
-                    fees_paid,
-                    realized_pnl,
-                ) = order.calculate_decrease_position(
-                    cur_datetime=candles.candle_open_datetimes[bar_index],
-                    exit_fee_pct=e.exit_fee_pct,
-                    exit_price=e.exit_price,
-                    order_status=e.order_status,
-                    market_fee_pct=strategy.exchange_settings_tuple.market_fee_pct,
-                    equity=order.equity,
-                )
-                logger.debug(f"Filling or for decrease postiion {OrderStatus._fields[e.order_status]}")
-                order.fill_or_exit_move(
-                    bar_index=bar_index,
-                    set_idx=set_idx,
-                    order_records=order_records[or_filled],
-                    order_status=e.order_status,
-                    timestamp=current_candle.open_timestamp,
-                    equity=equity,
-                    exit_price=e.exit_price,
-                    fees_paid=fees_paid,
-                    realized_pnl=realized_pnl,
-                )
-                or_filled += 1
-                logger.debug(f"Filled decrease postiion order records for {OrderStatus._fields[e.order_status]}")
-
-                order.set_order_variables(equity=equity)
-                logger.debug("reset order variables")
-
-            except Exception as e:
-                logger.error(f"Exception checking sl liq tp and move -> {e}")
-                raise Exception(f"Exception checking sl liq tp and move -> {e}")
-        else:
-            logger.debug("Not in a pos so not checking SL Liq or TP")
-
-        logger.debug("strategy evaluate")
-        if strategy.entries[bar_index]:
-            strategy.entry_message(bar_index=bar_index)
-            try:
-                logger.debug("calculate_stop_loss")
-                sl_price = order.calculate_stop_loss(
-                    bar_index=bar_index,
-                    candles=candles,
-                )
-
-                logger.debug("calculate_increase_position")
-                (
-                    average_entry,
-                    entry_price,
-                    entry_size_asset,
-                    entry_size_usd,
-                    position_size_asset,
-                    position_size_usd,
-                    total_possible_loss,
-                    total_trades,
-                    sl_pct,
-                ) = order.calculate_increase_position(
-                    average_entry=order.average_entry,
-                    entry_price=candles.candle_close_prices[bar_index],
-                    equity=order.equity,
-                    position_size_asset=order.position_size_asset,
-                    position_size_usd=order.position_size_usd,
-                    sl_price=sl_price,
-                    total_trades=order.total_trades,
-                )
+                    logger.info("We are in a position and filled the result")
+                except RejectedOrder:
+                    pass
+                except Exception as e:
+                    if bar_index + 1 >= candles.candle_open_timestamps.size:
+                        raise Exception(f"Exception hit in eval strat -> {e}")
+                        pass
+                    else:
+                        logger.error(f"Exception hit in eval strat -> {e}")
+                        raise Exception(f"Exception hit in eval strat -> {e}")
+                if profiler is not None:
+                    profiler.stop()
 
-                logger.debug("calculate_leverage")
-                (
-                    available_balance,
-                    cash_borrowed,
-                    cash_used,
-                    leverage,
-                    liq_price,
-                ) = order.calculate_leverage(
-                    available_balance=order.available_balance,
-                    average_entry=average_entry,
-                    cash_borrowed=order.cash_borrowed,
-                    cash_used=order.cash_used,
-                    position_size_usd=position_size_usd,
-                    position_size_asset=position_size_asset,
-                    sl_price=sl_price,
-                )
+            bar_index += 1
 
-                logger.debug("calculate_take_profit")
-                (
-                    can_move_sl_to_be,
-                    tp_price,
-                    tp_pct,
-                ) = order.calculate_take_profit(
-                    average_entry=average_entry,
-                    position_size_usd=position_size_usd,
-                    total_possible_loss=total_possible_loss,
-                )
+        if profiler is not None:
+            profiler.stop()
+            profiler.start(ProfilePhase.ResultTransfer)
+        order_records_df = order_records_to_df(order_records[:or_filled])
+        if profiler is not None:
+            profiler.stop()
+            print_phase_table(all_phase_stats={"main": profiler.get_phase_stats()})
+    finally:
+        trace.tracer = og_tracer
+        phase_profiler.profiler = og_profiler
 
-                logger.debug("calculate_take_profit")
-                order.fill_order_result(
-                    available_balance=available_balance,
-                    average_entry=average_entry,
-                    can_move_sl_to_be=can_move_sl_to_be,
-                    cash_borrowed=cash_borrowed,
-                    cash_used=cash_used,
-                    entry_price=entry_price,
-                    entry_size_asset=entry_size_asset,
-                    entry_size_usd=entry_size_usd,
-                    equity=order.equity,
-                    exit_price=np.nan,
-                    fees_paid=np.nan,
-                    leverage=leverage,
-                    liq_price=liq_price,
-                    order_status=OrderStatus.EntryFilled,
-                    position_size_asset=position_size_asset,
-                    position_size_usd=position_size_usd,
-                    total_possible_loss=total_possible_loss,
-                    realized_pnl=np.nan,
-                    sl_pct=sl_pct,
-                    sl_price=sl_price,
-                    total_trades=total_trades,
-                    tp_pct=tp_pct,
-                    tp_price=tp_price,
-                )
-                logger.debug("filling entry order records")
-                order.fill_or_entry(
-                    bar_index=bar_index + 1,
-                    set_idx=set_idx,
-                    order_records=order_records[or_filled],
-                    timestamp=candles.candle_open_timestamps[bar_index + 1],
-                )
-                or_filled += 1
-                logger.info("We are in a position and filled the result")
-            except RejectedOrder:
-                pass
-            except Exception as e:
-                if bar_index + 1 >= candles.candle_open_timestamps.size:
-                    raise Exception(f"Exception hit in eval strat -> {e}")
-                    pass
-                else:
-                    logger.error(f"Exception hit in eval strat -> {e}")
-                    raise Exception(f"Exception hit in eval strat -> {e}")
-    order_records_df = order_records_to_df(order_records[:or_filled])
     pretty_qf(strategy.cur_dos_tuple)
     pretty_qf(strategy.cur_ind_set_tuple)
     if not disable_plot:
@@ -0,0 +1,197 @@
+import numpy as np
+import pandas as pd
+from copy import copy
+from logging import getLogger
+from quantfreedom.backtesters.bt_multi_bt import run_df_backtest
+from quantfreedom.core.search_space import SearchSpace
+from quantfreedom.core.strategy import Strategy
+from quantfreedom.core.enums import BacktestSettings, FootprintCandlesTuple
+from quantfreedom.helpers.helper_funcs import filter_bt_df
+from quantfreedom.helpers.result_sink import ResultMetricColumns
+
+logger = getLogger()
+
+
+def run_refine_backtest(
+    candles: FootprintCandlesTuple,
+    strategy: Strategy,
+    threads: int,
+    stride: int = 4,
+    top_n: int = 10,
+    neighborhood: str = "box",
+    rank_metric: str = "qf_score",
+    engine: str = "loop",
+    batch_size: int = 1000,
+    shared_memory: bool = False,
+    tasks_per_thread: int = 4,
+    progress_interval: float = 5.0,
+) -> pd.DataFrame:
+    """
+    Summary
+    -------
+    Coarse to fine grid refinement. The first pass backtests every stride value of every axis of the SearchSpace plus the last one, so every 4th rsi_length, every 4th risk_reward and so on. Every pass after that halves the stride and only backtests the neighbours of the top_n settings with the highest rank_metric found so far, till the stride is 1
+
+    Settings that were backtested in an earlier pass come from the cache instead of being backtested again. Values that aren't settings of the strategy are skipped so get_filter_cart_prod_array or the param space constraints still hold
+
+    Every pass goes through run_df_backtest without the backtest settings filters so the ranking sees every setting, the filters are used on the results at the end
+
+    Parameters
+    ----------
+    candles : FootprintCandlesTuple
+        candles
+    strategy : Strategy
+        strategy
+    threads : int
+        number of processes
+    stride : int, 4
+        step between the value indexes of every axis in the first pass
+    top_n : int, 10
+        settings whose neighbours get backtested in the next pass
+    neighborhood : str, "box"
+        box = every combination of one stride down, the same value and one stride up on every axis, 3 ** axes settings around every top setting
+
+        cross = one stride down and one stride up on one axis at a time, 2 * axes settings around every top setting
+    rank_metric : str, "qf_score"
+        gains_pct, win_rate, qf_score or profit_factor
+    engine : str, "loop"
+        loop or batch, see run_df_backtest
+    batch_size : int, 1000
+        see run_df_backtest
+    shared_memory : bool, False
+        see run_df_backtest
+    tasks_per_thread : int, 4
+        see run_df_backtest
+    progress_interval : float, 5.0
+        see run_df_backtest
+
+    Returns
+    -------
+    pd.DataFrame
+        backtest results of every setting backtested in any pass that made it through the backtest settings filters
+    """
+    if rank_metric not in ResultMetricColumns:
+        raise Exception(f"{', '.join(ResultMetricColumns)} are the only options for rank_metric")
+    if neighborhood.lower() not in ("box", "cross"):
+        raise Exception("box or cross are the only options for neighborhood")
+    if stride < 1:
+        raise Exception("stride has to be at least 1")
+
+    search_space = SearchSpace(strategy=strategy)
+    print(f"Search space axis sizes: {search_space.axis_sizes}")
+
+    strides = [stride]
+    while strides[-1] > 1:
+        strides.append(strides[-1] // 2)
+
+    evaluated = np.empty(0, dtype=np.int_)
+    scores = np.empty(0)
+    backtest_dfs = []
+    for pass_idx, pass_stride in enumerate(strides):
+        if pass_idx == 0:
+            value_indexes = get_strided_value_indexes(
+                axis_sizes=search_space.axis_sizes,
+                stride=pass_stride,
+            )
+        else:
+            ranks = np.argsort(-np.nan_to_num(scores, nan=-np.inf), kind="stable")
+            top_settings = evaluated[ranks[:top_n]][~np.isnan(scores[ranks[:top_n]])]
+            value_indexes = get_neighbor_value_indexes(
+                axis_sizes=search_space.axis_sizes,
+                neighborhood=neighborhood,
+                stride=pass_stride,
+                value_indexes=search_space.get_value_indexes(settings_indexes=top_settings),
+            )
+
+        settings_indexes = search_space.get_settings_indexes(value_indexes=value_indexes)
+        settings_indexes = np.unique(settings_indexes[settings_indexes != -1])
+        total_cached = np.count_nonzero(np.isin(settings_indexes, evaluated))
+        settings_indexes = settings_indexes[~np.isin(settings_indexes, evaluated)]
+        print(
+            "\n"
+            + f"Pass {pass_idx + 1}/{len(strides)} stride {pass_stride}: {settings_indexes.size:,} new settings and {total_cached:,} from the cache"
+        )
+        if settings_indexes.size == 0:
+            continue
+
+        pass_strategy = copy(strategy)
+        pass_strategy.set_og_settings_subset(settings_indexes=settings_indexes)
+        pass_strategy.backtest_settings_tuple = BacktestSettings()
+        backtest_df = run_df_backtest(
+            candles=candles,
+            strategy=pass_strategy,
+            threads=threads,
+            engine=engine,
+            batch_size=batch_size,
+            shared_memory=shared_memory,
+            tasks_per_thread=tasks_per_thread,
+            progress_interval=progress_interval,
+        )
+        backtest_dfs.append(backtest_df)
+        evaluated = np.concatenate((evaluated, settings_indexes))
+        scores = np.concatenate(
+            (scores, backtest_df[rank_metric].reindex(settings_indexes).to_numpy(dtype=np.float_))
+        )
+
+    print(f"Total settings backtested: {evaluated.size:,} of {strategy.total_filtered_settings:,}")
+
+    if not backtest_dfs:
+        return pd.DataFrame()
+    return filter_bt_df(
+        backtest_df=pd.concat(backtest_dfs),
+        backtest_settings_tuple=strategy.backtest_settings_tuple,
+    ).sort_values("gains_pct", ascending=False)
+
+
+def get_strided_value_indexes(
+    axis_sizes: tuple,
+    stride: int,
+) -> np.ndarray:
+    """
+    Summary
+    -------
+    Every combination of every stride value index of every axis, the last value of every axis is always in so the coarse grid covers the whole range
+
+    Returns
+    -------
+    np.ndarray
+        one row per combination and one column per axis
+    """
+    axis_value_indexes = [np.unique(np.append(np.arange(0, axis_size, stride), axis_size - 1)) for axis_size in axis_sizes]
+    return np.stack(np.meshgrid(*axis_value_indexes, indexing="ij"), axis=-1).reshape(-1, len(axis_sizes))
+
+
+def get_neighbor_value_indexes(
+    axis_sizes: tuple,
+    neighborhood: str,
+    stride: int,
+    value_indexes: np.ndarray,
+) -> np.ndarray:
+    """
+    Summary
+    -------
+    Value indexes around every row of value_indexes that are stride away on the axes, neighbours past the end of an axis are left out
+
+    Returns
+    -------
+    np.ndarray
+        one row per neighbour and one column per axis, can have repeats
+    """
+    if neighborhood.lower() == "cross":
+        neighbors = [value_indexes]
+        for axis, axis_size in enumerate(axis_sizes):
+            for offset in (-stride, stride):
+                shifted = value_indexes.copy()
+                shifted[:, axis] += offset
+                neighbors.append(shifted[(shifted[:, axis] >= 0) & (shifted[:, axis] < axis_size)])
+        return np.concatenate(neighbors)
+
+    neighbors = value_indexes
+    for axis, axis_size in enumerate(axis_sizes):
+        shifted_neighbors = []
+        for offset in (-stride, 0, stride):
+            shifted = neighbors.copy()
+            shifted[:, axis] += offset
+            shifted_neighbors.append(shifted[(shifted[:, axis] >= 0) & (shifted[:, axis] < axis_size)])
+        # drop repeats every axis so boxes that overlap don't blow up
+        neighbors = np.unique(np.concatenate(shifted_neighbors), axis=0)
+    return neighbors
@@ -0,0 +1,316 @@
+import pickle
+import numpy as np
+import pandas as pd
+from copy import copy
+from logging import getLogger
+from multiprocessing import Pool, resource_tracker
+from typing import Callable, Iterator, Optional
+from quantfreedom.backtesters.bt_multi_bt import run_df_backtest, set_worker_backtest_data, worker_backtest_task
+from quantfreedom.core.strategy import Strategy
+from quantfreedom.core.enums import FootprintCandlesTuple, IndicatorBank
+from quantfreedom.helpers.shared_memory import (
+    SharedArraySpec,
+    attach_array,
+    attach_named_tuple,
+    close_shared_memory,
+    share_array,
+    share_named_tuple,
+)
+from quantfreedom.order_handler.order import OrderHandler
+
+logger = getLogger()
+
+
+class BacktestSession:
+    def __init__(
+        self,
+        candles: FootprintCandlesTuple,
+        threads: int,
+        shared_memory: bool = False,
+    ):
+        """
+        Summary
+        -------
+        Keeps a pool of processes alive with the candles already in them so you can run one backtest after another on the same candles without starting the processes, importing quantfreedom and sending the candles every time
+
+        Every backtest is a job. The settings and the indicator bank of a job get published once through shared memory and every process attaches to them the first time it gets a task of the job, so a new strategy or settings grid only costs what it takes to publish it
+
+        The indicator banks are kept for as long as the session is open so the next backtest of a strategy with the same indicator settings doesn't compute them again
+
+        Use it in a with block or call close when you are done
+
+        Parameters
+        ----------
+        candles : FootprintCandlesTuple
+            candles every backtest of the session uses
+        threads : int
+            number of processes
+        shared_memory : bool, False
+            publish the candles through shared memory instead of sending every process a copy
+        """
+        self.candles = candles
+        self.threads = threads
+        self.candle_shms = []
+        self.indicator_banks = {}
+        self.job_id = 0
+
+        # the processes have to share the resource tracker of this process, one they start on their own would unlink the job blocks they attached to when they exit
+        resource_tracker.ensure_running()
+
+        self.pool_initargs = (candles, None)
+        if shared_memory:
+            self.candle_shms, shared_candles = share_named_tuple(named_tuple=candles)
+            self.pool_initargs = (None, shared_candles)
+        self.pool = Pool(
+            processes=threads,
+            initializer=set_session_worker_candles,
+            initargs=self.pool_initargs,
+        )
+        logger.debug(f"backtest session with {threads} processes")
+
+    def __enter__(
+        self,
+    ):
+        return self
+
+    def __exit__(
+        self,
+        exc_type,
+        exc_value,
+        traceback,
+    ):
+        self.close()
+
+    def run_df_backtest(
+        self,
+        strategy: Strategy,
+        **kwargs,
+    ) -> pd.DataFrame:
+        """
+        Summary
+        -------
+        run_df_backtest on the processes of the session, takes every option of run_df_backtest but candles, threads and shared_memory
+
+        Returns
+        -------
+        pd.DataFrame
+            backtest results
+        """
+        return run_df_backtest(
+            candles=self.candles,
+            strategy=strategy,
+            threads=self.threads,
+            session=self,
+            **kwargs,
+        )
+
+    def set_indicator_bank(
+        self,
+        strategy: Strategy,
+    ):
+        """
+        Summary
+        -------
+        Gives the strategy the indicator bank the session already has for its class and bank params or computes it and keeps it, the bank also gets published to shared memory once
+        """
+        if not strategy.indicator_bank_fields:
+            return
+
+        bank_params = strategy.get_indicator_bank_params()
+        bank_key = (type(strategy).__qualname__, strategy.indicator_bank_fields, bank_params.shape, bank_params.tobytes())
+        if bank_key not in self.indicator_banks:
+            strategy.set_indicator_bank(candles=self.candles)
+            bank_shms, shared_bank = share_named_tuple(named_tuple=strategy.indicator_bank)
+            self.indicator_banks[bank_key] = (strategy.indicator_bank, bank_shms, shared_bank)
+            logger.debug(f"session computed an indicator bank for {type(strategy).__qualname__}")
+
+        strategy.indicator_bank = self.indicator_banks[bank_key][0]
+        strategy.indicator_bank_lookup = None
+
+    def get_shared_indicator_bank(
+        self,
+        indicator_bank: Optional[IndicatorBank],
+    ) -> Optional[IndicatorBank]:
+        """
+        Shared memory spec of a bank from set_indicator_bank
+        """
+        for bank, _, shared_bank in self.indicator_banks.values():
+            if bank is indicator_bank:
+                return shared_bank
+        return None
+
+    def imap_backtest_tasks(
+        self,
+        bt_func: Callable,
+        num_array_columns: int,
+        order: OrderHandler,
+        step_by: int,
+        strategy: Strategy,
+        task_ranges: list[tuple[int, int]],
+        top_k: Optional[int],
+        top_k_column: Optional[int],
+        trace_path: Optional[str] = None,
+        trace_size: int = 100_000,
+        profile: bool = False,
+    ) -> Iterator[tuple]:
+        """
+        Summary
+        -------
+        Publishes the job and gives back the results of worker_backtest_task for every task range as they finish, the shared memory of the job gets freed once every result is back
+
+        Returns
+        -------
+        Iterator[tuple]
+            what worker_backtest_task gives back
+        """
+        self.job_id += 1
+        dos_shms, shared_dos_tuple = share_named_tuple(named_tuple=strategy.og_dos_tuple)
+        ind_shms, shared_ind_set_tuple = share_named_tuple(named_tuple=strategy.og_ind_set_tuple)
+
+        shared_strategy = copy(strategy)
+        shared_strategy.og_dos_tuple = shared_dos_tuple
+        shared_strategy.og_ind_set_tuple = shared_ind_set_tuple
+        shared_strategy.og_settings_array = shared_strategy.og_settings_array_key = None
+        shared_strategy.settings_index_lookup = shared_strategy.settings_index_lookup_key = None
+        shared_strategy.indicator_bank_lookup = None
+        shared_strategy.indicator_bank = self.get_shared_indicator_bank(indicator_bank=strategy.indicator_bank)
+
+        job = pickle.dumps(
+            (
+                shared_strategy,
+                bt_func,
+                order,
+                num_array_columns,
+                strategy.static_os_tuple.starting_equity,
+                step_by,
+                top_k,
+                top_k_column,
+                trace_path,
+                trace_size,
+                profile,
+            )
+        )
+        job_shm, job_spec = share_array(arr=np.frombuffer(job, dtype=np.uint8))
+        job_shms = dos_shms + ind_shms + [job_shm]
+        try:
+            yield from self.pool.imap_unordered(
+                session_worker_task,
+                [(self.job_id, job_spec, task_range) for task_range in task_ranges],
+            )
+        finally:
+            close_shared_memory(shms=job_shms, unlink=True)
+
+    def restart_pool(
+        self,
+    ):
+        """
+        Throws away the pool with whatever tasks it still has and starts a new one, for when a backtest stops in the middle
+        """
+        self.pool.terminate()
+        self.pool.join()
+        self.pool = Pool(
+            processes=self.threads,
+            initializer=set_session_worker_candles,
+            initargs=self.pool_initargs,
+        )
+
+    def close(
+        self,
+    ):
+        """
+        Stops the processes and frees the shared memory of the session
+        """
+        self.pool.close()
+        self.pool.join()
+        for _, bank_shms, _ in self.indicator_banks.values():
+            close_shared_memory(shms=bank_shms, unlink=True)
+        self.indicator_banks = {}
+        close_shared_memory(shms=self.candle_shms, unlink=True)
+        self.candle_shms = []
+
+
+def set_session_worker_candles(
+    candles: Optional[FootprintCandlesTuple],
+    shared_candles: Optional[FootprintCandlesTuple],
+):
+    """
+    Summary
+    -------
+    Pool initializer of a BacktestSession, the candles are the only thing a process gets when it starts
+    """
+    global session_candles, session_candle_shms, session_job_id, session_job_shms
+
+    session_candle_shms = []
+    if shared_candles is not None:
+        session_candle_shms, candles = attach_named_tuple(spec_tuple=shared_candles)
+    session_candles = candles
+    session_job_id = None
+    session_job_shms = []
+
+
+def session_worker_task(
+    job_task: tuple[int, SharedArraySpec, tuple[int, int]],
+) -> tuple[int, int, np.ndarray, np.ndarray, int, float, Optional[np.ndarray]]:
+    """
+    Summary
+    -------
+    Attaches to the job the first time the process gets one of its tasks and then runs the task with worker_backtest_task
+
+    Returns
+    -------
+    tuple[int, int, np.ndarray, np.ndarray, int, float, Optional[np.ndarray]]
+        what worker_backtest_task gives back
+    """
+    global session_job_id, session_job_shms
+
+    job_id, job_spec, task_range = job_task
+    if job_id != session_job_id:
+        job_shm, job = attach_array(spec=job_spec)
+        (
+            shared_strategy,
+            bt_func,
+            order,
+            num_array_columns,
+            starting_equity,
+            step_by,
+            top_k,
+            top_k_column,
+            trace_path,
+            trace_size,
+            profile,
+        ) = pickle.loads(job.tobytes())
+        del job
+        job_shm.close()
+
+        dos_shms, shared_strategy.og_dos_tuple = attach_named_tuple(spec_tuple=shared_strategy.og_dos_tuple)
+        ind_shms, shared_strategy.og_ind_set_tuple = attach_named_tuple(spec_tuple=shared_strategy.og_ind_set_tuple)
+        bank_shms = []
+        if shared_strategy.indicator_bank is not None:
+            bank_shms, shared_strategy.indicator_bank = attach_named_tuple(spec_tuple=shared_strategy.indicator_bank)
+
+        set_worker_backtest_data(
+            candles=session_candles,
+            num_array_columns=num_array_columns,
+            strategy=shared_strategy,
+            bt_func=bt_func,
+            order=order,
+            starting_equity=starting_equity,
+            step_by=step_by,
+            top_k=top_k,
+            top_k_column=top_k_column,
+            total_bars=session_candles.candle_open_timestamps.size,
+            trace_path=trace_path,
+            trace_size=trace_size,
+            profile=profile,
+        )
+
+        # the last job isn't used anymore, arrays of it that are still around keep their block open till they are gone
+        for shm in session_job_shms:
+            try:
+                shm.close()
+            except BufferError:
+                pass
+        session_job_id = job_id
+        session_job_shms = dos_shms + ind_shms + bank_shms
+
+    return worker_backtest_task(task_range=task_range)
@@ -164,6 +164,59 @@ class PositionModeTypeT(NamedTuple):
 PositionModeType = PositionModeTypeT()
 
 
+class ProfilePhaseT(NamedTuple):
+    """
+    Phases of a backtest the phase profiler times
+
+    Parameters
+    ----------
+    Indicators : int = 0
+        Computing the indicator bank and reading indicators from it
+    Entries : int = 1
+        set_entries_exits_array and the entry arrays the prune rules use, indicators your strategy computes in set_entries_exits_array count here
+    PositionManagement : int = 2
+        Checking sl liq and tp hits, closing positions and moving the sl to be and the tsl, the kernel engine does all of its bar loop and order math here
+    OrderSizing : int = 3
+        Stop loss, entry size, leverage and take profit of an entry
+    Scoring : int = 4
+        Scoring a setting with the qf score and putting it in the record results
+    ResultTransfer : int = 5
+        Packing the results of a task in the process and putting them in the result sink in the main process
+    """
+
+    Indicators: int = 0
+    Entries: int = 1
+    PositionManagement: int = 2
+    OrderSizing: int = 3
+    Scoring: int = 4
+    ResultTransfer: int = 5
+
+
+ProfilePhase = ProfilePhaseT()
+
+
+class PruneRuleT(NamedTuple):
+    """
+    Rules run_df_backtest uses to skip or stop the backtest of a setting without changing the results
+
+    Parameters
+    ----------
+    TooFewEntries : int = 0
+        Skipped because the entries after the starting bar can't close more trades than the total trade filter
+    CantAffordMinAsset : int = 1
+        Stopped early because the equity can't pay the initial margin of min asset size at max leverage for any entry left
+    CantPassFilters : int = 2
+        Stopped early because the closed trades plus every entry left can't get above the total trade filter
+    """
+
+    TooFewEntries: int = 0
+    CantAffordMinAsset: int = 1
+    CantPassFilters: int = 2
+
+
+PruneRule = PruneRuleT()
+
+
 class StringerFuncTypeT(NamedTuple):
     float_to_str: int = 0
     log_datetime: int = 1
@@ -214,6 +267,139 @@ class TakeProfitStrategyTypeT(NamedTuple):
 TakeProfitStrategyType = TakeProfitStrategyTypeT()
 
 
+class TraceEventT(NamedTuple):
+    """
+    Events the backtests and the order handler put in the trace, see quantfreedom.helpers.trace for the values every event has
+
+    Parameters
+    ----------
+    SettingStart : int = 0
+        Backtest of a setting started
+    BatchStart : int = 1
+        Backtest of a batch of settings started, the set_idx is the first setting of the batch
+    EntryStatus : int = 2
+        Order status of an entry
+    StopLoss : int = 3
+        Stop loss price of an entry
+    SLCandleBody : int = 4
+        Candle body the stop loss of an entry is based on
+    IncreasePosition : int = 5
+        Position after an entry
+    Leverage : int = 6
+        Leverage and liq price after an entry
+    TakeProfit : int = 7
+        Take profit price of an entry
+    StopLossHit : int = 8
+        Stop loss got hit
+    LiquidationHit : int = 9
+        Liq price got hit
+    TakeProfitHit : int = 10
+        Take profit got hit
+    MovedSLToBE : int = 11
+        Stop loss moved to break even
+    MovedTSL : int = 12
+        Trailing stop loss moved
+    DecreasePosition : int = 13
+        Position got closed
+    EntrySizeTooSmall : int = 14
+        Entry got rejected because the entry size is below min asset size
+    EntrySizeTooBig : int = 15
+        Entry got rejected because the entry size is above max asset size
+    HitMaxTrades : int = 16
+        Entry got rejected because of max trades
+    CashUsedExceed : int = 17
+        Entry got rejected because the cash used is bigger than the available balance
+    LeverageTooHigh : int = 18
+        Leverage got capped at max leverage
+    LeverageTooLow : int = 19
+        Leverage was below min leverage and got set to 1
+    SettingPruned : int = 20
+        Backtest of the setting got skipped or stopped early by a PruneRule
+    SettingResult : int = 21
+        Backtest of the setting is done
+    """
+
+    SettingStart: int = 0
+    BatchStart: int = 1
+    EntryStatus: int = 2
+    StopLoss: int = 3
+    SLCandleBody: int = 4
+    IncreasePosition: int = 5
+    Leverage: int = 6
+    TakeProfit: int = 7
+    StopLossHit: int = 8
+    LiquidationHit: int = 9
+    TakeProfitHit: int = 10
+    MovedSLToBE: int = 11
+    MovedTSL: int = 12
+    DecreasePosition: int = 13
+    EntrySizeTooSmall: int = 14
+    EntrySizeTooBig: int = 15
+    HitMaxTrades: int = 16
+    CashUsedExceed: int = 17
+    LeverageTooHigh: int = 18
+    LeverageTooLow: int = 19
+    SettingPruned: int = 20
+    SettingResult: int = 21
+
+
+TraceEvent = TraceEventT()
+
+
+class TradeMetricT(NamedTuple):
+    """
+    Running stats of the closed trades of a setting that get updated with every closed trade, they are the spots in a trade metrics array
+
+    Break even trades are the ones with an abs realized pnl of 0.009 or less, they count in TotalTrades, TotalPnl and FeesPaid but not as a win or a loss
+
+    Parameters
+    ----------
+    TotalTrades : int = 0
+        Closed trades
+    Wins : int = 1
+        Closed trades with a realized pnl above 0.009
+    Losses : int = 2
+        Closed trades with a realized pnl below -0.009
+    GrossProfit : int = 3
+        Realized pnl of the wins added up
+    GrossLoss : int = 4
+        Realized pnl of the losses added up as a positive number
+    TotalPnl : int = 5
+        Realized pnl of every closed trade added up
+    FeesPaid : int = 6
+        Fees of every closed trade added up
+    PeakEquity : int = 7
+        Highest equity after a closed trade, starts at the starting equity
+    MaxDrawdownPct : int = 8
+        Biggest drop from the peak equity in pct
+    QfCumPnl : int = 9
+        Realized pnl of the wins and losses added up, the y of the qf score regression
+    QfCumPnlMean : int = 10
+        Mean of every QfCumPnl so far
+    QfCoMoment : int = 11
+        Sum of (x - x mean) * (y - y mean) of the qf score regression where x is the trade number
+    QfCumPnlMoment : int = 12
+        Sum of (y - y mean) ** 2 of the qf score regression
+    """
+
+    TotalTrades: int = 0
+    Wins: int = 1
+    Losses: int = 2
+    GrossProfit: int = 3
+    GrossLoss: int = 4
+    TotalPnl: int = 5
+    FeesPaid: int = 6
+    PeakEquity: int = 7
+    MaxDrawdownPct: int = 8
+    QfCumPnl: int = 9
+    QfCumPnlMean: int = 10
+    QfCoMoment: int = 11
+    QfCumPnlMoment: int = 12
+
+
+TradeMetric = TradeMetricT()
+
+
 class TriggerDirectionTypeT(NamedTuple):
     Rise: int = 1
     Fall: int = 2
@@ -300,6 +486,80 @@ class ExchangeSettings(NamedTuple):
     price_tick_step: int
 
 
+class IndicatorBank(NamedTuple):
+    """
+    Indicator values for every unique combination of the indicator settings an indicator depends on
+
+    Parameters
+    ----------
+    bank_params : np.ndarray
+        one row per unique combination with one column per field in Strategy.indicator_bank_fields
+    bank_values : np.ndarray
+        one row per unique combination with the indicator value of every candle
+    """
+
+    bank_params: np.ndarray
+    bank_values: np.ndarray
+
+
+class KernelOrderSettings(NamedTuple):
+    """
+    Static order and exchange settings the kernel engine needs, flattened into plain numbers so the kernel can be compiled
+
+    Parameters
+    ----------
+    is_long : bool
+        True for long and False for short
+    sl_bcb_min : bool
+        True if pg_min_max_sl_bcb is min and False if it is max
+    sl_to_be_bool : bool
+        sl_to_be_bool
+    sl_to_zero : bool
+        True if z_or_e_type is zero and False if it is entry
+    trailing_sl_strategy_type : int
+        TrailingSLStrategyType
+    tp_strategy_type : int
+        TakeProfitStrategyType
+    asset_tick_step : int
+        asset_tick_step
+    leverage_tick_step : int
+        leverage_tick_step
+    market_fee_pct : float
+        market_fee_pct
+    max_asset_size : float
+        max_asset_size
+    max_leverage : float
+        max_leverage
+    min_asset_size : float
+        min_asset_size
+    min_leverage : float
+        min_leverage
+    mmr_pct : float
+        mmr_pct
+    price_tick_step : int
+        price_tick_step
+    tp_fee_pct : float
+        market or limit fee pct depending on tp_fee_type
+    """
+
+    is_long: bool
+    sl_bcb_min: bool
+    sl_to_be_bool: bool
+    sl_to_zero: bool
+    trailing_sl_strategy_type: int
+    tp_strategy_type: int
+    asset_tick_step: int
+    leverage_tick_step: int
+    market_fee_pct: float
+    max_asset_size: float
+    max_leverage: float
+    min_asset_size: float
+    min_leverage: float
+    mmr_pct: float
+    price_tick_step: int
+    tp_fee_pct: float
+
+
 class OrderResult(NamedTuple):
     average_entry: np.float_ = np.nan
     can_move_sl_to_be: np.bool_ = False
@@ -434,3 +694,16 @@ strat_df_array_dt = np.dtype(
     ],
     align=True,
 )
+
+trace_dt = np.dtype(
+    [
+        ("set_idx", np.int_),
+        ("bar_idx", np.int_),
+        ("event", np.int_),
+        ("value_1", np.float_),
+        ("value_2", np.float_),
+        ("value_3", np.float_),
+        ("value_4", np.float_),
+    ],
+    align=True,
+)
@@ -0,0 +1,236 @@
+import numpy as np
+from logging import getLogger
+from math import gcd, prod
+from typing import NamedTuple, Optional
+from quantfreedom.core.enums import DynamicOrderSettings
+
+logger = getLogger()
+
+
+class ParamConstraint(NamedTuple):
+    left: int
+    op: str
+    right: int
+
+
+ParamConstraintOps = {
+    ">": np.greater,
+    ">=": np.greater_equal,
+    "<": np.less,
+    "<=": np.less_equal,
+    "==": np.equal,
+    "!=": np.not_equal,
+}
+
+
+class ParamSpace:
+    """
+    Summary
+    -------
+    The cartesian product of the dos tuple and the indicator settings tuple without ever building it.
+
+    The columns are the same as the rows of the cart prod array from Strategy.get_ind_set_dos_cart_product, so column 11 is the settings index and the indicator settings start at column 12.
+
+    Columns that are tied together by constraints are grouped and only the combinations of each group that pass the constraints are kept. Every other column is its own group. A flat settings index is then decoded with the number of valid combinations of each group as the radix, first group changing the slowest, which is the same order the filtered cart prod array has as long as the columns of a group are next to each other.
+    """
+
+    def __init__(
+        self,
+        dos_tuple: DynamicOrderSettings,
+        ind_set_tuple: NamedTuple,
+        constraints: list[ParamConstraint] = [],
+    ):
+        """
+        Parameters
+        ----------
+        dos_tuple : DynamicOrderSettings
+            dynamic order settings with the values you want to test for each field
+        ind_set_tuple : NamedTuple
+            indicator settings with the values you want to test for each field
+        constraints : list[ParamConstraint], []
+            column left op column right has to be true for a combination to be kept
+        """
+        self.dos_fields = DynamicOrderSettings._fields
+        self.ind_set_fields = ind_set_tuple._fields
+        self.param_values = [np.asarray(array, dtype=np.float_) for array in dos_tuple + ind_set_tuple]
+        self.constraints = list(constraints)
+
+        for constraint in self.constraints:
+            if constraint.op not in ParamConstraintOps:
+                raise Exception(f"{', '.join(ParamConstraintOps)} are the only options for constraint op")
+
+        self.total_dos = prod(array.size for array in self.param_values[:12])
+        self.total_indicator_settings = prod(array.size for array in self.param_values[12:])
+        self.total_settings = self.total_dos * self.total_indicator_settings
+
+        self.__set_groups()
+
+        self.total_filtered_settings = prod(combos.shape[0] for combos in self.group_combos)
+        self.total_filtered_dos = prod(self.get_param_unique_values(col=col).size for col in range(12))
+
+        self.shuffle_mult = 1
+        self.shuffle_inverse_mult = 1
+        self.shuffle_add = 0
+
+        logger.debug(f"Total settings: {self.total_settings:,}")
+        logger.debug(f"Total filtered settings: {self.total_filtered_settings:,}")
+
+    def __set_groups(
+        self,
+    ):
+        total_cols = len(self.param_values)
+        parents = list(range(total_cols))
+
+        def find(col: int) -> int:
+            while parents[col] != col:
+                col = parents[col]
+            return col
+
+        for constraint in self.constraints:
+            parents[find(constraint.right)] = find(constraint.left)
+
+        groups = {}
+        for col in range(total_cols):
+            groups.setdefault(find(col), []).append(col)
+
+        self.group_cols = []
+        self.group_combos = []
+        for cols in sorted(groups.values()):
+            radixes = tuple(self.param_values[col].size for col in cols)
+            combos = np.indices(radixes).reshape(len(cols), -1).T
+
+            if len(cols) > 1:
+                keep = np.full(combos.shape[0], True)
+                for constraint in self.constraints:
+                    if constraint.left in cols:
+                        left = self.param_values[constraint.left][combos[:, cols.index(constraint.left)]]
+                        right = self.param_values[constraint.right][combos[:, cols.index(constraint.right)]]
+                        keep &= ParamConstraintOps[constraint.op](left, right)
+                combos = combos[keep]
+                logger.debug(f"columns {cols} kept {combos.shape[0]:,} of {keep.size:,} combinations")
+
+            self.group_cols.append(cols)
+            self.group_combos.append(combos)
+
+    def get_param_unique_values(
+        self,
+        col: int,
+    ) -> np.ndarray:
+        """
+        Values of a column that are part of at least one combination that passes the constraints
+        """
+        for cols, combos in zip(self.group_cols, self.group_combos):
+            if col in cols:
+                return np.unique(self.param_values[col][combos[:, cols.index(col)]])
+
+    def shuffle(
+        self,
+        seed: Optional[int] = None,
+    ):
+        """
+        Summary
+        -------
+        Shuffles the order settings get decoded in with settings_index = (mult * position + add) % total_filtered_settings
+
+        Not as random as a real permutation but it spreads the settings out without having to store one index per setting
+        """
+        n = self.total_filtered_settings
+        if n < 3:
+            return
+        rng = np.random.default_rng(seed)
+        max_mult = max(2, min(n, 2**62 // n))
+        mult = int(rng.integers(1, max_mult))
+        while gcd(mult, n) != 1:
+            mult = int(rng.integers(1, max_mult))
+        self.shuffle_mult = mult
+        self.shuffle_inverse_mult = pow(mult, -1, n)
+        self.shuffle_add = int(rng.integers(0, n))
+        logger.debug(f"shuffle mult= {self.shuffle_mult} add= {self.shuffle_add}")
+
+    def get_settings_indexes(
+        self,
+        positions: np.ndarray,
+    ) -> np.ndarray:
+        """
+        Filtered settings index of each position after the shuffle
+        """
+        positions = np.asarray(positions, dtype=np.int_)
+        if self.shuffle_mult == 1 and self.shuffle_add == 0:
+            return positions
+        return (positions * self.shuffle_mult + self.shuffle_add) % self.total_filtered_settings
+
+    def get_position(
+        self,
+        settings_index: int,
+    ) -> int:
+        """
+        Position a filtered settings index gets decoded at, the inverse of get_settings_indexes
+        """
+        if settings_index < 0 or settings_index >= self.total_filtered_settings:
+            raise Exception(f"settings index has to be between 0 and {self.total_filtered_settings - 1}")
+        if self.shuffle_mult == 1 and self.shuffle_add == 0:
+            return settings_index
+        return (settings_index - self.shuffle_add) * self.shuffle_inverse_mult % self.total_filtered_settings
+
+    def get_positions(
+        self,
+        settings_indexes: np.ndarray,
+    ) -> np.ndarray:
+        """
+        Same as get_position for every settings index in settings_indexes
+        """
+        settings_indexes = np.asarray(settings_indexes, dtype=np.int_)
+        if settings_indexes.size and (
+            settings_indexes.min() < 0 or settings_indexes.max() >= self.total_filtered_settings
+        ):
+            raise Exception(f"settings index has to be between 0 and {self.total_filtered_settings - 1}")
+        if self.shuffle_mult == 1 and self.shuffle_add == 0:
+            return settings_indexes
+        if self.total_filtered_settings**2 < 2**63:
+            return (settings_indexes - self.shuffle_add) * self.shuffle_inverse_mult % self.total_filtered_settings
+        # the product could overflow int64 so let python ints do it
+        return np.array([self.get_position(settings_index=idx) for idx in settings_indexes.tolist()], dtype=np.int_)
+
+    def decode(
+        self,
+        positions: np.ndarray,
+    ) -> np.ndarray:
+        """
+        Summary
+        -------
+        Decodes positions into the settings combinations they point to
+
+        Parameters
+        ----------
+        positions : np.ndarray
+            positions in the filtered settings
+
+        Returns
+        -------
+        np.ndarray
+            array with the same layout as the cart prod array, one row per column and one column per position, with the settings index in row 11
+        """
+        positions = np.asarray(positions, dtype=np.int_)
+        if positions.size and (positions.min() < 0 or positions.max() >= self.total_filtered_settings):
+            raise Exception(f"positions have to be between 0 and {self.total_filtered_settings - 1}")
+        settings_indexes = self.get_settings_indexes(positions=positions)
+
+        cart_prod_array = np.empty((len(self.param_values), settings_indexes.size))
+        remainder = settings_indexes.copy()
+        for cols, combos in zip(reversed(self.group_cols), reversed(self.group_combos)):
+            remainder, combo_idx = np.divmod(remainder, combos.shape[0])
+            for i, col in enumerate(cols):
+                cart_prod_array[col] = self.param_values[col][combos[combo_idx, i]]
+
+        cart_prod_array[11] = settings_indexes
+        return cart_prod_array
+
+    def decode_range(
+        self,
+        range_start: int,
+        range_end: int,
+    ) -> np.ndarray:
+        """
+        Same as decode for every position from range_start up to range_end
+        """
+        return self.decode(positions=np.arange(range_start, range_end))
@@ -0,0 +1,179 @@
+import numpy as np
+from logging import getLogger
+from quantfreedom.core.strategy import Strategy
+
+logger = getLogger()
+
+
+class SearchSpace:
+    """
+    Summary
+    -------
+    Every settings column of a strategy as an axis of its sorted unique values, so a setting can be written as one value index per axis and searches can move along the axes.
+
+    Only the settings the strategy has are part of the space, so whatever get_filter_cart_prod_array or the param space constraints threw out can't be picked. get_settings_indexes gives -1 for value indexes that aren't a setting.
+
+    The axes are the columns of the cart prod array without the settings index column 11, in the same order. The values are the ones in og_dos_tuple and og_ind_set_tuple, or the param space values in lazy mode.
+    """
+
+    def __init__(
+        self,
+        strategy: Strategy,
+    ):
+        """
+        Parameters
+        ----------
+        strategy : Strategy
+            strategy with its og tuples or param space already set
+        """
+        self.param_space = strategy.param_space
+        self.total_settings = strategy.total_filtered_settings
+
+        if self.param_space is None:
+            settings_array = strategy.get_og_settings_array()
+            self.axis_cols = [col for col in range(settings_array.shape[1]) if col != 11]
+            self.axis_values = []
+            value_indexes = np.empty((settings_array.shape[0], len(self.axis_cols)), dtype=np.int_)
+            for axis, col in enumerate(self.axis_cols):
+                unique_values, value_indexes[:, axis] = np.unique(settings_array[:, col], return_inverse=True)
+                self.axis_values.append(unique_values)
+            self.axis_sizes = tuple(values.size for values in self.axis_values)
+
+            self.settings_indexes = settings_array[:, 11].astype(np.int_)
+            codes = np.ravel_multi_index(value_indexes.T, self.axis_sizes)
+            self.code_sorter = np.argsort(codes, kind="stable")
+            self.sorted_codes = codes[self.code_sorter]
+            self.setting_rows = np.full(self.settings_indexes.max() + 1 if self.settings_indexes.size else 0, -1)
+            self.setting_rows[self.settings_indexes] = np.arange(self.settings_indexes.size)
+            self.codes = codes
+        else:
+            self.axis_cols = [col for col in range(len(self.param_space.param_values)) if col != 11]
+            self.axis_values = [np.unique(self.param_space.param_values[col]) for col in self.axis_cols]
+            self.axis_sizes = tuple(values.size for values in self.axis_values)
+            self.__set_group_codes()
+
+        logger.debug(f"Search space axis sizes {self.axis_sizes}")
+
+    def __set_group_codes(
+        self,
+    ):
+        """
+        Axis value index codes of the combinations each param space group kept, sorted so they can be searched
+        """
+        self.group_axes = []
+        self.group_sorted_codes = []
+        self.group_code_combos = []
+        for cols, combos in zip(self.param_space.group_cols, self.param_space.group_combos):
+            if 11 in cols:
+                # the settings index column isn't an axis so only its first combination can be reached
+                self.group_axes.append(None)
+                self.group_sorted_codes.append(None)
+                self.group_code_combos.append(None)
+                continue
+            axes = [self.axis_cols.index(col) for col in cols]
+            axis_combos = np.column_stack(
+                [
+                    np.searchsorted(self.axis_values[axis], self.param_space.param_values[col][combos[:, i]])
+                    for i, (axis, col) in enumerate(zip(axes, cols))
+                ]
+            )
+            codes = np.ravel_multi_index(axis_combos.T, tuple(self.axis_sizes[axis] for axis in axes))
+            codes, combo_idxs = np.unique(codes, return_index=True)
+            self.group_axes.append(axes)
+            self.group_sorted_codes.append(codes)
+            self.group_code_combos.append(combo_idxs)
+
+    def get_settings_indexes(
+        self,
+        value_indexes: np.ndarray,
+    ) -> np.ndarray:
+        """
+        Summary
+        -------
+        Settings index of every row of value indexes
+
+        Parameters
+        ----------
+        value_indexes : np.ndarray
+            one row per setting and one column per axis
+
+        Returns
+        -------
+        np.ndarray
+            settings indexes, -1 where the values aren't a setting of the strategy
+        """
+        value_indexes = np.asarray(value_indexes, dtype=np.int_).reshape(-1, len(self.axis_sizes))
+
+        if self.param_space is None:
+            codes = np.ravel_multi_index(value_indexes.T, self.axis_sizes)
+            found_at = np.minimum(np.searchsorted(self.sorted_codes, codes), self.sorted_codes.size - 1)
+            found = self.sorted_codes[found_at] == codes
+            return np.where(found, self.settings_indexes[self.code_sorter[found_at]], -1)
+
+        settings_indexes = np.zeros(value_indexes.shape[0], dtype=np.int_)
+        found = np.full(value_indexes.shape[0], True)
+        for axes, sorted_codes, code_combos, combos in zip(
+            self.group_axes,
+            self.group_sorted_codes,
+            self.group_code_combos,
+            self.param_space.group_combos,
+        ):
+            if axes is None:
+                combo_idxs = 0
+            else:
+                codes = np.ravel_multi_index(
+                    value_indexes[:, axes].T,
+                    tuple(self.axis_sizes[axis] for axis in axes),
+                )
+                found_at = np.minimum(np.searchsorted(sorted_codes, codes), sorted_codes.size - 1)
+                found &= sorted_codes[found_at] == codes
+                combo_idxs = code_combos[found_at]
+            settings_indexes = settings_indexes * combos.shape[0] + combo_idxs
+        return np.where(found, settings_indexes, -1)
+
+    def get_value_indexes(
+        self,
+        settings_indexes: np.ndarray,
+    ) -> np.ndarray:
+        """
+        Summary
+        -------
+        Value indexes of every settings index, the inverse of get_settings_indexes
+
+        Parameters
+        ----------
+        settings_indexes : np.ndarray
+            settings indexes of the strategy
+
+        Returns
+        -------
+        np.ndarray
+            one row per setting and one column per axis
+        """
+        settings_indexes = np.asarray(settings_indexes, dtype=np.int_)
+
+        if self.param_space is None:
+            rows = self.setting_rows[settings_indexes]
+            if (rows == -1).any():
+                raise Exception("settings indexes have to be settings of the strategy")
+            return np.column_stack(np.unravel_index(self.codes[rows], self.axis_sizes)).reshape(-1, len(self.axis_sizes))
+
+        cart_prod_array = self.param_space.decode(
+            positions=self.param_space.get_positions(settings_indexes=settings_indexes),
+        )
+        return np.column_stack(
+            [np.searchsorted(self.axis_values[axis], cart_prod_array[col]) for axis, col in enumerate(self.axis_cols)]
+        ).reshape(-1, len(self.axis_sizes))
+
+    def get_random_settings_indexes(
+        self,
+        rng: np.random.Generator,
+        size: int,
+    ) -> np.ndarray:
+        """
+        Settings indexes picked uniformly from every setting of the strategy, can have repeats
+        """
+        positions = rng.integers(0, self.total_settings, size=size)
+        if self.param_space is None:
+            return self.settings_indexes[positions]
+        return self.param_space.get_settings_indexes(positions=positions)
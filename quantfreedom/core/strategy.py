@@ -1,3 +1,4 @@
+from itertools import product
 from typing import NamedTuple, Optional, Callable
 import numpy as np
 from logging import getLogger
@@ -6,9 +7,13 @@ from quantfreedom.core.enums import (
     DynamicOrderSettings,
     ExchangeSettings,
     FootprintCandlesTuple,
+    IndicatorBank,
+    ProfilePhase,
     StaticOrderSettings,
     CandleBodyType,
 )
+from quantfreedom.core.param_space import ParamConstraint, ParamSpace
+from quantfreedom.helpers import phase_profiler
 
 logger = getLogger()
 
@@ -32,6 +37,18 @@ class Strategy:
     total_dos: int = 1
     cur_ind_set_tuple: IndicatorSettings
     og_ind_set_tuple: IndicatorSettings
+    param_space: Optional[ParamSpace] = None
+    og_range_start: int = 0
+    og_settings_array: Optional[np.ndarray] = None
+    og_settings_array_key: Optional[tuple] = None
+    settings_index_lookup: Optional[np.ndarray] = None
+    settings_index_lookup_key: Optional[np.ndarray] = None
+    indicator_bank_fields: tuple = ()
+    indicator_bank: Optional[IndicatorBank] = None
+    indicator_bank_lookup: Optional[dict] = None
+    og_positions: Optional[np.ndarray] = None
+    og_positions_lookup: Optional[np.ndarray] = None
+    og_positions_lookup_key: Optional[np.ndarray] = None
 
     def get_ind_set_dos_cart_product(
         self,
@@ -122,32 +139,383 @@ class Strategy:
 
         return og_dos_tuple
 
+    def get_param_space_constraints(
+        self,
+        dos_tuple: DynamicOrderSettings,
+        ind_set_tuple: IndicatorSettings,
+    ) -> list[ParamConstraint]:
+        """
+        Summary
+        -------
+        Constraints the param space uses in place of filtering the cart prod array, override it and add to the list if your strategy filters indicator settings
+
+        Returns
+        -------
+        list[ParamConstraint]
+            trail_sl_when_pct has to be greater than trail_sl_by_pct if the trailing stop loss is used
+        """
+        constraints = []
+
+        col_trail_sl_by_pct = 9
+        col_trail_sl_when_pct = 10
+
+        if (np.asarray(dos_tuple.trail_sl_bcb_type) != CandleBodyType.Nothing).any():
+            constraints.append(ParamConstraint(left=col_trail_sl_when_pct, op=">", right=col_trail_sl_by_pct))
+
+        return constraints
+
+    def set_og_param_space(
+        self,
+        og_dos_tuple: DynamicOrderSettings,
+        og_ind_set_tuple: IndicatorSettings,
+        shuffle_bool: bool,
+    ) -> None:
+        """
+        Summary
+        -------
+        Lazy version of set_og_ind_and_dos_tuples. The settings combinations are counted from the constraints and only get decoded when a backtest asks for a range of them with set_og_tuples_from_param_space
+
+        Your strategy needs get_og_ind_set_tuple for this to work
+        """
+        self.param_space = ParamSpace(
+            dos_tuple=og_dos_tuple,
+            ind_set_tuple=og_ind_set_tuple,
+            constraints=self.get_param_space_constraints(
+                dos_tuple=og_dos_tuple,
+                ind_set_tuple=og_ind_set_tuple,
+            ),
+        )
+        if shuffle_bool:
+            self.param_space.shuffle()
+
+        self.total_dos = self.param_space.total_filtered_dos
+        self.total_indicator_settings = self.param_space.total_indicator_settings
+        self.total_filtered_settings = self.param_space.total_filtered_settings
+
+        self.set_og_tuples_from_param_space(range_start=0, range_end=0)
+        logger.debug("set_og_param_space")
+
+    def set_og_tuples_from_param_space(
+        self,
+        range_start: int,
+        range_end: int,
+    ) -> None:
+        """
+        Summary
+        -------
+        Decodes the settings from range_start up to range_end into og_dos_tuple and og_ind_set_tuple, after this set_idx 0 is the setting at range_start
+
+        If set_og_order was used the range is a range of og_positions instead of the param space positions
+        """
+        self.og_range_start = range_start
+        if self.og_positions is None:
+            final_cart_prod_array = self.param_space.decode_range(
+                range_start=range_start,
+                range_end=range_end,
+            )
+        else:
+            final_cart_prod_array = self.param_space.decode(
+                positions=self.og_positions[range_start:range_end],
+            )
+        self.og_dos_tuple = self.get_og_dos_tuple(
+            final_cart_prod_array=final_cart_prod_array,
+        )
+        self.og_ind_set_tuple = self.get_og_ind_set_tuple(
+            final_cart_prod_array=final_cart_prod_array,
+        )
+
     def get_settings_index(
         self,
         set_idx: int,
     ) -> int:
-        indexes = self.og_dos_tuple.settings_index == set_idx
-        new_set_idx = np.where(indexes)[0][0]
-        return new_set_idx
+        """
+        Summary
+        -------
+        Position of a settings index in og_dos_tuple. The inverse permutation of og_dos_tuple.settings_index is built the first time and every time og_dos_tuple changes so shuffled settings are O(1) too
+
+        In lazy mode with og_positions the inverse of og_positions is built the same way, every time og_positions changes
+
+        Parameters
+        ----------
+        set_idx : int
+            settings index, the same one you see in the backtest df
+
+        Returns
+        -------
+        int
+            position in og_dos_tuple and og_ind_set_tuple which is what set_cur_dos_tuple and set_cur_ind_set_tuple take
+        """
+        if self.param_space is not None:
+            position = self.param_space.get_position(settings_index=set_idx)
+            if self.og_positions is None:
+                return position - self.og_range_start
+            og_positions = self.og_positions
+            if self.og_positions_lookup_key is not og_positions:
+                self.og_positions_lookup = np.full(og_positions.max() + 1 if og_positions.size else 0, -1, dtype=np.int_)
+                self.og_positions_lookup[og_positions] = np.arange(og_positions.size)
+                self.og_positions_lookup_key = og_positions
+
+            og_idx = self.og_positions_lookup[position] if position < self.og_positions_lookup.size else -1
+            og_idx -= self.og_range_start
+            if og_idx < 0 or og_idx >= self.og_dos_tuple.settings_index.size:
+                raise Exception(f"settings index {set_idx} is not in og_dos_tuple")
+            return int(og_idx)
+
+        settings_index = self.og_dos_tuple.settings_index
+        if self.settings_index_lookup_key is not settings_index:
+            self.settings_index_lookup = np.full(settings_index.max() + 1 if settings_index.size else 0, -1, dtype=np.int_)
+            self.settings_index_lookup[settings_index] = np.arange(settings_index.size)
+            self.settings_index_lookup_key = settings_index
+
+        if set_idx < 0 or set_idx >= self.settings_index_lookup.size or self.settings_index_lookup[set_idx] == -1:
+            raise Exception(f"settings index {set_idx} is not in og_dos_tuple")
+        return int(self.settings_index_lookup[set_idx])
+
+    def get_og_settings_array(
+        self,
+    ) -> np.ndarray:
+        """
+        Summary
+        -------
+        og_dos_tuple and og_ind_set_tuple stacked into one array with a row per setting and the fields in the same order as the backtest df, built again only when one of the og tuples changes
+
+        Returns
+        -------
+        np.ndarray
+            og settings array
+        """
+        key = self.og_settings_array_key
+        if key is None or key[0] is not self.og_dos_tuple or key[1] is not self.og_ind_set_tuple:
+            self.og_settings_array = np.column_stack(self.og_dos_tuple + self.og_ind_set_tuple).astype(np.float_)
+            self.og_settings_array_key = (self.og_dos_tuple, self.og_ind_set_tuple)
+        return self.og_settings_array
+
+    def get_cur_settings_views(
+        self,
+        set_idx: int,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Summary
+        -------
+        Cheap alternative to set_cur_dos_tuple and set_cur_ind_set_tuple when you only need the values
+
+        Parameters
+        ----------
+        set_idx : int
+            position in og_dos_tuple and og_ind_set_tuple
+
+        Returns
+        -------
+        tuple[np.ndarray, np.ndarray]
+            views of the dos values and the indicator settings values of the setting in the og settings array
+        """
+        settings_row = self.get_og_settings_array()[set_idx]
+        total_dos_fields = len(self.og_dos_tuple._fields)
+        return settings_row[:total_dos_fields], settings_row[total_dos_fields:]
+
+    def get_indicator_group_ids(
+        self,
+    ) -> np.ndarray:
+        """
+        Summary
+        -------
+        Gives every setting the id of its indicator settings so settings with the same indicator settings have the same id. In lazy mode the param space gets decoded a chunk at a time
+
+        Returns
+        -------
+        np.ndarray
+            group id of every setting in og_ind_set_tuple order or og_positions order in lazy mode, param space position order if there are no og_positions
+        """
+        if self.param_space is None:
+            ind_settings = np.column_stack(self.og_ind_set_tuple).astype(np.float_)
+            return np.unique(ind_settings, axis=0, return_inverse=True)[1].reshape(-1)
+
+        group_ids = np.empty(self.total_filtered_settings, dtype=np.int_)
+        groups = {}
+        chunk_size = 1_000_000
+        for range_start in range(0, self.total_filtered_settings, chunk_size):
+            range_end = min(range_start + chunk_size, self.total_filtered_settings)
+            if self.og_positions is None:
+                positions = np.arange(range_start, range_end)
+            else:
+                positions = self.og_positions[range_start:range_end]
+            ind_settings = self.param_space.decode(positions=positions)[12:].T
+            unique_settings, inverse = np.unique(ind_settings, axis=0, return_inverse=True)
+            unique_ids = np.array(
+                [groups.setdefault(tuple(settings), len(groups)) for settings in unique_settings.tolist()],
+                dtype=np.int_,
+            )
+            group_ids[range_start:range_end] = unique_ids[inverse.reshape(-1)]
+        return group_ids
+
+    def set_og_order(
+        self,
+        og_order: np.ndarray,
+    ) -> None:
+        """
+        Summary
+        -------
+        Reorders the settings so backtests go through them in og_order, the setting at position og_order[i] moves to position i. The settings index moves with the setting so the results stay the same
+
+        In lazy mode the order is kept in og_positions and used by set_og_tuples_from_param_space
+
+        Parameters
+        ----------
+        og_order : np.ndarray
+            new order of the current positions
+        """
+        if self.param_space is None:
+            self.og_dos_tuple = DynamicOrderSettings(*[field[og_order] for field in self.og_dos_tuple])
+            self.og_ind_set_tuple = type(self.og_ind_set_tuple)(*[field[og_order] for field in self.og_ind_set_tuple])
+        elif self.og_positions is None:
+            self.og_positions = np.asarray(og_order, dtype=np.int_)
+        else:
+            self.og_positions = self.og_positions[og_order]
+
+    def set_og_settings_subset(
+        self,
+        settings_indexes: np.ndarray,
+    ) -> None:
+        """
+        Summary
+        -------
+        Only keeps the settings with these settings indexes, in the same order, so a backtest only goes through them. The settings indexes stay the same so the results can be matched with the results of the full settings
+
+        Parameters
+        ----------
+        settings_indexes : np.ndarray
+            settings indexes to keep, the same ones you see in the backtest df
+        """
+        settings_indexes = np.asarray(settings_indexes, dtype=np.int_)
+        if self.param_space is None:
+            self.set_og_order(
+                og_order=np.array([self.get_settings_index(set_idx=idx) for idx in settings_indexes.tolist()], dtype=np.int_)
+            )
+        else:
+            self.og_positions = self.param_space.get_positions(settings_indexes=settings_indexes)
+            self.set_og_tuples_from_param_space(range_start=0, range_end=0)
+        self.total_filtered_settings = settings_indexes.size
+
+    def get_indicator_bank_params(
+        self,
+    ) -> np.ndarray:
+        """
+        Summary
+        -------
+        Every unique combination of the indicator_bank_fields values, from the param space if there is one or else from og_ind_set_tuple
+
+        Returns
+        -------
+        np.ndarray
+            one row per unique combination and one column per field in indicator_bank_fields
+        """
+        if self.param_space is not None:
+            unique_values = [
+                self.param_space.get_param_unique_values(col=12 + self.param_space.ind_set_fields.index(field))
+                for field in self.indicator_bank_fields
+            ]
+            return np.array(list(product(*unique_values)), dtype=np.float_).reshape(-1, len(unique_values))
+
+        bank_params = np.column_stack(
+            [getattr(self.og_ind_set_tuple, field) for field in self.indicator_bank_fields]
+        ).astype(np.float_)
+        return np.unique(bank_params, axis=0)
+
+    def set_indicator_bank(
+        self,
+        candles: FootprintCandlesTuple,
+    ) -> None:
+        """
+        Summary
+        -------
+        Computes the indicator once for every unique combination of the indicator_bank_fields with calc_indicator_bank_values so set_entries_exits_array can read it with get_bank_indicator instead of computing it for every setting
+
+        Does nothing if your strategy doesn't set indicator_bank_fields
+
+        Parameters
+        ----------
+        candles : FootprintCandlesTuple
+            candles
+        """
+        if not self.indicator_bank_fields:
+            return
+
+        profiler = phase_profiler.profiler
+        bank_params = self.get_indicator_bank_params()
+        bank_values = np.empty((bank_params.shape[0], candles.candle_close_prices.size))
+        for row, params in enumerate(bank_params.tolist()):
+            if profiler is not None:
+                profiler.start(ProfilePhase.Indicators)
+            bank_values[row] = self.calc_indicator_bank_values(
+                candles=candles,
+                bank_params=tuple(params),
+            )
+            if profiler is not None:
+                profiler.stop()
+
+        self.indicator_bank = IndicatorBank(
+            bank_params=bank_params,
+            bank_values=bank_values,
+        )
+        self.indicator_bank_lookup = None
+        logger.debug(f"Indicator bank computed {bank_params.shape[0]:,} unique indicators")
+
+    def get_bank_indicator(
+        self,
+    ) -> Optional[np.ndarray]:
+        """
+        Summary
+        -------
+        Indicator values for the indicator_bank_fields of cur_ind_set_tuple, the row lookup is built the first time it is needed so it also works on a bank attached from shared memory
+
+        Returns
+        -------
+        Optional[np.ndarray]
+            read only view of the bank row, don't change it in place, or None if there is no bank or the settings aren't in it
+        """
+        if self.indicator_bank is None:
+            return None
+
+        profiler = phase_profiler.profiler
+        if profiler is not None:
+            profiler.start(ProfilePhase.Indicators)
+        if self.indicator_bank_lookup is None:
+            self.indicator_bank_lookup = {
+                tuple(params): row for row, params in enumerate(self.indicator_bank.bank_params.tolist())
+            }
+
+        row = self.indicator_bank_lookup.get(
+            tuple(float(getattr(self.cur_ind_set_tuple, field)) for field in self.indicator_bank_fields)
+        )
+        if profiler is not None:
+            profiler.stop()
+        if row is None:
+            return None
+        return self.indicator_bank.bank_values[row]
 
     def set_cur_dos_tuple(
         self,
         set_idx: int,
     ):
-        new_set_idx = self.get_settings_index(set_idx)
+        """
+        Parameters
+        ----------
+        set_idx : int
+            position in og_dos_tuple, use get_settings_index if you have a settings index
+        """
         self.cur_dos_tuple = DynamicOrderSettings(
-            settings_index=self.og_dos_tuple.settings_index[new_set_idx],
-            account_pct_risk_per_trade=self.og_dos_tuple.account_pct_risk_per_trade[new_set_idx],
-            max_trades=self.og_dos_tuple.max_trades[new_set_idx],
-            risk_reward=self.og_dos_tuple.risk_reward[new_set_idx],
-            sl_based_on_add_pct=self.og_dos_tuple.sl_based_on_add_pct[new_set_idx],
-            sl_based_on_lookback=self.og_dos_tuple.sl_based_on_lookback[new_set_idx],
-            sl_bcb_type=self.og_dos_tuple.sl_bcb_type[new_set_idx],
-            sl_to_be_cb_type=self.og_dos_tuple.sl_to_be_cb_type[new_set_idx],
-            sl_to_be_when_pct=self.og_dos_tuple.sl_to_be_when_pct[new_set_idx],
-            trail_sl_bcb_type=self.og_dos_tuple.trail_sl_bcb_type[new_set_idx],
-            trail_sl_by_pct=self.og_dos_tuple.trail_sl_by_pct[new_set_idx],
-            trail_sl_when_pct=self.og_dos_tuple.trail_sl_when_pct[new_set_idx],
+            settings_index=self.og_dos_tuple.settings_index[set_idx],
+            account_pct_risk_per_trade=self.og_dos_tuple.account_pct_risk_per_trade[set_idx],
+            max_trades=self.og_dos_tuple.max_trades[set_idx],
+            risk_reward=self.og_dos_tuple.risk_reward[set_idx],
+            sl_based_on_add_pct=self.og_dos_tuple.sl_based_on_add_pct[set_idx],
+            sl_based_on_lookback=self.og_dos_tuple.sl_based_on_lookback[set_idx],
+            sl_bcb_type=self.og_dos_tuple.sl_bcb_type[set_idx],
+            sl_to_be_cb_type=self.og_dos_tuple.sl_to_be_cb_type[set_idx],
+            sl_to_be_when_pct=self.og_dos_tuple.sl_to_be_when_pct[set_idx],
+            trail_sl_bcb_type=self.og_dos_tuple.trail_sl_bcb_type[set_idx],
+            trail_sl_by_pct=self.og_dos_tuple.trail_sl_by_pct[set_idx],
+            trail_sl_when_pct=self.og_dos_tuple.trail_sl_when_pct[set_idx],
         )
 
         logger.info(
@@ -226,6 +594,13 @@ trail_sl_when_pct={round(self.cur_dos_tuple.trail_sl_when_pct * 100, 2)}
     ):
         pass
 
+    def calc_indicator_bank_values(
+        self,
+        candles: FootprintCandlesTuple,
+        bank_params: tuple,
+    ) -> np.ndarray:
+        pass
+
     def set_live_bt_entries_exits_array(
         self,
         candles: FootprintCandlesTuple,
@@ -0,0 +1,265 @@
+import json
+import numpy as np
+from hashlib import sha256
+from logging import getLogger
+from os import listdir, makedirs, remove, replace
+from os.path import exists, join
+from time import perf_counter
+from typing import Optional
+from quantfreedom.core.enums import FootprintCandlesTuple
+from quantfreedom.core.strategy import Strategy
+from quantfreedom.helpers.result_sink import ResultMetricNames, get_top_k_rows
+
+logger = getLogger()
+
+
+def update_backtest_hash(
+    backtest_hash,
+    value,
+):
+    """
+    Feeds a value into the hash, arrays by their dtype, shape and bytes and everything else by its repr
+    """
+    if isinstance(value, np.ndarray):
+        backtest_hash.update(f"{value.dtype}{value.shape}".encode())
+        backtest_hash.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, tuple):
+        backtest_hash.update(f"{type(value).__name__}{getattr(value, '_fields', len(value))}".encode())
+        for field in value:
+            update_backtest_hash(backtest_hash=backtest_hash, value=field)
+    elif isinstance(value, list):
+        backtest_hash.update(f"list{len(value)}".encode())
+        for field in value:
+            update_backtest_hash(backtest_hash=backtest_hash, value=field)
+    else:
+        backtest_hash.update(repr(value).encode())
+
+
+def get_backtest_key(
+    candles: FootprintCandlesTuple,
+    strategy: Strategy,
+    run_settings: tuple,
+) -> str:
+    """
+    Summary
+    -------
+    Hash of the candles, the strategy settings and the run settings that change which rows a backtest gives back
+
+    The strategy part is the class name, long or short, the static order, exchange and backtest settings and either the og tuples or the param space with its shuffle and og_positions. Changes to the code of the strategy don't change the key so use a new checkpoint_path if you change how the entries are made
+
+    Parameters
+    ----------
+    candles : FootprintCandlesTuple
+        candles
+    strategy : Strategy
+        strategy before it gets reordered for the indicator partition
+    run_settings : tuple
+        step_by, partition, top_k and whatever else changes the rows
+
+    Returns
+    -------
+    str
+        hex key
+    """
+    backtest_hash = sha256()
+    # checkpoints made with other result columns can't be mixed in with these rows
+    update_backtest_hash(backtest_hash=backtest_hash, value=ResultMetricNames)
+    update_backtest_hash(backtest_hash=backtest_hash, value=tuple(candles))
+    update_backtest_hash(
+        backtest_hash=backtest_hash,
+        value=(
+            type(strategy).__qualname__,
+            strategy.long_short,
+            strategy.static_os_tuple,
+            strategy.exchange_settings_tuple,
+            strategy.backtest_settings_tuple,
+            strategy.total_filtered_settings,
+        ),
+    )
+    param_space = strategy.param_space
+    if param_space is None:
+        update_backtest_hash(backtest_hash=backtest_hash, value=(strategy.og_dos_tuple, strategy.og_ind_set_tuple))
+    else:
+        update_backtest_hash(
+            backtest_hash=backtest_hash,
+            value=(
+                param_space.param_values,
+                param_space.group_cols,
+                param_space.group_combos,
+                param_space.shuffle_mult,
+                param_space.shuffle_add,
+                strategy.og_positions,
+            ),
+        )
+    update_backtest_hash(backtest_hash=backtest_hash, value=run_settings)
+    return backtest_hash.hexdigest()
+
+
+def get_ranges_left(
+    task_ranges: list[tuple[int, int]],
+    done_ranges: list[tuple[int, int]],
+    step_by: int,
+) -> list[tuple[int, int]]:
+    """
+    Summary
+    -------
+    Cuts the done ranges out of the task ranges. The pieces that are left start on the same step_by steps the task range had so they backtest the same settings
+
+    Returns
+    -------
+    list[tuple[int, int]]
+        ranges that still have settings to backtest, in the order of task_ranges
+    """
+    ranges_left = []
+    for range_start, range_end in task_ranges:
+        pieces = [(range_start, range_end)]
+        for done_start, done_end in done_ranges:
+            new_pieces = []
+            for piece_start, piece_end in pieces:
+                if done_end <= piece_start or done_start >= piece_end:
+                    new_pieces.append((piece_start, piece_end))
+                    continue
+                if done_start > piece_start:
+                    new_pieces.append((piece_start, done_start))
+                if done_end < piece_end:
+                    # next setting on the step_by steps of the task range
+                    new_pieces.append((range_start + -(-(done_end - range_start) // step_by) * step_by, piece_end))
+            pieces = new_pieces
+        ranges_left += [piece for piece in pieces if len(range(piece[0], piece[1], step_by))]
+    return ranges_left
+
+
+class BacktestCheckpoint:
+    def __init__(
+        self,
+        backtest_key: str,
+        checkpoint_path: str,
+        num_array_columns: int,
+        resume: bool,
+        checkpoint_interval: float = 60.0,
+        top_k: Optional[int] = None,
+        top_k_column: Optional[int] = None,
+    ):
+        """
+        Summary
+        -------
+        Saves the settings ranges that are done and their result rows to a folder named after the backtest key in checkpoint_path every checkpoint_interval seconds, so a backtest that gets killed can pick up where it was
+
+        The rows go in rows_000000.npy files and the done ranges, the row files and the prune counts go in checkpoint.json, which gets replaced in one go after the rows are saved so a crash in the middle of a save never leaves ranges marked done without their rows
+
+        Parameters
+        ----------
+        backtest_key : str
+            from get_backtest_key
+        checkpoint_path : str
+            folder for the checkpoints, gets created if it doesn't exist
+        num_array_columns : int
+            columns of a result row
+        resume : bool
+            True = load the checkpoint of this backtest key if there is one. False = start over and throw away the old checkpoint of this backtest key
+        checkpoint_interval : float, 60.0
+            seconds between saves
+        top_k : Optional[int], None
+            only save the top_k rows of every save
+        top_k_column : Optional[int], None
+            column of the top_k metric
+        """
+        self.backtest_key = backtest_key
+        self.folder_path = join(checkpoint_path, backtest_key[:16])
+        self.json_path = join(self.folder_path, "checkpoint.json")
+        self.num_array_columns = num_array_columns
+        self.checkpoint_interval = checkpoint_interval
+        self.top_k = top_k
+        self.top_k_column = top_k_column
+
+        self.done_ranges = []
+        self.row_files = []
+        self.prune_counts = []
+        self.pending_ranges = []
+        self.pending_rows = []
+        self.last_save_time = perf_counter()
+
+        makedirs(self.folder_path, exist_ok=True)
+        if resume and exists(self.json_path):
+            with open(self.json_path) as f:
+                checkpoint = json.load(f)
+            if checkpoint["backtest_key"] != backtest_key:
+                raise Exception(f"{self.json_path} is the checkpoint of a different backtest")
+            self.done_ranges = [tuple(done_range) for done_range in checkpoint["done_ranges"]]
+            self.row_files = checkpoint["row_files"]
+            self.prune_counts = checkpoint["prune_counts"]
+        else:
+            for file_name in listdir(self.folder_path):
+                remove(join(self.folder_path, file_name))
+        logger.debug(f"checkpoint {self.folder_path} with {len(self.done_ranges)} done ranges")
+
+    def get_done_rows(
+        self,
+    ) -> np.ndarray:
+        """
+        Result rows of the ranges that were done before the resume
+        """
+        if not self.row_files:
+            return np.empty((0, self.num_array_columns))
+        return np.concatenate([np.load(join(self.folder_path, file_name)) for file_name in self.row_files])
+
+    def get_done_prune_counts(
+        self,
+        total_rules: int,
+    ) -> np.ndarray:
+        """
+        Prune counts of the ranges that were done before the resume
+        """
+        if not self.prune_counts:
+            return np.zeros(total_rules, dtype=np.int_)
+        return np.asarray(self.prune_counts, dtype=np.int_)
+
+    def add_done_range(
+        self,
+        range_start: int,
+        range_end: int,
+        record_results: np.ndarray,
+        task_prune_counts: np.ndarray,
+    ):
+        """
+        Keeps a finished task till the next save and saves if checkpoint_interval seconds went by
+        """
+        self.pending_ranges.append((int(range_start), int(range_end)))
+        if record_results.shape[0]:
+            self.pending_rows.append(record_results)
+        self.prune_counts = (self.get_done_prune_counts(total_rules=task_prune_counts.size) + task_prune_counts).tolist()
+        if perf_counter() - self.last_save_time >= self.checkpoint_interval:
+            self.save()
+
+    def save(
+        self,
+    ):
+        """
+        Saves the rows and ranges of every finished task since the last save
+        """
+        if self.pending_rows:
+            rows = np.concatenate(self.pending_rows)
+            if self.top_k is not None:
+                rows = get_top_k_rows(rows=rows, top_k=self.top_k, metric_column=self.top_k_column)
+            file_name = f"rows_{len(self.row_files):06d}.npy"
+            np.save(join(self.folder_path, file_name), rows)
+            self.row_files.append(file_name)
+
+        self.done_ranges += self.pending_ranges
+        temp_path = self.json_path + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump(
+                {
+                    "backtest_key": self.backtest_key,
+                    "done_ranges": self.done_ranges,
+                    "row_files": self.row_files,
+                    "prune_counts": self.prune_counts,
+                },
+                f,
+            )
+        replace(temp_path, self.json_path)
+
+        logger.debug(f"checkpoint saved {len(self.pending_ranges)} ranges")
+        self.pending_ranges = []
+        self.pending_rows = []
+        self.last_save_time = perf_counter()
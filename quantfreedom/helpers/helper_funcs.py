@@ -2,11 +2,12 @@ import numpy as np
 import pandas as pd
 from logging import getLogger
 from datetime import datetime
-from quantfreedom.core.enums import CandleBodyType, FootprintCandlesTuple
+from quantfreedom.core.enums import BacktestSettings, CandleBodyType, FootprintCandlesTuple
 from quantfreedom.core.strategy import Strategy
 from quantfreedom.exchanges.binance_usdm import BinanceUSDM
 from quantfreedom.exchanges.bybit import Bybit
 from quantfreedom.exchanges.mufex import Mufex
+from quantfreedom.helpers.result_sink import ResultMetricNames
 from typing import List, Optional, Union
 
 logger = getLogger()
@@ -142,42 +143,6 @@ def candles_to_df(
     return candles_df
 
 
-def get_qf_score(
-    gains_pct: float,
-    wins_and_losses_array_no_be: np.ndarray,
-):
-    x = np.arange(1, len(wins_and_losses_array_no_be) + 1)
-    y = wins_and_losses_array_no_be.cumsum()
-
-    xm = x.mean()
-    ym = y.mean()
-
-    y_ym = y - ym
-    if (y_ym == 0).all():
-        y_ym = np.array([1.0])
-    y_ym_s = np.power(y_ym, 2)
-
-    x_xm = x - xm
-    if (x_xm == 0).all():
-        x_xm = np.array([1.0])
-    x_xm_s = np.power(x_xm, 2)
-
-    b1 = (x_xm * y_ym).sum() / x_xm_s.sum()
-    b0 = ym - b1 * xm
-
-    y_pred = b0 + b1 * x
-
-    yp_ym = y_pred - ym
-
-    yp_ym_s = np.power(yp_ym, 2)
-
-    qf_score = yp_ym_s.sum() / y_ym_s.sum()
-
-    if gains_pct <= 0:
-        qf_score = -(qf_score)
-    return round(qf_score, 3)
-
-
 def round_size_by_tick_step(
     user_num: float,
     exchange_num: float,
@@ -276,17 +241,7 @@ def make_bt_df(
         return rounded
 
     column_names = (
-        [
-            "total_trades",
-            "wins",
-            "losses",
-            "gains_pct",
-            "win_rate",
-            "qf_score",
-            "fees_paid",
-            "total_pnl",
-            "ending_eq",
-        ]
+        ResultMetricNames
         + list(strategy.og_dos_tuple._fields)
         + list(strategy.og_ind_set_tuple._fields)
     )
@@ -308,6 +263,34 @@ def make_bt_df(
     return backtest_df
 
 
+def filter_bt_df(
+    backtest_df: pd.DataFrame,
+    backtest_settings_tuple: BacktestSettings,
+) -> pd.DataFrame:
+    """
+    Summary
+    -------
+    Only keeps the rows of a backtest df that make it through the backtest settings filters the same way record_strategy_result does, for results that were backtested without them
+
+    Parameters
+    ----------
+    backtest_df : pd.DataFrame
+        backtest df from make_bt_df
+    backtest_settings_tuple : BacktestSettings
+        filters
+
+    Returns
+    -------
+    pd.DataFrame
+        rows that made it through the filters
+    """
+    return backtest_df[
+        (backtest_df["gains_pct"] > backtest_settings_tuple.gains_pct_filter)
+        & (backtest_df["total_trades"] > backtest_settings_tuple.total_trade_filter)
+        & (backtest_df["qf_score"] > backtest_settings_tuple.qf_filter)
+    ]
+
+
 def symbol_bt_df(
     backtest_df: pd.DataFrame,
 ):
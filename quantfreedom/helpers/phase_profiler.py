@@ -0,0 +1,144 @@
+import numpy as np
+from time import perf_counter
+from typing import Optional
+from quantfreedom.core.enums import ProfilePhase
+
+
+class PhaseProfiler:
+    def __init__(
+        self,
+    ):
+        """
+        Summary
+        -------
+        Time and number of calls of every ProfilePhase
+
+        Phases can be inside each other, the time of a phase doesn't have the time of the phases inside it so the times add up to the time that got profiled
+        """
+        self.seconds = np.zeros(len(ProfilePhase))
+        self.calls = np.zeros(len(ProfilePhase), dtype=np.int_)
+        # phase, start time and seconds of the phases inside it
+        self.stack = []
+
+    def start(
+        self,
+        phase: int,
+    ):
+        self.stack.append([phase, perf_counter(), 0.0])
+
+    def stop(
+        self,
+    ):
+        phase, start_time, inner_seconds = self.stack.pop()
+        elapsed = perf_counter() - start_time
+        self.seconds[phase] += elapsed - inner_seconds
+        self.calls[phase] += 1
+        if self.stack:
+            self.stack[-1][2] += elapsed
+
+    def get_phase_stats(
+        self,
+    ) -> np.ndarray:
+        """
+        Summary
+        -------
+        Seconds and calls of every phase so far and starts them over
+
+        Returns
+        -------
+        np.ndarray
+            seconds in row 0 and calls in row 1, one column per ProfilePhase
+        """
+        phase_stats = np.vstack((self.seconds, self.calls))
+        self.seconds = np.zeros(len(ProfilePhase))
+        self.calls = np.zeros(len(ProfilePhase), dtype=np.int_)
+        return phase_stats
+
+
+# None = profiling is off, everything that profiles checks this before it times anything
+profiler: Optional[PhaseProfiler] = None
+
+
+def start_profiler() -> PhaseProfiler:
+    """
+    Summary
+    -------
+    Turns on the phase profiler in this process
+
+    Returns
+    -------
+    PhaseProfiler
+        the new profiler
+    """
+    global profiler
+
+    profiler = PhaseProfiler()
+    return profiler
+
+
+def stop_profiler() -> Optional[PhaseProfiler]:
+    """
+    Summary
+    -------
+    Turns off the phase profiler in this process
+
+    Returns
+    -------
+    Optional[PhaseProfiler]
+        the profiler it had so you can still get the counters out of it
+    """
+    global profiler
+
+    old_profiler = profiler
+    profiler = None
+    return old_profiler
+
+
+def add_phase_stats(
+    all_phase_stats: dict,
+    name: str,
+    phase_stats: Optional[np.ndarray],
+):
+    """
+    Adds the phase stats of a task to the ones of the process it ran on
+    """
+    if phase_stats is None:
+        return
+    if name in all_phase_stats:
+        all_phase_stats[name] = all_phase_stats[name] + phase_stats
+    else:
+        all_phase_stats[name] = phase_stats
+
+
+def print_phase_table(
+    all_phase_stats: dict,
+):
+    """
+    Summary
+    -------
+    Prints the time and calls of every phase with one seconds column per process
+
+    Parameters
+    ----------
+    all_phase_stats : dict
+        phase stats from get_phase_stats of every process by process name
+    """
+    if not all_phase_stats:
+        return
+
+    total_stats = sum(all_phase_stats.values())
+    total_seconds = max(total_stats[0].sum(), 1e-9)
+    names = list(all_phase_stats)
+
+    print("\n" + f"{'Phase':<20}{'Calls':>12}{'Seconds':>12}{'%':>8}{'us/call':>12}" + "".join(f"{name:>12}" for name in names))
+    for phase, phase_name in enumerate(ProfilePhase._fields):
+        seconds, calls = total_stats[:, phase]
+        print(
+            f"{phase_name:<20}{int(calls):>12,}{seconds:>12,.2f}{seconds / total_seconds * 100:>8.1f}"
+            f"{seconds / max(calls, 1) * 1e6:>12,.1f}"
+            + "".join(f"{all_phase_stats[name][0, phase]:>12,.2f}" for name in names)
+        )
+    print(
+        f"{'Total':<20}{int(total_stats[1].sum()):>12,}{total_stats[0].sum():>12,.2f}{100:>8.1f}{'':>12}"
+        + "".join(f"{all_phase_stats[name][0].sum():>12,.2f}" for name in names)
+    )
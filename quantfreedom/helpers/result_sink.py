@@ -0,0 +1,314 @@
+import numpy as np
+from glob import glob
+from logging import getLogger
+from os import makedirs, remove
+from os.path import join
+from typing import Optional
+
+logger = getLogger()
+
+# every result row starts with these metrics and then the dos and the ind set settings of the row
+ResultMetricNames = [
+    "total_trades",
+    "wins",
+    "losses",
+    "gains_pct",
+    "win_rate",
+    "qf_score",
+    "fees_paid",
+    "total_pnl",
+    "ending_eq",
+    "max_drawdown_pct",
+    "profit_factor",
+]
+
+ResultMetricColumns = {
+    "gains_pct": 3,
+    "win_rate": 4,
+    "qf_score": 5,
+    "profit_factor": 10,
+}
+
+
+class ResultSink:
+    """
+    Summary
+    -------
+    Collects the result rows of a backtest as the tasks finish so memory only grows with the rows that made it through the backtest settings filters
+    """
+
+    num_array_columns: int
+    total_rows: int = 0
+
+    def append(
+        self,
+        rows: np.ndarray,
+    ):
+        pass
+
+    def get_results(
+        self,
+    ) -> np.ndarray:
+        pass
+
+    def close(
+        self,
+    ):
+        pass
+
+
+class MemoryResultSink(ResultSink):
+    def __init__(
+        self,
+        num_array_columns: int,
+        starting_rows: int = 1024,
+    ):
+        """
+        Summary
+        -------
+        Keeps the rows in one array that doubles in size when it is full
+
+        Parameters
+        ----------
+        num_array_columns : int
+            columns of a result row
+        starting_rows : int, 1024
+            rows the array starts with
+        """
+        self.num_array_columns = num_array_columns
+        self.results = np.empty((max(starting_rows, 1), num_array_columns))
+        self.total_rows = 0
+
+    def append(
+        self,
+        rows: np.ndarray,
+    ):
+        new_total_rows = self.total_rows + rows.shape[0]
+        if new_total_rows > self.results.shape[0]:
+            new_size = max(new_total_rows, self.results.shape[0] * 2)
+            results = np.empty((new_size, self.num_array_columns))
+            results[: self.total_rows] = self.results[: self.total_rows]
+            self.results = results
+        self.results[self.total_rows : new_total_rows] = rows
+        self.total_rows = new_total_rows
+
+    def get_results(
+        self,
+    ) -> np.ndarray:
+        return self.results[: self.total_rows]
+
+
+def get_top_k_rows(
+    rows: np.ndarray,
+    top_k: int,
+    metric_column: int,
+) -> np.ndarray:
+    """
+    Rows with the top_k highest values in metric_column, not sorted
+    """
+    if rows.shape[0] <= top_k:
+        return rows
+    return rows[np.argpartition(-rows[:, metric_column], top_k - 1)[:top_k]]
+
+
+class TopKResultSink(ResultSink):
+    def __init__(
+        self,
+        num_array_columns: int,
+        top_k: int,
+        top_k_metric: str,
+    ):
+        """
+        Summary
+        -------
+        Only keeps the top_k rows with the highest top_k_metric so memory and the final sort stay the same size no matter how many rows make it through the filters
+
+        Parameters
+        ----------
+        num_array_columns : int
+            columns of a result row
+        top_k : int
+            rows to keep
+        top_k_metric : str
+            gains_pct, win_rate, qf_score or profit_factor
+        """
+        if top_k_metric not in ResultMetricColumns:
+            raise Exception(f"{', '.join(ResultMetricColumns)} are the only options for top_k_metric")
+        if top_k < 1:
+            raise Exception("top_k has to be at least 1")
+
+        self.num_array_columns = num_array_columns
+        self.top_k = top_k
+        self.metric_column = ResultMetricColumns[top_k_metric]
+        self.results = np.empty((0, num_array_columns))
+        self.total_rows = 0
+
+    def append(
+        self,
+        rows: np.ndarray,
+    ):
+        if rows.shape[0]:
+            self.results = get_top_k_rows(
+                rows=np.concatenate((self.results, rows)),
+                top_k=self.top_k,
+                metric_column=self.metric_column,
+            )
+            self.total_rows = self.results.shape[0]
+
+    def get_results(
+        self,
+    ) -> np.ndarray:
+        return self.results[np.argsort(-self.results[:, self.metric_column], kind="stable")]
+
+
+class HDF5ResultSink(ResultSink):
+    def __init__(
+        self,
+        num_array_columns: int,
+        file_path: str,
+        chunk_rows: int = 10000,
+    ):
+        """
+        Summary
+        -------
+        Appends the rows to an extendable array called results in an hdf5 file with tables, the file stays on disk after the backtest
+
+        Parameters
+        ----------
+        num_array_columns : int
+            columns of a result row
+        file_path : str
+            hdf5 file, gets overwritten if it exists
+        chunk_rows : int, 10000
+            rows per hdf5 chunk
+        """
+        import tables
+
+        self.num_array_columns = num_array_columns
+        self.file_path = file_path
+        self.h5_file = tables.open_file(file_path, mode="w")
+        self.results = self.h5_file.create_earray(
+            where=self.h5_file.root,
+            name="results",
+            atom=tables.Float64Atom(),
+            shape=(0, num_array_columns),
+            chunkshape=(chunk_rows, num_array_columns),
+        )
+        self.total_rows = 0
+        logger.debug(f"hdf5 result sink {file_path}")
+
+    def append(
+        self,
+        rows: np.ndarray,
+    ):
+        if rows.shape[0]:
+            self.results.append(rows)
+            self.total_rows += rows.shape[0]
+
+    def get_results(
+        self,
+    ) -> np.ndarray:
+        self.h5_file.flush()
+        return self.results[:]
+
+    def close(
+        self,
+    ):
+        self.h5_file.close()
+
+
+class NpyShardResultSink(ResultSink):
+    def __init__(
+        self,
+        num_array_columns: int,
+        folder_path: str,
+    ):
+        """
+        Summary
+        -------
+        Saves the rows of every task that has any to its own shard_000000.npy file in folder_path, the files stay on disk after the backtest
+
+        Shards of an earlier backtest in folder_path get deleted first so the folder only has the rows of this one
+
+        Parameters
+        ----------
+        num_array_columns : int
+            columns of a result row
+        folder_path : str
+            folder for the shards, gets created if it doesn't exist
+        """
+        makedirs(folder_path, exist_ok=True)
+        # the numbering starts over so old shards would get mixed in with the new ones
+        for shard_path in glob(join(folder_path, "shard_*.npy")):
+            remove(shard_path)
+        self.num_array_columns = num_array_columns
+        self.folder_path = folder_path
+        self.shard_paths = []
+        self.total_rows = 0
+        logger.debug(f"npy result sink {folder_path}")
+
+    def append(
+        self,
+        rows: np.ndarray,
+    ):
+        if rows.shape[0]:
+            shard_path = join(self.folder_path, f"shard_{len(self.shard_paths):06d}.npy")
+            np.save(shard_path, rows)
+            self.shard_paths.append(shard_path)
+            self.total_rows += rows.shape[0]
+
+    def get_results(
+        self,
+    ) -> np.ndarray:
+        if not self.shard_paths:
+            return np.empty((0, self.num_array_columns))
+        return np.concatenate([np.load(shard_path) for shard_path in self.shard_paths])
+
+
+def get_result_sink(
+    num_array_columns: int,
+    result_sink: str,
+    result_path: Optional[str] = None,
+    top_k: Optional[int] = None,
+    top_k_metric: str = "qf_score",
+) -> ResultSink:
+    """
+    Summary
+    -------
+    Creates the result sink run_df_backtest puts the result rows in
+
+    Parameters
+    ----------
+    num_array_columns : int
+        columns of a result row
+    result_sink : str
+        memory, hdf5 or npy
+    result_path : Optional[str], None
+        hdf5 file or npy shard folder
+    top_k : Optional[int], None
+        only keep the top_k rows with the highest top_k_metric, only works with the memory result_sink
+    top_k_metric : str, "qf_score"
+        gains_pct, win_rate, qf_score or profit_factor
+
+    Returns
+    -------
+    ResultSink
+        result sink
+    """
+    if result_sink.lower() not in ("memory", "hdf5", "npy"):
+        raise Exception("memory, hdf5 or npy are the only options for result_sink")
+
+    if top_k is not None:
+        if result_sink.lower() != "memory":
+            raise Exception("top_k only works with the memory result_sink")
+        return TopKResultSink(num_array_columns=num_array_columns, top_k=top_k, top_k_metric=top_k_metric)
+
+    if result_sink.lower() == "memory":
+        return MemoryResultSink(num_array_columns=num_array_columns)
+
+    if result_path is None:
+        raise Exception("you need a result_path if you want the hdf5 or npy result_sink")
+
+    if result_sink.lower() == "hdf5":
+        return HDF5ResultSink(num_array_columns=num_array_columns, file_path=result_path)
+    return NpyShardResultSink(num_array_columns=num_array_columns, folder_path=result_path)
@@ -0,0 +1,137 @@
+import numpy as np
+from logging import getLogger
+from multiprocessing.shared_memory import SharedMemory
+from typing import NamedTuple
+
+logger = getLogger()
+
+
+class SharedArraySpec(NamedTuple):
+    name: str
+    shape: tuple
+    dtype: str
+
+
+def share_array(
+    arr: np.ndarray,
+) -> tuple[SharedMemory, SharedArraySpec]:
+    """
+    Copies an array into a new shared memory block
+
+    Parameters
+    ----------
+    arr : np.ndarray
+        array to share, can't be an object array
+
+    Returns
+    -------
+    tuple[SharedMemory, SharedArraySpec]
+        the shared memory block which the creator has to keep a reference to and unlink when done, and the spec workers use to attach to it
+    """
+    shm = SharedMemory(create=True, size=max(arr.nbytes, 1))
+    shared_arr = np.ndarray(shape=arr.shape, dtype=arr.dtype, buffer=shm.buf)
+    shared_arr[...] = arr
+    spec = SharedArraySpec(
+        name=shm.name,
+        shape=arr.shape,
+        dtype=arr.dtype.str,
+    )
+    logger.debug(f"shared array {spec}")
+    return shm, spec
+
+
+def attach_array(
+    spec: SharedArraySpec,
+) -> tuple[SharedMemory, np.ndarray]:
+    """
+    Attaches to a shared memory block without copying it
+
+    Parameters
+    ----------
+    spec : SharedArraySpec
+        spec returned by share_array
+
+    Returns
+    -------
+    tuple[SharedMemory, np.ndarray]
+        the shared memory block which has to be kept alive as long as the array is used, and the array
+    """
+    shm = SharedMemory(name=spec.name)
+    arr = np.ndarray(shape=spec.shape, dtype=np.dtype(spec.dtype), buffer=shm.buf)
+    return shm, arr
+
+
+def share_named_tuple(
+    named_tuple: NamedTuple,
+) -> tuple[list[SharedMemory], NamedTuple]:
+    """
+    Shares every numpy array field of a named tuple like FootprintCandlesTuple, DynamicOrderSettings or IndicatorSettings
+
+    Parameters
+    ----------
+    named_tuple : NamedTuple
+        named tuple of arrays, fields that are not numeric arrays are left as they are
+
+    Returns
+    -------
+    tuple[list[SharedMemory], NamedTuple]
+        shared memory blocks and a named tuple of the same type with SharedArraySpec in place of the shared arrays
+    """
+    shms = []
+    fields = []
+    for field in named_tuple:
+        if isinstance(field, np.ndarray) and field.dtype != object:
+            shm, spec = share_array(arr=field)
+            shms.append(shm)
+            fields.append(spec)
+        else:
+            fields.append(field)
+    return shms, type(named_tuple)(*fields)
+
+
+def attach_named_tuple(
+    spec_tuple: NamedTuple,
+) -> tuple[list[SharedMemory], NamedTuple]:
+    """
+    Attaches to every shared field of a named tuple returned by share_named_tuple
+
+    Parameters
+    ----------
+    spec_tuple : NamedTuple
+        named tuple returned by share_named_tuple
+
+    Returns
+    -------
+    tuple[list[SharedMemory], NamedTuple]
+        shared memory blocks and the named tuple with arrays that point to shared memory
+    """
+    shms = []
+    fields = []
+    for field in spec_tuple:
+        if isinstance(field, SharedArraySpec):
+            shm, arr = attach_array(spec=field)
+            shms.append(shm)
+            fields.append(arr)
+        else:
+            fields.append(field)
+    return shms, type(spec_tuple)(*fields)
+
+
+def close_shared_memory(
+    shms: list[SharedMemory],
+    unlink: bool = False,
+):
+    """
+    Closes shared memory blocks and unlinks them if you are the one who created them
+
+    Parameters
+    ----------
+    shms : list[SharedMemory]
+        shared memory blocks
+    unlink : bool, False
+        free the memory, only the creator should do this
+    """
+    for shm in shms:
+        shm.close()
+        if unlink:
+            shm.unlink()
@@ -0,0 +1,289 @@
+import numpy as np
+from glob import glob
+from logging import getLogger
+from os.path import join
+from typing import Optional, Union
+from quantfreedom.core.enums import OrderStatus, PruneRule, TraceEvent, trace_dt
+
+logger = getLogger()
+
+# what every event means with the values it has, value_1 of EntryStatus and DecreasePosition is an OrderStatus and of SettingPruned a PruneRule
+TRACE_MESSAGES = {
+    TraceEvent.SettingStart: "setting started",
+    TraceEvent.BatchStart: "batch started batch_size= {value_1:.0f}",
+    TraceEvent.EntryStatus: "entry order_status= {order_status} entry_price= {value_2}",
+    TraceEvent.StopLoss: "sl_price= {value_1}",
+    TraceEvent.SLCandleBody: "sl lookback to index= {value_1:.0f} candle_body= {value_2}",
+    TraceEvent.IncreasePosition: "average_entry= {value_1} entry_size_usd= {value_2} position_size_usd= {value_3} sl_pct= {value_4_pct}",
+    TraceEvent.Leverage: "available_balance= {value_1} cash_used= {value_2} leverage= {value_3} liq_price= {value_4}",
+    TraceEvent.TakeProfit: "tp_price= {value_1} tp_pct= {value_2_pct}",
+    TraceEvent.StopLossHit: "stop loss hit sl_price= {value_1}",
+    TraceEvent.LiquidationHit: "liq hit liq_price= {value_1}",
+    TraceEvent.TakeProfitHit: "tp hit tp_price= {value_1}",
+    TraceEvent.MovedSLToBE: "moved sl to be old_sl= {value_1} new_sl= {value_2} sl_pct= {value_3_pct}",
+    TraceEvent.MovedTSL: "moved tsl old_sl= {value_1} new_sl= {value_2} sl_pct= {value_3_pct}",
+    TraceEvent.DecreasePosition: "order_status= {order_status} equity= {value_2} fees_paid= {value_3} realized_pnl= {value_4}",
+    TraceEvent.EntrySizeTooSmall: "entry size too small entry_size_asset= {value_1} < min_asset_size= {value_2}",
+    TraceEvent.EntrySizeTooBig: "entry size too big entry_size_asset= {value_1} > max_asset_size= {value_2}",
+    TraceEvent.HitMaxTrades: "max trades reached total_trades= {value_1:.0f} max_trades= {value_2:.0f}",
+    TraceEvent.CashUsedExceed: "cash used bigger than available balance cash_used= {value_1} available_balance= {value_2}",
+    TraceEvent.LeverageTooHigh: "lev too high leverage= {value_1} max_leverage= {value_2}",
+    TraceEvent.LeverageTooLow: "lev too low leverage= {value_1} min_leverage= {value_2} so leverage= 1",
+    TraceEvent.SettingPruned: "setting pruned prune_rule= {prune_rule}",
+    TraceEvent.SettingResult: "ending_eq= {value_1} gains_pct= {value_2} total_trades= {value_3:.0f}",
+}
+
+
+class TraceBuffer:
+    def __init__(
+        self,
+        size: int = 100_000,
+    ):
+        """
+        Summary
+        -------
+        Ring buffer of trace_dt records, once it is full every new event writes over the oldest one so it always has the last size events
+
+        The backtest sets set_idx and bar_idx as it goes so record only needs the event and its values
+
+        Parameters
+        ----------
+        size : int, 100_000
+            number of events it keeps
+        """
+        self.size = max(size, 1)
+        self.events = np.zeros(self.size, dtype=trace_dt)
+        self.total_events = 0
+        self.total_saved = 0
+        self.set_idx = -1
+        self.bar_idx = -1
+
+    def record(
+        self,
+        event: int,
+        value_1: float = np.nan,
+        value_2: float = np.nan,
+        value_3: float = np.nan,
+        value_4: float = np.nan,
+    ):
+        self.events[self.total_events % self.size] = (
+            self.set_idx,
+            self.bar_idx,
+            event,
+            value_1,
+            value_2,
+            value_3,
+            value_4,
+        )
+        self.total_events += 1
+
+    def get_events(
+        self,
+    ) -> np.ndarray:
+        """
+        Summary
+        -------
+        Copy of the events it has from oldest to newest
+
+        Returns
+        -------
+        np.ndarray
+            trace_dt events
+        """
+        if self.total_events <= self.size:
+            return self.events[: self.total_events].copy()
+        oldest = self.total_events % self.size
+        return np.concatenate((self.events[oldest:], self.events[:oldest]))
+
+    def get_unsaved_events(
+        self,
+    ) -> np.ndarray:
+        """
+        Summary
+        -------
+        Copy of the events recorded since the last save from oldest to newest, if more than size of them got recorded only the last size are still there
+
+        Returns
+        -------
+        np.ndarray
+            trace_dt events
+        """
+        first_event = max(self.total_saved, self.total_events - self.size)
+        return self.events[np.arange(first_event, self.total_events) % self.size]
+
+    def save(
+        self,
+        path: str,
+    ):
+        """
+        Adds the events recorded since the last save to the end of a raw trace_dt file so every save only writes the new events
+        """
+        if self.total_events == self.total_saved:
+            return
+        with open(path, "ab") as trace_file:
+            self.get_unsaved_events().tofile(trace_file)
+        self.total_saved = self.total_events
+
+
+class TraceLogger:
+    def __init__(
+        self,
+    ):
+        """
+        Summary
+        -------
+        Tracer that logs every event as a readable line right away instead of keeping it, or_backtest uses it when the logger is on
+        """
+        self.set_idx = -1
+        self.bar_idx = -1
+
+    def record(
+        self,
+        event: int,
+        value_1: float = np.nan,
+        value_2: float = np.nan,
+        value_3: float = np.nan,
+        value_4: float = np.nan,
+    ):
+        logger.info(
+            decode_trace_event(
+                event=event,
+                value_1=value_1,
+                value_2=value_2,
+                value_3=value_3,
+                value_4=value_4,
+            ),
+            stacklevel=2,
+        )
+
+
+# None = tracing is off, everything that traces checks this before it records anything
+tracer: Optional[Union[TraceBuffer, TraceLogger]] = None
+
+
+def start_trace(
+    size: int = 100_000,
+) -> TraceBuffer:
+    """
+    Summary
+    -------
+    Turns on tracing in this process with a new TraceBuffer
+
+    Parameters
+    ----------
+    size : int, 100_000
+        number of events the ring buffer keeps
+
+    Returns
+    -------
+    TraceBuffer
+        the new tracer
+    """
+    global tracer
+
+    tracer = TraceBuffer(size=size)
+    return tracer
+
+
+def stop_trace() -> Optional[Union[TraceBuffer, TraceLogger]]:
+    """
+    Summary
+    -------
+    Turns off tracing in this process
+
+    Returns
+    -------
+    Optional[Union[TraceBuffer, TraceLogger]]
+        the tracer it had so you can still get the events out of it
+    """
+    global tracer
+
+    old_tracer = tracer
+    tracer = None
+    return old_tracer
+
+
+def decode_trace_event(
+    event: int,
+    value_1: float,
+    value_2: float,
+    value_3: float,
+    value_4: float,
+) -> str:
+    """
+    Summary
+    -------
+    Readable message of one event
+
+    Returns
+    -------
+    str
+        message
+    """
+    code = int(value_1) if value_1 == value_1 else -1
+    return TRACE_MESSAGES[event].format(
+        value_1=value_1,
+        value_2=value_2,
+        value_3=value_3,
+        value_4=value_4,
+        value_2_pct=round(value_2 * 100, 2),
+        value_3_pct=round(value_3 * 100, 2),
+        value_4_pct=round(value_4 * 100, 2),
+        order_status=OrderStatus._fields[code] if 0 <= code < len(OrderStatus) else code,
+        prune_rule=PruneRule._fields[code] if 0 <= code < len(PruneRule) else code,
+    )
+
+
+def decode_trace_events(
+    events: np.ndarray,
+) -> list[str]:
+    """
+    Summary
+    -------
+    Turns trace_dt events into readable log lines
+
+    Parameters
+    ----------
+    events : np.ndarray
+        trace_dt events
+
+    Returns
+    -------
+    list[str]
+        one line per event with its set_idx and bar_idx
+    """
+    return [
+        f"set_idx= {event['set_idx']} bar_idx= {event['bar_idx']} "
+        + decode_trace_event(
+            event=event["event"],
+            value_1=event["value_1"],
+            value_2=event["value_2"],
+            value_3=event["value_3"],
+            value_4=event["value_4"],
+        )
+        for event in events
+    ]
+
+
+def load_trace_events(
+    trace_path: str,
+) -> np.ndarray:
+    """
+    Summary
+    -------
+    Events of every process that run_df_backtest saved to trace_path, the events of one process stay in the order they happened
+
+    Parameters
+    ----------
+    trace_path : str
+        folder with the trace_<pid>.bin files
+
+    Returns
+    -------
+    np.ndarray
+        trace_dt events
+    """
+    trace_files = sorted(glob(join(trace_path, "trace_*.bin")))
+    if not trace_files:
+        return np.zeros(0, dtype=trace_dt)
+    return np.concatenate([np.fromfile(trace_file, dtype=trace_dt) for trace_file in trace_files])
@@ -0,0 +1,234 @@
+import numpy as np
+from typing import Optional
+from quantfreedom.core.enums import TradeMetric
+
+# numba can't read attributes of the enum tuples so the functions the kernel uses get them as plain ints
+TOTAL_TRADES = TradeMetric.TotalTrades
+WINS = TradeMetric.Wins
+LOSSES = TradeMetric.Losses
+GROSS_PROFIT = TradeMetric.GrossProfit
+GROSS_LOSS = TradeMetric.GrossLoss
+TOTAL_PNL = TradeMetric.TotalPnl
+FEES_PAID = TradeMetric.FeesPaid
+PEAK_EQUITY = TradeMetric.PeakEquity
+MAX_DRAWDOWN_PCT = TradeMetric.MaxDrawdownPct
+QF_CUM_PNL = TradeMetric.QfCumPnl
+QF_CUM_PNL_MEAN = TradeMetric.QfCumPnlMean
+QF_CO_MOMENT = TradeMetric.QfCoMoment
+QF_CUM_PNL_MOMENT = TradeMetric.QfCumPnlMoment
+
+
+def get_trade_metrics(
+    starting_equity: float,
+    batch_size: Optional[int] = None,
+) -> np.ndarray:
+    """
+    Summary
+    -------
+    New trade metrics with no closed trades
+
+    Parameters
+    ----------
+    starting_equity : float
+        starting equity
+    batch_size : Optional[int], None
+        None = one setting with one value per TradeMetric, otherwise one column per setting
+
+    Returns
+    -------
+    np.ndarray
+        trade metrics
+    """
+    shape = len(TradeMetric) if batch_size is None else (len(TradeMetric), batch_size)
+    trade_metrics = np.zeros(shape)
+    trade_metrics[PEAK_EQUITY] = starting_equity
+    return trade_metrics
+
+
+def reset_trade_metrics(
+    trade_metrics: np.ndarray,
+    starting_equity: float,
+):
+    """
+    Starts the trade metrics of a setting over so the same array gets used for every setting
+    """
+    trade_metrics[:] = 0.0
+    trade_metrics[PEAK_EQUITY] = starting_equity
+
+
+def add_closed_trade(
+    trade_metrics: np.ndarray,
+    equity: float,
+    fees_paid: float,
+    realized_pnl: float,
+):
+    """
+    Summary
+    -------
+    Updates the trade metrics of one setting with a closed trade
+
+    The qf score regression gets updated like welford so the score comes out the same as getting it from the whole pnl array
+
+    Parameters
+    ----------
+    trade_metrics : np.ndarray
+        trade metrics of the setting
+    equity : float
+        equity after the trade
+    fees_paid : float
+        fees of the trade
+    realized_pnl : float
+        realized pnl of the trade
+    """
+    trade_metrics[TOTAL_TRADES] += 1
+    trade_metrics[TOTAL_PNL] += realized_pnl
+    trade_metrics[FEES_PAID] += fees_paid
+
+    peak_equity = max(trade_metrics[PEAK_EQUITY], equity)
+    trade_metrics[PEAK_EQUITY] = peak_equity
+    trade_metrics[MAX_DRAWDOWN_PCT] = max(
+        trade_metrics[MAX_DRAWDOWN_PCT],
+        (peak_equity - equity) / peak_equity * 100,
+    )
+
+    # break even trades aren't a win or a loss and aren't in the qf score
+    if abs(realized_pnl) <= 0.009:
+        return
+
+    if realized_pnl > 0:
+        trade_metrics[WINS] += 1
+        trade_metrics[GROSS_PROFIT] += realized_pnl
+    else:
+        trade_metrics[LOSSES] += 1
+        trade_metrics[GROSS_LOSS] -= realized_pnl
+
+    # x is the trade number so the mean of x before this trade is total_no_be / 2
+    total_no_be = trade_metrics[WINS] + trade_metrics[LOSSES]
+    trade_metrics[QF_CUM_PNL] += realized_pnl
+    cum_pnl = trade_metrics[QF_CUM_PNL]
+    cum_pnl_delta = cum_pnl - trade_metrics[QF_CUM_PNL_MEAN]
+    trade_metrics[QF_CUM_PNL_MEAN] += cum_pnl_delta / total_no_be
+    trade_metrics[QF_CO_MOMENT] += total_no_be / 2 * (cum_pnl - trade_metrics[QF_CUM_PNL_MEAN])
+    trade_metrics[QF_CUM_PNL_MOMENT] += cum_pnl_delta * (cum_pnl - trade_metrics[QF_CUM_PNL_MEAN])
+
+
+def add_closed_trades(
+    trade_metrics: np.ndarray,
+    equity: np.ndarray,
+    fees_paid: np.ndarray,
+    realized_pnl: np.ndarray,
+    rows: np.ndarray,
+):
+    """
+    Summary
+    -------
+    add_closed_trade for every row of a batch that closed a trade on the same bar, same math in the same order so the metrics are the same
+
+    Parameters
+    ----------
+    trade_metrics : np.ndarray
+        trade metrics of the batch with one column per setting
+    equity : np.ndarray
+        equity of the rows after the trade
+    fees_paid : np.ndarray
+        fees of the trades
+    realized_pnl : np.ndarray
+        realized pnl of the trades
+    rows : np.ndarray
+        rows that closed a trade, a row can only be in there once
+    """
+    metrics = trade_metrics[:, rows]
+    metrics[TOTAL_TRADES] += 1
+    metrics[TOTAL_PNL] += realized_pnl
+    metrics[FEES_PAID] += fees_paid
+
+    np.maximum(metrics[PEAK_EQUITY], equity, out=metrics[PEAK_EQUITY])
+    np.maximum(
+        metrics[MAX_DRAWDOWN_PCT],
+        (metrics[PEAK_EQUITY] - equity) / metrics[PEAK_EQUITY] * 100,
+        out=metrics[MAX_DRAWDOWN_PCT],
+    )
+
+    is_win = realized_pnl > 0.009
+    is_loss = realized_pnl < -0.009
+    metrics[WINS] += is_win
+    metrics[GROSS_PROFIT] += np.where(is_win, realized_pnl, 0.0)
+    metrics[LOSSES] += is_loss
+    metrics[GROSS_LOSS] -= np.where(is_loss, realized_pnl, 0.0)
+
+    not_be = is_win | is_loss
+    qf_metrics = metrics[:, not_be]
+    total_no_be = qf_metrics[WINS] + qf_metrics[LOSSES]
+    qf_metrics[QF_CUM_PNL] += realized_pnl[not_be]
+    cum_pnl = qf_metrics[QF_CUM_PNL]
+    cum_pnl_delta = cum_pnl - qf_metrics[QF_CUM_PNL_MEAN]
+    qf_metrics[QF_CUM_PNL_MEAN] += cum_pnl_delta / total_no_be
+    qf_metrics[QF_CO_MOMENT] += total_no_be / 2 * (cum_pnl - qf_metrics[QF_CUM_PNL_MEAN])
+    qf_metrics[QF_CUM_PNL_MOMENT] += cum_pnl_delta * (cum_pnl - qf_metrics[QF_CUM_PNL_MEAN])
+    metrics[:, not_be] = qf_metrics
+
+    trade_metrics[:, rows] = metrics
+
+
+def get_qf_score_from_metrics(
+    gains_pct: float,
+    trade_metrics: np.ndarray,
+) -> float:
+    """
+    Summary
+    -------
+    get_qf_score from the running sums of the trade metrics instead of the pnl array
+
+    The r squared of the regression is QfCoMoment ** 2 / (sum of (x - x mean) ** 2 * QfCumPnlMoment) and the sum of (x - x mean) ** 2 of 1 to n is n * (n * n - 1) / 12
+
+    Parameters
+    ----------
+    gains_pct : float
+        gains pct of the setting
+    trade_metrics : np.ndarray
+        trade metrics of the setting
+
+    Returns
+    -------
+    float
+        qf score rounded to 3 decimals, nan if every trade closed at break even
+    """
+    total_no_be = trade_metrics[WINS] + trade_metrics[LOSSES]
+    if total_no_be == 0:
+        return np.nan
+
+    co_moment = trade_metrics[QF_CO_MOMENT]
+    cum_pnl_moment = trade_metrics[QF_CUM_PNL_MOMENT]
+    if total_no_be == 1 or cum_pnl_moment == 0:
+        # a flat line, get_qf_score swaps the zeros for ones and gets 0
+        qf_score = 0.0
+    else:
+        x_xm_s_sum = total_no_be * (total_no_be * total_no_be - 1) / 12
+        qf_score = co_moment * co_moment / (x_xm_s_sum * cum_pnl_moment)
+
+    if gains_pct <= 0:
+        qf_score = -(qf_score)
+    return round(qf_score, 3)
+
+
+def get_profit_factor(
+    trade_metrics: np.ndarray,
+) -> float:
+    """
+    Summary
+    -------
+    Gross profit over gross loss
+
+    Parameters
+    ----------
+    trade_metrics : np.ndarray
+        trade metrics of the setting
+
+    Returns
+    -------
+    float
+        profit factor, np.inf if there are wins and no losses and nan if there are neither
+    """
+    if trade_metrics[GROSS_LOSS] == 0:
+        return np.inf if trade_metrics[GROSS_PROFIT] > 0 else np.nan
+    return trade_metrics[GROSS_PROFIT] / trade_metrics[GROSS_LOSS]
@@ -0,0 +1,1086 @@
+import numpy as np
+
+from logging import getLogger
+from typing import Optional
+from numpy.lib.stride_tricks import sliding_window_view
+
+from quantfreedom.core.enums import (
+    CandleBodyType,
+    DynamicOrderSettings,
+    ExchangeSettings,
+    FootprintCandlesTuple,
+    IncreasePositionType,
+    LeverageStrategyType,
+    OrderStatus,
+    StaticOrderSettings,
+    StopLossStrategyType,
+    TakeProfitStrategyType,
+    TrailingSLStrategyType,
+)
+from quantfreedom.helpers.trade_metrics import add_closed_trades, get_trade_metrics, reset_trade_metrics
+
+logger = getLogger()
+
+# dtype of every order variable, they all have one value per row of the batch and start at 0 except for the equity ones
+order_variable_dtypes = {
+    "available_balance": np.float_,
+    "average_entry": np.float_,
+    "can_move_sl_to_be": np.bool_,
+    "cash_borrowed": np.float_,
+    "cash_used": np.float_,
+    "equity": np.float_,
+    "liq_price": np.float_,
+    "position_size_asset": np.float_,
+    "position_size_usd": np.float_,
+    "total_possible_loss": np.float_,
+    "sl_pct": np.float_,
+    "sl_price": np.float_,
+    "total_trades": np.int_,
+    "tp_pct": np.float_,
+    "tp_price": np.float_,
+    "total_trades_closed": np.int_,
+}
+
+
+class BatchOrderHandler:
+    """
+    Struct of arrays version of the OrderHandler.
+
+    Every order variable that is a single number on the OrderHandler is a numpy array here with one value per
+    settings combination, so a whole batch of settings can be moved forward one bar at a time with vector math.
+    The math mirrors StopLoss, IncreasePosition, Leverage and TakeProfit line for line, rejected orders are
+    handled with masks instead of RejectedOrder and exits with masks instead of DecreasePosition.
+    """
+
+    def __init__(
+        self,
+        exchange_settings_tuple: ExchangeSettings,
+        long_short: str,
+        static_os_tuple: StaticOrderSettings,
+        batch_size: int = 1000,
+    ) -> None:
+        self.batch_size = batch_size
+        self.clear_buffers()
+
+        self.asset_tick_step = exchange_settings_tuple.asset_tick_step
+        self.leverage_tick_step = exchange_settings_tuple.leverage_tick_step
+        self.market_fee_pct = exchange_settings_tuple.market_fee_pct
+        self.max_asset_size = exchange_settings_tuple.max_asset_size
+        self.max_leverage = exchange_settings_tuple.max_leverage
+        self.min_asset_size = exchange_settings_tuple.min_asset_size
+        self.min_leverage = exchange_settings_tuple.min_leverage
+        self.mmr_pct = exchange_settings_tuple.mmr_pct
+        self.price_tick_step = exchange_settings_tuple.price_tick_step
+
+        if long_short.lower() == "long":
+            self.calc_dynamic_lev = self.long_calc_dynamic_lev
+            self.entry_calc_np = self.long_entry_size_np
+            self.entry_calc_p = self.long_entry_size_p
+            self.get_bankruptcy_price = self.long_get_bankruptcy_price
+            self.get_liq_price = self.long_get_liq_price
+            self.get_tp_price = self.long_tp_price
+            self.hit_bool = self.long_hit_bool
+            self.tp_hit_bool = self.long_tp_hit_bool
+            self.move_sl_bool = np.greater
+            self.pnl_calc = self.long_pnl_calc
+            self.sl_price_calc = self.decrease_sl_price
+            self.sl_to_zero_price = self.long_sl_to_zero_price
+            self.tsl_mover = self.increase_sl_price
+        elif long_short.lower() == "short":
+            self.calc_dynamic_lev = self.short_calc_dynamic_lev
+            self.entry_calc_np = self.short_entry_size_np
+            self.entry_calc_p = self.short_entry_size_p
+            self.get_bankruptcy_price = self.short_get_bankruptcy_price
+            self.get_liq_price = self.short_get_liq_price
+            self.get_tp_price = self.short_tp_price
+            self.hit_bool = self.short_hit_bool
+            self.tp_hit_bool = self.short_tp_hit_bool
+            self.move_sl_bool = np.less
+            self.pnl_calc = self.short_pnl_calc
+            self.sl_price_calc = self.increase_sl_price
+            self.sl_to_zero_price = self.short_sl_to_zero_price
+            self.tsl_mover = None
+        else:
+            raise Exception("long or short are the only options for long_short")
+
+        # stop loss
+        if static_os_tuple.sl_strategy_type != StopLossStrategyType.SLBasedOnCandleBody:
+            raise Exception("SLBasedOnCandleBody is the only sl_strategy_type the batch engine supports")
+        if static_os_tuple.pg_min_max_sl_bcb.lower() == "min":
+            self.sl_bcb_reducer = np.min
+            self.sl_bcb_pad = np.inf
+        elif static_os_tuple.pg_min_max_sl_bcb.lower() == "max":
+            self.sl_bcb_reducer = np.max
+            self.sl_bcb_pad = -np.inf
+        else:
+            raise Exception("min or max are the only options for pg_min_max_sl_bcb")
+
+        # increase position and leverage
+        if static_os_tuple.increase_position_type != IncreasePositionType.RiskPctAccountEntrySize:
+            raise Exception("RiskPctAccountEntrySize is the only increase_position_type the batch engine supports")
+        if static_os_tuple.leverage_strategy_type != LeverageStrategyType.Dynamic:
+            raise Exception("Dynamic is the only leverage_strategy_type the batch engine supports")
+
+        # SL break even
+        self.sl_to_be_bool = static_os_tuple.sl_to_be_bool
+        if self.sl_to_be_bool:
+            if static_os_tuple.z_or_e_type.lower() == "zero":
+                self.zero_or_entry_calc = self.sl_to_zero
+            elif static_os_tuple.z_or_e_type.lower() == "entry":
+                self.zero_or_entry_calc = self.sl_to_entry
+            else:
+                raise Exception("zero or entry are the only options for z_or_e_type")
+
+        # Trailing stop loss
+        if static_os_tuple.trailing_sl_strategy_type == TrailingSLStrategyType.CBAboveBelow:
+            self.checker_tsl = self.check_move_tsl_close
+        elif static_os_tuple.trailing_sl_strategy_type == TrailingSLStrategyType.PctAboveBelow:
+            if self.tsl_mover is None:
+                raise Exception("PctAboveBelow trailing stop loss is only available for long")
+            self.checker_tsl = self.check_move_tsl_pct
+        else:
+            self.checker_tsl = None
+
+        # Take profit
+        if static_os_tuple.tp_fee_type.lower() == "market":
+            self.tp_fee_pct = exchange_settings_tuple.market_fee_pct
+        elif static_os_tuple.tp_fee_type.lower() == "limit":
+            self.tp_fee_pct = exchange_settings_tuple.limit_fee_pct
+        else:
+            raise Exception("market or limit are the only options for tp_fee_type")
+
+        self.tp_strategy_type = static_os_tuple.tp_strategy_type
+        if self.tp_strategy_type == TakeProfitStrategyType.RiskReward:
+            self.tp_calculator = self.tp_rr
+        else:
+            self.tp_calculator = self.tp_provided
+
+    #######################################################
+    ##################      Setup      ####################
+    #######################################################
+
+    def get_empty_buffers(
+        self,
+    ) -> dict:
+        """
+        Summary
+        -------
+        Every buffer and cache of the handler with nothing in it
+
+        The buffers are made once per process for the biggest batch and every batch uses views of them, so a worker doesn't allocate anything per batch once the first batch is done
+
+        Returns
+        -------
+        dict
+            attribute name and empty value of every buffer and cache
+        """
+        return {
+            "buffers_size": 0,
+            "order_variable_buffers": None,
+            "batch_trade_metrics": None,
+            "dos_buffers": None,
+            "entries_buffer": None,
+            "exit_prices_buffer": None,
+            "cached_candles": None,
+            "candle_prices": None,
+            "sl_bcb_price_rows": [],
+            "sl_bcb_row_lookup": {},
+            "sl_bcb_prices": None,
+            "sl_bcb_pair_idx": None,
+        }
+
+    def clear_buffers(
+        self,
+    ):
+        """
+        Drops every buffer and cache, they get made again the first time a batch needs them
+        """
+        self.__dict__.update(self.get_empty_buffers())
+
+    def __getstate__(
+        self,
+    ) -> dict:
+        # the handler gets pickled to every worker and every worker makes its own buffers
+        return {**self.__dict__, **self.get_empty_buffers()}
+
+    def get_signal_buffers(
+        self,
+        batch_size: int,
+        total_bars: int,
+    ) -> tuple[np.ndarray, Optional[np.ndarray]]:
+        """
+        Summary
+        -------
+        Entries and exit prices buffers with a row per bar and a column per setting of the batch
+
+        Exit prices are only used by the Provided take profit so every other take profit doesn't get a buffer for them
+
+        Parameters
+        ----------
+        batch_size : int
+            number of settings in the batch
+        total_bars : int
+            number of candles
+
+        Returns
+        -------
+        tuple[np.ndarray, Optional[np.ndarray]]
+            entries, exit_prices or None when the take profit isn't Provided
+        """
+        if (
+            self.entries_buffer is None
+            or self.entries_buffer.shape[0] != total_bars
+            or self.entries_buffer.shape[1] < batch_size
+        ):
+            buffer_size = max(batch_size, self.batch_size)
+            self.entries_buffer = np.empty((total_bars, buffer_size), dtype=np.bool_)
+            if self.tp_strategy_type == TakeProfitStrategyType.Provided:
+                self.exit_prices_buffer = np.empty((total_bars, buffer_size))
+        if self.exit_prices_buffer is None:
+            return self.entries_buffer[:, :batch_size], None
+        return self.entries_buffer[:, :batch_size], self.exit_prices_buffer[:, :batch_size]
+
+    def update_class_dos(
+        self,
+        candles: FootprintCandlesTuple,
+        og_dos_tuple: DynamicOrderSettings,
+        set_idxs: np.ndarray,
+    ):
+        """
+        Summary
+        -------
+        Copies the dynamic order settings of the settings at set_idxs into the dos buffers so every field is an array with one value per row of the batch, and gets the rolling candle body prices the stop loss needs for every candle body type and lookback pair in the batch
+
+        The candle prices and the rolling candle body prices of every pair are only made once for the candles
+
+        Parameters
+        ----------
+        candles : FootprintCandlesTuple
+            candles
+        og_dos_tuple : DynamicOrderSettings
+            og dynamic order settings of the strategy
+        set_idxs : np.ndarray
+            positions of the settings of the batch in og_dos_tuple
+        """
+        batch_size = set_idxs.size
+        if (
+            self.dos_buffers is None
+            or self.dos_buffers[0].size < batch_size
+            or any(buffer.dtype != field.dtype for buffer, field in zip(self.dos_buffers, og_dos_tuple))
+        ):
+            self.dos_buffers = [np.empty(max(batch_size, self.batch_size), dtype=field.dtype) for field in og_dos_tuple]
+        dynamic_order_settings = DynamicOrderSettings(
+            *[
+                np.take(field, set_idxs, out=buffer[:batch_size])
+                for field, buffer in zip(og_dos_tuple, self.dos_buffers)
+            ]
+        )
+
+        # take profit
+        self.risk_reward = dynamic_order_settings.risk_reward
+
+        # increase position
+        self.max_trades = dynamic_order_settings.max_trades
+        self.account_pct_risk_per_trade = dynamic_order_settings.account_pct_risk_per_trade
+
+        # stop loss
+        self.sl_based_on_add_pct = dynamic_order_settings.sl_based_on_add_pct
+        self.sl_to_be_when_pct = dynamic_order_settings.sl_to_be_when_pct
+        self.trail_sl_by_pct = dynamic_order_settings.trail_sl_by_pct
+        self.trail_sl_when_pct = dynamic_order_settings.trail_sl_when_pct
+
+        if candles is not self.cached_candles:
+            # candle body prices only exist for open high low close so the cb types become rows of candle_prices
+            self.candle_prices = np.vstack(
+                (
+                    candles.candle_open_prices,
+                    candles.candle_high_prices,
+                    candles.candle_low_prices,
+                    candles.candle_close_prices,
+                )
+            )
+            self.sl_bcb_price_rows = []
+            self.sl_bcb_row_lookup = {}
+            self.cached_candles = candles
+        self.sl_to_be_cb_row = dynamic_order_settings.sl_to_be_cb_type - CandleBodyType.Open
+        self.trail_sl_bcb_row = dynamic_order_settings.trail_sl_bcb_type - CandleBodyType.Open
+
+        sl_pairs, sl_pair_idx = np.unique(
+            np.vstack((dynamic_order_settings.sl_bcb_type, dynamic_order_settings.sl_based_on_lookback)),
+            axis=1,
+            return_inverse=True,
+        )
+        pair_rows = np.empty(sl_pairs.shape[1], dtype=np.int_)
+        total_price_rows = len(self.sl_bcb_price_rows)
+        for pair in range(sl_pairs.shape[1]):
+            candle_body_type, lookback = sl_pairs[:, pair]
+            pair_key = (int(candle_body_type), int(lookback))
+            if pair_key not in self.sl_bcb_row_lookup:
+                the_prices = candles[candle_body_type]
+                padded_prices = np.concatenate((np.full(lookback, self.sl_bcb_pad), the_prices))
+                self.sl_bcb_row_lookup[pair_key] = len(self.sl_bcb_price_rows)
+                self.sl_bcb_price_rows.append(
+                    self.sl_bcb_reducer(
+                        sliding_window_view(padded_prices, lookback + 1),
+                        axis=1,
+                    )
+                )
+            pair_rows[pair] = self.sl_bcb_row_lookup[pair_key]
+        if len(self.sl_bcb_price_rows) > total_price_rows:
+            self.sl_bcb_prices = np.vstack(self.sl_bcb_price_rows)
+            total_new_pairs = len(self.sl_bcb_price_rows) - total_price_rows
+            logger.debug(f"Created rolling sl candle body prices for {total_new_pairs} pairs")
+        self.sl_bcb_pair_idx = pair_rows[sl_pair_idx.ravel()]
+
+    def set_order_variables(
+        self,
+        batch_size: int,
+        equity: float,
+    ):
+        """
+        Summary
+        -------
+        Starts the order variables and trade metrics of the first batch_size rows over, they are views of buffers that only get made again when a batch is bigger than every batch before it
+        """
+        if self.buffers_size < batch_size:
+            self.buffers_size = max(batch_size, self.batch_size)
+            self.order_variable_buffers = {
+                name: np.empty(self.buffers_size, dtype=dtype) for name, dtype in order_variable_dtypes.items()
+            }
+            self.batch_trade_metrics = get_trade_metrics(starting_equity=equity, batch_size=self.buffers_size)
+        for name, buffer in self.order_variable_buffers.items():
+            order_variable = buffer[:batch_size]
+            order_variable[:] = 0
+            setattr(self, name, order_variable)
+        self.available_balance[:] = equity
+        self.equity[:] = equity
+
+        self.trade_metrics = self.batch_trade_metrics[:, :batch_size]
+        reset_trade_metrics(
+            trade_metrics=self.trade_metrics,
+            starting_equity=equity,
+        )
+
+    def reset_order_variables(
+        self,
+        rows: np.ndarray,
+    ):
+        self.available_balance[rows] = self.equity[rows]
+        self.average_entry[rows] = 0.0
+        self.can_move_sl_to_be[rows] = False
+        self.cash_borrowed[rows] = 0.0
+        self.cash_used[rows] = 0.0
+        self.liq_price[rows] = 0.0
+        self.position_size_asset[rows] = 0.0
+        self.position_size_usd[rows] = 0.0
+        self.total_possible_loss[rows] = 0.0
+        self.sl_pct[rows] = 0.0
+        self.sl_price[rows] = 0.0
+        self.total_trades[rows] = 0
+        self.tp_pct[rows] = 0.0
+        self.tp_price[rows] = 0.0
+
+    #######################################################
+    ##################      Exits      ####################
+    #######################################################
+
+    def long_hit_bool(
+        self,
+        bar_index: int,
+        price: np.ndarray,
+    ) -> np.ndarray:
+        return price > self.candle_prices[2, bar_index]
+
+    def short_hit_bool(
+        self,
+        bar_index: int,
+        price: np.ndarray,
+    ) -> np.ndarray:
+        return price < self.candle_prices[1, bar_index]
+
+    def long_tp_hit_bool(
+        self,
+        bar_index: int,
+        tp_price: np.ndarray,
+    ) -> np.ndarray:
+        return tp_price < self.candle_prices[1, bar_index]
+
+    def short_tp_hit_bool(
+        self,
+        bar_index: int,
+        tp_price: np.ndarray,
+    ) -> np.ndarray:
+        return tp_price > self.candle_prices[2, bar_index]
+
+    def check_exits(
+        self,
+        bar_index: int,
+        exit_prices: Optional[np.ndarray],
+        rows: np.ndarray,
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Summary
+        -------
+        Checks stop loss, liquidation and take profit in that order for every row that is in a position, the first one hit is the exit just like the DecreasePosition raised by the OrderHandler
+
+        Parameters
+        ----------
+        bar_index : int
+            bar_index
+        exit_prices : Optional[np.ndarray]
+            strategy exit prices of every bar for every row in the batch, only used by the Provided take profit
+        rows : np.ndarray
+            rows that are in a position
+
+        Returns
+        -------
+        tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+            exit_mask, exit_price, exit_fee_pct, order_status
+        """
+        sl_price = self.sl_price[rows]
+        liq_price = self.liq_price[rows]
+        sl_hit = self.hit_bool(bar_index=bar_index, price=sl_price)
+        liq_hit = ~sl_hit & self.hit_bool(bar_index=bar_index, price=liq_price)
+
+        if self.tp_strategy_type == TakeProfitStrategyType.RiskReward:
+            tp_exit_price = self.tp_price[rows]
+            tp_hit = self.tp_hit_bool(bar_index=bar_index, tp_price=tp_exit_price)
+            tp_hit &= ~sl_hit & ~liq_hit
+            exit_mask = sl_hit | liq_hit | tp_hit
+        elif self.tp_strategy_type == TakeProfitStrategyType.Provided:
+            tp_exit_price = exit_prices[bar_index, rows]
+            tp_hit = ~np.isnan(tp_exit_price)
+            tp_hit &= ~sl_hit & ~liq_hit
+            exit_mask = sl_hit | liq_hit | tp_hit
+        else:
+            tp_exit_price = None
+            tp_hit = None
+            exit_mask = sl_hit | liq_hit
+
+        # most bars nothing gets hit
+        if not exit_mask.any():
+            return exit_mask, sl_price[:0], sl_price[:0], sl_price[:0]
+
+        sl_hit = sl_hit[exit_mask]
+        liq_hit = liq_hit[exit_mask]
+        if tp_hit is None:
+            exit_price = np.where(sl_hit, sl_price[exit_mask], liq_price[exit_mask])
+            exit_fee_pct = np.full(sl_hit.size, self.market_fee_pct)
+            order_status = np.where(sl_hit, OrderStatus.StopLossFilled, OrderStatus.LiquidationFilled)
+        else:
+            tp_hit = tp_hit[exit_mask]
+            exit_price = np.where(
+                sl_hit,
+                sl_price[exit_mask],
+                np.where(liq_hit, liq_price[exit_mask], tp_exit_price[exit_mask]),
+            )
+            exit_fee_pct = np.where(tp_hit, self.tp_fee_pct, self.market_fee_pct)
+            order_status = np.where(
+                sl_hit,
+                OrderStatus.StopLossFilled,
+                np.where(liq_hit, OrderStatus.LiquidationFilled, OrderStatus.TakeProfitFilled),
+            )
+        return exit_mask, exit_price, exit_fee_pct, order_status
+
+    def long_pnl_calc(
+        self,
+        exit_price: np.ndarray,
+        rows: np.ndarray,
+    ) -> np.ndarray:
+        return np.round((exit_price - self.average_entry[rows]) * self.position_size_asset[rows], 2)  # math checked
+
+    def short_pnl_calc(
+        self,
+        exit_price: np.ndarray,
+        rows: np.ndarray,
+    ) -> np.ndarray:
+        return np.round((self.average_entry[rows] - exit_price) * self.position_size_asset[rows], 2)  # math checked
+
+    def calculate_decrease_position(
+        self,
+        exit_fee_pct: np.ndarray,
+        exit_price: np.ndarray,
+        rows: np.ndarray,
+    ):
+        """
+        Summary
+        -------
+        Closes the position of every row given, adds the trade to the trade metrics and resets the order variables of those rows with the new equity
+
+        Parameters
+        ----------
+        exit_fee_pct : np.ndarray
+            exit_fee_pct
+        exit_price : np.ndarray
+            exit_price
+        rows : np.ndarray
+            rows that hit an exit
+        """
+        position_size_asset = self.position_size_asset[rows]
+        pnl = self.pnl_calc(exit_price=exit_price, rows=rows)  # math checked
+        fee_open = np.round(position_size_asset * self.average_entry[rows] * self.market_fee_pct, 2)  # math checked
+        fee_close = np.round(position_size_asset * exit_price * exit_fee_pct, 2)  # math checked
+        fees_paid = np.round(fee_open + fee_close, 2)  # math checked
+        realized_pnl = np.round(pnl - fees_paid, 2)  # math checked
+
+        self.equity[rows] = np.round(realized_pnl + self.equity[rows], 2)
+        self.total_trades_closed[rows] += 1
+        add_closed_trades(
+            trade_metrics=self.trade_metrics,
+            equity=self.equity[rows],
+            fees_paid=fees_paid,
+            realized_pnl=realized_pnl,
+            rows=rows,
+        )
+
+        self.reset_order_variables(rows=rows)
+
+    #######################################################
+    ##################   Moving SL     ####################
+    #######################################################
+
+    def decrease_sl_price(
+        self,
+        price: np.ndarray,
+        add_pct: np.ndarray,
+    ) -> np.ndarray:
+        return price - (price * add_pct)
+
+    def increase_sl_price(
+        self,
+        price: np.ndarray,
+        add_pct: np.ndarray,
+    ) -> np.ndarray:
+        return price + (price * add_pct)
+
+    def long_sl_to_zero_price(
+        self,
+        average_entry: np.ndarray,
+    ) -> np.ndarray:
+        return (average_entry + self.market_fee_pct * average_entry) / (1 - self.market_fee_pct)
+
+    def short_sl_to_zero_price(
+        self,
+        average_entry: np.ndarray,
+    ) -> np.ndarray:
+        return (average_entry - self.market_fee_pct * average_entry) / (1 + self.market_fee_pct)
+
+    def sl_to_zero(
+        self,
+        average_entry: np.ndarray,
+    ) -> np.ndarray:
+        return np.round(self.sl_to_zero_price(average_entry=average_entry), self.price_tick_step)
+
+    def sl_to_entry(
+        self,
+        average_entry: np.ndarray,
+    ) -> np.ndarray:
+        return average_entry
+
+    def set_moved_sl(
+        self,
+        rows: np.ndarray,
+        sl_pct: np.ndarray,
+        sl_price: np.ndarray,
+    ):
+        # the OrderHandler only moves the sl if the new price is truthy
+        moved = sl_price != 0
+        self.sl_pct[rows[moved]] = sl_pct[moved]
+        self.sl_price[rows[moved]] = sl_price[moved]
+
+    def check_move_sl_to_be(
+        self,
+        bar_index: int,
+        rows: np.ndarray,
+    ):
+        """
+        Summary
+        -------
+        Moves the stop loss to break even for every row given that can move it and is far enough from the average entry
+        """
+        if not self.sl_to_be_bool:
+            return
+        rows = rows[self.can_move_sl_to_be[rows]]
+        if rows.size == 0:
+            return
+
+        average_entry = self.average_entry[rows]
+        candle_body = self.candle_prices[self.sl_to_be_cb_row[rows], bar_index]
+        pct_from_ae = np.abs(candle_body - average_entry) / average_entry
+        move_sl = self.move_sl_bool(pct_from_ae, self.sl_to_be_when_pct[rows])
+        if not move_sl.any():
+            return
+
+        rows = rows[move_sl]
+        average_entry = average_entry[move_sl]
+        sl_price = self.zero_or_entry_calc(average_entry=average_entry)
+        sl_pct = np.round(np.abs(average_entry - sl_price) / average_entry, 2)
+        self.set_moved_sl(rows=rows, sl_pct=sl_pct, sl_price=sl_price)
+
+    def check_move_tsl(
+        self,
+        bar_index: int,
+        rows: np.ndarray,
+    ):
+        if self.checker_tsl is not None and rows.size:
+            self.checker_tsl(bar_index=bar_index, rows=rows)
+
+    def check_move_tsl_close(
+        self,
+        bar_index: int,
+        rows: np.ndarray,
+    ):
+        """
+        Summary
+        -------
+        Moves the trailing stop loss to the candle body plus or minus the trail by pct for every row given where the candle body is far enough away from the average entry
+        """
+        average_entry = self.average_entry[rows]
+        candle_body = self.candle_prices[self.trail_sl_bcb_row[rows], bar_index]
+        pct_from_ae = np.abs(candle_body - average_entry) / average_entry
+        possible_move_tsl = self.move_sl_bool(pct_from_ae, self.trail_sl_when_pct[rows])
+        if not possible_move_tsl.any():
+            return
+
+        rows = rows[possible_move_tsl]
+        average_entry = average_entry[possible_move_tsl]
+        temp_sl_price = self.sl_price_calc(
+            price=candle_body[possible_move_tsl],
+            add_pct=self.trail_sl_by_pct[rows],
+        )
+        temp_sl_price = np.round(temp_sl_price, self.price_tick_step)
+
+        move_tsl = self.move_sl_bool(temp_sl_price, self.sl_price[rows])
+        sl_price = temp_sl_price[move_tsl]
+        average_entry = average_entry[move_tsl]
+        sl_pct = np.round(np.abs(average_entry - sl_price) / average_entry, 2)
+        self.set_moved_sl(rows=rows[move_tsl], sl_pct=sl_pct, sl_price=sl_price)
+
+    def check_move_tsl_pct(
+        self,
+        bar_index: int,
+        rows: np.ndarray,
+    ):
+        """
+        Summary
+        -------
+        Moves the trailing stop loss by the trail by pct for every row given where the candle body is far enough away from the stop loss
+        """
+        sl_price = self.sl_price[rows]
+        candle_body = self.candle_prices[self.trail_sl_bcb_row[rows], bar_index]
+        pct_from_sl = np.abs(candle_body - sl_price) / sl_price
+        possible_move_tsl = self.move_sl_bool(pct_from_sl, self.trail_sl_when_pct[rows])
+        if not possible_move_tsl.any():
+            return
+
+        rows = rows[possible_move_tsl]
+        sl_price = sl_price[possible_move_tsl]
+        new_sl_price = self.tsl_mover(price=sl_price, add_pct=self.trail_sl_by_pct[rows])
+        sl_pct = np.round(np.abs(sl_price - new_sl_price) / sl_price, 2)
+        self.set_moved_sl(rows=rows, sl_pct=sl_pct, sl_price=new_sl_price)
+
+    #######################################################
+    ##################     Entries     ####################
+    #######################################################
+
+    def calculate_stop_loss(
+        self,
+        bar_index: int,
+        rows: np.ndarray,
+    ) -> np.ndarray:
+        candle_body = self.sl_bcb_prices[self.sl_bcb_pair_idx[rows], bar_index]
+        sl_price = self.sl_price_calc(
+            price=candle_body,
+            add_pct=self.sl_based_on_add_pct[rows],
+        )
+        return np.round(sl_price, self.price_tick_step)
+
+    def long_entry_size_np(
+        self,
+        entry_price: float,
+        sl_price: np.ndarray,
+        total_possible_loss: np.ndarray,
+    ) -> np.ndarray:
+        price_mult_loss = entry_price * -total_possible_loss
+        div_by = -sl_price + entry_price + entry_price * self.market_fee_pct + self.market_fee_pct * sl_price
+        return np.round(price_mult_loss / div_by, 2)
+
+    def short_entry_size_np(
+        self,
+        entry_price: float,
+        sl_price: np.ndarray,
+        total_possible_loss: np.ndarray,
+    ) -> np.ndarray:
+        price_mult_loss = entry_price * -total_possible_loss
+        div_by = -entry_price + sl_price + entry_price * self.market_fee_pct + self.market_fee_pct * sl_price
+        return np.round(price_mult_loss / div_by, 2)
+
+    def long_entry_size_p(
+        self,
+        average_entry: np.ndarray,
+        entry_price: float,
+        position_size_usd: np.ndarray,
+        sl_price: np.ndarray,
+        total_possible_loss: np.ndarray,
+    ) -> np.ndarray:
+        return np.round(
+            -(
+                (
+                    entry_price * average_entry * total_possible_loss
+                    - entry_price * sl_price * position_size_usd
+                    + entry_price * sl_price * self.market_fee_pct * position_size_usd
+                    + entry_price * average_entry * position_size_usd
+                    + entry_price * self.market_fee_pct * average_entry * position_size_usd
+                )
+                / (
+                    average_entry
+                    * (-sl_price + entry_price + sl_price * self.market_fee_pct + entry_price * self.market_fee_pct)
+                )
+            ),
+            3,
+        )
+
+    def short_entry_size_p(
+        self,
+        average_entry: np.ndarray,
+        entry_price: float,
+        position_size_usd: np.ndarray,
+        sl_price: np.ndarray,
+        total_possible_loss: np.ndarray,
+    ) -> np.ndarray:
+        return np.round(
+            -(
+                (
+                    entry_price * average_entry * total_possible_loss
+                    - entry_price * average_entry * position_size_usd
+                    + entry_price * sl_price * position_size_usd
+                    + entry_price * sl_price * self.market_fee_pct * position_size_usd
+                    + entry_price * self.market_fee_pct * average_entry * position_size_usd
+                )
+                / (
+                    average_entry
+                    * (sl_price - entry_price + sl_price * self.market_fee_pct + entry_price * self.market_fee_pct)
+                )
+            ),
+            3,
+        )
+
+    def calculate_increase_position(
+        self,
+        entry_price: float,
+        rows: np.ndarray,
+        sl_price: np.ndarray,
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Summary
+        -------
+        Risk pct of account with the stop loss based on candle body for every row given, rows not in a position use the np formulas and rows in a position use the p formulas
+
+        Parameters
+        ----------
+        entry_price : float
+            entry_price
+        rows : np.ndarray
+            rows that have an entry on this bar
+        sl_price : np.ndarray
+            sl_price
+
+        Returns
+        -------
+        tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+            accepted,
+            average_entry,
+            position_size_asset,
+            position_size_usd,
+            total_possible_loss,
+            total_trades,
+            sl_pct
+        """
+        in_pos = self.position_size_asset[rows] > 0
+        average_entry = self.average_entry[rows]
+        position_size_asset = self.position_size_asset[rows]
+        position_size_usd = self.position_size_usd[rows]
+
+        # c_pl_ra_ps
+        total_trades = np.where(in_pos, self.total_trades[rows], 0) + 1
+        possible_loss = -np.trunc(self.equity[rows] * self.account_pct_risk_per_trade[rows])
+        total_possible_loss = total_trades * possible_loss
+
+        entry_size_usd = np.empty(rows.size)
+        entry_size_usd[~in_pos] = self.entry_calc_np(
+            entry_price=entry_price,
+            sl_price=sl_price[~in_pos],
+            total_possible_loss=total_possible_loss[~in_pos],
+        )
+        entry_size_usd[in_pos] = self.entry_calc_p(
+            average_entry=average_entry[in_pos],
+            entry_price=entry_price,
+            position_size_usd=position_size_usd[in_pos],
+            sl_price=sl_price[in_pos],
+            total_possible_loss=total_possible_loss[in_pos],
+        )
+        entry_size_asset = np.round(entry_size_usd / entry_price, self.asset_tick_step)
+
+        # c_too_b_s
+        accepted = (
+            (total_trades <= self.max_trades[rows])
+            & ~(entry_size_asset < self.min_asset_size)
+            & ~(entry_size_asset > self.max_asset_size)
+        )
+
+        position_size_asset = np.where(
+            in_pos,
+            np.round(position_size_asset + entry_size_asset, self.asset_tick_step),
+            entry_size_asset,
+        )
+        new_position_size_usd = np.where(
+            in_pos,
+            np.round(entry_size_usd + position_size_usd, 2),
+            entry_size_usd,
+        )
+        with np.errstate(divide="ignore", invalid="ignore"):
+            p_average_entry = (entry_size_usd + new_position_size_usd) / (
+                (entry_size_usd / entry_price) + (new_position_size_usd / average_entry)
+            )
+        average_entry = np.where(in_pos, np.round(p_average_entry, self.price_tick_step), entry_price)
+
+        sl_pct = np.round(np.abs(average_entry - sl_price) / average_entry, 2)
+        return (
+            accepted,
+            average_entry,
+            position_size_asset,
+            new_position_size_usd,
+            total_possible_loss,
+            total_trades,
+            sl_pct,
+        )
+
+    def long_calc_dynamic_lev(
+        self,
+        average_entry: np.ndarray,
+        sl_price: np.ndarray,
+    ) -> np.ndarray:
+        return average_entry / (-sl_price + sl_price * 0.001 + average_entry + average_entry * self.mmr_pct)
+
+    def short_calc_dynamic_lev(
+        self,
+        average_entry: np.ndarray,
+        sl_price: np.ndarray,
+    ) -> np.ndarray:
+        return average_entry / (sl_price + sl_price * 0.001 - average_entry + average_entry * self.mmr_pct)
+
+    def long_get_bankruptcy_price(
+        self,
+        average_entry: np.ndarray,
+        leverage: np.ndarray,
+    ) -> np.ndarray:
+        return average_entry * (leverage - 1) / leverage
+
+    def short_get_bankruptcy_price(
+        self,
+        average_entry: np.ndarray,
+        leverage: np.ndarray,
+    ) -> np.ndarray:
+        return average_entry * (leverage + 1) / leverage
+
+    def long_get_liq_price(
+        self,
+        average_entry: np.ndarray,
+        leverage: np.ndarray,
+    ) -> np.ndarray:
+        return average_entry * (1 - (1 / leverage) + self.mmr_pct)
+
+    def short_get_liq_price(
+        self,
+        average_entry: np.ndarray,
+        leverage: np.ndarray,
+    ) -> np.ndarray:
+        return average_entry * (1 + (1 / leverage) - self.mmr_pct)
+
+    def calculate_leverage(
+        self,
+        average_entry: np.ndarray,
+        position_size_asset: np.ndarray,
+        position_size_usd: np.ndarray,
+        rows: np.ndarray,
+        sl_price: np.ndarray,
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Summary
+        -------
+        Dynamic leverage for every row given
+
+        Returns
+        -------
+        tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+            accepted,
+            available_balance,
+            cash_borrowed,
+            cash_used,
+            liq_price
+        """
+        leverage = self.calc_dynamic_lev(average_entry=average_entry, sl_price=sl_price)
+        leverage = np.round(leverage, self.leverage_tick_step)
+        leverage = np.where(
+            leverage > self.max_leverage,
+            self.max_leverage,
+            np.where(leverage < self.min_leverage, 1, leverage),
+        )
+
+        initial_margin = (position_size_asset * average_entry) / leverage
+        fee_to_open = position_size_asset * average_entry * self.market_fee_pct  # math checked
+        bankruptcy_price = self.get_bankruptcy_price(average_entry=average_entry, leverage=leverage)
+        fee_to_close = position_size_asset * bankruptcy_price * self.market_fee_pct
+        cash_used = initial_margin + fee_to_open + fee_to_close  # math checked
+
+        og_available_balance = self.available_balance[rows]
+        accepted = ~(cash_used > og_available_balance)
+
+        available_balance = np.round(og_available_balance - cash_used, 2)
+        cash_used = np.round(self.cash_used[rows] + cash_used, 2)
+        cash_borrowed = np.round(self.cash_borrowed[rows] + position_size_usd - cash_used, 2)
+
+        liq_price = self.get_liq_price(average_entry=average_entry, leverage=leverage)  # math checked
+        liq_price = np.round(liq_price, self.price_tick_step)
+        return (
+            accepted,
+            available_balance,
+            cash_borrowed,
+            cash_used,
+            liq_price,
+        )
+
+    def long_tp_price(
+        self,
+        average_entry: np.ndarray,
+        position_size_usd: np.ndarray,
+        profit: np.ndarray,
+    ) -> np.ndarray:
+        return (
+            (profit * average_entry)
+            + (average_entry * position_size_usd)
+            + (average_entry * self.market_fee_pct * position_size_usd)
+        ) / (position_size_usd * (1 - self.tp_fee_pct))
+
+    def short_tp_price(
+        self,
+        average_entry: np.ndarray,
+        position_size_usd: np.ndarray,
+        profit: np.ndarray,
+    ) -> np.ndarray:
+        return -(
+            (profit * average_entry)
+            - (average_entry * position_size_usd)
+            + (average_entry * self.market_fee_pct * position_size_usd)
+        ) / (position_size_usd * (1 + self.tp_fee_pct))
+
+    def tp_rr(
+        self,
+        average_entry: np.ndarray,
+        position_size_usd: np.ndarray,
+        rows: np.ndarray,
+        total_possible_loss: np.ndarray,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        profit = -total_possible_loss * self.risk_reward[rows]
+        tp_price = self.get_tp_price(
+            average_entry=average_entry,
+            position_size_usd=position_size_usd,
+            profit=profit,
+        )
+        tp_price = np.round(tp_price, self.price_tick_step)
+        tp_pct = np.round(np.abs((tp_price - average_entry)) / average_entry, 2)
+        return tp_price, tp_pct
+
+    def tp_provided(
+        self,
+        average_entry: np.ndarray,
+        position_size_usd: np.ndarray,
+        rows: np.ndarray,
+        total_possible_loss: np.ndarray,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        return np.full(rows.size, np.nan), np.full(rows.size, np.nan)
+
+    def calculate_entries(
+        self,
+        bar_index: int,
+        entry_price: float,
+        rows: np.ndarray,
+    ):
+        """
+        Summary
+        -------
+        Runs the stop loss, increase position, leverage and take profit calculators for every row given and fills the order variables of the rows that did not get rejected
+
+        Parameters
+        ----------
+        bar_index : int
+            bar_index
+        entry_price : float
+            close price of the bar
+        rows : np.ndarray
+            rows that have an entry on this bar
+        """
+        sl_price = self.calculate_stop_loss(bar_index=bar_index, rows=rows)
+
+        (
+            accepted,
+            average_entry,
+            position_size_asset,
+            position_size_usd,
+            total_possible_loss,
+            total_trades,
+            sl_pct,
+        ) = self.calculate_increase_position(
+            entry_price=entry_price,
+            rows=rows,
+            sl_price=sl_price,
+        )
+        rows = rows[accepted]
+        if rows.size == 0:
+            return
+        average_entry = average_entry[accepted]
+        position_size_asset = position_size_asset[accepted]
+        position_size_usd = position_size_usd[accepted]
+        total_possible_loss = total_possible_loss[accepted]
+        total_trades = total_trades[accepted]
+        sl_pct = sl_pct[accepted]
+        sl_price = sl_price[accepted]
+
+        (
+            accepted,
+            available_balance,
+            cash_borrowed,
+            cash_used,
+            liq_price,
+        ) = self.calculate_leverage(
+            average_entry=average_entry,
+            position_size_asset=position_size_asset,
+            position_size_usd=position_size_usd,
+            rows=rows,
+            sl_price=sl_price,
+        )
+        rows = rows[accepted]
+        if rows.size == 0:
+            return
+
+        tp_price, tp_pct = self.tp_calculator(
+            average_entry=average_entry[accepted],
+            position_size_usd=position_size_usd[accepted],
+            rows=rows,
+            total_possible_loss=total_possible_loss[accepted],
+        )
+
+        self.available_balance[rows] = available_balance[accepted]
+        self.average_entry[rows] = average_entry[accepted]
+        self.can_move_sl_to_be[rows] = True
+        self.cash_borrowed[rows] = cash_borrowed[accepted]
+        self.cash_used[rows] = cash_used[accepted]
+        self.liq_price[rows] = liq_price[accepted]
+        self.position_size_asset[rows] = position_size_asset[accepted]
+        self.position_size_usd[rows] = position_size_usd[accepted]
+        self.total_possible_loss[rows] = total_possible_loss[accepted]
+        self.sl_pct[rows] = sl_pct[accepted]
+        self.sl_price[rows] = sl_price[accepted]
+        self.total_trades[rows] = total_trades[accepted]
+        self.tp_pct[rows] = tp_pct
+        self.tp_price[rows] = tp_price
@@ -1,9 +1,13 @@
+import numpy as np
 from logging import getLogger
 from quantfreedom.core.enums import (
     IncreasePositionType,
+    OrderStatus,
     RejectedOrder,
     StopLossStrategyType,
+    TraceEvent,
 )
+from quantfreedom.helpers import trace
 from quantfreedom.helpers.helper_funcs import round_size_by_tick_step
 
 logger = getLogger()
@@ -67,6 +71,7 @@ class IncreasePosition:
         if sl_strategy_type == StopLossStrategyType.SLBasedOnCandleBody:
             if increase_position_type == IncreasePositionType.RiskPctAccountEntrySize:
                 self.inc_pos_calculator = self.rpa_slbcb
+                self.inc_pos_status_calculator = self.rpa_slbcb_status
             elif increase_position_type == IncreasePositionType.SmalletEntrySizeAsset:
                 self.inc_pos_calculator = self.min_asset_amount
 
@@ -85,20 +90,39 @@ class IncreasePosition:
             entry size of the asset
 
         """
+        order_status = self.get_too_b_s_status(entry_size_asset=entry_size_asset)
+        if order_status != OrderStatus.Nothing:
+            raise RejectedOrder(msg=OrderStatus._fields[order_status])
+
+    def get_too_b_s_status(
+        self,
+        entry_size_asset: float,
+    ) -> int:
+        """
+        Summary
+        -------
+        Same check as c_too_b_s but returns the order status instead of raising RejectedOrder
+
+        Parameters
+        ----------
+        entry_size_asset : float
+            entry size of the asset
+
+        Returns
+        -------
+        int
+            EntrySizeTooSmall, EntrySizeTooBig or Nothing if the size is fine
+        """
         if entry_size_asset < self.min_asset_size:
-            msg = f"entry size too small entry_size_asset= {entry_size_asset} < self.min_asset_size= {self.min_asset_size}"
-            logger.warning(msg)
-            RejectedOrder.msg = msg
-            raise RejectedOrder
+            if trace.tracer is not None:
+                trace.tracer.record(TraceEvent.EntrySizeTooSmall, entry_size_asset, self.min_asset_size)
+            return OrderStatus.EntrySizeTooSmall
         elif entry_size_asset > self.max_asset_size:
-            msg = (
-                f"entry size too big entry_size_asset= {entry_size_asset} > self.max_asset_size= {self.max_asset_size}"
-            )
-            logger.warning(msg)
-            RejectedOrder.msg = msg
-            raise RejectedOrder
+            if trace.tracer is not None:
+                trace.tracer.record(TraceEvent.EntrySizeTooBig, entry_size_asset, self.max_asset_size)
+            return OrderStatus.EntrySizeTooBig
 
-        logger.debug(f"Entry size is fine entry_size_asset= {entry_size_asset}")
+        return OrderStatus.Nothing
 
     def c_pl_ra_ps(
         self,
@@ -122,26 +146,47 @@ class IncreasePosition:
         int, int
             total_possible_loss, total_trades
         """
+        order_status, total_possible_loss, total_trades = self.get_pl_ra_ps_status(
+            equity=equity,
+            total_trades=total_trades,
+        )
+        if order_status != OrderStatus.Nothing:
+            raise RejectedOrder(msg=OrderStatus._fields[order_status])
+        return total_possible_loss, total_trades
+
+    def get_pl_ra_ps_status(
+        self,
+        equity: float,
+        total_trades: int,
+    ) -> tuple[int, int, int]:
+        """
+        Summary
+        -------
+        Same as c_pl_ra_ps but returns the order status instead of raising RejectedOrder
+
+        Parameters
+        ----------
+        equity : float
+            equity
+        total_trades : int
+            total_trades
+
+        Returns
+        -------
+        int, int, int
+            order_status which is HitMaxTrades or Nothing, total_possible_loss, total_trades
+        """
         total_trades += 1
 
         if total_trades > self.max_trades:
-            msg = f"Max trades reached - total trades= {total_trades} max trades= {self.max_trades}"
-            logger.warning(msg)
-            RejectedOrder.msg = msg
-            raise RejectedOrder
+            if trace.tracer is not None:
+                trace.tracer.record(TraceEvent.HitMaxTrades, total_trades, self.max_trades)
+            return OrderStatus.HitMaxTrades, 0, total_trades
 
         possible_loss = -int(equity * self.account_pct_risk_per_trade)
 
         total_possible_loss = int(total_trades * possible_loss)
-
-        logger.debug(
-            f"""
-total trades= {total_trades}
-max trades= {self.max_trades}
-possible_loss= {possible_loss}
-total_possible_loss= {total_possible_loss}"""
-        )
-        return total_possible_loss, total_trades
+        return OrderStatus.Nothing, total_possible_loss, total_trades
 
     def c_total_trades(
         self,
@@ -191,14 +236,6 @@ total_possible_loss= {total_possible_loss}"""
         fees_paid = fee_open + fee_close  # math checked
         possible_loss = -int(pnl - fees_paid)
         total_possible_loss = int(total_trades * possible_loss)
-
-        logger.debug(
-            f"""
-Total trades= {total_trades}
-max trades= {self.max_trades}
-possible_loss= {possible_loss}
-total_possible_loss= {total_possible_loss}"""
-        )
         return total_possible_loss, total_trades
 
     def min_asset_amount(
@@ -249,7 +286,6 @@ total_possible_loss= {total_possible_loss}"""
             sl_pct
         """
         if position_size_asset > 0:
-            logger.debug("We are in a position")
             return self.min_amount_p(
                 average_entry=average_entry,
                 entry_price=entry_price,
@@ -259,7 +295,6 @@ total_possible_loss= {total_possible_loss}"""
                 total_trades=total_trades,
             )
         else:
-            logger.debug("Not in a position")
             return self.min_amount_np(
                 entry_price=entry_price,
                 sl_price=sl_price,
@@ -311,10 +346,8 @@ total_possible_loss= {total_possible_loss}"""
         """
         position_size_asset += self.min_asset_size
         entry_size_asset = self.min_asset_size
-        logger.debug(f"entry_size_asset= {entry_size_asset} position_size_asset{position_size_asset}")
 
         entry_size_usd = round(self.min_asset_size * entry_price, 2)
-        logger.debug(f"entry_size_usd = {entry_size_usd}")
 
         average_entry = (entry_size_usd + position_size_usd) / (
             (entry_size_usd / entry_price) + (position_size_usd / average_entry)
@@ -323,13 +356,10 @@ total_possible_loss= {total_possible_loss}"""
             user_num=average_entry,
             exchange_num=self.price_tick_step,
         )
-        logger.debug(f"average_entry {average_entry}")
 
         sl_pct = round(abs(average_entry - sl_price) / average_entry, 2)
-        logger.debug(f"sl_pct= {round(sl_pct*100, 2)}")
 
         position_size_usd = round(entry_size_usd + position_size_usd, 2)
-        logger.debug(f"position_size_usd= {position_size_usd}")
 
         total_possible_loss, total_trades = self.c_total_trades(
             average_entry=average_entry,
@@ -338,7 +368,6 @@ total_possible_loss= {total_possible_loss}"""
             position_size_asset=position_size_asset,
             sl_price=sl_price,
         )
-        logger.debug(f"total_possible_loss= {total_possible_loss} total_trades= {total_trades}")
 
         self.c_too_b_s(entry_size_asset=entry_size_asset)
         return (
@@ -384,15 +413,11 @@ total_possible_loss= {total_possible_loss}"""
             sl_pct
         """
         entry_size_asset = position_size_asset = self.min_asset_size
-        logger.debug(f"entry_size_asset={entry_size_asset} position_size_asset= {position_size_asset}")
 
         entry_size_usd = position_size_usd = round(entry_size_asset * entry_price, 2)
-        logger.debug(f"entry_size_usd= {entry_size_usd} position_size_usd= {position_size_usd}")
 
         average_entry = entry_price
-        logger.debug(f"average_entry {average_entry}")
         sl_pct = round(abs(average_entry - sl_price) / average_entry, 2)
-        logger.debug(f"sl_pct= {round(sl_pct*100, 2)}")
 
         total_possible_loss, total_trades = self.c_total_trades(
             average_entry=average_entry,
@@ -401,7 +426,6 @@ total_possible_loss= {total_possible_loss}"""
             sl_price=sl_price,
             total_trades=0,
         )
-        logger.debug(f"total_possible_loss= {total_possible_loss} total_trades {total_trades}")
 
         self.c_too_b_s(
             entry_size_asset=entry_size_asset,
@@ -603,6 +627,47 @@ total_possible_loss= {total_possible_loss}"""
         sl_price: float,
         total_trades: int,
     ) -> tuple[float, float, float, float, float, float, int, int, float]:
+        """
+        Summary
+        -------
+        rpa_slbcb_status that raises RejectedOrder if the order got rejected
+
+        Returns
+        -------
+        float, float, float, float, float, float, int, int, float
+            average_entry,
+            entry_price,
+            entry_size_asset,
+            entry_size_usd,
+            position_size_asset,
+            position_size_usd,
+            total_possible_loss,
+            total_trades,
+            sl_pct
+        """
+        order_status, *results = self.rpa_slbcb_status(
+            equity=equity,
+            average_entry=average_entry,
+            entry_price=entry_price,
+            position_size_asset=position_size_asset,
+            position_size_usd=position_size_usd,
+            sl_price=sl_price,
+            total_trades=total_trades,
+        )
+        if order_status != OrderStatus.EntryFilled:
+            raise RejectedOrder(msg=OrderStatus._fields[order_status])
+        return tuple(results)
+
+    def rpa_slbcb_status(
+        self,
+        equity: float,
+        average_entry: float,
+        entry_price: float,
+        position_size_asset: float,
+        position_size_usd: float,
+        sl_price: float,
+        total_trades: int,
+    ) -> tuple[int, float, float, float, float, float, float, int, int, float]:
         """
         Summary
         -------
@@ -629,7 +694,8 @@ total_possible_loss= {total_possible_loss}"""
 
         Returns
         -------
-        float, float, float, float, float, float, int, int, float
+        int, float, float, float, float, float, float, int, int, float
+            order_status which is EntryFilled or the reason the order got rejected,
             average_entry,
             entry_price,
             entry_size_asset,
@@ -641,8 +707,7 @@ total_possible_loss= {total_possible_loss}"""
             sl_pct
         """
         if position_size_asset > 0:
-            logger.debug("We are in a position")
-            return self.rpa_slbcb_p(
+            return self.rpa_slbcb_p_status(
                 equity=equity,
                 average_entry=average_entry,
                 entry_price=entry_price,
@@ -652,14 +717,13 @@ total_possible_loss= {total_possible_loss}"""
                 total_trades=total_trades,
             )
         else:
-            logger.debug("Not in a position")
-            return self.rpa_slbcb_np(
+            return self.rpa_slbcb_np_status(
                 equity=equity,
                 entry_price=entry_price,
                 sl_price=sl_price,
             )
 
-    def rpa_slbcb_p(
+    def rpa_slbcb_p_status(
         self,
         average_entry: float,
         entry_price: float,
@@ -668,7 +732,7 @@ total_possible_loss= {total_possible_loss}"""
         position_size_usd: float,
         sl_price: float,
         total_trades: int,
-    ) -> tuple[float, float, float, float, float, float, int, int, float]:
+    ) -> tuple[int, float, float, float, float, float, float, int, int, float]:
         """
         Summary
         -------
@@ -695,7 +759,8 @@ total_possible_loss= {total_possible_loss}"""
 
         Returns
         -------
-        float, float, float, float, float, float, int, int, float
+        int, float, float, float, float, float, float, int, int, float
+            order_status which is EntryFilled or the reason the order got rejected,
             average_entry,
             entry_price,
             entry_size_asset,
@@ -706,10 +771,23 @@ total_possible_loss= {total_possible_loss}"""
             total_trades,
             sl_pct
         """
-        total_possible_loss, total_trades = self.c_pl_ra_ps(
+        order_status, total_possible_loss, total_trades = self.get_pl_ra_ps_status(
             equity=equity,
             total_trades=total_trades,
         )
+        if order_status != OrderStatus.Nothing:
+            return (
+                order_status,
+                np.nan,
+                np.nan,
+                np.nan,
+                np.nan,
+                np.nan,
+                np.nan,
+                total_possible_loss,
+                total_trades,
+                np.nan,
+            )
 
         entry_size_usd = self.entry_calc_p(
             total_possible_loss=total_possible_loss,
@@ -718,22 +796,32 @@ total_possible_loss= {total_possible_loss}"""
             average_entry=average_entry,
             position_size_usd=position_size_usd,
         )
-        logger.debug(f"entry_size_usd= {entry_size_usd}")
 
         entry_size_asset = round_size_by_tick_step(
             user_num=entry_size_usd / entry_price,
             exchange_num=self.asset_tick_step,
         )
-        self.c_too_b_s(entry_size_asset=entry_size_asset)
+        order_status = self.get_too_b_s_status(entry_size_asset=entry_size_asset)
+        if order_status != OrderStatus.Nothing:
+            return (
+                order_status,
+                np.nan,
+                np.nan,
+                np.nan,
+                np.nan,
+                np.nan,
+                np.nan,
+                total_possible_loss,
+                total_trades,
+                np.nan,
+            )
 
         position_size_asset = round_size_by_tick_step(
             user_num=position_size_asset + entry_size_asset,
             exchange_num=self.asset_tick_step,
         )
-        logger.debug(f"position_size_asset= {position_size_asset}")
 
         position_size_usd = round(entry_size_usd + position_size_usd, 2)
-        logger.debug(f"position_size_usd= {position_size_usd}")
 
         average_entry = (entry_size_usd + position_size_usd) / (
             (entry_size_usd / entry_price) + (position_size_usd / average_entry)
@@ -742,11 +830,10 @@ total_possible_loss= {total_possible_loss}"""
             user_num=average_entry,
             exchange_num=self.price_tick_step,
         )
-        logger.debug(f"average_entry= {average_entry}")
 
         sl_pct = round(abs(average_entry - sl_price) / average_entry, 2)
-        logger.debug(f"sl_pct= {round(sl_pct * 100, 2)}")
         return (
+            OrderStatus.EntryFilled,
             average_entry,
             entry_price,
             entry_size_asset,
@@ -758,12 +845,12 @@ total_possible_loss= {total_possible_loss}"""
             sl_pct,
         )
 
-    def rpa_slbcb_np(
+    def rpa_slbcb_np_status(
         self,
         equity: float,
         entry_price: float,
         sl_price: float,
-    ) -> tuple[float, float, float, float, float, float, int, int, float]:
+    ) -> tuple[int, float, float, float, float, float, float, int, int, float]:
         """
         Summary
         -------
@@ -780,7 +867,8 @@ total_possible_loss= {total_possible_loss}"""
 
         Returns
         -------
-        tuple[float, float, float, float, float, float, int, int, float]
+        tuple[int, float, float, float, float, float, float, int, int, float]
+            order_status which is EntryFilled or the reason the order got rejected,
             average_entry,
             entry_price,
             entry_size_asset,
@@ -791,28 +879,53 @@ total_possible_loss= {total_possible_loss}"""
             total_trades,
             sl_pct
         """
-        total_possible_loss, total_trades = self.c_pl_ra_ps(
+        order_status, total_possible_loss, total_trades = self.get_pl_ra_ps_status(
             equity=equity,
             total_trades=0,
         )
+        if order_status != OrderStatus.Nothing:
+            return (
+                order_status,
+                np.nan,
+                np.nan,
+                np.nan,
+                np.nan,
+                np.nan,
+                np.nan,
+                total_possible_loss,
+                total_trades,
+                np.nan,
+            )
 
         entry_size_usd = position_size_usd = self.entry_calc_np(
             sl_price=sl_price,
             entry_price=entry_price,
             total_possible_loss=total_possible_loss,
         )
-        logger.debug(f"entry_size_usd= {entry_size_usd}")
         entry_size_asset = position_size_asset = round_size_by_tick_step(
             user_num=entry_size_usd / entry_price,
             exchange_num=self.asset_tick_step,
         )
-        self.c_too_b_s(entry_size_asset=entry_size_asset)
+        order_status = self.get_too_b_s_status(entry_size_asset=entry_size_asset)
+        if order_status != OrderStatus.Nothing:
+            return (
+                order_status,
+                np.nan,
+                np.nan,
+                np.nan,
+                np.nan,
+                np.nan,
+                np.nan,
+                total_possible_loss,
+                total_trades,
+                np.nan,
+            )
 
         average_entry = entry_price
 
         sl_pct = round(abs(average_entry - sl_price) / average_entry, 2)
-        logger.debug(f"sl_pct= {round(sl_pct * 100, 2)}")
         return (
+            OrderStatus.EntryFilled,
             average_entry,
             entry_price,
             entry_size_asset,
@@ -823,3 +936,42 @@ total_possible_loss= {total_possible_loss}"""
             total_trades,
             sl_pct,
         )
+
+    def inc_pos_status_calculator(
+        self,
+        equity: float,
+        average_entry: float,
+        entry_price: float,
+        position_size_asset: float,
+        position_size_usd: float,
+        sl_price: float,
+        total_trades: int,
+    ) -> tuple[int, float, float, float, float, float, float, int, int, float]:
+        """
+        Summary
+        -------
+        Increase position types without a status version of their own still go through inc_pos_calculator and RejectedOrder gets turned into an order status
+        """
+        try:
+            return (OrderStatus.EntryFilled,) + self.inc_pos_calculator(
+                equity=equity,
+                average_entry=average_entry,
+                entry_price=entry_price,
+                position_size_asset=position_size_asset,
+                position_size_usd=position_size_usd,
+                sl_price=sl_price,
+                total_trades=total_trades,
+            )
+        except RejectedOrder:
+            return (
+                OrderStatus.Nothing,
+                np.nan,
+                np.nan,
+                np.nan,
+                np.nan,
+                np.nan,
+                np.nan,
+                np.nan,
+                total_trades,
+                np.nan,
+            )
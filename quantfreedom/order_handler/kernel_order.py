@@ -0,0 +1,1055 @@
+import numpy as np
+
+from logging import getLogger
+
+from quantfreedom.core.enums import (
+    CandleBodyType,
+    DynamicOrderSettings,
+    ExchangeSettings,
+    FootprintCandlesTuple,
+    IncreasePositionType,
+    KernelOrderSettings,
+    LeverageStrategyType,
+    OrderStatus,
+    PruneRule,
+    StaticOrderSettings,
+    StopLossStrategyType,
+    TakeProfitStrategyType,
+    TrailingSLStrategyType,
+    or_dt,
+)
+from quantfreedom.helpers.trade_metrics import add_closed_trade, get_trade_metrics, reset_trade_metrics
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+logger = getLogger()
+
+JIT_AVAILABLE = njit is not None
+
+# numba can't read attributes of the enum tuples so the kernel gets them as plain ints
+CANDLE_OPEN = CandleBodyType.Open
+CANDLE_CLOSE = CandleBodyType.Close
+ENTRY_FILLED = OrderStatus.EntryFilled
+STOP_LOSS_FILLED = OrderStatus.StopLossFilled
+TAKE_PROFIT_FILLED = OrderStatus.TakeProfitFilled
+LIQUIDATION_FILLED = OrderStatus.LiquidationFilled
+MOVED_SL_TO_BE = OrderStatus.MovedSLToBE
+MOVED_TSL = OrderStatus.MovedTSL
+CASH_USED_EXCEED = OrderStatus.CashUsedExceed
+ENTRY_SIZE_TOO_SMALL = OrderStatus.EntrySizeTooSmall
+ENTRY_SIZE_TOO_BIG = OrderStatus.EntrySizeTooBig
+HIT_MAX_TRADES = OrderStatus.HitMaxTrades
+NOTHING = OrderStatus.Nothing
+CANT_AFFORD_MIN_ASSET = PruneRule.CantAffordMinAsset
+CANT_PASS_FILTERS = PruneRule.CantPassFilters
+NOT_PRUNED = -1
+TSL_CB_ABOVE_BELOW = TrailingSLStrategyType.CBAboveBelow
+TSL_PCT_ABOVE_BELOW = TrailingSLStrategyType.PctAboveBelow
+TP_RISK_REWARD = TakeProfitStrategyType.RiskReward
+TP_PROVIDED = TakeProfitStrategyType.Provided
+
+# or_dt without the timestamp, the kernel only knows bars so the timestamps get filled in after
+KERNEL_RECORD_FIELDS = tuple(name for name in or_dt.names if name != "timestamp")
+
+
+def jit_kernel(func):
+    """
+    Compiles func with numba when it is installed, without numba func stays plain python
+    """
+    if njit is None:
+        return func
+    return njit(cache=True)(func)
+
+
+kernel_add_closed_trade = jit_kernel(add_closed_trade)
+kernel_reset_trade_metrics = jit_kernel(reset_trade_metrics)
+
+
+@jit_kernel
+def sl_based_on_candle_body(
+    bar_index: int,
+    candle_prices: np.ndarray,
+    kos: KernelOrderSettings,
+    sl_based_on_add_pct: float,
+    sl_based_on_lookback: int,
+    sl_bcb_type: int,
+) -> float:
+    lookback = max(bar_index - sl_based_on_lookback, 0)
+    the_prices = candle_prices[int(sl_bcb_type) - CANDLE_OPEN, lookback : bar_index + 1]
+    if kos.sl_bcb_min:
+        candle_body = the_prices.min()
+    else:
+        candle_body = the_prices.max()
+
+    if kos.is_long:
+        sl_price = candle_body - (candle_body * sl_based_on_add_pct)
+    else:
+        sl_price = candle_body + (candle_body * sl_based_on_add_pct)
+    return round(sl_price, kos.price_tick_step)
+
+
+@jit_kernel
+def get_pl_ra_ps(
+    account_pct_risk_per_trade: float,
+    equity: float,
+    max_trades: int,
+    total_trades: int,
+) -> tuple[int, int, int]:
+    total_trades += 1
+    if total_trades > max_trades:
+        return HIT_MAX_TRADES, 0, total_trades
+
+    possible_loss = -int(equity * account_pct_risk_per_trade)
+    total_possible_loss = int(total_trades * possible_loss)
+    return NOTHING, total_possible_loss, total_trades
+
+
+@jit_kernel
+def get_too_b_s(
+    entry_size_asset: float,
+    kos: KernelOrderSettings,
+) -> int:
+    if entry_size_asset < kos.min_asset_size:
+        return ENTRY_SIZE_TOO_SMALL
+    elif entry_size_asset > kos.max_asset_size:
+        return ENTRY_SIZE_TOO_BIG
+    return NOTHING
+
+
+@jit_kernel
+def rpa_slbcb_p(
+    account_pct_risk_per_trade: float,
+    average_entry: float,
+    entry_price: float,
+    equity: float,
+    kos: KernelOrderSettings,
+    max_trades: int,
+    position_size_asset: float,
+    position_size_usd: float,
+    sl_price: float,
+    total_trades: int,
+) -> tuple[int, float, float, float, float, float, int, int, float]:
+    """
+    Summary
+    -------
+    IncreasePosition.rpa_slbcb_p_status with long_entry_size_p and short_entry_size_p put in line
+
+    Returns
+    -------
+    tuple[int, float, float, float, float, float, int, int, float]
+        order_status,
+        average_entry,
+        entry_size_asset,
+        entry_size_usd,
+        position_size_asset,
+        position_size_usd,
+        total_possible_loss,
+        total_trades,
+        sl_pct
+    """
+    order_status, total_possible_loss, total_trades = get_pl_ra_ps(
+        account_pct_risk_per_trade=account_pct_risk_per_trade,
+        equity=equity,
+        max_trades=max_trades,
+        total_trades=total_trades,
+    )
+    if order_status != NOTHING:
+        return order_status, np.nan, np.nan, np.nan, np.nan, np.nan, total_possible_loss, total_trades, np.nan
+
+    market_fee_pct = kos.market_fee_pct
+    if kos.is_long:
+        entry_size_usd = round(
+            -(
+                (
+                    entry_price * average_entry * total_possible_loss
+                    - entry_price * sl_price * position_size_usd
+                    + entry_price * sl_price * market_fee_pct * position_size_usd
+                    + entry_price * average_entry * position_size_usd
+                    + entry_price * market_fee_pct * average_entry * position_size_usd
+                )
+                / (average_entry * (-sl_price + entry_price + sl_price * market_fee_pct + entry_price * market_fee_pct))
+            ),
+            3,
+        )
+    else:
+        entry_size_usd = round(
+            -(
+                (
+                    entry_price * average_entry * total_possible_loss
+                    - entry_price * average_entry * position_size_usd
+                    + entry_price * sl_price * position_size_usd
+                    + entry_price * sl_price * market_fee_pct * position_size_usd
+                    + entry_price * market_fee_pct * average_entry * position_size_usd
+                )
+                / (average_entry * (sl_price - entry_price + sl_price * market_fee_pct + entry_price * market_fee_pct))
+            ),
+            3,
+        )
+
+    entry_size_asset = round(entry_size_usd / entry_price, kos.asset_tick_step)
+    order_status = get_too_b_s(entry_size_asset=entry_size_asset, kos=kos)
+    if order_status != NOTHING:
+        return order_status, np.nan, np.nan, np.nan, np.nan, np.nan, total_possible_loss, total_trades, np.nan
+
+    position_size_asset = round(position_size_asset + entry_size_asset, kos.asset_tick_step)
+    position_size_usd = round(entry_size_usd + position_size_usd, 2)
+    average_entry = (entry_size_usd + position_size_usd) / (
+        (entry_size_usd / entry_price) + (position_size_usd / average_entry)
+    )
+    average_entry = round(average_entry, kos.price_tick_step)
+    sl_pct = round(abs(average_entry - sl_price) / average_entry, 2)
+    return (
+        ENTRY_FILLED,
+        average_entry,
+        entry_size_asset,
+        entry_size_usd,
+        position_size_asset,
+        position_size_usd,
+        total_possible_loss,
+        total_trades,
+        sl_pct,
+    )
+
+
+@jit_kernel
+def rpa_slbcb_np(
+    account_pct_risk_per_trade: float,
+    entry_price: float,
+    equity: float,
+    kos: KernelOrderSettings,
+    max_trades: int,
+    sl_price: float,
+) -> tuple[int, float, float, float, float, float, int, int, float]:
+    """
+    Summary
+    -------
+    IncreasePosition.rpa_slbcb_np_status with long_entry_size_np and short_entry_size_np put in line
+
+    Returns
+    -------
+    tuple[int, float, float, float, float, float, int, int, float]
+        same as rpa_slbcb_p
+    """
+    order_status, total_possible_loss, total_trades = get_pl_ra_ps(
+        account_pct_risk_per_trade=account_pct_risk_per_trade,
+        equity=equity,
+        max_trades=max_trades,
+        total_trades=0,
+    )
+    if order_status != NOTHING:
+        return order_status, np.nan, np.nan, np.nan, np.nan, np.nan, total_possible_loss, total_trades, np.nan
+
+    market_fee_pct = kos.market_fee_pct
+    price_mult_loss = entry_price * -total_possible_loss
+    if kos.is_long:
+        div_by = -sl_price + entry_price + entry_price * market_fee_pct + market_fee_pct * sl_price
+    else:
+        div_by = -entry_price + sl_price + entry_price * market_fee_pct + market_fee_pct * sl_price
+    entry_size_usd = round(price_mult_loss / div_by, 2)
+
+    entry_size_asset = round(entry_size_usd / entry_price, kos.asset_tick_step)
+    order_status = get_too_b_s(entry_size_asset=entry_size_asset, kos=kos)
+    if order_status != NOTHING:
+        return order_status, np.nan, np.nan, np.nan, np.nan, np.nan, total_possible_loss, total_trades, np.nan
+
+    average_entry = entry_price
+    sl_pct = round(abs(average_entry - sl_price) / average_entry, 2)
+    return (
+        ENTRY_FILLED,
+        average_entry,
+        entry_size_asset,
+        entry_size_usd,
+        entry_size_asset,
+        entry_size_usd,
+        total_possible_loss,
+        total_trades,
+        sl_pct,
+    )
+
+
+@jit_kernel
+def calc_liq_price(
+    average_entry: float,
+    kos: KernelOrderSettings,
+    leverage: float,
+    og_available_balance: float,
+    og_cash_borrowed: float,
+    og_cash_used: float,
+    position_size_asset: float,
+    position_size_usd: float,
+) -> tuple[int, float, float, float, float]:
+    """
+    Summary
+    -------
+    Leverage.calc_liq_price_status with the long and short bankruptcy and liq prices put in line
+
+    Returns
+    -------
+    tuple[int, float, float, float, float]
+        order_status, available_balance, cash_borrowed, cash_used, liq_price
+    """
+    initial_margin = (position_size_asset * average_entry) / leverage
+    fee_to_open = position_size_asset * average_entry * kos.market_fee_pct  # math checked
+    if kos.is_long:
+        bankruptcy_price = average_entry * (leverage - 1) / leverage
+    else:
+        bankruptcy_price = average_entry * (leverage + 1) / leverage
+    fee_to_close = position_size_asset * bankruptcy_price * kos.market_fee_pct
+    cash_used = initial_margin + fee_to_open + fee_to_close  # math checked
+
+    if cash_used > og_available_balance:
+        return CASH_USED_EXCEED, np.nan, np.nan, np.nan, np.nan
+
+    available_balance = round(og_available_balance - cash_used, 2)
+    cash_used = round(og_cash_used + cash_used, 2)
+    cash_borrowed = round(og_cash_borrowed + position_size_usd - cash_used, 2)
+
+    # https://www.bybithelp.com/HelpCenterKnowledge/bybitHC_Article?id=000001067&language=en_US
+    if kos.is_long:
+        liq_price = average_entry * (1 - (1 / leverage) + kos.mmr_pct)  # math checked
+    else:
+        liq_price = average_entry * (1 + (1 / leverage) - kos.mmr_pct)  # math checked
+    liq_price = round(liq_price, kos.price_tick_step)
+    return ENTRY_FILLED, available_balance, cash_borrowed, cash_used, liq_price
+
+
+@jit_kernel
+def dynamic_lev(
+    average_entry: float,
+    kos: KernelOrderSettings,
+    sl_price: float,
+) -> float:
+    # https://www.bybithelp.com/HelpCenterKnowledge/bybitHC_Article?id=000001067&language=en_US
+    if kos.is_long:
+        leverage = average_entry / (-sl_price + sl_price * 0.001 + average_entry + average_entry * kos.mmr_pct)
+    else:
+        leverage = average_entry / (sl_price + sl_price * 0.001 - average_entry + average_entry * kos.mmr_pct)
+    leverage = round(leverage, kos.leverage_tick_step)
+    if leverage > kos.max_leverage:
+        leverage = kos.max_leverage
+    elif leverage < kos.min_leverage:
+        leverage = 1.0
+    return leverage
+
+
+@jit_kernel
+def tp_rr(
+    average_entry: float,
+    kos: KernelOrderSettings,
+    position_size_usd: float,
+    risk_reward: float,
+    total_possible_loss: int,
+) -> tuple[float, float]:
+    """
+    Summary
+    -------
+    TakeProfit.tp_rr with the long and short tp prices put in line
+
+    Returns
+    -------
+    tuple[float, float]
+        tp_price, tp_pct
+    """
+    profit = -total_possible_loss * risk_reward
+    if kos.is_long:
+        tp_price = (
+            (profit * average_entry)
+            + (average_entry * position_size_usd)
+            + (average_entry * kos.market_fee_pct * position_size_usd)
+        ) / (position_size_usd * (1 - kos.tp_fee_pct))
+    else:
+        tp_price = -(
+            (profit * average_entry)
+            - (average_entry * position_size_usd)
+            + (average_entry * kos.market_fee_pct * position_size_usd)
+        ) / (position_size_usd * (1 + kos.tp_fee_pct))
+    tp_price = round(tp_price, kos.price_tick_step)
+    tp_pct = round(abs((tp_price - average_entry)) / average_entry, 2)
+    return tp_price, tp_pct
+
+
+@jit_kernel
+def get_order_records_room(
+    order_records: np.ndarray,
+    or_filled: int,
+) -> np.ndarray:
+    """
+    Doubles order_records when it is full
+    """
+    if or_filled < order_records.shape[0]:
+        return order_records
+    bigger_records = np.full((or_filled * 2 + 1, order_records.shape[1]), np.nan)
+    bigger_records[:or_filled] = order_records[:or_filled]
+    return bigger_records
+
+
+@jit_kernel
+def fill_or_exit_move(
+    bar_index: int,
+    equity: float,
+    exit_price: float,
+    fees_paid: float,
+    or_filled: int,
+    order_records: np.ndarray,
+    order_status: int,
+    realized_pnl: float,
+    set_idx: int,
+    sl_pct: float,
+    sl_price: float,
+) -> np.ndarray:
+    """
+    OrderHandler.fill_or_exit_move for a row of KERNEL_RECORD_FIELDS
+    """
+    order_records = get_order_records_room(order_records=order_records, or_filled=or_filled)
+    order_record = order_records[or_filled]
+    order_record[:] = np.nan
+    order_record[0] = set_idx
+    order_record[1] = bar_index
+    order_record[2] = order_status
+    order_record[3] = equity
+    order_record[4] = equity
+    order_record[8] = fees_paid
+    order_record[11] = 0
+    order_record[12] = 0
+    order_record[16] = exit_price
+    order_record[19] = realized_pnl
+    order_record[20] = sl_pct
+    order_record[21] = sl_price
+    return order_records
+
+
+@jit_kernel
+def fill_or_entry(
+    available_balance: float,
+    average_entry: float,
+    bar_index: int,
+    cash_borrowed: float,
+    cash_used: float,
+    entry_price: float,
+    entry_size_asset: float,
+    entry_size_usd: float,
+    equity: float,
+    leverage: float,
+    liq_price: float,
+    or_filled: int,
+    order_records: np.ndarray,
+    position_size_asset: float,
+    position_size_usd: float,
+    set_idx: int,
+    sl_pct: float,
+    sl_price: float,
+    total_possible_loss: int,
+    total_trades: int,
+    tp_pct: float,
+    tp_price: float,
+) -> np.ndarray:
+    """
+    OrderHandler.fill_or_entry for a row of KERNEL_RECORD_FIELDS
+    """
+    order_records = get_order_records_room(order_records=order_records, or_filled=or_filled)
+    order_record = order_records[or_filled]
+    order_record[0] = set_idx
+    order_record[1] = bar_index
+    order_record[2] = ENTRY_FILLED
+    order_record[3] = equity
+    order_record[4] = available_balance
+    order_record[5] = cash_borrowed
+    order_record[6] = cash_used
+    order_record[7] = average_entry
+    order_record[8] = np.nan
+    order_record[9] = leverage
+    order_record[10] = liq_price
+    order_record[11] = total_possible_loss
+    order_record[12] = total_trades
+    order_record[13] = entry_size_asset
+    order_record[14] = entry_size_usd
+    order_record[15] = entry_price
+    order_record[16] = np.nan
+    order_record[17] = position_size_asset
+    order_record[18] = position_size_usd
+    order_record[19] = np.nan
+    order_record[20] = round(sl_pct * 100, 2)
+    order_record[21] = sl_price
+    order_record[22] = round(tp_pct * 100, 2)
+    order_record[23] = tp_price
+    return order_records
+
+
+@jit_kernel
+def kernel_backtest(
+    candle_prices: np.ndarray,
+    dos: DynamicOrderSettings,
+    entries: np.ndarray,
+    entry_bars: np.ndarray,
+    exit_prices: np.ndarray,
+    kos: KernelOrderSettings,
+    max_entry_leverage: float,
+    max_trades_to_prune: int,
+    min_entry_prices_left: np.ndarray,
+    order_records: np.ndarray,
+    record_orders: bool,
+    set_idx: int,
+    starting_bar: int,
+    starting_equity: float,
+    trade_metrics: np.ndarray,
+) -> tuple[int, float, np.ndarray, int]:
+    """
+    Summary
+    -------
+    The bar loop of multiprocess_backtest for one setting with the order math of the OrderHandler flattened into it, so numba can compile all of it into one function
+
+    Every check happens in the same order with the same math as the OrderHandler so the results are the same. It walks every bar while in a position instead of searching for the next exit bar, that is cheap once it is compiled
+
+    Parameters
+    ----------
+    candle_prices : np.ndarray
+        open, high, low and close prices as rows
+    dos : DynamicOrderSettings
+        dynamic order settings of the setting
+    entries : np.ndarray
+        entries of the setting
+    entry_bars : np.ndarray
+        entry bars after the starting bar from get_entry_prune_arrays
+    exit_prices : np.ndarray
+        exit prices of the setting
+    kos : KernelOrderSettings
+        kernel order settings
+    max_entry_leverage : float
+        from get_max_entry_leverage, np.inf turns off the CantAffordMinAsset prune rule
+    max_trades_to_prune : int
+        settings that can't close more trades than this get pruned, -1 turns off the CantPassFilters prune rule
+    min_entry_prices_left : np.ndarray
+        from get_entry_prune_arrays
+    order_records : np.ndarray
+        rows of KERNEL_RECORD_FIELDS, only used if record_orders is True
+    record_orders : bool
+        write every entry, exit and stop loss move to order_records like or_backtest does
+    set_idx : int
+        set_idx that goes in the order records
+    starting_bar : int
+        bar to start at
+    starting_equity : float
+        starting equity
+    trade_metrics : np.ndarray
+        from get_trade_metrics, gets started over and then every closed trade gets added to it
+
+    Returns
+    -------
+    tuple[int, float, np.ndarray, int]
+        prune_rule which is NOT_PRUNED or the PruneRule that stopped the setting,
+        equity,
+        order_records which is a new array if it had to grow,
+        or_filled
+    """
+    total_bars = entries.size
+    total_entry_bars = entry_bars.size
+    high_prices = candle_prices[CandleBodyType.High - CANDLE_OPEN]
+    low_prices = candle_prices[CandleBodyType.Low - CANDLE_OPEN]
+    market_fee_pct = kos.market_fee_pct
+
+    available_balance = starting_equity
+    average_entry = 0.0
+    can_move_sl_to_be = False
+    cash_borrowed = 0.0
+    cash_used = 0.0
+    equity = starting_equity
+    leverage = 0.0
+    liq_price = 0.0
+    position_size_asset = 0.0
+    position_size_usd = 0.0
+    sl_pct = 0.0
+    sl_price = 0.0
+    total_trades = 0
+    tp_price = 0.0
+
+    kernel_reset_trade_metrics(trade_metrics, starting_equity)
+    total_trades_closed = 0
+    or_filled = 0
+    prune_rule = NOT_PRUNED
+    next_entry = 0
+
+    bar_index = starting_bar
+    while bar_index < total_bars:
+        if position_size_usd == 0:
+            # nothing can happen while we are flat so jump to the next entry
+            while next_entry < total_entry_bars and entry_bars[next_entry] < bar_index:
+                next_entry += 1
+            if next_entry == total_entry_bars:
+                break
+            if total_trades_closed + total_entry_bars - next_entry <= max_trades_to_prune:
+                prune_rule = CANT_PASS_FILTERS
+                break
+            if equity * max_entry_leverage < kos.min_asset_size * min_entry_prices_left[next_entry]:
+                # every entry left gets rejected so the result is already final
+                prune_rule = CANT_AFFORD_MIN_ASSET
+                break
+            bar_index = entry_bars[next_entry]
+        else:
+            # stop loss, liq and take profit in that order like get_exit_status
+            order_status = NOTHING
+            exit_price = np.nan
+            exit_fee_pct = np.nan
+            if kos.is_long:
+                sl_hit = sl_price > low_prices[bar_index]
+                liq_hit = liq_price > low_prices[bar_index]
+                tp_hit = tp_price < high_prices[bar_index]
+            else:
+                sl_hit = sl_price < high_prices[bar_index]
+                liq_hit = liq_price < high_prices[bar_index]
+                tp_hit = tp_price > low_prices[bar_index]
+
+            if sl_hit:
+                order_status = STOP_LOSS_FILLED
+                exit_price = sl_price
+                exit_fee_pct = market_fee_pct
+            elif liq_hit:
+                order_status = LIQUIDATION_FILLED
+                exit_price = liq_price
+                exit_fee_pct = market_fee_pct
+            elif kos.tp_strategy_type == TP_RISK_REWARD:
+                if tp_hit:
+                    order_status = TAKE_PROFIT_FILLED
+                    exit_price = tp_price
+                    exit_fee_pct = kos.tp_fee_pct
+            elif kos.tp_strategy_type == TP_PROVIDED:
+                if not np.isnan(exit_prices[bar_index]):
+                    order_status = TAKE_PROFIT_FILLED
+                    exit_price = exit_prices[bar_index]
+                    exit_fee_pct = kos.tp_fee_pct
+
+            if order_status != NOTHING:
+                if kos.is_long:
+                    pnl = round((exit_price - average_entry) * position_size_asset, 2)  # math checked
+                else:
+                    pnl = round((average_entry - exit_price) * position_size_asset, 2)  # math checked
+                fee_open = round(position_size_asset * average_entry * market_fee_pct, 2)  # math checked
+                fee_close = round(position_size_asset * exit_price * exit_fee_pct, 2)  # math checked
+                fees_paid = round(fee_open + fee_close, 2)  # math checked
+                realized_pnl = round(pnl - fees_paid, 2)  # math checked
+                equity = round(realized_pnl + equity, 2)
+
+                kernel_add_closed_trade(trade_metrics, equity, fees_paid, realized_pnl)
+                total_trades_closed += 1
+
+                if record_orders:
+                    order_records = fill_or_exit_move(
+                        bar_index=bar_index,
+                        equity=equity,
+                        exit_price=exit_price,
+                        fees_paid=fees_paid,
+                        or_filled=or_filled,
+                        order_records=order_records,
+                        order_status=order_status,
+                        realized_pnl=realized_pnl,
+                        set_idx=set_idx,
+                        sl_pct=np.nan,
+                        sl_price=np.nan,
+                    )
+                    or_filled += 1
+
+                available_balance = equity
+                average_entry = 0.0
+                can_move_sl_to_be = False
+                cash_borrowed = 0.0
+                cash_used = 0.0
+                leverage = 0.0
+                liq_price = 0.0
+                position_size_asset = 0.0
+                position_size_usd = 0.0
+                sl_pct = 0.0
+                sl_price = 0.0
+                total_trades = 0
+                tp_price = 0.0
+            else:
+                if kos.sl_to_be_bool and can_move_sl_to_be:
+                    candle_body = candle_prices[int(dos.sl_to_be_cb_type) - CANDLE_OPEN, bar_index]
+                    pct_from_ae = abs(candle_body - average_entry) / average_entry
+                    if kos.is_long:
+                        move_sl = pct_from_ae > dos.sl_to_be_when_pct
+                    else:
+                        move_sl = pct_from_ae < dos.sl_to_be_when_pct
+                    if move_sl:
+                        if not kos.sl_to_zero:
+                            sl_to_be_price = average_entry
+                        elif kos.is_long:
+                            sl_to_be_price = (average_entry + market_fee_pct * average_entry) / (1 - market_fee_pct)
+                            sl_to_be_price = round(sl_to_be_price, kos.price_tick_step)
+                        else:
+                            sl_to_be_price = (average_entry - market_fee_pct * average_entry) / (1 + market_fee_pct)
+                            sl_to_be_price = round(sl_to_be_price, kos.price_tick_step)
+                        sl_to_be_pct = round(abs(average_entry - sl_to_be_price) / average_entry, 2)
+                        if sl_to_be_price != 0:
+                            sl_pct = sl_to_be_pct
+                            sl_price = sl_to_be_price
+                            if record_orders:
+                                order_records = fill_or_exit_move(
+                                    bar_index=bar_index,
+                                    equity=np.nan,
+                                    exit_price=np.nan,
+                                    fees_paid=np.nan,
+                                    or_filled=or_filled,
+                                    order_records=order_records,
+                                    order_status=MOVED_SL_TO_BE,
+                                    realized_pnl=np.nan,
+                                    set_idx=set_idx,
+                                    sl_pct=sl_to_be_pct,
+                                    sl_price=sl_to_be_price,
+                                )
+                                or_filled += 1
+
+                tsl_price = 0.0
+                tsl_pct = 0.0
+                if kos.trailing_sl_strategy_type == TSL_CB_ABOVE_BELOW:
+                    candle_body = candle_prices[int(dos.trail_sl_bcb_type) - CANDLE_OPEN, bar_index]
+                    pct_from_ae = abs(candle_body - average_entry) / average_entry
+                    if kos.is_long:
+                        possible_move_tsl = pct_from_ae > dos.trail_sl_when_pct
+                    else:
+                        possible_move_tsl = pct_from_ae < dos.trail_sl_when_pct
+                    if possible_move_tsl:
+                        if kos.is_long:
+                            temp_sl_price = candle_body - (candle_body * dos.trail_sl_by_pct)
+                        else:
+                            temp_sl_price = candle_body + (candle_body * dos.trail_sl_by_pct)
+                        temp_sl_price = round(temp_sl_price, kos.price_tick_step)
+                        if (kos.is_long and temp_sl_price > sl_price) or (not kos.is_long and temp_sl_price < sl_price):
+                            tsl_price = temp_sl_price
+                            tsl_pct = round(abs(average_entry - temp_sl_price) / average_entry, 2)
+                elif kos.trailing_sl_strategy_type == TSL_PCT_ABOVE_BELOW:
+                    # only long gets here, the new sl doesn't get rounded just like StopLoss.check_move_tsl_pct
+                    candle_body = candle_prices[int(dos.trail_sl_bcb_type) - CANDLE_OPEN, bar_index]
+                    pct_from_sl = abs(candle_body - sl_price) / sl_price
+                    if pct_from_sl > dos.trail_sl_when_pct:
+                        tsl_price = sl_price + (sl_price * dos.trail_sl_by_pct)
+                        tsl_pct = round(abs(sl_price - tsl_price) / sl_price, 2)
+
+                if tsl_price != 0:
+                    sl_pct = tsl_pct
+                    sl_price = tsl_price
+                    if record_orders:
+                        order_records = fill_or_exit_move(
+                            bar_index=bar_index,
+                            equity=np.nan,
+                            exit_price=np.nan,
+                            fees_paid=np.nan,
+                            or_filled=or_filled,
+                            order_records=order_records,
+                            order_status=MOVED_TSL,
+                            realized_pnl=np.nan,
+                            set_idx=set_idx,
+                            sl_pct=tsl_pct,
+                            sl_price=tsl_price,
+                        )
+                        or_filled += 1
+
+        if entries[bar_index]:
+            entry_price = candle_prices[CANDLE_CLOSE - CANDLE_OPEN, bar_index]
+            new_sl_price = sl_based_on_candle_body(
+                bar_index=bar_index,
+                candle_prices=candle_prices,
+                kos=kos,
+                sl_based_on_add_pct=dos.sl_based_on_add_pct,
+                sl_based_on_lookback=dos.sl_based_on_lookback,
+                sl_bcb_type=dos.sl_bcb_type,
+            )
+            if position_size_asset > 0:
+                (
+                    order_status,
+                    new_average_entry,
+                    entry_size_asset,
+                    entry_size_usd,
+                    new_position_size_asset,
+                    new_position_size_usd,
+                    total_possible_loss,
+                    new_total_trades,
+                    new_sl_pct,
+                ) = rpa_slbcb_p(
+                    account_pct_risk_per_trade=dos.account_pct_risk_per_trade,
+                    average_entry=average_entry,
+                    entry_price=entry_price,
+                    equity=equity,
+                    kos=kos,
+                    max_trades=dos.max_trades,
+                    position_size_asset=position_size_asset,
+                    position_size_usd=position_size_usd,
+                    sl_price=new_sl_price,
+                    total_trades=total_trades,
+                )
+            else:
+                (
+                    order_status,
+                    new_average_entry,
+                    entry_size_asset,
+                    entry_size_usd,
+                    new_position_size_asset,
+                    new_position_size_usd,
+                    total_possible_loss,
+                    new_total_trades,
+                    new_sl_pct,
+                ) = rpa_slbcb_np(
+                    account_pct_risk_per_trade=dos.account_pct_risk_per_trade,
+                    entry_price=entry_price,
+                    equity=equity,
+                    kos=kos,
+                    max_trades=dos.max_trades,
+                    sl_price=new_sl_price,
+                )
+
+            if order_status == ENTRY_FILLED:
+                new_leverage = dynamic_lev(
+                    average_entry=new_average_entry,
+                    kos=kos,
+                    sl_price=new_sl_price,
+                )
+                (
+                    order_status,
+                    new_available_balance,
+                    new_cash_borrowed,
+                    new_cash_used,
+                    new_liq_price,
+                ) = calc_liq_price(
+                    average_entry=new_average_entry,
+                    kos=kos,
+                    leverage=new_leverage,
+                    og_available_balance=available_balance,
+                    og_cash_borrowed=cash_borrowed,
+                    og_cash_used=cash_used,
+                    position_size_asset=new_position_size_asset,
+                    position_size_usd=new_position_size_usd,
+                )
+
+            if order_status == ENTRY_FILLED:
+                if kos.tp_strategy_type == TP_RISK_REWARD:
+                    tp_price, tp_pct = tp_rr(
+                        average_entry=new_average_entry,
+                        kos=kos,
+                        position_size_usd=new_position_size_usd,
+                        risk_reward=dos.risk_reward,
+                        total_possible_loss=total_possible_loss,
+                    )
+                else:
+                    tp_price = np.nan
+                    tp_pct = np.nan
+
+                available_balance = new_available_balance
+                average_entry = new_average_entry
+                can_move_sl_to_be = True
+                cash_borrowed = new_cash_borrowed
+                cash_used = new_cash_used
+                leverage = new_leverage
+                liq_price = new_liq_price
+                position_size_asset = new_position_size_asset
+                position_size_usd = new_position_size_usd
+                sl_pct = new_sl_pct
+                sl_price = new_sl_price
+                total_trades = new_total_trades
+
+                if record_orders:
+                    order_records = fill_or_entry(
+                        available_balance=available_balance,
+                        average_entry=average_entry,
+                        bar_index=bar_index + 1,
+                        cash_borrowed=cash_borrowed,
+                        cash_used=cash_used,
+                        entry_price=entry_price,
+                        entry_size_asset=entry_size_asset,
+                        entry_size_usd=entry_size_usd,
+                        equity=equity,
+                        leverage=leverage,
+                        liq_price=liq_price,
+                        or_filled=or_filled,
+                        order_records=order_records,
+                        position_size_asset=position_size_asset,
+                        position_size_usd=position_size_usd,
+                        set_idx=set_idx,
+                        sl_pct=sl_pct,
+                        sl_price=sl_price,
+                        total_possible_loss=total_possible_loss,
+                        total_trades=total_trades,
+                        tp_pct=tp_pct,
+                        tp_price=tp_price,
+                    )
+                    or_filled += 1
+
+        bar_index += 1
+
+    return prune_rule, equity, order_records, or_filled
+
+
+class KernelOrderHandler:
+    """
+    Settings holder of the kernel engine.
+
+    The order math lives in the kernel_backtest function instead of methods so numba can compile it, this only
+    checks the static order settings and flattens them into KernelOrderSettings. The kernel supports the same
+    order settings as the BatchOrderHandler.
+    """
+
+    def __init__(
+        self,
+        exchange_settings_tuple: ExchangeSettings,
+        long_short: str,
+        static_os_tuple: StaticOrderSettings,
+    ) -> None:
+        if long_short.lower() == "long":
+            is_long = True
+        elif long_short.lower() == "short":
+            is_long = False
+        else:
+            raise Exception("long or short are the only options for long_short")
+
+        if static_os_tuple.sl_strategy_type != StopLossStrategyType.SLBasedOnCandleBody:
+            raise Exception("SLBasedOnCandleBody is the only sl_strategy_type the kernel engine supports")
+        if static_os_tuple.pg_min_max_sl_bcb.lower() == "min":
+            sl_bcb_min = True
+        elif static_os_tuple.pg_min_max_sl_bcb.lower() == "max":
+            sl_bcb_min = False
+        else:
+            raise Exception("min or max are the only options for pg_min_max_sl_bcb")
+
+        if static_os_tuple.increase_position_type != IncreasePositionType.RiskPctAccountEntrySize:
+            raise Exception("RiskPctAccountEntrySize is the only increase_position_type the kernel engine supports")
+        if static_os_tuple.leverage_strategy_type != LeverageStrategyType.Dynamic:
+            raise Exception("Dynamic is the only leverage_strategy_type the kernel engine supports")
+
+        sl_to_zero = False
+        if static_os_tuple.sl_to_be_bool:
+            if static_os_tuple.z_or_e_type.lower() == "zero":
+                sl_to_zero = True
+            elif static_os_tuple.z_or_e_type.lower() != "entry":
+                raise Exception("zero or entry are the only options for z_or_e_type")
+
+        if static_os_tuple.trailing_sl_strategy_type == TrailingSLStrategyType.PctAboveBelow and not is_long:
+            raise Exception("PctAboveBelow trailing stop loss is only available for long")
+
+        if static_os_tuple.tp_fee_type.lower() == "market":
+            tp_fee_pct = exchange_settings_tuple.market_fee_pct
+        elif static_os_tuple.tp_fee_type.lower() == "limit":
+            tp_fee_pct = exchange_settings_tuple.limit_fee_pct
+        else:
+            raise Exception("market or limit are the only options for tp_fee_type")
+
+        self.kos = KernelOrderSettings(
+            is_long=is_long,
+            sl_bcb_min=sl_bcb_min,
+            sl_to_be_bool=bool(static_os_tuple.sl_to_be_bool),
+            sl_to_zero=sl_to_zero,
+            trailing_sl_strategy_type=static_os_tuple.trailing_sl_strategy_type,
+            tp_strategy_type=static_os_tuple.tp_strategy_type,
+            asset_tick_step=exchange_settings_tuple.asset_tick_step,
+            leverage_tick_step=exchange_settings_tuple.leverage_tick_step,
+            market_fee_pct=exchange_settings_tuple.market_fee_pct,
+            max_asset_size=exchange_settings_tuple.max_asset_size,
+            max_leverage=exchange_settings_tuple.max_leverage,
+            min_asset_size=exchange_settings_tuple.min_asset_size,
+            min_leverage=exchange_settings_tuple.min_leverage,
+            mmr_pct=exchange_settings_tuple.mmr_pct,
+            price_tick_step=exchange_settings_tuple.price_tick_step,
+            tp_fee_pct=tp_fee_pct,
+        )
+
+    def check_candle_body_types(
+        self,
+        dynamic_order_settings: DynamicOrderSettings,
+    ):
+        """
+        Summary
+        -------
+        The kernel only has the open, high, low and close prices so every candle body type it is going to use has to be one of them
+
+        Parameters
+        ----------
+        dynamic_order_settings : DynamicOrderSettings
+            og dos tuple or a cur dos tuple
+        """
+        cb_types = [dynamic_order_settings.sl_bcb_type]
+        if self.kos.sl_to_be_bool:
+            cb_types.append(dynamic_order_settings.sl_to_be_cb_type)
+        if self.kos.trailing_sl_strategy_type != TrailingSLStrategyType.Nothing:
+            cb_types.append(dynamic_order_settings.trail_sl_bcb_type)
+        for cb_type in cb_types:
+            if np.any((np.asarray(cb_type) < CANDLE_OPEN) | (np.asarray(cb_type) > CANDLE_CLOSE)):
+                raise Exception("Open High Low or Close are the only candle body types the kernel engine supports")
+
+    def get_candle_prices(
+        self,
+        candles: FootprintCandlesTuple,
+    ) -> np.ndarray:
+        """
+        Open, high, low and close prices as rows for kernel_backtest
+        """
+        return np.vstack(
+            (
+                candles.candle_open_prices,
+                candles.candle_high_prices,
+                candles.candle_low_prices,
+                candles.candle_close_prices,
+            )
+        )
+
+    def get_order_records(
+        self,
+        candles: FootprintCandlesTuple,
+        dynamic_order_settings: DynamicOrderSettings,
+        entries: np.ndarray,
+        exit_prices: np.ndarray,
+        set_idx: int,
+        starting_bar: int,
+        starting_equity: float,
+    ) -> np.ndarray:
+        """
+        Summary
+        -------
+        Runs one setting through kernel_backtest without the prune rules and gives back the same order records or_backtest makes
+
+        Parameters
+        ----------
+        candles : FootprintCandlesTuple
+            candles
+        dynamic_order_settings : DynamicOrderSettings
+            cur dos tuple of the setting
+        entries : np.ndarray
+            entries of the setting
+        exit_prices : np.ndarray
+            exit prices of the setting
+        set_idx : int
+            set_idx that goes in the order records
+        starting_bar : int
+            bar to start at
+        starting_equity : float
+            starting equity
+
+        Returns
+        -------
+        np.ndarray
+            order records with the or_dt dtype
+        """
+        self.check_candle_body_types(dynamic_order_settings=dynamic_order_settings)
+        entry_bars = np.flatnonzero(entries[starting_bar:]) + starting_bar
+        total_bars = candles.candle_open_timestamps.size
+        _, _, kernel_records, or_filled = kernel_backtest(
+            candle_prices=self.get_candle_prices(candles=candles),
+            dos=dynamic_order_settings,
+            entries=entries,
+            entry_bars=entry_bars,
+            exit_prices=exit_prices,
+            kos=self.kos,
+            max_entry_leverage=np.inf,
+            max_trades_to_prune=-1,
+            min_entry_prices_left=np.zeros(entry_bars.size),
+            order_records=np.empty((int(total_bars / 3), len(KERNEL_RECORD_FIELDS))),
+            record_orders=True,
+            set_idx=set_idx,
+            starting_bar=starting_bar,
+            starting_equity=starting_equity,
+            trade_metrics=get_trade_metrics(starting_equity=starting_equity),
+        )
+
+        order_records = np.empty(or_filled, dtype=or_dt)
+        for column, field in enumerate(KERNEL_RECORD_FIELDS):
+            order_records[field] = kernel_records[:or_filled, column]
+        order_records["timestamp"] = candles.candle_open_timestamps[order_records["bar_idx"]]
+        return order_records
@@ -7,7 +7,9 @@ from quantfreedom.core.enums import (
     LeverageStrategyType,
     OrderStatus,
     RejectedOrder,
+    TraceEvent,
 )
+from quantfreedom.helpers import trace
 from quantfreedom.helpers.helper_funcs import round_size_by_tick_step
 
 logger = getLogger()
@@ -48,8 +50,10 @@ class Leverage:
             raise Exception("long or short are the only options for long_short")
 
         self.checker_liq_hit = self.check_liq_hit
+        self.status_liq_hit = self.get_liq_hit_status
         if leverage_strategy_type == LeverageStrategyType.Dynamic:
             self.lev_calculator = self.dynamic_lev
+            self.lev_status_calculator = self.dynamic_lev_status
 
     def long_get_bankruptcy_price(
         self,
@@ -95,6 +99,51 @@ class Leverage:
         position_size_asset: float,
         position_size_usd: float,
     ):
+        (
+            order_status,
+            available_balance,
+            cash_borrowed,
+            cash_used,
+            liq_price,
+        ) = self.calc_liq_price_status(
+            average_entry=average_entry,
+            leverage=leverage,
+            og_available_balance=og_available_balance,
+            og_cash_borrowed=og_cash_borrowed,
+            og_cash_used=og_cash_used,
+            position_size_asset=position_size_asset,
+            position_size_usd=position_size_usd,
+        )
+        if order_status != OrderStatus.EntryFilled:
+            raise RejectedOrder(msg=OrderStatus._fields[order_status])
+
+        return (
+            available_balance,
+            cash_borrowed,
+            cash_used,
+            liq_price,
+        )
+
+    def calc_liq_price_status(
+        self,
+        average_entry: float,
+        leverage: float,
+        og_available_balance: float,
+        og_cash_borrowed: float,
+        og_cash_used: float,
+        position_size_asset: float,
+        position_size_usd: float,
+    ) -> tuple[int, float, float, float, float]:
+        """
+        Summary
+        -------
+        Same as calc_liq_price but returns CashUsedExceed as the order status instead of raising RejectedOrder
+
+        Returns
+        -------
+        tuple[int, float, float, float, float]
+            order_status, available_balance, cash_borrowed, cash_used, liq_price
+        """
         # Getting Order Cost
         # https://www.bybithelp.com/HelpCenterKnowledge/bybitHC_Article?id=000001064&language=en_US
 
@@ -108,21 +157,10 @@ class Leverage:
 
         cash_used = initial_margin + fee_to_open + fee_to_close  # math checked
 
-        logger.debug(
-            f"""
-initial_margin= {round(initial_margin, 2)}
-fee_to_open= {round(fee_to_open, 2)}
-bankruptcy_price= {round(bankruptcy_price, 2)}
-fee to close= {round(fee_to_close, 2)}
-cash_used= {round(cash_used, 2)}
-og_available_balance= {og_available_balance}"""
-        )
-
         if cash_used > og_available_balance:
-            msg = "Cash used bigger than available balance AKA position size too big"
-            logger.warning(msg)
-            RejectedOrder.msg = msg
-            raise RejectedOrder
+            if trace.tracer is not None:
+                trace.tracer.record(TraceEvent.CashUsedExceed, cash_used, og_available_balance)
+            return OrderStatus.CashUsedExceed, np.nan, np.nan, np.nan, np.nan
         else:
             available_balance = round(og_available_balance - cash_used, 2)
             cash_used = round(og_cash_used + cash_used, 2)
@@ -138,6 +176,7 @@ og_available_balance= {og_available_balance}"""
             )
 
         return (
+            OrderStatus.EntryFilled,
             available_balance,
             cash_borrowed,
             cash_used,
@@ -169,7 +208,6 @@ og_available_balance= {og_available_balance}"""
             og_available_balance=available_balance,
             og_cash_borrowed=cash_borrowed,
         )
-        logger.debug(f"Lev set to static lev= {self.static_leverage}")
         return (
             available_balance,
             can_move_sl_to_be,
@@ -209,26 +247,74 @@ og_available_balance= {og_available_balance}"""
         position_size_usd: float,
         sl_price: float,
     ):
+        (
+            order_status,
+            available_balance,
+            cash_borrowed,
+            cash_used,
+            leverage,
+            liq_price,
+        ) = self.dynamic_lev_status(
+            available_balance=available_balance,
+            average_entry=average_entry,
+            cash_borrowed=cash_borrowed,
+            cash_used=cash_used,
+            position_size_asset=position_size_asset,
+            position_size_usd=position_size_usd,
+            sl_price=sl_price,
+        )
+        if order_status != OrderStatus.EntryFilled:
+            raise RejectedOrder(msg=OrderStatus._fields[order_status])
+
+        return (
+            available_balance,
+            cash_borrowed,
+            cash_used,
+            leverage,
+            liq_price,
+        )
+
+    def dynamic_lev_status(
+        self,
+        available_balance: float,
+        average_entry: float,
+        cash_borrowed: float,
+        cash_used: float,
+        position_size_asset: float,
+        position_size_usd: float,
+        sl_price: float,
+    ) -> tuple[int, float, float, float, float, float]:
+        """
+        Summary
+        -------
+        Same as dynamic_lev but returns the order status instead of raising RejectedOrder
+
+        Returns
+        -------
+        tuple[int, float, float, float, float, float]
+            order_status, available_balance, cash_borrowed, cash_used, leverage, liq_price
+        """
         leverage = self.calc_dynamic_lev(average_entry=average_entry, sl_price=sl_price)
         leverage = round_size_by_tick_step(
             user_num=leverage,
             exchange_num=self.leverage_tick_step,
         )
         if leverage > self.max_leverage:
-            logger.warning(f"Lev too high Lev= {leverage} Max Lev= {self.max_leverage}")
+            if trace.tracer is not None:
+                trace.tracer.record(TraceEvent.LeverageTooHigh, leverage, self.max_leverage)
             leverage = self.max_leverage
         elif leverage < self.min_leverage:
-            logger.warning(f"Lev too low Lev= {leverage} Min Lev= {self.min_leverage}")
+            if trace.tracer is not None:
+                trace.tracer.record(TraceEvent.LeverageTooLow, leverage, self.min_leverage)
             leverage = 1
-        else:
-            logger.debug(f"Leverage= {leverage}")
 
         (
+            order_status,
             available_balance,
             cash_borrowed,
             cash_used,
             liq_price,
-        ) = self.calc_liq_price(
+        ) = self.calc_liq_price_status(
             leverage=leverage,
             average_entry=average_entry,
             og_cash_used=cash_used,
@@ -238,6 +324,7 @@ og_available_balance= {og_available_balance}"""
             position_size_usd=position_size_usd,
         )
         return (
+            order_status,
             available_balance,
             cash_borrowed,
             cash_used,
@@ -250,37 +337,55 @@ og_available_balance= {og_available_balance}"""
         current_candle: CurrentFootprintCandleTuple,
         liq_price: float,
     ):
-        candle_low = current_candle[CandleBodyType.Low]
-        logger.debug(f"candle_low= {candle_low}")
-        return liq_price > candle_low
+        return liq_price > current_candle[CandleBodyType.Low]
 
     def short_liq_hit_bool(
         self,
         current_candle: CurrentFootprintCandleTuple,
         liq_price: float,
     ):
-        candle_high = current_candle[CandleBodyType.High]
-        logger.debug(f"candle_high= {candle_high}")
-        return liq_price < candle_high
+        return liq_price < current_candle[CandleBodyType.High]
 
-    def check_liq_hit(
+    def get_liq_hit_status(
         self,
         current_candle: CurrentFootprintCandleTuple,
         liq_price: float,
-    ):
+    ) -> tuple[int, float, float]:
+        """
+        Summary
+        -------
+        Same check as check_liq_hit but returns the result instead of raising DecreasePosition
+
+        Returns
+        -------
+        tuple[int, float, float]
+            order_status, exit_price, exit_fee_pct and order status is Nothing if the liq price wasn't hit
+        """
         if self.liq_hit_bool(
             current_candle=current_candle,
             liq_price=liq_price,
         ):
-            logger.debug("Liq Hit")
+            if trace.tracer is not None:
+                trace.tracer.record(TraceEvent.LiquidationHit, liq_price)
+            return OrderStatus.LiquidationFilled, liq_price, self.market_fee_pct
+        else:
+            return OrderStatus.Nothing, np.nan, np.nan
+
+    def check_liq_hit(
+        self,
+        current_candle: CurrentFootprintCandleTuple,
+        liq_price: float,
+    ):
+        order_status, exit_price, exit_fee_pct = self.get_liq_hit_status(
+            current_candle=current_candle,
+            liq_price=liq_price,
+        )
+        if order_status != OrderStatus.Nothing:
             raise DecreasePosition(
-                exit_fee_pct=self.market_fee_pct,
-                exit_price=liq_price,
-                order_status=OrderStatus.LiquidationFilled,
+                exit_fee_pct=exit_fee_pct,
+                exit_price=exit_price,
+                order_status=order_status,
             )
-        else:
-            logger.debug("No hit on liq price")
-            pass
 
     def get_liq_price(
         self,
@@ -328,3 +433,15 @@ og_available_balance= {og_available_balance}"""
         liq_price: float,
     ):
         pass
+
+    def lev_status_calculator(
+        self,
+        available_balance: float,
+        average_entry: float,
+        cash_borrowed: float,
+        cash_used: float,
+        position_size_asset: float,
+        position_size_usd: float,
+        sl_price: float,
+    ):
+        pass
@@ -2,6 +2,7 @@ import numpy as np
 
 from logging import getLogger
 
+from quantfreedom.helpers import trace
 from quantfreedom.order_handler.increase_position import IncreasePosition
 from quantfreedom.order_handler.leverage import Leverage
 from quantfreedom.order_handler.stop_loss import StopLoss
@@ -14,6 +15,10 @@ from quantfreedom.core.enums import (
     DynamicOrderSettings,
     ExchangeSettings,
     StaticOrderSettings,
+    StopLossStrategyType,
+    TakeProfitStrategyType,
+    TraceEvent,
+    TrailingSLStrategyType,
 )
 
 logger = getLogger()
@@ -31,8 +36,10 @@ class OrderHandler:
         # Decrease Position
         if long_short.lower() == "long":
             self.pnl_calc = self.long_pnl_calc
+            self.exit_hit_bars = self.long_exit_hit_bars
         elif long_short.lower() == "short":
             self.pnl_calc = self.short_pnl_calc
+            self.exit_hit_bars = self.short_exit_hit_bars
         else:
             raise Exception("long or short are the only options for long_short")
 
@@ -83,6 +90,14 @@ class OrderHandler:
             tp_strategy_type=static_os_tuple.tp_strategy_type,
         )
 
+        # first touch exit search only works if the stop loss never moves while we are in a position
+        self.can_search_exit_bar = (
+            static_os_tuple.trailing_sl_strategy_type == TrailingSLStrategyType.Nothing
+            and not static_os_tuple.sl_to_be_bool
+        )
+        self.sl_hit_search = static_os_tuple.sl_strategy_type == StopLossStrategyType.SLBasedOnCandleBody
+        self.tp_strategy_type = static_os_tuple.tp_strategy_type
+
     def pass_func(self, **kwargs):
         pass
 
@@ -238,6 +253,239 @@ class OrderHandler:
             sl_price=self.sl_price,
         )
 
+    def get_exit_status(
+        self,
+        current_candle: CurrentFootprintCandleTuple,
+        exit_price: float,
+    ) -> tuple[int, float, float]:
+        """
+        Summary
+        -------
+        Checks stop loss, liq and take profit in that order like check_stop_loss_hit, check_liq_hit and check_take_profit_hit but returns the first one that got hit instead of raising DecreasePosition
+
+        Parameters
+        ----------
+        current_candle : CurrentFootprintCandleTuple
+            current candle
+        exit_price : float
+            exit price provided by the strategy
+
+        Returns
+        -------
+        tuple[int, float, float]
+            order_status, exit_price, exit_fee_pct and order status is Nothing if we are still in the position
+        """
+        exit_status = self.obj_stop_loss.status_sl_hit(
+            current_candle=current_candle,
+            sl_price=self.sl_price,
+        )
+        if exit_status[0] != OrderStatus.Nothing:
+            return exit_status
+
+        exit_status = self.obj_leverage.status_liq_hit(
+            current_candle=current_candle,
+            liq_price=self.liq_price,
+        )
+        if exit_status[0] != OrderStatus.Nothing:
+            return exit_status
+
+        return self.obj_take_profit.status_tp_hit(
+            current_candle=current_candle,
+            exit_price=exit_price,
+            tp_price=self.tp_price,
+        )
+
+    def long_exit_hit_bars(
+        self,
+        candles: FootprintCandlesTuple,
+        exit_prices: np.ndarray,
+        start_bar: int,
+        end_bar: int,
+    ) -> np.ndarray:
+        lows = candles.candle_low_prices[start_bar:end_bar]
+        hits = self.liq_price > lows
+        if self.sl_hit_search:
+            hits |= self.sl_price > lows
+        if self.tp_strategy_type == TakeProfitStrategyType.RiskReward:
+            hits |= self.tp_price < candles.candle_high_prices[start_bar:end_bar]
+        elif self.tp_strategy_type == TakeProfitStrategyType.Provided:
+            hits |= ~np.isnan(exit_prices[start_bar:end_bar])
+        return hits
+
+    def short_exit_hit_bars(
+        self,
+        candles: FootprintCandlesTuple,
+        exit_prices: np.ndarray,
+        start_bar: int,
+        end_bar: int,
+    ) -> np.ndarray:
+        highs = candles.candle_high_prices[start_bar:end_bar]
+        hits = self.liq_price < highs
+        if self.sl_hit_search:
+            hits |= self.sl_price < highs
+        if self.tp_strategy_type == TakeProfitStrategyType.RiskReward:
+            hits |= self.tp_price > candles.candle_low_prices[start_bar:end_bar]
+        elif self.tp_strategy_type == TakeProfitStrategyType.Provided:
+            hits |= ~np.isnan(exit_prices[start_bar:end_bar])
+        return hits
+
+    def get_next_exit_bar(
+        self,
+        candles: FootprintCandlesTuple,
+        exit_prices: np.ndarray,
+        start_bar: int,
+        end_bar: int,
+    ) -> int:
+        """
+        Summary
+        -------
+        Finds the first bar from start_bar up to end_bar where the stop loss, liq or take profit gets hit in one numpy pass instead of checking every bar with get_exit_status
+
+        Only use it when can_search_exit_bar is True because a trailing or break even stop loss changes the sl price while we are in a position
+
+        Parameters
+        ----------
+        candles : FootprintCandlesTuple
+            candles
+        exit_prices : np.ndarray
+            exit prices provided by the strategy
+        start_bar : int
+            first bar to check
+        end_bar : int
+            bar to stop at, usually the next entry bar so entries still get processed
+
+        Returns
+        -------
+        int
+            the first bar with a hit or end_bar if nothing gets hit, which bar is then run through get_exit_status so same bar hits get resolved in the usual order
+        """
+        hits = self.exit_hit_bars(
+            candles=candles,
+            exit_prices=exit_prices,
+            start_bar=start_bar,
+            end_bar=end_bar,
+        )
+        if hits.size and hits.any():
+            return start_bar + int(hits.argmax())
+        return end_bar
+
+    def calculate_entry_status(
+        self,
+        bar_index: int,
+        candles: FootprintCandlesTuple,
+        entry_price: float,
+    ) -> int:
+        """
+        Summary
+        -------
+        Stop loss, increase position, leverage and take profit calculations plus fill_order_result without exceptions, if the order gets rejected nothing changes
+
+        Parameters
+        ----------
+        bar_index : int
+            bar index
+        candles : FootprintCandlesTuple
+            candles
+        entry_price : float
+            entry price
+
+        Returns
+        -------
+        int
+            EntryFilled or the order status of the reason the order got rejected
+        """
+        sl_price = self.obj_stop_loss.sl_calculator(
+            bar_index=bar_index,
+            candles=candles,
+        )
+        if trace.tracer is not None:
+            trace.tracer.record(TraceEvent.StopLoss, sl_price)
+
+        (
+            order_status,
+            average_entry,
+            entry_price,
+            entry_size_asset,
+            entry_size_usd,
+            position_size_asset,
+            position_size_usd,
+            total_possible_loss,
+            total_trades,
+            sl_pct,
+        ) = self.obj_inc_pos.inc_pos_status_calculator(
+            average_entry=self.average_entry,
+            entry_price=entry_price,
+            equity=self.equity,
+            position_size_asset=self.position_size_asset,
+            position_size_usd=self.position_size_usd,
+            sl_price=sl_price,
+            total_trades=self.total_trades,
+        )
+        if order_status != OrderStatus.EntryFilled:
+            return order_status
+        if trace.tracer is not None:
+            trace.tracer.record(TraceEvent.IncreasePosition, average_entry, entry_size_usd, position_size_usd, sl_pct)
+
+        (
+            order_status,
+            available_balance,
+            cash_borrowed,
+            cash_used,
+            leverage,
+            liq_price,
+        ) = self.obj_leverage.lev_status_calculator(
+            available_balance=self.available_balance,
+            average_entry=average_entry,
+            cash_borrowed=self.cash_borrowed,
+            cash_used=self.cash_used,
+            position_size_asset=position_size_asset,
+            position_size_usd=position_size_usd,
+            sl_price=sl_price,
+        )
+        if order_status != OrderStatus.EntryFilled:
+            return order_status
+        if trace.tracer is not None:
+            trace.tracer.record(TraceEvent.Leverage, available_balance, cash_used, leverage, liq_price)
+
+        (
+            can_move_sl_to_be,
+            tp_price,
+            tp_pct,
+        ) = self.obj_take_profit.tp_calculator(
+            average_entry=average_entry,
+            position_size_usd=position_size_usd,
+            total_possible_loss=total_possible_loss,
+        )
+        if trace.tracer is not None:
+            trace.tracer.record(TraceEvent.TakeProfit, tp_price, tp_pct)
+
+        self.fill_order_result(
+            available_balance=available_balance,
+            average_entry=average_entry,
+            can_move_sl_to_be=can_move_sl_to_be,
+            cash_borrowed=cash_borrowed,
+            cash_used=cash_used,
+            entry_price=entry_price,
+            entry_size_asset=entry_size_asset,
+            entry_size_usd=entry_size_usd,
+            equity=self.equity,
+            exit_price=np.nan,
+            fees_paid=np.nan,
+            leverage=leverage,
+            liq_price=liq_price,
+            order_status=OrderStatus.EntryFilled,
+            position_size_asset=position_size_asset,
+            position_size_usd=position_size_usd,
+            total_possible_loss=total_possible_loss,
+            realized_pnl=np.nan,
+            sl_pct=sl_pct,
+            sl_price=sl_price,
+            total_trades=total_trades,
+            tp_pct=tp_pct,
+            tp_price=tp_price,
+        )
+        return OrderStatus.EntryFilled
+
     def update_class_dos(
         self,
         dynamic_order_settings: DynamicOrderSettings,
@@ -268,7 +516,8 @@ class OrderHandler:
             bar_index=bar_index,
             candles=candles,
         )
-        logger.info(f"sl price= {sl_price}")
+        if trace.tracer is not None:
+            trace.tracer.record(TraceEvent.StopLoss, sl_price)
         return sl_price
 
     def calculate_increase_position(
@@ -300,17 +549,8 @@ class OrderHandler:
             sl_price=sl_price,
             total_trades=total_trades,
         )
-        logger.info(
-            f"""
-average_entry= {average_entry}
-entry_price= {entry_price}
-entry_size_asset= {entry_size_asset}
-entry_size_usd= {entry_size_usd}
-position_size_asset= {position_size_asset}
-position_size_usd= {position_size_usd}
-sl_pct= {round(sl_pct*100, 2)}
-"""
-        )
+        if trace.tracer is not None:
+            trace.tracer.record(TraceEvent.IncreasePosition, average_entry, entry_size_usd, position_size_usd, sl_pct)
         return (
             average_entry,
             entry_price,
@@ -348,15 +588,8 @@ sl_pct= {round(sl_pct*100, 2)}
             position_size_usd=position_size_usd,
             sl_price=sl_price,
         )
-        logger.info(
-            f"""
-available_balance= {available_balance}
-cash_borrowed= {cash_borrowed}
-cash_used= {cash_used}
-leverage= {leverage}
-liq_price= {liq_price}
-"""
-        )
+        if trace.tracer is not None:
+            trace.tracer.record(TraceEvent.Leverage, available_balance, cash_used, leverage, liq_price)
         return (
             available_balance,
             cash_borrowed,
@@ -380,12 +613,8 @@ liq_price= {liq_price}
             position_size_usd=position_size_usd,
             total_possible_loss=total_possible_loss,
         )
-        logger.info(
-            f"""
-tp_price= {tp_price}
-tp_pct= {round(tp_pct * 100, 2)}
-"""
-        )
+        if trace.tracer is not None:
+            trace.tracer.record(TraceEvent.TakeProfit, tp_price, tp_pct)
         return (
             can_move_sl_to_be,
             tp_price,
@@ -408,32 +637,14 @@ tp_pct= {round(tp_pct * 100, 2)}
         order_status: OrderStatus,  # type: ignore
     ):
         pnl = self.pnl_calc(exit_price=exit_price)  # math checked
-        logger.debug(f"pnl= {pnl}")
-
         fee_open = round(self.position_size_asset * self.average_entry * market_fee_pct, 2)  # math checked
-        logger.debug(f"fee_open= {fee_open}")
-
         fee_close = round(self.position_size_asset * exit_price * exit_fee_pct, 2)  # math checked
-        logger.debug(f"fee_close= {fee_close}")
-
         fees_paid = round(fee_open + fee_close, 2)  # math checked
-        logger.debug(f"fees_paid= {fees_paid}")
-
         realized_pnl = round(pnl - fees_paid, 2)  # math checked
-        logger.debug(f"realized_pnl= {realized_pnl}")
-
         equity = round(realized_pnl + equity, 2)
-        logger.debug(f"equity= {equity}")
-
-        logger.info(
-            f"""
-datetime= {cur_datetime}
-equity= {equity}
-fees_paid= {fees_paid}
-order_status= {OrderStatus._fields[order_status]}
-realized_pnl= {realized_pnl}
-"""
-        )
+
+        if trace.tracer is not None:
+            trace.tracer.record(TraceEvent.DecreasePosition, order_status, equity, fees_paid, realized_pnl)
         return (
             equity,
             fees_paid,
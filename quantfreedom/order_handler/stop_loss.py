@@ -1,6 +1,7 @@
 import numpy as np
 from logging import getLogger
 
+from quantfreedom.helpers import trace
 from quantfreedom.helpers.helper_funcs import round_size_by_tick_step
 from quantfreedom.core.enums import (
     CurrentFootprintCandleTuple,
@@ -8,6 +9,7 @@ from quantfreedom.core.enums import (
     FootprintCandlesTuple,
     OrderStatus,
     StopLossStrategyType,
+    TraceEvent,
     TrailingSLStrategyType,
 )
 
@@ -55,6 +57,7 @@ class StopLoss:
         if sl_strategy_type == StopLossStrategyType.SLBasedOnCandleBody:
             self.sl_calculator = self.sl_based_on_candle_body
             self.checker_sl_hit = self.check_sl_hit
+            self.status_sl_hit = self.get_sl_hit_status
             if pg_min_max_sl_bcb.lower() == "min":
                 self.sl_bcb_price_getter = self.min_price_getter
             elif pg_min_max_sl_bcb.lower() == "max":
@@ -64,6 +67,7 @@ class StopLoss:
         else:
             self.sl_calculator = self.pass_func
             self.checker_sl_hit = self.pass_func
+            self.status_sl_hit = self.nothing_status_func
 
         # SL break even
         if sl_to_be_bool:
@@ -115,10 +119,7 @@ class StopLoss:
         current_candle: CurrentFootprintCandleTuple,
         sl_price: float,
     ):
-        logger.debug("Starting")
-        candle_low = current_candle.low_price
-        logger.debug(f"candle_low= {candle_low}")
-        return sl_price > candle_low
+        return sl_price > current_candle.low_price
 
     def long_sl_to_zero_price(self, average_entry: float):
         sl_price = (average_entry + self.market_fee_pct * average_entry) / (1 - self.market_fee_pct)
@@ -134,10 +135,7 @@ class StopLoss:
         current_candle: CurrentFootprintCandleTuple,
         sl_price: float,
     ):
-        logger.debug("Starting")
-        candle_high = current_candle.high_price
-        logger.debug(f"candle_high= {candle_high}")
-        return sl_price < candle_high
+        return sl_price < current_candle.high_price
 
     def short_sl_to_zero_price(
         self,
@@ -186,7 +184,6 @@ class StopLoss:
         """
         # lb will be bar index if sl isn't based on lookback because look back will be 0
         lookback = max(bar_index - self.sl_based_on_lookback, 0)
-        logger.debug(f"lookback to index= {lookback}")
 
         candle_body = self.sl_bcb_price_getter(
             bar_index=bar_index,
@@ -194,7 +191,8 @@ class StopLoss:
             candle_body_type=self.sl_bcb_type,
             lookback=lookback,
         )
-        logger.debug(f"candle_body= {candle_body}")
+        if trace.tracer is not None:
+            trace.tracer.record(TraceEvent.SLCandleBody, lookback, candle_body)
 
         sl_price = self.sl_price_calc(
             price=candle_body,
@@ -204,28 +202,48 @@ class StopLoss:
             user_num=sl_price,
             exchange_num=self.price_tick_step,
         )
-        logger.debug(f"sl_price= {sl_price}")
-
         return sl_price
 
-    def check_sl_hit(
+    def get_sl_hit_status(
         self,
         current_candle: CurrentFootprintCandleTuple,
         sl_price: float,
-    ):
+    ) -> tuple[int, float, float]:
+        """
+        Summary
+        -------
+        Same check as check_sl_hit but returns the result instead of raising DecreasePosition
+
+        Returns
+        -------
+        tuple[int, float, float]
+            order_status, exit_price, exit_fee_pct and order status is Nothing if the stop loss wasn't hit
+        """
         if self.get_sl_hit(
             current_candle=current_candle,
             sl_price=sl_price,
         ):
-            logger.debug(f"Stop loss hit sl_price= {sl_price}")
+            if trace.tracer is not None:
+                trace.tracer.record(TraceEvent.StopLossHit, sl_price)
+            return OrderStatus.StopLossFilled, sl_price, self.market_fee_pct
+        else:
+            return OrderStatus.Nothing, np.nan, np.nan
+
+    def check_sl_hit(
+        self,
+        current_candle: CurrentFootprintCandleTuple,
+        sl_price: float,
+    ):
+        order_status, exit_price, exit_fee_pct = self.get_sl_hit_status(
+            current_candle=current_candle,
+            sl_price=sl_price,
+        )
+        if order_status != OrderStatus.Nothing:
             raise DecreasePosition(
-                exit_fee_pct=self.market_fee_pct,
-                exit_price=sl_price,
-                order_status=OrderStatus.StopLossFilled,
+                exit_fee_pct=exit_fee_pct,
+                exit_price=exit_price,
+                order_status=order_status,
             )
-        else:
-            logger.debug("No hit on stop loss")
-            pass
 
     def check_move_sl_to_be(
         self,
@@ -238,23 +256,20 @@ class StopLoss:
         Checking to see if we move the stop loss to break even
         """
         if can_move_sl_to_be:
-            logger.debug("Might move sl to break even")
             # Stop Loss to break even
             candle_body = current_candle[self.sl_to_be_cb_type]
             pct_from_ae = abs(candle_body - average_entry) / average_entry
-            logger.debug(f"pct_from_ae= {round(pct_from_ae * 100, 2)}")
             move_sl_bool = self.move_sl_bool(num_1=pct_from_ae, num_2=self.sl_to_be_when_pct)
             if move_sl_bool:
                 old_sl = sl_price
                 sl_price = self.zero_or_entry_calc(average_entry=average_entry)
                 sl_pct = round(abs(average_entry - sl_price) / average_entry, 2)
-                logger.debug(f"Moving old_sl= {old_sl} to new sl= {sl_price} sl_pct= {round(sl_pct*100, 2)}")
+                if trace.tracer is not None:
+                    trace.tracer.record(TraceEvent.MovedSLToBE, old_sl, sl_price, sl_pct)
                 return sl_price, sl_pct
             else:
-                logger.debug("not moving sl to be")
                 return None, None
         else:
-            logger.debug("can't move sl to be")
             return None, None
 
     def check_move_tsl_close(
@@ -268,14 +283,12 @@ class StopLoss:
         """
         candle_body = current_candle[self.trail_sl_bcb_type]
         pct_from_ae = abs(candle_body - average_entry) / average_entry
-        logger.debug(f"pct_from_ae= {round(pct_from_ae * 100, 2)}")
         possible_move_tsl = self.move_sl_bool(
             num_1=pct_from_ae,
             num_2=self.trail_sl_when_pct,
         )
 
         if possible_move_tsl:
-            logger.debug("Maybe move tsl")
             temp_sl_price = self.sl_price_calc(
                 price=candle_body,
                 add_pct=self.trail_sl_by_pct,
@@ -284,16 +297,14 @@ class StopLoss:
                 user_num=temp_sl_price,
                 exchange_num=self.price_tick_step,
             )
-            logger.debug(f"temp sl= {temp_sl_price}")
             if self.move_sl_bool(num_1=temp_sl_price, num_2=sl_price):
                 sl_pct = round(abs(average_entry - temp_sl_price) / average_entry, 2)
-                logger.debug(f"Moving tsl new sl= {temp_sl_price} > old sl= {sl_price} sl_pct= {round(sl_pct*100, 2)}")
+                if trace.tracer is not None:
+                    trace.tracer.record(TraceEvent.MovedTSL, sl_price, temp_sl_price, sl_pct)
                 return temp_sl_price, sl_pct
             else:
-                logger.debug("Wont move tsl")
                 return None, None
         else:
-            logger.debug("Not moving tsl")
             return None, None
 
     def check_move_tsl_pct(
@@ -307,7 +318,6 @@ class StopLoss:
         """
         candle_body = current_candle[self.trail_sl_bcb_type]
         pct_from_sl = abs(candle_body - sl_price) / sl_price
-        logger.debug(f"pct_from_sl = {round(pct_from_sl * 100, 2)}")
 
         possible_move_tsl = self.move_sl_bool(
             num_1=pct_from_sl,
@@ -317,7 +327,6 @@ class StopLoss:
         # TODO once possible_move_tsl is True, we don't need to check it again
 
         if possible_move_tsl:
-            logger.debug("Move tsl")
             new_sl_price = self.tsl_mover(
                 price=sl_price,
                 add_pct=self.trail_sl_by_pct,
@@ -327,9 +336,10 @@ class StopLoss:
                 exchange_num=self.price_tick_step,
             )
             sl_pct = round(abs(sl_price - new_sl_price) / sl_price, 2)
+            if trace.tracer is not None:
+                trace.tracer.record(TraceEvent.MovedTSL, sl_price, new_sl_price, sl_pct)
             return new_sl_price, sl_pct
         else:
-            logger.debug("Not moving tsl")
             return None, None
 
     def min_price_getter(
@@ -359,6 +369,9 @@ class StopLoss:
     def pass_func(self, **kwargs):
         return None, None
 
+    def nothing_status_func(self, **kwargs):
+        return OrderStatus.Nothing, np.nan, np.nan
+
     def sl_to_zero_price(self, **kwargs):
         pass
 
@@ -2,6 +2,7 @@ import numpy as np
 
 from logging import getLogger
 
+from quantfreedom.helpers import trace
 from quantfreedom.helpers.helper_funcs import round_size_by_tick_step
 from quantfreedom.core.enums import (
     CandleBodyType,
@@ -9,6 +10,7 @@ from quantfreedom.core.enums import (
     DecreasePosition,
     OrderStatus,
     TakeProfitStrategyType,
+    TraceEvent,
 )
 
 logger = getLogger()
@@ -41,12 +43,15 @@ class TakeProfit:
         if tp_strategy_type == TakeProfitStrategyType.RiskReward:
             self.tp_calculator = self.tp_rr
             self.checker_tp_hit = self.c_tp_hit_regular
+            self.status_tp_hit = self.tp_hit_status_regular
         if tp_strategy_type == TakeProfitStrategyType.Provided:
             self.tp_calculator = self.tp_provided
             self.checker_tp_hit = self.c_tp_hit_provided
+            self.status_tp_hit = self.tp_hit_status_provided
         if tp_strategy_type == TakeProfitStrategyType.Nothing:
             self.tp_calculator = self.tp_provided
             self.checker_tp_hit = self.c_tp_hit_nothing
+            self.status_tp_hit = self.tp_hit_status_nothing
 
     def short_tp_price(
         self,
@@ -66,9 +71,7 @@ class TakeProfit:
         current_candle: CurrentFootprintCandleTuple,
         tp_price: float,
     ):
-        candle_low = current_candle[CandleBodyType.Low]
-        logger.debug(f"candle_high= {candle_low}")
-        return tp_price > candle_low
+        return tp_price > current_candle[CandleBodyType.Low]
 
     def long_tp_price(
         self,
@@ -88,10 +91,7 @@ class TakeProfit:
         current_candle: CurrentFootprintCandleTuple,
         tp_price: float,
     ):
-        candle_high = current_candle[CandleBodyType.High]
-        logger.debug(f"candle_high= {candle_high}")
-        result = tp_price < candle_high
-        return result
+        return tp_price < current_candle[CandleBodyType.High]
 
     def tp_rr(
         self,
@@ -100,7 +100,6 @@ class TakeProfit:
         total_possible_loss: float,
     ):
         profit = -total_possible_loss * self.risk_reward
-        logger.debug(f"possible profit= {profit}")
         tp_price = self.get_tp_price(
             average_entry=average_entry,
             position_size_usd=position_size_usd,
@@ -111,12 +110,9 @@ class TakeProfit:
             user_num=tp_price,
             exchange_num=self.price_tick_step,
         )
-        logger.debug(f"tp_price= {tp_price}")
 
         tp_pct = round(abs((tp_price - average_entry)) / average_entry, 2)
-        logger.debug(f"tp_pct= {round(tp_pct * 100, 2)}")
         can_move_sl_to_be = True
-        logger.debug("can_move_sl_to_be= True")
         return (
             can_move_sl_to_be,
             tp_price,
@@ -139,25 +135,89 @@ class TakeProfit:
             tp_pct,
         )
 
-    def c_tp_hit_regular(
+    def tp_hit_status_regular(
         self,
         current_candle: CurrentFootprintCandleTuple,
         exit_price: float,
         tp_price: float,
-    ):
+    ) -> tuple[int, float, float]:
+        """
+        Summary
+        -------
+        Same check as c_tp_hit_regular but returns the result instead of raising DecreasePosition
+
+        Returns
+        -------
+        tuple[int, float, float]
+            order_status, exit_price, exit_fee_pct and order status is Nothing if the take profit wasn't hit
+        """
         if self.get_check_tp_candle_price(
             current_candle=current_candle,
             tp_price=tp_price,
         ):
-            logger.debug(f"TP Hit tp_price= {tp_price}")
+            if trace.tracer is not None:
+                trace.tracer.record(TraceEvent.TakeProfitHit, tp_price)
+            return OrderStatus.TakeProfitFilled, tp_price, self.tp_fee_pct
+        else:
+            return OrderStatus.Nothing, np.nan, np.nan
+
+    def tp_hit_status_nothing(
+        self,
+        current_candle: CurrentFootprintCandleTuple,
+        exit_price: float,
+        tp_price: float,
+    ) -> tuple[int, float, float]:
+        return OrderStatus.Nothing, np.nan, np.nan
+
+    def tp_hit_status_provided(
+        self,
+        current_candle: CurrentFootprintCandleTuple,
+        exit_price: float,
+        tp_price: float,
+    ) -> tuple[int, float, float]:
+        """
+        Summary
+        -------
+        Same check as c_tp_hit_provided but returns the result instead of raising DecreasePosition
+
+        Returns
+        -------
+        tuple[int, float, float]
+            order_status, exit_price, exit_fee_pct and order status is Nothing if the strategy didn't provide an exit price
+        """
+        if not np.isnan(exit_price):
+            if trace.tracer is not None:
+                trace.tracer.record(TraceEvent.TakeProfitHit, exit_price)
+            return OrderStatus.TakeProfitFilled, exit_price, self.tp_fee_pct
+        else:
+            return OrderStatus.Nothing, np.nan, np.nan
+
+    def raise_tp_hit_status(
+        self,
+        order_status: int,
+        exit_price: float,
+        exit_fee_pct: float,
+    ):
+        if order_status != OrderStatus.Nothing:
             raise DecreasePosition(
-                exit_fee_pct=self.tp_fee_pct,
-                exit_price=tp_price,
-                order_status=OrderStatus.TakeProfitFilled,
+                exit_fee_pct=exit_fee_pct,
+                exit_price=exit_price,
+                order_status=order_status,
             )
-        else:
-            logger.debug("No Tp Hit")
-            pass
+
+    def c_tp_hit_regular(
+        self,
+        current_candle: CurrentFootprintCandleTuple,
+        exit_price: float,
+        tp_price: float,
+    ):
+        self.raise_tp_hit_status(
+            *self.tp_hit_status_regular(
+                current_candle=current_candle,
+                exit_price=exit_price,
+                tp_price=tp_price,
+            )
+        )
 
     def c_tp_hit_nothing(
         self,
@@ -173,13 +233,10 @@ class TakeProfit:
         exit_price: float,
         tp_price: float,
     ):
-        if not np.isnan(exit_price):
-            logger.debug(f"TP Hit tp_price= {exit_price}")
-            raise DecreasePosition(
-                exit_fee_pct=self.tp_fee_pct,
+        self.raise_tp_hit_status(
+            *self.tp_hit_status_provided(
+                current_candle=current_candle,
                 exit_price=exit_price,
-                order_status=OrderStatus.TakeProfitFilled,
+                tp_price=tp_price,
             )
-        else:
-            logger.debug("No Tp Hit")
-            pass
+        )
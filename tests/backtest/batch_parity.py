@@ -0,0 +1,91 @@
+import sys
+import numpy as np
+from contextlib import redirect_stdout
+from copy import copy
+from io import StringIO
+from os.path import abspath, dirname, join
+from quantfreedom.backtesters import run_df_backtest
+from quantfreedom.core.enums import BacktestSettings, FootprintCandlesTuple, TakeProfitStrategyType
+from kernel_parity import ParityRSI, long_og_dos_tuple, long_static_os_tuple, parity_strategies
+
+sys.path.append(join(dirname(abspath(__file__)), "..", "benchmarks"))
+from bench_strategy import make_random_walk_candles
+
+# the batch engine has to give the same backtest results as the loop engine
+# a small batch_size so every task goes through a few batches that reuse the same buffers
+total_bars = 20_000
+batch_size = 7
+
+
+class ProvidedExitRSI(ParityRSI):
+    def set_entries_exits_array(
+        self,
+        candles: FootprintCandlesTuple,
+    ):
+        """
+        Summary
+        -------
+        Same entries as ParityRSI and it exits at the close when the rsi gets back past 100 - rsi_level
+        """
+        super().set_entries_exits_array(candles=candles)
+        rsi = self.get_bank_indicator()
+        if rsi is None:
+            rsi = self.calc_indicator_bank_values(
+                candles=candles,
+                bank_params=(self.cur_ind_set_tuple.rsi_length,),
+            )
+        exit_level = 100 - self.cur_ind_set_tuple.rsi_level
+        exits = rsi > exit_level if self.long_short == "long" else rsi < exit_level
+        self.exit_prices = np.where(exits, candles.candle_close_prices, np.nan)
+
+
+def get_parity_strategies() -> dict:
+    long_strategy, short_strategy = parity_strategies
+
+    provided_strategy = ProvidedExitRSI(
+        long_short="long",
+        og_dos_tuple=long_og_dos_tuple,
+        static_os_tuple=long_static_os_tuple._replace(tp_strategy_type=TakeProfitStrategyType.Provided),
+        rsi_length=np.array([14, 20]),
+        rsi_level=np.array([35]),
+    )
+
+    # the filters prune settings before and during the backtest
+    filtered_strategy = copy(short_strategy)
+    filtered_strategy.backtest_settings_tuple = BacktestSettings(
+        gains_pct_filter=-np.inf,
+        qf_filter=-np.inf,
+        total_trade_filter=300,
+    )
+    return {
+        "long": long_strategy,
+        "short": short_strategy,
+        "long provided exits": provided_strategy,
+        "short total trade filter": filtered_strategy,
+    }
+
+
+if __name__ == "__main__":
+    candles = make_random_walk_candles(total_bars=total_bars)
+
+    all_match = True
+    for name, strategy in get_parity_strategies().items():
+        # the tasks finish in any order so the rows get sorted by settings index
+        with redirect_stdout(StringIO()):
+            loop_df = run_df_backtest(candles=candles, strategy=strategy, threads=2, engine="loop").sort_index()
+            batch_df = run_df_backtest(
+                candles=candles,
+                strategy=strategy,
+                threads=2,
+                engine="batch",
+                batch_size=batch_size,
+            ).sort_index()
+        results_match = loop_df.equals(batch_df)
+        all_match &= results_match
+        print(
+            f"{name} {strategy.total_filtered_settings} settings "
+            f"{loop_df.shape[0]} rows {'match' if results_match else 'do not match'}"
+        )
+
+    print("\n" + ("batch matches the loop engine" if all_match else "batch does not match the loop engine"))
+    sys.exit(0 if all_match else 1)
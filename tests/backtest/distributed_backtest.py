@@ -0,0 +1,84 @@
+import os
+import sys
+from multiprocessing import Process
+from os.path import abspath, dirname, join
+from signal import SIGKILL
+from time import perf_counter
+from typing import Optional
+from quantfreedom.backtesters import run_coordinator_backtest, run_df_backtest, run_worker_backtest
+
+sys.path.append(join(dirname(abspath(__file__)), "..", "benchmarks"))
+from bench_strategy import BenchRSI, get_bench_strategy, make_random_walk_candles
+
+# the whole coordinator and worker setup on one box, every worker process acts like its own machine
+# one of the workers dies in the middle of a range and the results still have to be the same as run_df_backtest
+# on other machines only run the worker part with the host of the coordinator
+total_bars = 20_000
+total_ind_settings = 40
+total_workers = 3
+threads_per_worker = 1
+chunk_size = 8
+kill_after_settings = 5
+port = 6000
+
+
+def start_worker(
+    worker_name: str,
+    kill_after: Optional[int] = None,
+):
+    # its own process group so killing it takes its pool processes with it like a machine going down
+    os.setsid()
+    if kill_after is not None:
+        set_entries_exits_array = BenchRSI.set_entries_exits_array
+        settings_started = [0]
+
+        def dying_set_entries_exits_array(self, candles):
+            settings_started[0] += 1
+            if settings_started[0] > kill_after:
+                os.killpg(0, SIGKILL)
+            set_entries_exits_array(self, candles)
+
+        # only this worker gets it, the class name has to stay the same or the coordinator turns the worker away
+        BenchRSI.set_entries_exits_array = dying_set_entries_exits_array
+
+    run_worker_backtest(
+        candles=make_random_walk_candles(total_bars=total_bars),
+        strategy=get_bench_strategy(total_ind_settings=total_ind_settings),
+        threads=threads_per_worker,
+        host="127.0.0.1",
+        port=port,
+        worker_name=worker_name,
+    )
+
+
+if __name__ == "__main__":
+    start = perf_counter()
+    candles = make_random_walk_candles(total_bars=total_bars)
+    strategy = get_bench_strategy(total_ind_settings=total_ind_settings)
+
+    dying_worker = Process(target=start_worker, args=("worker_0", kill_after_settings))
+    workers = [dying_worker] + [Process(target=start_worker, args=(f"worker_{idx}",)) for idx in range(1, total_workers)]
+    for worker in workers:
+        worker.start()
+
+    distributed_df = run_coordinator_backtest(
+        candles=candles,
+        strategy=strategy,
+        host="127.0.0.1",
+        port=port,
+        chunk_size=chunk_size,
+        progress_interval=1.0,
+    ).sort_index()
+    for worker in workers:
+        worker.join(timeout=30)
+
+    print("\n" + "Running the same backtest with run_df_backtest")
+    # the ranges finish in any order so the rows get sorted by settings index
+    df = run_df_backtest(candles=candles, strategy=strategy, threads=2).sort_index()
+
+    worker_killed = dying_worker.exitcode == -SIGKILL
+    results_match = df.shape[0] > 0 and df.equals(distributed_df)
+    print("\n" + f"worker_0 {'got killed' if worker_killed else 'did not get killed'}")
+    print(f"{df.shape[0]} rows {'match' if results_match else 'do not match'} run_df_backtest")
+    print(f"It took {perf_counter() - start:.1f} seconds")
+    sys.exit(0 if worker_killed and results_match else 1)
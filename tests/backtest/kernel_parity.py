@@ -0,0 +1,303 @@
+import os
+import subprocess
+import sys
+import numpy as np
+from contextlib import redirect_stdout
+from copy import copy
+from io import StringIO
+from os.path import abspath, dirname, join
+from typing import NamedTuple
+from quantfreedom.backtesters import or_backtest, run_df_backtest
+from quantfreedom.core.strategy import Strategy
+from quantfreedom.helpers.helper_funcs import order_records_to_df
+from quantfreedom.indicators.tv_indicators import rsi_tv
+from quantfreedom.order_handler.kernel_order import JIT_AVAILABLE, KernelOrderHandler
+from quantfreedom.core.enums import (
+    BacktestSettings,
+    CandleBodyType,
+    DynamicOrderSettings,
+    ExchangeSettings,
+    FootprintCandlesTuple,
+    IncreasePositionType,
+    LeverageStrategyType,
+    StaticOrderSettings,
+    StopLossStrategyType,
+    TakeProfitStrategyType,
+    TrailingSLStrategyType,
+)
+
+sys.path.append(join(dirname(abspath(__file__)), "..", "benchmarks"))
+from bench_strategy import make_random_walk_candles
+
+# the kernel engine has to give the same order records and backtest results as the OrderHandler
+# with numba installed it checks the compiled kernel and then runs again with NUMBA_DISABLE_JIT=1 for the python one
+# without numba run_df_backtest runs the python kernel too so the backtest results still check the kernel against loop
+total_bars = 20_000
+
+
+class IndicatorSettings(NamedTuple):
+    rsi_length: np.ndarray
+    rsi_level: np.ndarray
+
+
+class ParityRSI(Strategy):
+    og_ind_set_tuple: IndicatorSettings
+    cur_ind_set_tuple: IndicatorSettings
+    indicator_bank_fields = ("rsi_length",)
+
+    def __init__(
+        self,
+        long_short: str,
+        og_dos_tuple: DynamicOrderSettings,
+        static_os_tuple: StaticOrderSettings,
+        rsi_length: np.ndarray,
+        rsi_level: np.ndarray,
+    ) -> None:
+        """
+        Summary
+        -------
+        Long when the rsi is below rsi_level and turns up, short when it is above rsi_level and turns down
+        """
+        self.long_short = long_short
+        self.log_folder = abspath(join(abspath("")))
+        self.exchange_settings_tuple = exchange_settings_tuple
+        self.backtest_settings_tuple = backtest_settings_tuple
+        self.static_os_tuple = static_os_tuple
+
+        cart_prod_array, self.total_dos = self.get_ind_set_dos_cart_product(
+            dos_tuple=og_dos_tuple,
+            ind_set_tuple=IndicatorSettings(rsi_length=rsi_length, rsi_level=rsi_level),
+        )
+        cart_prod_array[11] = np.arange(cart_prod_array.shape[1])
+        self.og_dos_tuple = self.get_og_dos_tuple(final_cart_prod_array=cart_prod_array)
+        self.og_ind_set_tuple = self.get_og_ind_set_tuple(final_cart_prod_array=cart_prod_array)
+        self.total_filtered_settings = cart_prod_array.shape[1]
+
+    def get_og_ind_set_tuple(
+        self,
+        final_cart_prod_array: np.ndarray,
+    ) -> IndicatorSettings:
+        return IndicatorSettings(
+            rsi_length=final_cart_prod_array[12].astype(np.int_),
+            rsi_level=final_cart_prod_array[13].astype(np.int_),
+        )
+
+    def calc_indicator_bank_values(
+        self,
+        candles: FootprintCandlesTuple,
+        bank_params: tuple,
+    ) -> np.ndarray:
+        rsi = rsi_tv(
+            source=candles.candle_close_prices,
+            length=int(bank_params[0]),
+        )
+        return np.around(rsi, 1)
+
+    def set_cur_ind_set_tuple(
+        self,
+        set_idx: int,
+    ):
+        self.cur_ind_set_tuple = IndicatorSettings(
+            rsi_length=self.og_ind_set_tuple.rsi_length[set_idx],
+            rsi_level=self.og_ind_set_tuple.rsi_level[set_idx],
+        )
+
+    def set_entries_exits_array(
+        self,
+        candles: FootprintCandlesTuple,
+    ):
+        rsi = self.get_bank_indicator()
+        if rsi is None:
+            rsi = self.calc_indicator_bank_values(
+                candles=candles,
+                bank_params=(self.cur_ind_set_tuple.rsi_length,),
+            )
+        p_rsi = np.roll(rsi, 1)
+        p_rsi[0] = np.nan
+
+        if self.long_short == "long":
+            self.entries = (rsi < self.cur_ind_set_tuple.rsi_level) & (rsi > p_rsi)
+        else:
+            self.entries = (rsi > self.cur_ind_set_tuple.rsi_level) & (rsi < p_rsi)
+        self.exit_prices = np.full_like(rsi, np.nan)
+        self.entries[: self.static_os_tuple.starting_bar] = False
+
+    def get_long_or_short(
+        self,
+    ):
+        return self.long_short
+
+
+backtest_settings_tuple = BacktestSettings(
+    gains_pct_filter=-np.inf,
+    qf_filter=-np.inf,
+)
+
+exchange_settings_tuple = ExchangeSettings(
+    asset_tick_step=3,
+    leverage_mode=1,
+    leverage_tick_step=2,
+    limit_fee_pct=0.0003,
+    market_fee_pct=0.0006,
+    max_asset_size=100.0,
+    max_leverage=150.0,
+    min_asset_size=0.001,
+    min_leverage=1.0,
+    mmr_pct=0.004,
+    position_mode=3,
+    price_tick_step=1,
+)
+
+long_static_os_tuple = StaticOrderSettings(
+    increase_position_type=IncreasePositionType.RiskPctAccountEntrySize,
+    leverage_strategy_type=LeverageStrategyType.Dynamic,
+    pg_min_max_sl_bcb="min",
+    sl_strategy_type=StopLossStrategyType.SLBasedOnCandleBody,
+    trailing_sl_strategy_type=TrailingSLStrategyType.PctAboveBelow,
+    sl_to_be_bool=False,
+    starting_bar=100,
+    starting_equity=1000.0,
+    static_leverage=None,
+    tp_fee_type="limit",
+    tp_strategy_type=TakeProfitStrategyType.RiskReward,
+    z_or_e_type=None,
+)
+
+long_og_dos_tuple = DynamicOrderSettings(
+    account_pct_risk_per_trade=np.array([3]),
+    max_trades=np.array([2, 4]),
+    risk_reward=np.array([2, 5]),
+    sl_based_on_add_pct=np.array([0.2]),
+    sl_based_on_lookback=np.array([20]),
+    sl_bcb_type=np.array([CandleBodyType.Low]),
+    sl_to_be_cb_type=np.array([CandleBodyType.Nothing]),
+    sl_to_be_when_pct=np.array([0]),
+    trail_sl_bcb_type=np.array([CandleBodyType.Low]),
+    trail_sl_by_pct=np.array([0.5, 1.0]),
+    trail_sl_when_pct=np.array([1, 2]),
+)
+
+short_static_os_tuple = StaticOrderSettings(
+    increase_position_type=IncreasePositionType.RiskPctAccountEntrySize,
+    leverage_strategy_type=LeverageStrategyType.Dynamic,
+    pg_min_max_sl_bcb="max",
+    sl_strategy_type=StopLossStrategyType.SLBasedOnCandleBody,
+    trailing_sl_strategy_type=TrailingSLStrategyType.CBAboveBelow,
+    sl_to_be_bool=True,
+    starting_bar=100,
+    starting_equity=1000.0,
+    static_leverage=None,
+    tp_fee_type="limit",
+    tp_strategy_type=TakeProfitStrategyType.RiskReward,
+    z_or_e_type="entry",
+)
+
+short_og_dos_tuple = DynamicOrderSettings(
+    account_pct_risk_per_trade=np.array([3]),
+    max_trades=np.array([2, 4]),
+    risk_reward=np.array([2, 5]),
+    sl_based_on_add_pct=np.array([0.2]),
+    sl_based_on_lookback=np.array([20]),
+    sl_bcb_type=np.array([CandleBodyType.High]),
+    sl_to_be_cb_type=np.array([CandleBodyType.Low]),
+    sl_to_be_when_pct=np.array([1]),
+    trail_sl_bcb_type=np.array([CandleBodyType.High]),
+    trail_sl_by_pct=np.array([0.5, 1.0]),
+    trail_sl_when_pct=np.array([1, 2]),
+)
+
+parity_strategies = [
+    ParityRSI(
+        long_short="long",
+        og_dos_tuple=long_og_dos_tuple,
+        static_os_tuple=long_static_os_tuple,
+        rsi_length=np.array([14, 20]),
+        rsi_level=np.array([35]),
+    ),
+    ParityRSI(
+        long_short="short",
+        og_dos_tuple=short_og_dos_tuple,
+        static_os_tuple=short_static_os_tuple,
+        rsi_length=np.array([14, 20]),
+        rsi_level=np.array([65]),
+    ),
+]
+
+
+def kernel_order_records_df(candles, strategy, set_idx):
+    # same steps or_backtest takes to get to the setting
+    strategy = copy(strategy)
+    set_idx = strategy.get_settings_index(set_idx=set_idx)
+    strategy.set_cur_ind_set_tuple(set_idx=set_idx)
+    strategy.set_entries_exits_array(candles=candles)
+    strategy.set_cur_dos_tuple(set_idx=set_idx)
+
+    order = KernelOrderHandler(
+        exchange_settings_tuple=strategy.exchange_settings_tuple,
+        long_short=strategy.get_long_or_short(),
+        static_os_tuple=strategy.static_os_tuple,
+    )
+    order_records = order.get_order_records(
+        candles=candles,
+        dynamic_order_settings=strategy.cur_dos_tuple,
+        entries=strategy.entries,
+        exit_prices=strategy.exit_prices,
+        set_idx=set_idx,
+        starting_bar=strategy.static_os_tuple.starting_bar - 1,
+        starting_equity=strategy.static_os_tuple.starting_equity,
+    )
+    return order_records_to_df(order_records)
+
+
+if __name__ == "__main__":
+    python_kernel = not JIT_AVAILABLE or os.environ.get("NUMBA_DISABLE_JIT") == "1"
+    print(f"kernel= {'python' if python_kernel else 'numba compiled'}")
+    candles = make_random_walk_candles(total_bars=total_bars)
+    # or_backtest only has room for this many order records
+    max_order_records = int(total_bars / 3)
+
+    all_match = True
+    for strategy in parity_strategies:
+        long_short = strategy.get_long_or_short()
+        order_record_diffs = []
+        most_order_records = 0
+        for set_idx in range(strategy.total_filtered_settings):
+            kernel_df = kernel_order_records_df(candles=candles, strategy=strategy, set_idx=set_idx)
+            most_order_records = max(most_order_records, kernel_df.shape[0])
+            if kernel_df.shape[0] > max_order_records:
+                order_record_diffs.append(set_idx)
+                continue
+            with redirect_stdout(StringIO()):
+                or_df = or_backtest(
+                    candles=candles,
+                    disable_logger=True,
+                    disable_plot=True,
+                    strategy=copy(strategy),
+                    set_idx=set_idx,
+                )
+            if not or_df.equals(kernel_df):
+                order_record_diffs.append(set_idx)
+        total_settings = strategy.total_filtered_settings
+        print(
+            f"{long_short} order records {total_settings - len(order_record_diffs)} of {total_settings} match, "
+            f"most order records {most_order_records} of the {max_order_records} or_backtest has room for"
+        )
+        if order_record_diffs:
+            all_match = False
+            print(f"settings indexes that don't match or don't fit= {order_record_diffs}")
+
+        # the tasks finish in any order so the rows get sorted by settings index
+        with redirect_stdout(StringIO()):
+            loop_df = run_df_backtest(candles=candles, strategy=strategy, threads=2, engine="loop").sort_index()
+            kernel_df = run_df_backtest(candles=candles, strategy=strategy, threads=2, engine="kernel").sort_index()
+        results_match = loop_df.shape[0] > 0 and loop_df.equals(kernel_df)
+        all_match &= results_match
+        print(f"{long_short} backtest results {loop_df.shape[0]} rows {'match' if results_match else 'do not match'}")
+
+    print("\n" + ("kernel matches the OrderHandler" if all_match else "kernel does not match the OrderHandler"))
+
+    if not python_kernel:
+        print("\n" + "running again with the python kernel")
+        python_run = subprocess.run([sys.executable, abspath(__file__)], env={**os.environ, "NUMBA_DISABLE_JIT": "1"})
+        all_match &= python_run.returncode == 0
+    sys.exit(0 if all_match else 1)
@@ -23,6 +23,8 @@ if __name__ == "__main__":
         strategy=rsi_rising_falling_long_strat,
         threads=32,
         step_by=2,
+        checkpoint_path="dbs/checkpoints",
+        resume=True,
     )
     print("\n" + "Backtest results done now saving to hdf5")
     backtest_results.to_hdf(
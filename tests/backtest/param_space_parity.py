@@ -0,0 +1,108 @@
+import sys
+import numpy as np
+from contextlib import redirect_stdout
+from io import StringIO
+from os.path import abspath, dirname, join
+from quantfreedom.backtesters import run_df_backtest
+from quantfreedom.core.enums import BacktestSettings, CandleBodyType, DynamicOrderSettings
+from rsi_rising_falling import IndicatorSettings, RSIRisingFalling
+
+sys.path.append(join(dirname(abspath(__file__)), "..", "benchmarks"))
+from bench_strategy import make_random_walk_candles
+
+# lazy mode has to give the same settings in the same order and the same backtest results as the cart prod array
+total_bars = 20_000
+
+small_dos_tuple = DynamicOrderSettings(
+    account_pct_risk_per_trade=np.array([3]),
+    max_trades=np.array([2, 4]),
+    risk_reward=np.array([2, 4]),
+    sl_based_on_add_pct=np.array([0.2]),
+    sl_based_on_lookback=np.array([20]),
+    sl_bcb_type=np.array([CandleBodyType.Low]),
+    sl_to_be_cb_type=np.array([CandleBodyType.Nothing]),
+    sl_to_be_when_pct=np.array([0]),
+    trail_sl_bcb_type=np.array([CandleBodyType.Low]),
+    trail_sl_by_pct=np.array([0.5, 1.0, 2.0]),
+    trail_sl_when_pct=np.array([1, 2]),
+)
+
+ind_settings = {
+    "long": dict(
+        rsi_length=np.array([14, 20]),
+        below_rsi_cur=np.array([30, 40]),
+        below_rsi_p=np.array([25, 30, 40]),
+        below_rsi_pp=np.array([30, 40]),
+    ),
+    "short": dict(
+        rsi_length=np.array([14, 20]),
+        above_rsi_cur=np.array([70, 60]),
+        above_rsi_p=np.array([75, 70, 60]),
+        above_rsi_pp=np.array([70, 60]),
+    ),
+}
+
+
+def get_strategy(long_short: str, lazy_bool: bool) -> RSIRisingFalling:
+    strategy = RSIRisingFalling(
+        long_short=long_short,
+        shuffle_bool=False,
+        lazy_bool=lazy_bool,
+        **ind_settings[long_short],
+    )
+    # the backtest settings of the module only keep winners and a random walk doesn't have many of them
+    strategy.backtest_settings_tuple = BacktestSettings(gains_pct_filter=-np.inf, qf_filter=-np.inf)
+    og_ind_set_tuple = IndicatorSettings(
+        **{field: ind_settings[long_short].get(field, np.array([0])) for field in IndicatorSettings._fields}
+    )
+    if lazy_bool:
+        strategy.set_og_param_space(
+            og_dos_tuple=small_dos_tuple,
+            og_ind_set_tuple=og_ind_set_tuple,
+            shuffle_bool=False,
+        )
+    else:
+        strategy.set_og_ind_and_dos_tuples(
+            og_dos_tuple=small_dos_tuple,
+            og_ind_set_tuple=og_ind_set_tuple,
+            shuffle_bool=False,
+        )
+    return strategy
+
+
+if __name__ == "__main__":
+    candles = make_random_walk_candles(total_bars=total_bars)
+
+    all_match = True
+    for long_short in ind_settings:
+        cart_strategy = get_strategy(long_short=long_short, lazy_bool=False)
+        lazy_strategy = get_strategy(long_short=long_short, lazy_bool=True)
+
+        total_settings = cart_strategy.total_filtered_settings
+        settings_match = lazy_strategy.total_filtered_settings == total_settings
+        lazy_strategy.set_og_tuples_from_param_space(range_start=0, range_end=lazy_strategy.total_filtered_settings)
+        if settings_match:
+            settings_match = all(
+                np.array_equal(cart_array, lazy_array)
+                for cart_array, lazy_array in zip(
+                    cart_strategy.og_dos_tuple + cart_strategy.og_ind_set_tuple,
+                    lazy_strategy.og_dos_tuple + lazy_strategy.og_ind_set_tuple,
+                )
+            )
+        print(f"{long_short} {total_settings} settings {'match' if settings_match else 'do not match'}")
+
+        # the tasks finish in any order so the rows get sorted by settings index
+        with redirect_stdout(StringIO()):
+            cart_df = run_df_backtest(candles=candles, strategy=cart_strategy, threads=2).sort_index()
+            lazy_df = run_df_backtest(
+                candles=candles,
+                strategy=get_strategy(long_short=long_short, lazy_bool=True),
+                threads=2,
+            ).sort_index()
+        results_match = cart_df.shape[0] > 0 and cart_df.equals(lazy_df)
+        print(f"{long_short} backtest results {cart_df.shape[0]} rows {'match' if results_match else 'do not match'}")
+
+        all_match &= settings_match and results_match
+
+    print("\n" + ("lazy mode matches the cart prod array" if all_match else "lazy mode does not match the cart prod array"))
+    sys.exit(0 if all_match else 1)
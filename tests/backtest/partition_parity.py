@@ -0,0 +1,44 @@
+import sys
+from contextlib import redirect_stdout
+from io import StringIO
+from os.path import abspath, dirname, join
+from quantfreedom.backtesters import run_df_backtest
+from param_space_parity import get_strategy
+
+sys.path.append(join(dirname(abspath(__file__)), "..", "benchmarks"))
+from bench_strategy import make_random_walk_candles
+
+# the partition only changes how the settings get split into tasks, with or without step_by it has to backtest the same settings
+total_bars = 5_000
+
+if __name__ == "__main__":
+    candles = make_random_walk_candles(total_bars=total_bars)
+
+    all_match = True
+    for lazy_bool in [False, True]:
+        for step_by in [1, 3]:
+            # the tasks finish in any order so the rows get sorted by settings index
+            with redirect_stdout(StringIO()):
+                range_df = run_df_backtest(
+                    candles=candles,
+                    strategy=get_strategy(long_short="long", lazy_bool=lazy_bool),
+                    threads=2,
+                    step_by=step_by,
+                    partition="range",
+                ).sort_index()
+                indicator_df = run_df_backtest(
+                    candles=candles,
+                    strategy=get_strategy(long_short="long", lazy_bool=lazy_bool),
+                    threads=2,
+                    step_by=step_by,
+                    partition="indicator",
+                ).sort_index()
+            results_match = range_df.shape[0] > 0 and range_df.equals(indicator_df)
+            all_match &= results_match
+            print(
+                f"{'lazy' if lazy_bool else 'cart prod'} step_by= {step_by} "
+                f"{range_df.shape[0]} rows {'match' if results_match else 'do not match'}"
+            )
+
+    print("\n" + ("indicator partition matches the range partition" if all_match else "indicator partition does not match the range partition"))
+    sys.exit(0 if all_match else 1)
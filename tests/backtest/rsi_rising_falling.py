@@ -5,6 +5,7 @@ from typing import NamedTuple
 from os.path import join, abspath
 from quantfreedom.helpers.helper_funcs import np_lb_one
 from quantfreedom.indicators.tv_indicators import rsi_tv
+from quantfreedom.core.param_space import ParamConstraint
 from quantfreedom.core.strategy import Strategy
 from quantfreedom.core.enums import (
     BacktestSettings,
@@ -36,6 +37,7 @@ class IndicatorSettings(NamedTuple):
 class RSIRisingFalling(Strategy):
     og_ind_set_tuple: IndicatorSettings
     cur_ind_set_tuple: IndicatorSettings
+    indicator_bank_fields = ("rsi_length",)
 
     def __init__(
         self,
@@ -48,6 +50,7 @@ class RSIRisingFalling(Strategy):
         below_rsi_cur: np.ndarray = np.array([0]),
         below_rsi_p: np.ndarray = np.array([0]),
         below_rsi_pp: np.ndarray = np.array([0]),
+        lazy_bool: bool = False,
     ) -> None:
 
         self.long_short = long_short
@@ -72,7 +75,6 @@ class RSIRisingFalling(Strategy):
             self.live_bt = self.long_live_bt
             self.live_evaluate = self.long_live_evaluate
             self.set_cur_ind_tuple = self.long_set_cur_ind_tuple
-            self.set_entries_exits_array = self.long_set_entries_exits_array
             self.set_live_bt_entries_exits_array = self.long_live_bt_set_entries_exits_array
             self.static_os_tuple = long_static_os_tuple
         else:
@@ -82,15 +84,22 @@ class RSIRisingFalling(Strategy):
             self.live_bt = self.short_live_bt
             self.live_evaluate = self.short_live_evaluate
             self.set_cur_ind_tuple = self.short_set_cur_ind_tuple
-            self.set_entries_exits_array = self.short_set_entries_exits_array
             self.set_live_bt_entries_exits_array = self.short_live_bt_set_entries_exits_array
             self.static_os_tuple = short_static_os_tuple
 
-        self.set_og_ind_and_dos_tuples(
-            og_dos_tuple=og_dos_tuple,
-            og_ind_set_tuple=og_ind_set_tuple,
-            shuffle_bool=shuffle_bool,
-        )
+        # lazy only decodes the settings a backtest asks for instead of building the whole cart prod array
+        if lazy_bool:
+            self.set_og_param_space(
+                og_dos_tuple=og_dos_tuple,
+                og_ind_set_tuple=og_ind_set_tuple,
+                shuffle_bool=shuffle_bool,
+            )
+        else:
+            self.set_og_ind_and_dos_tuples(
+                og_dos_tuple=og_dos_tuple,
+                og_ind_set_tuple=og_ind_set_tuple,
+                shuffle_bool=shuffle_bool,
+            )
 
     #######################################################
     #######################################################
@@ -109,9 +118,9 @@ class RSIRisingFalling(Strategy):
         shuffle_bool: bool,
     ) -> None:
 
-        cart_prod_array = self.get_ind_set_dos_cart_product(
-            og_dos_tuple=og_dos_tuple,
-            og_ind_set_tuple=og_ind_set_tuple,
+        cart_prod_array, self.total_dos = self.get_ind_set_dos_cart_product(
+            dos_tuple=og_dos_tuple,
+            ind_set_tuple=og_ind_set_tuple,
         )
 
         filtered_cart_prod_array = self.get_filter_cart_prod_array(
@@ -155,6 +164,37 @@ class RSIRisingFalling(Strategy):
 
         return og_ind_set_tuple
 
+    # these are methods instead of being set in __init__ because the backtests copy the strategy and a bound method would still change the original
+    def set_cur_ind_set_tuple(
+        self,
+        set_idx: int,
+    ):
+        if self.long_short == "long":
+            self.long_set_cur_ind_tuple(set_idx=set_idx)
+        else:
+            self.short_set_cur_ind_tuple(set_idx=set_idx)
+
+    def set_entries_exits_array(
+        self,
+        candles: FootprintCandlesTuple,
+    ):
+        if self.long_short == "long":
+            self.long_set_entries_exits_array(candles=candles)
+        else:
+            self.short_set_entries_exits_array(candles=candles)
+
+    def calc_indicator_bank_values(
+        self,
+        candles: FootprintCandlesTuple,
+        bank_params: tuple,
+    ) -> np.ndarray:
+        rsi_length = bank_params[0]
+        rsi = rsi_tv(
+            source=candles.candle_close_prices,
+            length=int(rsi_length),
+        )
+        return np.around(rsi, 1)
+
     def get_filter_cart_prod_array(
         self,
         cart_prod_array: np.ndarray,
@@ -184,6 +224,31 @@ class RSIRisingFalling(Strategy):
 
         return filtered_cart_prod_array
 
+    def get_param_space_constraints(
+        self,
+        dos_tuple: DynamicOrderSettings,
+        ind_set_tuple: IndicatorSettings,
+    ) -> list[ParamConstraint]:
+        # same filters as get_filter_cart_prod_array so lazy mode gets the same settings
+        above_rsi_cur = 13
+        above_rsi_p = 14
+        above_rsi_pp = 15
+        below_rsi_cur = 16
+        below_rsi_p = 17
+        below_rsi_pp = 18
+
+        constraints = super().get_param_space_constraints(
+            dos_tuple=dos_tuple,
+            ind_set_tuple=ind_set_tuple,
+        )
+        constraints += [
+            ParamConstraint(left=above_rsi_cur, op="<=", right=above_rsi_p),
+            ParamConstraint(left=above_rsi_pp, op="<=", right=above_rsi_p),
+            ParamConstraint(left=below_rsi_cur, op=">=", right=below_rsi_p),
+            ParamConstraint(left=below_rsi_pp, op=">=", right=below_rsi_p),
+        ]
+        return constraints
+
     #######################################################
     #######################################################
     #######################################################
@@ -242,23 +307,25 @@ below_rsi_pp= {below_rsi_pp}
         candles: FootprintCandlesTuple,
     ):
         try:
-            rsi = rsi_tv(
-                source=candles.candle_close_prices,
-                length=self.cur_ind_set_tuple.rsi_length,
-            )
-
-            self.rsi = np.around(rsi, 1)
+            self.rsi = self.get_bank_indicator()
+            if self.rsi is None:
+                self.rsi = self.calc_indicator_bank_values(
+                    candles=candles,
+                    bank_params=(self.cur_ind_set_tuple.rsi_length,),
+                )
             logger.debug("Created RSI")
 
             rsi_lb = np_lb_one(
                 arr=self.rsi,
-                lb=2,
-                include=False,
+                lookback=2,
+                include_current=False,
                 fill_value=np.nan,
             )
 
-            p_rsi = rsi_lb[:, 0]
-            pp_rsi = rsi_lb[:, 1]
+            # the first column is the oldest so p_rsi is the last column
+            # this used to take p_rsi from the first column, which is 2 bars back, so the entries are on different bars than before
+            p_rsi = rsi_lb[:, 1]
+            pp_rsi = rsi_lb[:, 0]
 
             falling = pp_rsi > p_rsi
             rising = self.rsi > p_rsi
@@ -443,23 +510,25 @@ above_rsi_pp= {above_rsi_pp}
         candles: FootprintCandlesTuple,
     ):
         try:
-            rsi = rsi_tv(
-                source=candles.candle_close_prices,
-                length=self.cur_ind_set_tuple.rsi_length,
-            )
-
-            self.rsi = np.around(rsi, 1)
+            self.rsi = self.get_bank_indicator()
+            if self.rsi is None:
+                self.rsi = self.calc_indicator_bank_values(
+                    candles=candles,
+                    bank_params=(self.cur_ind_set_tuple.rsi_length,),
+                )
             logger.debug("Created RSI")
 
             rsi_lb = np_lb_one(
                 arr=self.rsi,
-                lb=2,
-                include=False,
+                lookback=2,
+                include_current=False,
                 fill_value=np.nan,
             )
 
-            p_rsi = rsi_lb[:, 0]
-            pp_rsi = rsi_lb[:, 1]
+            # the first column is the oldest so p_rsi is the last column
+            # this used to take p_rsi from the first column, which is 2 bars back, so the entries are on different bars than before
+            p_rsi = rsi_lb[:, 1]
+            pp_rsi = rsi_lb[:, 0]
 
             rising = pp_rsi < p_rsi
             falling = self.rsi > p_rsi
@@ -590,6 +659,11 @@ above_rsi_pp= {above_rsi_pp}
     #######################################################
     #######################################################
 
+    def get_long_or_short(
+        self,
+    ):
+        return self.long_short
+
     def plot_signals(
         self,
         candles: FootprintCandlesTuple,
@@ -0,0 +1,304 @@
+import numpy as np
+from logging import getLogger
+from typing import NamedTuple
+from os.path import join, abspath
+from quantfreedom.indicators.tv_indicators import rsi_tv
+from quantfreedom.core.strategy import Strategy
+from quantfreedom.core.enums import (
+    BacktestSettings,
+    CandleBodyType,
+    DynamicOrderSettings,
+    ExchangeSettings,
+    FootprintCandlesTuple,
+    IncreasePositionType,
+    LeverageStrategyType,
+    StaticOrderSettings,
+    StopLossStrategyType,
+    TrailingSLStrategyType,
+    TakeProfitStrategyType,
+)
+
+logger = getLogger()
+
+
+def make_random_walk_candles(
+    total_bars: int,
+    seed: int = 1022,
+) -> FootprintCandlesTuple:
+    """
+    Summary
+    -------
+    5 min candles of a random walk, the same total_bars and seed always give the same candles
+
+    Parameters
+    ----------
+    total_bars : int
+        number of candles
+    seed : int, 1022
+        seed of the random walk
+
+    Returns
+    -------
+    FootprintCandlesTuple
+        candles
+    """
+    rng = np.random.default_rng(seed)
+    close_prices = np.around(30000 * np.exp(rng.normal(scale=0.0015, size=total_bars).cumsum()), 1)
+    open_prices = np.roll(close_prices, 1)
+    open_prices[0] = close_prices[0]
+    high_prices = np.maximum(open_prices, close_prices) + np.around(np.abs(rng.normal(scale=30, size=total_bars)), 1)
+    low_prices = np.minimum(open_prices, close_prices) - np.around(np.abs(rng.normal(scale=30, size=total_bars)), 1)
+    asset_volumes = np.around(rng.gamma(shape=2, scale=50, size=total_bars), 3)
+    timestamps = np.arange(total_bars, dtype=np.int64) * 300_000 + 1_696_118_400_000
+
+    return FootprintCandlesTuple(
+        candle_open_datetimes=timestamps.astype("datetime64[ms]"),
+        candle_open_timestamps=timestamps,
+        candle_open_prices=open_prices,
+        candle_high_prices=high_prices,
+        candle_low_prices=low_prices,
+        candle_close_prices=close_prices,
+        candle_asset_volumes=asset_volumes,
+        candle_usdt_volumes=asset_volumes * close_prices,
+    )
+
+
+def get_candle_array(
+    candles: FootprintCandlesTuple,
+) -> np.ndarray:
+    """
+    Summary
+    -------
+    The candles as the 2-dim array with a column for every CandleBodyType that the candle indicators in tv_indicators take
+
+    Parameters
+    ----------
+    candles : FootprintCandlesTuple
+        candles
+
+    Returns
+    -------
+    np.ndarray
+        candle array
+    """
+    candle_array = np.zeros((candles.candle_open_timestamps.size, CandleBodyType.Nothing))
+    candle_array[:, CandleBodyType.OpenTimestamp] = candles.candle_open_timestamps
+    candle_array[:, CandleBodyType.Open] = candles.candle_open_prices
+    candle_array[:, CandleBodyType.High] = candles.candle_high_prices
+    candle_array[:, CandleBodyType.Low] = candles.candle_low_prices
+    candle_array[:, CandleBodyType.Close] = candles.candle_close_prices
+    candle_array[:, CandleBodyType.UsdtVolume] = candles.candle_usdt_volumes
+    candle_array[:, CandleBodyType.AssetVolume] = candles.candle_asset_volumes
+    return candle_array
+
+
+class IndicatorSettings(NamedTuple):
+    rsi_length: np.ndarray
+    below_rsi: np.ndarray
+
+
+class BenchRSI(Strategy):
+    og_ind_set_tuple: IndicatorSettings
+    cur_ind_set_tuple: IndicatorSettings
+    indicator_bank_fields = ("rsi_length",)
+
+    def __init__(
+        self,
+        og_dos_tuple: DynamicOrderSettings,
+        rsi_length: np.ndarray,
+        below_rsi: np.ndarray,
+    ) -> None:
+        """
+        Summary
+        -------
+        Long when the rsi is below below_rsi and turns up, the benchmarks use it so they don't need any candles or strategies that aren't in the repo
+        """
+        self.long_short = "long"
+        self.log_folder = abspath(join(abspath("")))
+        self.exchange_settings_tuple = exchange_settings_tuple
+        self.backtest_settings_tuple = backtest_settings_tuple
+        self.static_os_tuple = static_os_tuple
+
+        self.set_og_ind_and_dos_tuples(
+            og_dos_tuple=og_dos_tuple,
+            og_ind_set_tuple=IndicatorSettings(
+                rsi_length=rsi_length,
+                below_rsi=below_rsi,
+            ),
+            shuffle_bool=False,
+        )
+
+    def set_og_ind_and_dos_tuples(
+        self,
+        og_dos_tuple: DynamicOrderSettings,
+        og_ind_set_tuple: IndicatorSettings,
+        shuffle_bool: bool,
+    ) -> None:
+        cart_prod_array, self.total_dos = self.get_ind_set_dos_cart_product(
+            dos_tuple=og_dos_tuple,
+            ind_set_tuple=og_ind_set_tuple,
+        )
+        cart_prod_array[11] = np.arange(cart_prod_array.shape[1])
+
+        self.og_dos_tuple = self.get_og_dos_tuple(
+            final_cart_prod_array=cart_prod_array,
+        )
+        self.og_ind_set_tuple = self.get_og_ind_set_tuple(
+            final_cart_prod_array=cart_prod_array,
+        )
+        self.total_filtered_settings = cart_prod_array.shape[1]
+
+    def get_og_ind_set_tuple(
+        self,
+        final_cart_prod_array: np.ndarray,
+    ) -> IndicatorSettings:
+        return IndicatorSettings(
+            rsi_length=final_cart_prod_array[12].astype(np.int_),
+            below_rsi=final_cart_prod_array[13].astype(np.int_),
+        )
+
+    def calc_indicator_bank_values(
+        self,
+        candles: FootprintCandlesTuple,
+        bank_params: tuple,
+    ) -> np.ndarray:
+        rsi = rsi_tv(
+            source=candles.candle_close_prices,
+            length=int(bank_params[0]),
+        )
+        return np.around(rsi, 1)
+
+    def set_cur_ind_set_tuple(
+        self,
+        set_idx: int,
+    ):
+        self.cur_ind_set_tuple = IndicatorSettings(
+            rsi_length=self.og_ind_set_tuple.rsi_length[set_idx],
+            below_rsi=self.og_ind_set_tuple.below_rsi[set_idx],
+        )
+
+    def set_entries_exits_array(
+        self,
+        candles: FootprintCandlesTuple,
+    ):
+        rsi = self.get_bank_indicator()
+        if rsi is None:
+            rsi = self.calc_indicator_bank_values(
+                candles=candles,
+                bank_params=(self.cur_ind_set_tuple.rsi_length,),
+            )
+        p_rsi = np.roll(rsi, 1)
+        p_rsi[0] = np.nan
+
+        self.entries = (rsi < self.cur_ind_set_tuple.below_rsi) & (rsi > p_rsi)
+        self.exit_prices = np.full_like(rsi, np.nan)
+        self.entries[: self.static_os_tuple.starting_bar] = False
+
+    def get_long_or_short(
+        self,
+    ):
+        return self.long_short
+
+
+backtest_settings_tuple = BacktestSettings(
+    gains_pct_filter=-np.inf,
+    qf_filter=-np.inf,
+)
+
+exchange_settings_tuple = ExchangeSettings(
+    asset_tick_step=3,
+    leverage_mode=1,
+    leverage_tick_step=2,
+    limit_fee_pct=0.0003,
+    market_fee_pct=0.0006,
+    max_asset_size=100.0,
+    max_leverage=150.0,
+    min_asset_size=0.001,
+    min_leverage=1.0,
+    mmr_pct=0.004,
+    position_mode=3,
+    price_tick_step=1,
+)
+
+static_os_tuple = StaticOrderSettings(
+    increase_position_type=IncreasePositionType.RiskPctAccountEntrySize,
+    leverage_strategy_type=LeverageStrategyType.Dynamic,
+    pg_min_max_sl_bcb="min",
+    sl_strategy_type=StopLossStrategyType.SLBasedOnCandleBody,
+    trailing_sl_strategy_type=TrailingSLStrategyType.CBAboveBelow,
+    sl_to_be_bool=False,
+    starting_bar=100,
+    starting_equity=1000.0,
+    static_leverage=None,
+    tp_fee_type="limit",
+    tp_strategy_type=TakeProfitStrategyType.RiskReward,
+    z_or_e_type=None,
+)
+
+og_dos_tuple = DynamicOrderSettings(
+    account_pct_risk_per_trade=np.array([3]),
+    max_trades=np.array([2]),
+    risk_reward=np.array([2, 4]),
+    sl_based_on_add_pct=np.array([0.2]),
+    sl_based_on_lookback=np.array([20]),
+    sl_bcb_type=np.array([CandleBodyType.Low]),
+    sl_to_be_cb_type=np.array([CandleBodyType.Nothing]),
+    sl_to_be_when_pct=np.array([0]),
+    trail_sl_bcb_type=np.array([CandleBodyType.Low]),
+    trail_sl_by_pct=np.array([1.0]),
+    trail_sl_when_pct=np.array([2]),
+)
+
+
+def get_bench_strategy(
+    total_ind_settings: int = 2,
+) -> BenchRSI:
+    """
+    Summary
+    -------
+    BenchRSI with the 2 dos of og_dos_tuple for every one of total_ind_settings indicator settings
+
+    Parameters
+    ----------
+    total_ind_settings : int, 2
+        number of indicator settings
+
+    Returns
+    -------
+    BenchRSI
+        strategy
+    """
+    return BenchRSI(
+        og_dos_tuple=og_dos_tuple,
+        rsi_length=np.arange(14, 14 + total_ind_settings),
+        below_rsi=np.array([35]),
+    )
+
+
+# 140 dos that only change the order settings once the cart product drops the ones where trail_sl_when_pct isn't greater than trail_sl_by_pct
+# the batch engine backtests them together for every indicator setting
+sweep_dos_tuple = og_dos_tuple._replace(
+    account_pct_risk_per_trade=np.array([1, 3]),
+    risk_reward=np.array([1.5, 2, 3, 4, 5]),
+    sl_based_on_lookback=np.array([10, 20]),
+    trail_sl_by_pct=np.array([0.5, 1.0, 1.5]),
+    trail_sl_when_pct=np.array([1, 2, 3]),
+)
+
+
+def get_bench_sweep_strategy() -> BenchRSI:
+    """
+    Summary
+    -------
+    BenchRSI with the 140 dos of sweep_dos_tuple for 8 indicator settings, so a backtest has 1120 settings like a real parameter sweep
+
+    Returns
+    -------
+    BenchRSI
+        strategy
+    """
+    return BenchRSI(
+        og_dos_tuple=sweep_dos_tuple,
+        rsi_length=np.array([14, 20]),
+        below_rsi=np.array([30, 35, 40, 45]),
+    )
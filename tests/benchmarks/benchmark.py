@@ -0,0 +1,385 @@
+import json
+import platform
+import subprocess
+import sys
+import numpy as np
+from argparse import ArgumentParser
+from contextlib import redirect_stdout
+from datetime import datetime, timezone
+from io import StringIO
+from os import makedirs
+from os.path import abspath, dirname, join
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from typing import Callable
+from quantfreedom.backtesters import or_backtest, run_df_backtest
+from quantfreedom.helpers.helper_funcs import make_bt_df
+from quantfreedom.helpers.result_sink import ResultMetricNames, get_result_sink
+from quantfreedom.indicators import tv_indicators
+from quantfreedom.order_handler.kernel_order import JIT_AVAILABLE
+from bench_strategy import (
+    get_bench_strategy,
+    get_bench_sweep_strategy,
+    get_candle_array,
+    make_random_walk_candles,
+    og_dos_tuple,
+)
+
+# python benchmark.py run --sizes 10000 100000 --out dbs/bench.json
+# python benchmark.py compare dbs/bench_baseline.json dbs/bench.json
+#
+# candle benchmarks get size candles and settings benchmarks get size settings, every benchmark is timed repeat times
+# unless it goes over max_seconds and the json keeps the fastest and the median time
+default_sizes = [10_000, 100_000, 1_000_000, 5_000_000]
+engines = ["loop", "batch", "kernel"]
+result_sinks = ["memory", "npy", "hdf5"]
+sink_rows_per_append = 10_000
+
+
+def get_indicator_cases(
+    candles,
+) -> dict[str, Callable]:
+    # every function in tv_indicators, the candle ones take the 2-dim candle array
+    close_prices = candles.candle_close_prices
+    candle_array = get_candle_array(candles=candles)
+    return {
+        "wma_tv": lambda: tv_indicators.wma_tv(source=close_prices, length=20),
+        "sma_tv": lambda: tv_indicators.sma_tv(source=close_prices, length=20),
+        "ema_tv": lambda: tv_indicators.ema_tv(source=close_prices, length=20),
+        "rma_tv": lambda: tv_indicators.rma_tv(source=close_prices, length=20),
+        "rma_tv_2": lambda: tv_indicators.rma_tv_2(
+            source_1=close_prices,
+            source_2=candles.candle_open_prices,
+            length=20,
+        ),
+        "stdev_tv": lambda: tv_indicators.stdev_tv(source=close_prices, length=20),
+        "macd_tv": lambda: tv_indicators.macd_tv(
+            source=close_prices,
+            fast_length=12,
+            slow_length=26,
+            signal_smoothing=9,
+        ),
+        "bb_tv": lambda: tv_indicators.bb_tv(length=20, multi=2, source=close_prices),
+        "true_range_tv": lambda: tv_indicators.true_range_tv(candles=candle_array),
+        "atr_tv": lambda: tv_indicators.atr_tv(candles=candle_array, length=14),
+        "rsi_tv": lambda: tv_indicators.rsi_tv(length=14, source=close_prices),
+        "supertrend_tv": lambda: tv_indicators.supertrend_tv(candles=candle_array, atr_length=10, factor=3),
+        "vwap_tv": lambda: tv_indicators.vwap_tv(candles=candle_array),
+        "donchain_channels_tv": lambda: tv_indicators.donchain_channels_tv(candles=candle_array, length=20),
+        "squeeze_momentum_lazybear_tv": lambda: tv_indicators.squeeze_momentum_lazybear_tv(
+            candles=candle_array,
+            length_bb=20,
+            length_kc=20,
+            multi_bb=2,
+            multi_kc=1.5,
+        ),
+        "linear_regression_candles_ugurvu_tv": lambda: tv_indicators.linear_regression_candles_ugurvu_tv(
+            candles=candle_array,
+            lin_reg_length=11,
+            smoothing_length=7,
+        ),
+        "revolution_volatility_bands_tv": lambda: tv_indicators.revolution_volatility_bands_tv(
+            length=20,
+            source=close_prices,
+        ),
+    }
+
+
+def get_candle_cases(
+    size: int,
+    threads: int,
+) -> dict[str, Callable]:
+    candles = make_random_walk_candles(total_bars=size)
+    strategy = get_bench_strategy()
+    sweep_strategy = get_bench_sweep_strategy()
+
+    cases = {
+        f"run_df_backtest[{engine}]": lambda engine=engine: run_df_backtest(
+            candles=candles,
+            strategy=strategy,
+            threads=threads,
+            engine=engine,
+            progress_interval=np.inf,
+        )
+        for engine in engines
+    }
+    # the 4 settings of get_bench_strategy are mostly the indicator, the sweep is where the engines differ
+    for engine in engines:
+        cases[f"run_df_backtest[{engine}] sweep"] = lambda engine=engine: run_df_backtest(
+            candles=candles,
+            strategy=sweep_strategy,
+            threads=threads,
+            engine=engine,
+            progress_interval=np.inf,
+        )
+    cases["or_backtest"] = lambda: or_backtest(
+        candles=candles,
+        disable_logger=True,
+        disable_plot=True,
+        strategy=get_bench_strategy(),
+        set_idx=0,
+    )
+    for name, case in get_indicator_cases(candles=candles).items():
+        cases[f"tv_indicators.{name}"] = case
+    return cases
+
+
+def get_settings_cases(
+    size: int,
+    only: list[str],
+) -> dict[str, Callable]:
+    case_names = ["get_ind_set_dos_cart_product", "make_bt_df"] + [f"result_sink[{sink}]" for sink in result_sinks]
+    if not any(is_wanted(name=name, only=only) for name in case_names):
+        # the settings take a while to make when size is in the millions
+        return {}
+
+    # the 2 dos of og_dos_tuple times size / 2 indicator settings
+    strategy = get_bench_strategy(total_ind_settings=max(size // 2, 1))
+    ind_set_tuple = strategy.og_ind_set_tuple._make(
+        (
+            np.unique(strategy.og_ind_set_tuple.rsi_length),
+            np.unique(strategy.og_ind_set_tuple.below_rsi),
+        )
+    )
+
+    # made up stats with the real settings columns so make_bt_df has something to convert and sort
+    rng = np.random.default_rng(1022)
+    total_settings = strategy.total_filtered_settings
+    total_metrics = len(ResultMetricNames)
+    total_columns = total_metrics + len(strategy.og_dos_tuple) + len(strategy.og_ind_set_tuple)
+    record_results = np.empty((total_settings, total_columns))
+    record_results[:, :total_metrics] = rng.normal(size=(total_settings, total_metrics))
+    record_results[:, total_metrics:] = np.column_stack(strategy.og_dos_tuple + strategy.og_ind_set_tuple)
+
+    cases = {
+        "get_ind_set_dos_cart_product": lambda: strategy.get_ind_set_dos_cart_product(
+            dos_tuple=og_dos_tuple,
+            ind_set_tuple=ind_set_tuple,
+        ),
+        "make_bt_df": lambda: make_bt_df(
+            strategy=strategy,
+            strategy_result_records=record_results,
+        ),
+    }
+    for result_sink in result_sinks:
+        cases[f"result_sink[{result_sink}]"] = lambda result_sink=result_sink: write_and_read_sink(
+            record_results=record_results,
+            result_sink=result_sink,
+        )
+    return cases
+
+
+def is_wanted(
+    name: str,
+    only: list[str],
+) -> bool:
+    return not only or any(part in name for part in only)
+
+
+def write_and_read_sink(
+    record_results: np.ndarray,
+    result_sink: str,
+):
+    with TemporaryDirectory() as temp_folder:
+        sink = get_result_sink(
+            num_array_columns=record_results.shape[1],
+            result_sink=result_sink,
+            result_path=join(temp_folder, "results.h5" if result_sink == "hdf5" else "shards"),
+        )
+        for row_start in range(0, record_results.shape[0], sink_rows_per_append):
+            sink.append(rows=record_results[row_start : row_start + sink_rows_per_append])
+        sink.get_results()
+        sink.close()
+
+
+def time_case(
+    case: Callable,
+    repeat: int,
+    max_seconds: float,
+) -> dict:
+    """
+    Summary
+    -------
+    Times a benchmark repeat times or until it went over max_seconds, the backtest prints don't get shown
+
+    Returns
+    -------
+    dict
+        fastest and median seconds and the number of runs or the error if it failed
+    """
+    run_times = []
+    try:
+        while len(run_times) < repeat and sum(run_times) < max_seconds:
+            with redirect_stdout(StringIO()):
+                start = perf_counter()
+                case()
+                run_times.append(perf_counter() - start)
+    except Exception as e:
+        return {"error": f"{type(e).__name__}: {e}"}
+    return {
+        "seconds": min(run_times),
+        "median_seconds": float(np.median(run_times)),
+        "runs": len(run_times),
+    }
+
+
+def get_git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            cwd=dirname(abspath(__file__)),
+            text=True,
+        ).stdout.strip()
+    except OSError:
+        return ""
+
+
+def run_benchmarks(
+    sizes: list[int],
+    threads: int,
+    repeat: int,
+    max_seconds: float,
+    only: list[str],
+) -> dict:
+    results = {}
+    for size in sizes:
+        print("\n" + f"Size: {size:,}")
+        for cases in (get_candle_cases(size=size, threads=threads), get_settings_cases(size=size, only=only)):
+            for name, case in cases.items():
+                if not is_wanted(name=name, only=only):
+                    continue
+                result = time_case(case=case, repeat=repeat, max_seconds=max_seconds)
+                results.setdefault(name, {})[str(size)] = result
+                if "error" in result:
+                    print(f"{name:<45} {result['error']}")
+                else:
+                    print(f"{name:<45} {result['seconds']:>10.4f}s  runs= {result['runs']}")
+    return {
+        "meta": {
+            "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git_commit": get_git_commit(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "numba": JIT_AVAILABLE,
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+            "threads": threads,
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def compare_benchmarks(
+    baseline: dict,
+    current: dict,
+    threshold: float,
+    min_seconds: float,
+) -> list[str]:
+    """
+    Summary
+    -------
+    Prints every benchmark that is in both and flags the ones that got more than threshold slower than the baseline
+
+    Parameters
+    ----------
+    baseline : dict
+        json of the baseline run
+    current : dict
+        json of the run to check
+    threshold : float
+        0.1 = 10% slower is a regression
+    min_seconds : float
+        differences smaller than this are noise and never a regression
+
+    Returns
+    -------
+    list[str]
+        benchmark and size of every regression
+    """
+    for key in ("python", "numpy", "numba", "machine", "threads"):
+        if baseline["meta"].get(key) != current["meta"].get(key):
+            print(f"warning {key} is {current['meta'].get(key)} but the baseline has {baseline['meta'].get(key)}")
+
+    regressions = []
+    print("\n" + f"{'Benchmark':<45}{'Size':>12}{'Baseline':>12}{'Current':>12}{'Change':>10}")
+    for name, sizes in current["results"].items():
+        for size, result in sizes.items():
+            base_result = baseline["results"].get(name, {}).get(size)
+            if base_result is None or "error" in base_result or "error" in result:
+                continue
+            base_seconds = base_result["seconds"]
+            cur_seconds = result["seconds"]
+            change = cur_seconds / base_seconds - 1
+            flag = ""
+            if change > threshold and cur_seconds - base_seconds > min_seconds:
+                flag = "  REGRESSION"
+                regressions.append(f"{name} {int(size):,}")
+            elif change < -threshold and base_seconds - cur_seconds > min_seconds:
+                flag = "  faster"
+            print(f"{name:<45}{int(size):>12,}{base_seconds:>12.4f}{cur_seconds:>12.4f}{change * 100:>9.1f}%{flag}")
+
+    if regressions:
+        print("\n" + f"{len(regressions)} regressions over {threshold * 100:.0f}%")
+        for regression in regressions:
+            print(regression)
+    else:
+        print("\n" + "No regressions")
+    return regressions
+
+
+def load_json(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="QuantFreedom benchmarks on random walk candles")
+    sub_parsers = parser.add_subparsers(dest="mode", required=True)
+
+    run_parser = sub_parsers.add_parser("run", help="run the benchmarks and save them to json")
+    run_parser.add_argument("--sizes", type=int, nargs="+", default=default_sizes)
+    run_parser.add_argument("--threads", type=int, default=1)
+    run_parser.add_argument("--repeat", type=int, default=3)
+    run_parser.add_argument("--max-seconds", type=float, default=30.0)
+    run_parser.add_argument("--only", nargs="+", default=[], help="only the benchmarks with one of these in their name")
+    run_parser.add_argument("--out", default="dbs/benchmarks/benchmark.json")
+    run_parser.add_argument("--baseline", default=None, help="compare to this json when the run is done")
+    run_parser.add_argument("--threshold", type=float, default=0.1)
+    run_parser.add_argument("--min-seconds", type=float, default=0.005)
+
+    compare_parser = sub_parsers.add_parser("compare", help="compare a run to a baseline")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.1)
+    compare_parser.add_argument("--min-seconds", type=float, default=0.005)
+
+    args = parser.parse_args()
+
+    if args.mode == "run":
+        current = run_benchmarks(
+            sizes=args.sizes,
+            threads=args.threads,
+            repeat=args.repeat,
+            max_seconds=args.max_seconds,
+            only=args.only,
+        )
+        makedirs(dirname(abspath(args.out)), exist_ok=True)
+        with open(args.out, "w") as f:
+            json.dump(current, f, indent=2)
+        print("\n" + f"Benchmarks saved to {args.out}")
+        if args.baseline is None:
+            sys.exit(0)
+        baseline = load_json(args.baseline)
+    else:
+        baseline = load_json(args.baseline)
+        current = load_json(args.current)
+
+    regressions = compare_benchmarks(
+        baseline=baseline,
+        current=current,
+        threshold=args.threshold,
+        min_seconds=args.min_seconds,
+    )
+    sys.exit(1 if regressions else 0)